@@ -0,0 +1,350 @@
+"""A tiered cache for the API, and helpers for caching views with it.
+
+Every cache read used to be a round trip to Postgres, competing with
+the queries the API actually needs to make. TieredCache puts a small
+LRU in each process in front of a shared cache, such as Redis or
+memcached, and falls back to the database cache if no shared cache is
+configured or it stops responding.
+
+Entries only live in the per-process LRU for LOCAL_TIMEOUT seconds, so
+deleting something from the cache can take that long to reach every
+process. They're pickled like they would be in any other cache, so
+nothing a request does to what it got from the cache affects anyone
+else.
+
+Views opt into caching with cached_view(), which groups their pages so
+invalidate_cached_views() can drop a whole group at once. Pages built
+from rows that the Foreman or workers write, where the API would never
+hear about the change, can instead be keyed on latest_change() of those
+rows' models.
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db.models import Count, Max
+from django.middleware.cache import CacheMiddleware
+from django.utils.decorators import decorator_from_middleware_with_args
+from django.views.decorators.vary import vary_on_headers
+
+from data_refinery_common.logging import get_and_configure_logger
+
+logger = get_and_configure_logger(__name__)
+
+# How long to stop trying the shared cache after it fails.
+SHARED_CACHE_RETRY_TIME = 30
+
+VERSION_KEY_PREFIX = "cached_view_version:"
+
+_MISSING = object()
+
+
+class _LocalLRU:
+    """A thread-safe LRU of entries which expire.
+
+    Values are stored pickled so each get returns a copy, which keeps
+    requests in different threads from sharing response objects.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return _MISSING
+
+            self.entries.move_to_end(key)
+
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout: float) -> None:
+        if self.max_entries <= 0 or timeout <= 0:
+            self.delete(key)
+            return
+
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (value, time.time() + timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class _Metrics:
+    """Counts hits, misses, errors and time spent for each tier."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tiers = {}
+
+    def record(self, tier: str, duration: float = 0.0, hit: bool = None, error=False) -> None:
+        with self.lock:
+            tier_metrics = self.tiers.setdefault(
+                tier, {"calls": 0, "hits": 0, "misses": 0, "errors": 0, "total_time": 0.0}
+            )
+            tier_metrics["calls"] += 1
+            tier_metrics["total_time"] += duration
+            if hit is True:
+                tier_metrics["hits"] += 1
+            elif hit is False:
+                tier_metrics["misses"] += 1
+            if error:
+                tier_metrics["errors"] += 1
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            snapshot = {}
+            for tier, tier_metrics in self.tiers.items():
+                lookups = tier_metrics["hits"] + tier_metrics["misses"]
+                snapshot[tier] = {
+                    **tier_metrics,
+                    "hit_rate": tier_metrics["hits"] / lookups if lookups else 0.0,
+                    "average_latency_ms": 1000 * tier_metrics["total_time"] / tier_metrics["calls"],
+                }
+            return snapshot
+
+
+# Django makes a cache object per thread, but the LRUs and metrics are
+# for the whole process, so they're kept here by cache location.
+_local_caches = {}
+_metrics = {}
+_process_lock = threading.Lock()
+
+
+def get_process_metrics(name: str) -> _Metrics:
+    """Returns this process's metrics for `name`, such as a cache location."""
+    with _process_lock:
+        if name not in _metrics:
+            _metrics[name] = _Metrics()
+        return _metrics[name]
+
+
+class TieredCache(BaseCache):
+    """A per-process LRU in front of another cache.
+
+    Configured through OPTIONS:
+        LOCAL_MAX_ENTRIES: how many entries each process keeps. 0 disables the LRU.
+        LOCAL_TIMEOUT: the most seconds an entry is kept in a process.
+        SHARED_CACHE: the alias of the shared cache, if there is one.
+        FALLBACK_CACHE: the alias of the cache to use if there's no shared
+            cache or it's failing.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 60)
+        self.shared_alias = options.get("SHARED_CACHE")
+        self.fallback_alias = options.get("FALLBACK_CACHE", "database")
+
+        location = location or "default"
+        with _process_lock:
+            if location not in _local_caches:
+                _local_caches[location] = _LocalLRU(options.get("LOCAL_MAX_ENTRIES", 1000))
+        self.local = _local_caches[location]
+        self.metrics = get_process_metrics(location)
+        self.shared_down_until = 0.0
+
+    def _call_remote(self, method: str, *args, **kwargs):
+        """Calls `method` on the shared cache, or the fallback cache if it's unavailable."""
+        if self.shared_alias and time.time() >= self.shared_down_until:
+            start_time = time.monotonic()
+            try:
+                result = getattr(caches[self.shared_alias], method)(*args, **kwargs)
+                self._record(self.shared_alias, method, start_time, result)
+                return result
+            except Exception:
+                self.metrics.record(self.shared_alias, time.monotonic() - start_time, error=True)
+                logger.exception(
+                    "Shared cache failed, falling back.",
+                    shared_cache=self.shared_alias,
+                    fallback_cache=self.fallback_alias,
+                )
+                self.shared_down_until = time.time() + SHARED_CACHE_RETRY_TIME
+
+        start_time = time.monotonic()
+        result = getattr(caches[self.fallback_alias], method)(*args, **kwargs)
+        self._record(self.fallback_alias, method, start_time, result)
+        return result
+
+    def _record(self, tier: str, method: str, start_time: float, result) -> None:
+        hit = result is not _MISSING if method == "get" else None
+        self.metrics.record(tier, time.monotonic() - start_time, hit=hit)
+
+    def _get_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _set_local(self, local_key, value, timeout) -> None:
+        local_timeout = self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+        self.local.set(local_key, value, local_timeout)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version=version)
+        self.validate_key(local_key)
+
+        value = self.local.get(local_key)
+        self.metrics.record("local", hit=value is not _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = self._call_remote("get", key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+
+        # We don't know how long the entry has left, so keep it for as
+        # long as we would keep anything.
+        self._set_local(local_key, value, None)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_key(key, version=version)
+        self.validate_key(local_key)
+        timeout = self._get_timeout(timeout)
+
+        self._call_remote("set", key, value, timeout=timeout, version=version)
+        self._set_local(local_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_key(key, version=version)
+        self.validate_key(local_key)
+        timeout = self._get_timeout(timeout)
+
+        added = self._call_remote("add", key, value, timeout=timeout, version=version)
+        if added:
+            self._set_local(local_key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        # Let the next get pick up the new expiration.
+        self.local.delete(self.make_key(key, version=version))
+        return self._call_remote("touch", key, timeout=self._get_timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_key(key, version=version))
+        return self._call_remote("delete", key, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self._call_remote("clear")
+
+    def get_metrics(self) -> Dict:
+        """Returns this process's hit, miss, error and latency counts for each tier."""
+        return self.metrics.snapshot()
+
+
+def get_view_cache_version(group: str) -> str:
+    return str(caches["default"].get(VERSION_KEY_PREFIX + group, 0))
+
+
+def invalidate_cached_views(*groups: str) -> None:
+    """Drops every page cached for `groups` by changing their versions."""
+    for group in groups:
+        caches["default"].set(VERSION_KEY_PREFIX + group, time.time_ns(), timeout=None)
+
+
+def latest_change(*models) -> Callable[[], str]:
+    """Returns a data_version for cached_view() which changes whenever a
+    row of one of `models` is saved or deleted.
+
+    Unlike invalidate_cached_views(), this notices rows written by the
+    Foreman and workers. The models need a last_modified field, which
+    save() sets, so rows changed with QuerySet.update() aren't noticed.
+    """
+
+    def get_data_version() -> str:
+        versions = []
+        for model in models:
+            latest = model.objects.aggregate(last_modified=Max("last_modified"), count=Count("id"))
+            last_modified = latest["last_modified"].timestamp() if latest["last_modified"] else 0
+            versions.append("{}-{}".format(last_modified, latest["count"]))
+
+        return "_".join(versions)
+
+    return get_data_version
+
+
+class _VersionedCacheMiddleware(CacheMiddleware):
+    """Caches pages under their group's current version."""
+
+    def __init__(self, get_response, group=None, data_version=None, **kwargs):
+        self.group = group
+        self.data_version = data_version
+        # One middleware serves every request to the view, so the prefix
+        # for the request each thread is handling is kept here.
+        self.request_prefix = threading.local()
+        super().__init__(get_response, **kwargs)
+
+    def _get_key_prefix(self) -> str:
+        key_prefix = "{}.{}".format(self.group, get_view_cache_version(self.group))
+        if self.data_version:
+            key_prefix += "." + self.data_version()
+
+        return key_prefix
+
+    @property
+    def key_prefix(self):
+        return getattr(self.request_prefix, "value", None) or self._get_key_prefix()
+
+    @key_prefix.setter
+    def key_prefix(self, value):
+        # The prefix always comes from the group.
+        pass
+
+    def process_request(self, request):
+        # Work out the version once, so a page built from rows that
+        # change while it's being built isn't cached as the new version.
+        request._cached_view_key_prefix = self._get_key_prefix()
+        self.request_prefix.value = request._cached_view_key_prefix
+        try:
+            return super().process_request(request)
+        finally:
+            self.request_prefix.value = None
+
+    def process_response(self, request, response):
+        self.request_prefix.value = getattr(request, "_cached_view_key_prefix", None)
+        try:
+            return super().process_response(request, response)
+        finally:
+            self.request_prefix.value = None
+
+
+def cached_view(group: str, timeout: int, vary_on=(), data_version: Callable[[], str] = None):
+    """Like cache_page, but the pages can be dropped with invalidate_cached_views(group).
+
+    `vary_on` lists request headers which change the response, such as
+    API keys, so responses to requests with different values are cached
+    separately. If `data_version` is given, pages are also cached under
+    what it returns, such as latest_change() of the models they show.
+    """
+
+    def decorator(view):
+        if vary_on:
+            view = vary_on_headers(*vary_on)(view)
+
+        return decorator_from_middleware_with_args(_VersionedCacheMiddleware)(
+            page_timeout=timeout, group=group, data_version=data_version
+        )(view)
+
+    return decorator
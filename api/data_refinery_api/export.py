@@ -0,0 +1,139 @@
+"""Streaming metadata exports.
+
+Building a metadata table by paging through the list endpoints costs a
+round of prefetches and serialization for every page. The export
+endpoints instead stream a flat projection of every matching row as TSV
+or JSON lines.
+
+The API's database connections go through PgBouncer, so server side
+cursors are turned off and iterator() would still load every row at
+once. Rows are read a chunk at a time by id instead, which keeps memory
+flat however big the export is.
+"""
+
+import csv
+import json
+from typing import Dict, Iterator, List
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework import generics
+from rest_framework.throttling import SimpleRateThrottle
+
+from data_refinery_api.exceptions import InvalidFilters
+from data_refinery_common.models import APIToken
+
+# How many rows to read from the database at a time.
+EXPORT_CHUNK_SIZE = 2000
+
+FILE_FORMAT_PARAM = "file_format"
+FILE_FORMATS = {
+    "tsv": "text/tab-separated-values",
+    "jsonl": "application/x-ndjson",
+}
+
+
+class ExportRateThrottle(SimpleRateThrottle):
+    """Limits how many exports each activated API token, or each address
+    without one, can start."""
+
+    scope = "export"
+
+    def get_cache_key(self, request, view):
+        token_id = request.META.get("HTTP_API_KEY", None)
+
+        # Otherwise making up a new key for every request would get
+        # around the limit.
+        try:
+            token = APIToken.objects.get(id=token_id, is_activated=True)
+            ident = "token_" + str(token.id)
+        except (APIToken.DoesNotExist, ValidationError):
+            ident = self.get_ident(request)
+
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+def iter_rows(queryset, fields: List[str], chunk_size=EXPORT_CHUNK_SIZE) -> Iterator[Dict]:
+    """Yields `fields` of every row in `queryset` in id order, a chunk at a time."""
+    queryset = queryset.prefetch_related(None).order_by("id").values("id", *fields)
+
+    last_id = None
+    while True:
+        chunk_queryset = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        chunk = list(chunk_queryset[:chunk_size])
+        if not chunk:
+            return
+
+        yield from chunk
+        last_id = chunk[-1]["id"]
+
+
+class _Echo:
+    """A file-like object that hands back whatever is written to it, so
+    csv.writer can build lines one at a time."""
+
+    def write(self, value):
+        return value
+
+
+def _format_tsv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ",".join(str(item) for item in value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_tsv(rows: Iterator[Dict], columns: List[str]) -> Iterator[str]:
+    writer = csv.writer(_Echo(), delimiter="\t", lineterminator="\n")
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_format_tsv_value(row[column]) for column in columns])
+
+
+def iter_jsonl(rows: Iterator[Dict], columns: List[str]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps({column: row[column] for column in columns}, cls=DjangoJSONEncoder) + "\n"
+
+
+class MetadataExportView(generics.GenericAPIView):
+    """Base for views that stream `export_fields` of every object in
+    their filtered queryset.
+
+    `file_format` can be `tsv` (the default) or `jsonl`."""
+
+    export_fields = []
+    export_name = "export"
+    file_format_param = FILE_FORMAT_PARAM
+    pagination_class = None
+    throttle_classes = (ExportRateThrottle,)
+
+    def get_export_queryset(self):
+        """Lets views add annotations that only the export needs."""
+        return self.filter_queryset(self.get_queryset())
+
+    def get(self, request, version, format=None):
+        file_format = request.query_params.get(self.file_format_param, "tsv")
+        if file_format not in FILE_FORMATS:
+            raise InvalidFilters(
+                message="{} must be one of {}.".format(
+                    self.file_format_param, ", ".join(sorted(FILE_FORMATS))
+                ),
+                invalid_filters=[self.file_format_param],
+            )
+
+        columns = ["id", *self.export_fields]
+        rows = iter_rows(self.get_export_queryset(), self.export_fields)
+        if file_format == "tsv":
+            content = iter_tsv(rows, columns)
+        else:
+            content = iter_jsonl(rows, columns)
+
+        response = StreamingHttpResponse(content, content_type=FILE_FORMATS[file_format])
+        response["Content-Disposition"] = 'attachment; filename="{}.{}"'.format(
+            self.export_name, file_format
+        )
+        return response
@@ -3,7 +3,9 @@ import datetime
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
-from django_elasticsearch_dsl.registries import registry
+from data_refinery_api import search_cache, search_indexing
+from data_refinery_api.views.experiment_document import precompute_facets
+from data_refinery_common.models.documents import ExperimentDocument
 
 # We'll update for the past 30 minutes every 20 minutes.
 UPDATE_WINDOW = datetime.timedelta(minutes=30)
@@ -12,18 +14,64 @@ UPDATE_WINDOW = datetime.timedelta(minutes=30)
 class Command(BaseCommand):
     help = "Manage elasticsearch index."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help=(
+                "Index every experiment into a new index, then point the experiments alias at it"
+                " instead of only updating recently modified experiments."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=search_indexing.DEFAULT_BATCH_SIZE,
+            help="How many experiments to load from the database at a time.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=search_indexing.DEFAULT_CHUNK_SIZE,
+            help="How many documents to send to Elasticsearch in each bulk request.",
+        )
+        parser.add_argument(
+            "--thread-count",
+            type=int,
+            default=search_indexing.DEFAULT_THREAD_COUNT,
+            help="How many bulk requests to have going at once.",
+        )
+
     def handle(self, *args, **options):
-        """This command is based off of the 'populate' command of Django ES DSL:
+        """This command was based off of the 'populate' command of Django ES DSL:
 
         https://github.com/sabricot/django-elasticsearch-dsl/blob/f6b2e0694e4ed69826c824196ccec5863874c856/django_elasticsearch_dsl/management/commands/search_index.py#L86
 
         We have updated it so that it will do incremental updates
-        rather than looping over the full queryset every time.
+        rather than looping over the full queryset every time, and so
+        that it prefetches what the documents need in batches.
         """
-        models = set(registry.get_models())
+        bulk_options = {
+            "batch_size": options["batch_size"],
+            "chunk_size": options["chunk_size"],
+            "thread_count": options["thread_count"],
+        }
 
-        for doc in registry.get_documents(models):
+        if options["full"]:
+            self.stdout.write("Reindexing all experiments")
+            stats = search_indexing.reindex_experiments(**bulk_options)
+            self.stdout.write("Swapped the alias to {}".format(stats["index"]))
+        else:
             start_time = timezone.now() - UPDATE_WINDOW
-            qs = doc().get_queryset().filter(last_modified__gt=start_time).order_by("id")
+            qs = ExperimentDocument().get_queryset().filter(last_modified__gt=start_time)
             self.stdout.write("Indexing {} '{}' objects".format(qs.count(), qs.model.__name__))
-            doc().update(qs)
+            stats = search_indexing.index_experiments(qs, **bulk_options)
+
+        self.stdout.write(
+            "Indexed {indexed} experiments ({failed} failed) in {duration:.1f}s,"
+            " {docs_per_second:.1f} docs/sec".format(**stats)
+        )
+
+        # Cached searches could be out of date now.
+        search_cache.invalidate()
+        self.stdout.write("Precomputed {} sets of search facets".format(precompute_facets()))
@@ -1,6 +1,201 @@
+import binascii
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+import coreapi
+import coreschema
+
+from data_refinery_api.exceptions import InvalidFilters
+from data_refinery_common.performant_pagination.pagination import PerformantPaginator
+
+# Below this many rows an exact count is cheap enough to just do.
+APPROXIMATE_COUNT_THRESHOLD = 100000
 
 
 # Limit the max size of requests.
 class LimitedLimitOffsetPagination(LimitOffsetPagination):
     max_limit = 1000
+
+
+def get_estimated_count(queryset) -> int:
+    """Returns how many rows Postgres' planner thinks `queryset` will return.
+
+    This comes from the table statistics, so it costs about the same no
+    matter how big the table is, but it can be well off for complicated
+    filters.
+    """
+    compiler = queryset.order_by().query.get_compiler(using=queryset.db)
+    sql, params = compiler.as_sql()
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def get_count(queryset):
+    """Returns (count, is_approximate) for `queryset`.
+
+    Small results are counted exactly, but anything the planner thinks
+    is over APPROXIMATE_COUNT_THRESHOLD rows gets the planner's estimate
+    instead of a COUNT(*) that has to visit every one of them.
+    """
+    estimate = get_estimated_count(queryset)
+    if estimate < APPROXIMATE_COUNT_THRESHOLD:
+        return queryset.count(), False
+
+    return estimate, True
+
+
+class CursorOrLimitOffsetPagination(LimitedLimitOffsetPagination):
+    """Offset paging by default, or keyset paging when a `cursor` is passed.
+
+    Offset paging gets slower the deeper you go, since Postgres has to
+    find and throw away every row before the offset. Passing `cursor`
+    (empty for the first page) pages by id instead, so every page costs
+    the same. Each response's `next` and `previous` links carry the
+    cursor for those pages.
+
+    Either way `count` is only exact for smaller results, which is what
+    `count_is_approximate` says.
+    """
+
+    cursor_query_param = "cursor"
+    cursor_query_description = (
+        "Pass this empty to page through the results by id, then follow the `next` links. "
+        "This is much faster than `offset` for deep pages. Can't be used with `offset` or "
+        "`ordering`."
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor = request.query_params.get(self.cursor_query_param)
+        self.limit = self.get_limit(request)
+
+        if self.cursor is not None:
+            return self.paginate_queryset_by_cursor(queryset, request)
+
+        if self.limit is None:
+            return None
+
+        self.count, self.count_is_approximate = get_count(queryset)
+        self.offset = self.get_offset(request)
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        # An estimate can be low, so don't trust it to say there's nothing here.
+        if not self.count_is_approximate and (self.count == 0 or self.offset > self.count):
+            self.results_length = 0
+            return []
+
+        results = list(queryset[self.offset : self.offset + self.limit])
+        self.results_length = len(results)
+        return results
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        conflicting_params = [
+            param
+            for param in (self.offset_query_param, "ordering")
+            if param in request.query_params
+        ]
+        if conflicting_params:
+            raise InvalidFilters(
+                message="Cursor pagination always goes in id order and can't be combined with"
+                " these parameters.",
+                invalid_filters=conflicting_params,
+            )
+
+        paginator = PerformantPaginator(queryset, per_page=self.limit, ordering="pk")
+        try:
+            page = paginator.page(self.cursor)
+        except (binascii.Error, ValueError, ValidationError):
+            raise NotFound("Invalid cursor")
+
+        self.count, self.count_is_approximate = get_count(queryset)
+        self.next_token = page.next_token
+        self.previous_token = page.previous_token
+
+        return list(page.object_list)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.count),
+                    ("count_is_approximate", self.count_is_approximate),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count_is_approximate"] = {
+            "type": "boolean",
+            "example": False,
+        }
+        return response_schema
+
+    def _get_cursor_link(self, token):
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        # The tokens are base64 encoded already.
+        return replace_query_param(url, self.cursor_query_param, token.decode())
+
+    def get_next_link(self):
+        if self.cursor is not None:
+            if self.next_token is None:
+                return None
+            return self._get_cursor_link(self.next_token)
+
+        if self.count_is_approximate:
+            # A short page means we've run out, whatever the estimate says.
+            if self.results_length < self.limit:
+                return None
+        elif self.offset + self.limit >= self.count:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_previous_link(self):
+        if self.cursor is not None:
+            if self.previous_token is None:
+                return None
+            # The paginator uses an empty token for the first page.
+            return self._get_cursor_link(self.previous_token or b"")
+
+        return super().get_previous_link()
+
+    def get_schema_fields(self, view):
+        return super().get_schema_fields(view) + [
+            coreapi.Field(
+                name=self.cursor_query_param,
+                required=False,
+                location="query",
+                schema=coreschema.String(
+                    title="Cursor", description=str(self.cursor_query_description)
+                ),
+            )
+        ]
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": str(self.cursor_query_description),
+                "schema": {"type": "string"},
+            }
+        ]
@@ -0,0 +1,125 @@
+"""Caching for the experiment search endpoint.
+
+The frontend sends the same few searches over and over, like its
+landing page's search with no filters, so whole search responses are
+cached for a short time under their normalized parameters. The facets
+for no filters and for each single filter are also computed ahead of
+time, since the aggregations are the most expensive part of a search.
+
+Everything cached here is dropped by invalidate(), which
+update_es_index calls whenever the index changes.
+"""
+
+import hashlib
+import json
+from typing import Dict, Optional
+
+from django.core.cache import caches
+
+from data_refinery_api.caching import (
+    get_process_metrics,
+    get_view_cache_version,
+    invalidate_cached_views,
+)
+
+CACHE_GROUP = "search"
+
+# Search responses only live a short time in case the index changes
+# without update_es_index running.
+RESULTS_CACHE_TIME = 5 * 60
+
+# Precomputed facets live until the next index update replaces them,
+# but don't let them outlive the index updates stopping for long.
+FACETS_CACHE_TIME = 24 * 60 * 60
+
+# These don't change which experiments match.
+PAGINATION_PARAMS = ["limit", "offset", "ordering"]
+
+results_metrics = get_process_metrics("search_results")
+facets_metrics = get_process_metrics("search_facets")
+
+
+def get_search_params(request) -> Dict:
+    """Combines the query parameters and, for POSTs, the body into one dict of lists."""
+    params = {key: request.query_params.getlist(key) for key in request.query_params}
+
+    if request.method == "POST":
+        for key, value in request.data.items():
+            values = value if isinstance(value, list) else [value]
+            params.setdefault(key, []).extend(str(item) for item in values)
+
+    return params
+
+
+def normalize_search_params(params: Dict) -> str:
+    """Turns search parameters into a string that's the same for equivalent searches.
+
+    The order of parameters, and of a parameter's values, doesn't
+    matter except for ordering, since the results are sorted by each of
+    its values in turn.
+    """
+    normalized = {
+        key: values if key == "ordering" else sorted(values) for key, values in params.items()
+    }
+    return json.dumps(normalized, sort_keys=True)
+
+
+def _make_key(kind: str, normalized_params: str) -> str:
+    params_hash = hashlib.md5(normalized_params.encode()).hexdigest()
+    return "search:{}:{}:{}".format(kind, get_view_cache_version(CACHE_GROUP), params_hash)
+
+
+def get_cached_results(params: Dict) -> Optional[Dict]:
+    results = caches["default"].get(_make_key("results", normalize_search_params(params)))
+    results_metrics.record("search_results", hit=results is not None)
+    return results
+
+
+def cache_results(params: Dict, results: Dict) -> None:
+    caches["default"].set(
+        _make_key("results", normalize_search_params(params)),
+        dict(results),
+        timeout=RESULTS_CACHE_TIME,
+    )
+
+
+def get_facet_filter(params: Dict, filter_params) -> Optional[Dict]:
+    """Returns the filters of a search if it could use precomputed facets, otherwise None.
+
+    That's searches with no search terms and at most one of
+    `filter_params` with one value. Pagination doesn't matter.
+    """
+    filters = {key: values for key, values in params.items() if key not in PAGINATION_PARAMS}
+    if not filters:
+        return {}
+
+    if len(filters) == 1:
+        key, values = next(iter(filters.items()))
+        if key in filter_params and len(values) == 1:
+            return {key: values}
+
+    return None
+
+
+def get_precomputed_facets(facet_filter: Dict) -> Optional[Dict]:
+    facets = caches["default"].get(_make_key("facets", normalize_search_params(facet_filter)))
+    facets_metrics.record("search_facets", hit=facets is not None)
+    return facets
+
+
+def store_precomputed_facets(facet_filter: Dict, facets: Dict) -> None:
+    caches["default"].set(
+        _make_key("facets", normalize_search_params(facet_filter)),
+        facets,
+        timeout=FACETS_CACHE_TIME,
+    )
+
+
+def invalidate() -> None:
+    """Drops every cached search response and precomputed facet."""
+    invalidate_cached_views(CACHE_GROUP)
+
+
+def get_metrics() -> Dict:
+    """Returns this process's hit and miss counts for search responses and facets."""
+    return {**results_metrics.snapshot(), **facets_metrics.snapshot()}
@@ -0,0 +1,182 @@
+"""Bulk indexing of experiments into Elasticsearch.
+
+Indexing through the document one experiment at a time costs a couple
+of queries per experiment for its organisms and downloadable samples.
+This loads experiments in batches with those prefetched, builds the
+documents as they're needed, and sends them with parallel bulk
+requests.
+
+A full reindex builds a brand new index and then points the alias the
+API searches at it, so searches keep working while it runs.
+"""
+
+import time
+from typing import Dict, Iterator
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from elasticsearch.helpers import parallel_bulk
+
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.models import Sample
+from data_refinery_common.models.documents import ExperimentDocument
+
+logger = get_and_configure_logger(__name__)
+
+# How many experiments to load from the database at a time.
+DEFAULT_BATCH_SIZE = 1000
+
+# How many documents to send to Elasticsearch in each bulk request.
+DEFAULT_CHUNK_SIZE = 500
+
+DEFAULT_THREAD_COUNT = 4
+
+
+def get_downloadable_samples_prefetch() -> Prefetch:
+    """Prefetches what ExperimentDocument needs for organism_names and downloadable_samples."""
+    return Prefetch(
+        "samples",
+        queryset=Sample.objects.filter(is_processed=True, organism__qn_target__isnull=False)
+        .select_related("organism")
+        .only("accession_code", "organism__name"),
+        to_attr="prefetched_downloadable_samples",
+    )
+
+
+def iter_experiment_batches(queryset, batch_size=DEFAULT_BATCH_SIZE) -> Iterator:
+    """Yields lists of experiments from `queryset` with their downloadable samples prefetched.
+
+    Experiments are paged through by id, so each batch costs the same
+    two queries however far in we are.
+    """
+    queryset = queryset.order_by("id").prefetch_related(get_downloadable_samples_prefetch())
+
+    last_id = None
+    while True:
+        batch_queryset = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        batch = list(batch_queryset[:batch_size])
+        if not batch:
+            return
+
+        yield batch
+        last_id = batch[-1].id
+
+
+def iter_index_actions(queryset, index_name: str, batch_size=DEFAULT_BATCH_SIZE) -> Iterator[Dict]:
+    """Yields a bulk index action for each experiment in `queryset`."""
+    doc = ExperimentDocument()
+    for batch in iter_experiment_batches(queryset, batch_size):
+        for experiment in batch:
+            yield {
+                "_op_type": "index",
+                "_index": index_name,
+                "_type": doc._doc_type.name,
+                "_id": experiment.pk,
+                "_source": doc.prepare(experiment),
+            }
+
+
+def index_experiments(
+    queryset,
+    index_name: str = None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    thread_count=DEFAULT_THREAD_COUNT,
+) -> Dict:
+    """Indexes every experiment in `queryset` and returns how it went.
+
+    The result has the number of documents indexed and that failed, how
+    long it took, and the throughput in documents per second.
+    """
+    index_name = index_name or ExperimentDocument._index._name
+    client = ExperimentDocument._get_connection()
+
+    start_time = time.monotonic()
+    indexed = 0
+    failed = 0
+    for success, info in parallel_bulk(
+        client,
+        iter_index_actions(queryset, index_name, batch_size),
+        thread_count=thread_count,
+        chunk_size=chunk_size,
+        raise_on_error=False,
+    ):
+        if success:
+            indexed += 1
+        else:
+            failed += 1
+            logger.error("Failed to index experiment.", index=index_name, info=info)
+
+    duration = time.monotonic() - start_time
+    stats = {
+        "indexed": indexed,
+        "failed": failed,
+        "duration": duration,
+        "docs_per_second": indexed / duration if duration else 0.0,
+    }
+    logger.info("Indexed experiments.", index=index_name, **stats)
+
+    return stats
+
+
+def swap_alias(alias: str, index_name: str) -> None:
+    """Points `alias` at `index_name` and deletes whatever it pointed at before."""
+    client = ExperimentDocument._get_connection()
+
+    if client.indices.exists_alias(name=alias):
+        old_indices = list(client.indices.get_alias(name=alias).keys())
+        client.indices.update_aliases(
+            body={
+                "actions": [
+                    *[{"remove": {"index": old, "alias": alias}} for old in old_indices],
+                    {"add": {"index": index_name, "alias": alias}},
+                ]
+            }
+        )
+        for old_index in old_indices:
+            client.indices.delete(index=old_index)
+        return
+
+    if client.indices.exists(index=alias):
+        # The first time we do this there's a plain index with the
+        # alias's name in the way, so searches fail until the alias is up.
+        logger.warning("Replacing index with an alias.", alias=alias, index=index_name)
+        client.indices.delete(index=alias)
+
+    client.indices.put_alias(index=index_name, name=alias)
+
+
+def reindex_experiments(
+    batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE, thread_count=DEFAULT_THREAD_COUNT
+) -> Dict:
+    """Indexes every experiment into a new index, then swaps the alias over to it."""
+    alias = ExperimentDocument._index._name
+    index_name = "{}_{}".format(alias, timezone.now().strftime("%Y%m%d%H%M%S"))
+
+    # There's no one searching the new index yet, so don't refresh it
+    # until everything's in.
+    new_index = ExperimentDocument._index.clone(name=index_name)
+    new_index.settings(refresh_interval="-1")
+    new_index.create()
+
+    stats = index_experiments(
+        ExperimentDocument().get_queryset(),
+        index_name,
+        batch_size=batch_size,
+        chunk_size=chunk_size,
+        thread_count=thread_count,
+    )
+
+    if stats["failed"]:
+        # Better to keep serving the old index than a partial one.
+        new_index.delete()
+        raise RuntimeError(
+            "{} experiments failed to index into {}.".format(stats["failed"], index_name)
+        )
+
+    new_index.put_settings(body={"index": {"refresh_interval": "1s"}})
+    new_index.refresh()
+    swap_alias(alias, index_name)
+
+    return {**stats, "index": index_name}
@@ -154,14 +154,41 @@ STATICFILES_DIRS = [
 
 # Caching
 # https://docs.djangoproject.com/en/2.2/topics/cache/
+#
+# Reads go through a small LRU in each process first, then a shared
+# cache if one is configured, e.g. with
+# API_SHARED_CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache.
+# The database cache is used if there's no shared cache or it's down.
+# See data_refinery_api.caching.
+
+SHARED_CACHE_BACKEND = get_env_variable_gracefully("API_SHARED_CACHE_BACKEND")
 
 CACHES = {
     "default": {
+        "BACKEND": "data_refinery_api.caching.TieredCache",
+        "OPTIONS": {
+            # Tests roll back the database cache between them, but
+            # couldn't roll back the LRU.
+            "LOCAL_MAX_ENTRIES": 0
+            if "test" in sys.argv
+            else int(get_env_variable("API_LOCAL_CACHE_MAX_ENTRIES", "1000")),
+            "LOCAL_TIMEOUT": int(get_env_variable("API_LOCAL_CACHE_TIMEOUT", "60")),
+            "SHARED_CACHE": "shared" if SHARED_CACHE_BACKEND else None,
+            "FALLBACK_CACHE": "database",
+        },
+    },
+    "database": {
         "BACKEND": "django.core.cache.backends.db.DatabaseCache",
         "LOCATION": "cache_table",
-    }
+    },
 }
 
+if SHARED_CACHE_BACKEND:
+    CACHES["shared"] = {
+        "BACKEND": SHARED_CACHE_BACKEND,
+        "LOCATION": get_env_variable("API_SHARED_CACHE_LOCATION"),
+    }
+
 
 # Server Side Databse Cursors
 # https://code.djangoproject.com/ticket/28062
@@ -182,7 +209,7 @@ REST_FRAMEWORK = {
         "rest_framework.throttling.AnonRateThrottle",
         "rest_framework.throttling.UserRateThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "10/second", "user": "10/second"},
+    "DEFAULT_THROTTLE_RATES": {"anon": "10/second", "user": "10/second", "export": "30/hour"},
 }
 
 SWAGGER_SETTINGS = {
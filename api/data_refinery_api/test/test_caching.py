@@ -0,0 +1,101 @@
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from data_refinery_api.test.test_api_general import API_VERSION
+from data_refinery_common.models import Organism
+
+TIERED_CACHES = {
+    "default": {
+        "BACKEND": "data_refinery_api.caching.TieredCache",
+        "LOCATION": "caching_tests",
+        "OPTIONS": {
+            "LOCAL_MAX_ENTRIES": 10,
+            "LOCAL_TIMEOUT": 60,
+            "SHARED_CACHE": "shared",
+            "FALLBACK_CACHE": "database",
+        },
+    },
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+    "database": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "database",
+    },
+}
+
+
+@override_settings(CACHES=TIERED_CACHES)
+class TieredCacheTestCase(APITestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_local_tier_serves_repeat_reads(self):
+        """Once a process has read something it shouldn't go to the shared cache for it again."""
+        cache = caches["default"]
+        cache.set("key", "value")
+        local_hits = cache.get_metrics().get("local", {}).get("hits", 0)
+
+        with patch.object(caches["shared"], "get", wraps=caches["shared"].get) as mock_get:
+            self.assertEqual(cache.get("key"), "value")
+            self.assertEqual(cache.get("key"), "value")
+            mock_get.assert_not_called()
+
+        self.assertEqual(cache.get_metrics()["local"]["hits"], local_hits + 2)
+
+    def test_local_tier_returns_copies(self):
+        """Changing something read from the cache shouldn't change it for the next reader."""
+        cache = caches["default"]
+        cache.set("key", {"results": []})
+
+        cache.get("key")["results"].append("changed")
+        self.assertEqual(cache.get("key"), {"results": []})
+
+    def test_falls_back_when_shared_cache_fails(self):
+        """If the shared cache is down the database cache should be used instead."""
+        cache = caches["default"]
+        caches["database"].set("key", "from the database")
+        metrics = cache.get_metrics()
+        shared_errors = metrics.get("shared", {}).get("errors", 0)
+        database_hits = metrics.get("database", {}).get("hits", 0)
+
+        with patch.object(caches["shared"], "get", side_effect=ConnectionError("down")):
+            self.assertEqual(cache.get("key"), "from the database")
+
+        # The shared cache should be left alone for a while after failing.
+        cache.set("other_key", "value")
+        self.assertIsNone(caches["shared"].get("other_key"))
+        self.assertEqual(caches["database"].get("other_key"), "value")
+
+        metrics = cache.get_metrics()
+        self.assertEqual(metrics["shared"]["errors"], shared_errors + 1)
+        self.assertEqual(metrics["database"]["hits"], database_hits + 1)
+
+
+class CachedViewTestCase(APITestCase):
+    def test_saving_organism_invalidates_list(self):
+        """Cached organism lists shouldn't outlive changes to the organisms."""
+        Organism(name="HOMO_SAPIENS", taxonomy_id=9606, is_scientific_name=True).save()
+
+        response = self.client.get(reverse("organisms", kwargs={"version": API_VERSION}))
+        self.assertEqual(len(response.json()["results"]), 1)
+
+        # Organisms are saved by the Foreman, so nothing tells the API.
+        Organism(name="DANIO_RERIO", taxonomy_id=7955, is_scientific_name=True).save()
+
+        response = self.client.get(reverse("organisms", kwargs={"version": API_VERSION}))
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    def test_deleting_organism_invalidates_list(self):
+        Organism(name="HOMO_SAPIENS", taxonomy_id=9606, is_scientific_name=True).save()
+        Organism(name="DANIO_RERIO", taxonomy_id=7955, is_scientific_name=True).save()
+
+        response = self.client.get(reverse("organisms", kwargs={"version": API_VERSION}))
+        self.assertEqual(len(response.json()["results"]), 2)
+
+        Organism.objects.filter(name="HOMO_SAPIENS").delete()
+
+        response = self.client.get(reverse("organisms", kwargs={"version": API_VERSION}))
+        self.assertEqual(len(response.json()["results"]), 1)
@@ -7,6 +7,7 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from data_refinery_api.test.test_api_general import API_VERSION
+from data_refinery_api.views.dataset import validate_dataset
 from data_refinery_common.models import (
     ComputationalResult,
     ComputationalResultAnnotation,
@@ -449,6 +450,55 @@ class DatasetTestCase(APITestCase):
         self.assertEqual(response.status_code, 200)
 
     @patch("data_refinery_api.views.dataset.send_job", lambda *args: True)
+    def test_validate_dataset_query_count(self):
+        """Validation should take the same number of queries however big the dataset is."""
+        for i in range(10):
+            Experiment(accession_code="GSE900" + str(i), num_processed_samples=1).save()
+
+            sample = Sample()
+            sample.accession_code = "GSM900" + str(i)
+            sample.is_processed = True
+            sample.organism = self.homo_sapiens
+            sample.save()
+
+        data = {"data": {"GSE900" + str(i): ["ALL"] for i in range(5)}}
+        data["data"].update({"GSE900" + str(i): ["GSM900" + str(i)] for i in range(5, 10)})
+
+        with self.assertNumQueries(2):
+            validate_dataset(data)
+
+    def test_dataset_details_are_stored(self):
+        """The details should only be built once for each version of the data."""
+        dataset = Dataset(data={"GSE123": ["789"]})
+        dataset.save()
+        url = reverse("dataset", kwargs={"id": dataset.id, "version": API_VERSION})
+
+        response = self.client.get(url, {"details": "true"})
+        self.assertEqual(response.json()["organism_samples"], {"AILUROPODA_MELANOLEUCA": ["789"]})
+        self.assertEqual(response.json()["experiments"][0]["accession_code"], "GSE123")
+        self.assertEqual(
+            response.json()["experiments"][0]["organism_names"], ["AILUROPODA_MELANOLEUCA"]
+        )
+
+        with patch.object(Dataset, "compute_details") as mock_compute_details:
+            response = self.client.get(url, {"details": "true"})
+            mock_compute_details.assert_not_called()
+        self.assertEqual(response.json()["organism_samples"], {"AILUROPODA_MELANOLEUCA": ["789"]})
+
+        dataset = Dataset.objects.get(id=dataset.id)
+        dataset.is_processing = True
+        dataset.save()
+        self.assertIsNotNone(Dataset.objects.get(id=dataset.id).details)
+
+        dataset.data["GSE123"].append("123")
+        dataset.save()
+        self.assertIsNone(Dataset.objects.get(id=dataset.id).details)
+
+        response = self.client.get(url, {"details": "true"})
+        self.assertEqual(
+            response.json()["organism_samples"], {"AILUROPODA_MELANOLEUCA": ["123", "789"]}
+        )
+
     def test_create_update_dataset(self):
 
         # Create a token first
@@ -0,0 +1,115 @@
+import json
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from data_refinery_api import export
+from data_refinery_api.test.test_api_general import API_VERSION
+from data_refinery_api.views import SampleExportView
+from data_refinery_common.models import (
+    APIToken,
+    Experiment,
+    ExperimentOrganismAssociation,
+    ExperimentSampleAssociation,
+    Organism,
+    Sample,
+)
+
+
+class ExportTestCase(APITestCase):
+    def setUp(self):
+        # Don't let the rate limit carry over between tests.
+        cache.clear()
+
+        self.homo_sapiens = Organism(name="HOMO_SAPIENS", taxonomy_id=9606)
+        self.homo_sapiens.save()
+        self.mus_musculus = Organism(name="MUS_MUSCULUS", taxonomy_id=10090)
+        self.mus_musculus.save()
+
+        self.experiment = Experiment(accession_code="GSE123", title="Tabs\tand things")
+        self.experiment.save()
+        for organism in [self.homo_sapiens, self.mus_musculus]:
+            ExperimentOrganismAssociation.objects.create(
+                experiment=self.experiment, organism=organism
+            )
+
+        for i in range(5):
+            sample = Sample(
+                accession_code="GSM{}".format(i),
+                title="Sample {}".format(i),
+                organism=self.homo_sapiens,
+                is_processed=i % 2 == 0,
+            )
+            sample.save()
+            ExperimentSampleAssociation.objects.create(experiment=self.experiment, sample=sample)
+
+    def test_sample_export_tsv(self):
+        response = self.client.get(
+            reverse("samples_export", kwargs={"version": API_VERSION}), {"is_processed": "true"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/tab-separated-values")
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        header = lines[0].split("\t")
+        self.assertEqual(header, ["id", *SampleExportView.export_fields])
+
+        rows = [dict(zip(header, line.split("\t"))) for line in lines[1:]]
+        self.assertEqual([row["accession_code"] for row in rows], ["GSM0", "GSM2", "GSM4"])
+        self.assertEqual(rows[0]["organism__name"], "HOMO_SAPIENS")
+
+    def test_export_reads_in_chunks(self):
+        """Every row should come out once, however small the chunks."""
+        rows = list(export.iter_rows(Sample.objects.all(), ["accession_code"], chunk_size=2))
+        self.assertEqual(
+            [row["accession_code"] for row in rows], ["GSM{}".format(i) for i in range(5)]
+        )
+
+    def test_experiment_export_jsonl(self):
+        response = self.client.get(
+            reverse("experiments_export", kwargs={"version": API_VERSION}),
+            {"file_format": "jsonl", "organisms": self.mus_musculus.id},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["title"], "Tabs\tand things")
+        # Filtering on one organism shouldn't hide the others.
+        self.assertEqual(rows[0]["organism_names"], ["HOMO_SAPIENS", "MUS_MUSCULUS"])
+
+    def test_export_rejects_bad_params(self):
+        url = reverse("samples_export", kwargs={"version": API_VERSION})
+        self.assertEqual(self.client.get(url, {"file_format": "xlsx"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"offset": 10}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"ordering": "title"}).status_code, 400)
+
+    def test_export_rate_limit(self):
+        """Each API token gets its own limit."""
+        url = reverse("samples_export", kwargs={"version": API_VERSION})
+        rate = export.ExportRateThrottle().get_rate()
+        num_requests = int(rate.split("/")[0])
+
+        token_a = APIToken.objects.create(is_activated=True)
+        token_b = APIToken.objects.create(is_activated=True)
+
+        for _ in range(num_requests):
+            response = self.client.get(url, HTTP_API_KEY=str(token_a.id))
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get(url, HTTP_API_KEY=str(token_a.id)).status_code, 429)
+        self.assertEqual(self.client.get(url, HTTP_API_KEY=str(token_b.id)).status_code, 200)
+
+    def test_export_rate_limit_made_up_tokens(self):
+        """Keys that aren't activated tokens share their address's limit."""
+        url = reverse("samples_export", kwargs={"version": API_VERSION})
+        rate = export.ExportRateThrottle().get_rate()
+        num_requests = int(rate.split("/")[0])
+
+        inactive_token = APIToken.objects.create()
+        for i in range(num_requests):
+            api_key = str(inactive_token.id) if i % 2 else "made-up-{}".format(i)
+            self.assertEqual(self.client.get(url, HTTP_API_KEY=api_key).status_code, 200)
+
+        self.assertEqual(self.client.get(url, HTTP_API_KEY="one-more").status_code, 429)
@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from data_refinery_api import pagination
+from data_refinery_api.test.test_api_general import API_VERSION
+from data_refinery_common.models import SurveyJob
+
+
+class CursorPaginationTestCase(APITestCase):
+    def setUp(self):
+        for _ in range(7):
+            SurveyJob(source_type="SRA").save()
+
+        self.url = reverse("survey_jobs", kwargs={"version": API_VERSION})
+
+    def test_cursor_pages_through_everything(self):
+        """Following the next links should return every job once, in id order."""
+        response = self.client.get(self.url, {"cursor": "", "limit": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["previous"])
+
+        ids = []
+        while True:
+            page = response.json()
+            self.assertEqual(page["count"], 7)
+            self.assertFalse(page["count_is_approximate"])
+            ids += [job["id"] for job in page["results"]]
+
+            if not page["next"]:
+                break
+            response = self.client.get(page["next"])
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNotNone(response.json()["previous"])
+
+        self.assertEqual(ids, sorted(SurveyJob.objects.values_list("id", flat=True)))
+
+    def test_cursor_rejects_offset_and_bad_cursors(self):
+        response = self.client.get(self.url, {"cursor": "", "offset": 3})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(self.url, {"cursor": "not a cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_approximate_count(self):
+        """Big results should use the planner's estimate and still link to the next page."""
+        with patch.object(pagination, "get_estimated_count", return_value=5000000):
+            response = self.client.get(self.url, {"limit": 5})
+
+        page = response.json()
+        self.assertEqual(page["count"], 5000000)
+        self.assertTrue(page["count_is_approximate"])
+        self.assertEqual(len(page["results"]), 5)
+        self.assertIsNotNone(page["next"])
+
+        # The estimate is way off, but the short page shows we're at the end.
+        with patch.object(pagination, "get_estimated_count", return_value=5000000):
+            response = self.client.get(page["next"])
+
+        page = response.json()
+        self.assertEqual(len(page["results"]), 2)
+        self.assertIsNone(page["next"])
@@ -6,7 +6,9 @@ from django.core.management import call_command
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
+from data_refinery_api import search_cache, search_indexing
 from data_refinery_api.test.test_api_general import API_VERSION
+from data_refinery_api.views.experiment_document import precompute_facets
 from data_refinery_common.models import (
     ComputationalResult,
     ComputationalResultAnnotation,
@@ -244,3 +246,75 @@ class ESTestCases(APITestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["count"], 1)
+
+    def test_search_caching(self):
+        """The same search in a different order should come from the cache."""
+        search_cache.invalidate()
+        url = reverse("search", kwargs={"version": API_VERSION})
+        hits = search_cache.results_metrics.snapshot().get("search_results", {}).get("hits", 0)
+
+        response = self.client.get(url + "?technology=microarray&search=soda")
+        self.assertEqual(response.json()["count"], 1)
+
+        cached_response = self.client.get(url + "?search=soda&technology=microarray")
+        self.assertEqual(cached_response.json(), response.json())
+        self.assertEqual(
+            search_cache.results_metrics.snapshot()["search_results"]["hits"], hits + 1
+        )
+
+        # Different filters are a different search.
+        response = self.client.get(url + "?search=soda&technology=rna-seq")
+        self.assertEqual(response.json()["count"], 0)
+
+    def test_precomputed_facets(self):
+        """Searches with one filter should get the same facets precomputed or not."""
+        url = reverse("search", kwargs={"version": API_VERSION})
+
+        search_cache.invalidate()
+        expected = [
+            self.client.get(url).json(),
+            self.client.get(url, {"technology": "microarray"}).json(),
+        ]
+
+        search_cache.invalidate()
+        self.assertGreater(precompute_facets(), 1)
+        self.assertIsNotNone(search_cache.get_precomputed_facets({"technology": ["microarray"]}))
+
+        self.assertEqual(self.client.get(url).json(), expected[0])
+        self.assertEqual(self.client.get(url, {"technology": "microarray"}).json(), expected[1])
+
+        # Searches with terms can't use them.
+        self.assertIsNone(
+            search_cache.get_facet_filter(
+                {"search": ["soda"], "technology": ["microarray"]}, ["technology"]
+            )
+        )
+
+    def test_bulk_indexing_prefetches(self):
+        """Building documents in bulk shouldn't take queries per experiment."""
+        queryset = ExperimentDocument().get_queryset()
+
+        # One query for the experiments, one for their samples and one
+        # to find there's nothing left.
+        with self.assertNumQueries(3):
+            actions = list(search_indexing.iter_index_actions(queryset, "experiments_test"))
+
+        sources = {action["_source"]["accession_code"]: action["_source"] for action in actions}
+        self.assertEqual(sources["GSE123-X"]["organism_names"], [ECOLI_STRAIN_NAME])
+        self.assertEqual(sources["GSE123-X"]["downloadable_samples"], ["789"])
+        self.assertEqual(sources["GSE000-X"]["downloadable_samples"], [])
+
+        # They should match what the document builds on its own.
+        experiment = Experiment.objects.get(accession_code="GSE123-X")
+        self.assertEqual(sources["GSE123-X"], ExperimentDocument().prepare(experiment))
+
+    def test_full_reindex(self):
+        """Searches should work against the alias after a full reindex."""
+        call_command("update_es_index", "--full", "--batch-size", "1", "--chunk-size", "1")
+
+        alias = ExperimentDocument._index._name
+        client = ExperimentDocument._get_connection()
+        self.assertTrue(client.indices.exists_alias(name=alias))
+
+        es_search_result = ExperimentDocument.search().filter("term", description="soda")
+        self.assertEqual(len(es_search_result.to_queryset()), 1)
@@ -1,11 +1,10 @@
-from unittest.mock import patch
-
 from django.test import override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
 from data_refinery_api.test.test_api_general import API_VERSION
 from data_refinery_api.views.stats import get_batch_jobs_breakdown
+from data_refinery_common import batch_jobs_breakdown
 
 QUEUE_NAMES = [
     "data-refinery-batch-compendia-queue-tests-dev",
@@ -14,15 +13,34 @@ QUEUE_NAMES = [
 ]
 
 
-def dummy_get_jobs_in_queue(queue):
-    if queue not in QUEUE_NAMES:
-        raise ValueError(f"Tried to get jobs for unrecognzied job queue {queue}")
-    return {
-        # The queues are defined at the bottom of the file because they're pretty long
-        "data-refinery-batch-compendia-queue-tests-dev": COMPENDIA_QUEUE,
-        "data-refinery-batch-smasher-queue-tests-dev": SMASHER_QUEUE,
-        "data-refinery-batch-workers-queue-tests-dev-0": WORKER_QUEUE,
-    }[queue]
+class FakeBatchClient:
+    """Pages through the jobs in QUEUE_NAMES like Batch's list_jobs would."""
+
+    PAGE_SIZE = 4
+
+    def __init__(self):
+        self.num_calls = 0
+
+    def list_jobs(self, jobQueue, jobStatus, nextToken=None):
+        if jobQueue not in QUEUE_NAMES:
+            raise ValueError(f"Tried to get jobs for unrecognzied job queue {jobQueue}")
+
+        self.num_calls += 1
+        queue = {
+            # The queues are defined at the bottom of the file because they're pretty long
+            "data-refinery-batch-compendia-queue-tests-dev": COMPENDIA_QUEUE,
+            "data-refinery-batch-smasher-queue-tests-dev": SMASHER_QUEUE,
+            "data-refinery-batch-workers-queue-tests-dev-0": WORKER_QUEUE,
+        }[jobQueue]
+        jobs = [job for job in queue if job["status"] == jobStatus]
+
+        start = int(nextToken) if nextToken else 0
+        end = start + self.PAGE_SIZE
+        response = {"jobSummaryList": jobs[start:end]}
+        if end < len(jobs):
+            response["nextToken"] = str(end)
+
+        return response
 
 
 class StatsTestCases(APITestCase):
@@ -34,13 +52,19 @@ class StatsTestCases(APITestCase):
         response = self.client.get(reverse("stats", kwargs={"version": API_VERSION}))
         self.assertEqual(response.status_code, 200)
 
-    @patch("data_refinery_api.views.stats.get_jobs_in_queue")
     @override_settings(AWS_BATCH_QUEUE_ALL_NAMES=QUEUE_NAMES)
-    def test_stats_get_batch_breakdown(self, mock_get_jobs_in_queue):
+    def test_stats_get_batch_breakdown(self):
         """Make sure that the batch breakdown has the right stats"""
-        mock_get_jobs_in_queue.side_effect = dummy_get_jobs_in_queue
+        self.assertEqual(get_batch_jobs_breakdown(), {})
+
+        batch_client = FakeBatchClient()
+        batch_jobs_breakdown.collect_snapshot(batch_client)
+        # Every page of every status should have been listed.
+        self.assertGreater(batch_client.num_calls, len(QUEUE_NAMES) * 5)
 
-        breakdown = get_batch_jobs_breakdown(force=True)
+        breakdown = get_batch_jobs_breakdown()
+        self.assertGreaterEqual(breakdown.pop("batch_jobs_age"), 0)
+        self.assertIsNotNone(breakdown.pop("batch_jobs_collected_on"))
 
         self.assertEqual(
             set(breakdown.keys()),
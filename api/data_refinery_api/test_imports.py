@@ -6,9 +6,12 @@ class ImportTestCase(TestCase):
         # Make sure we can import the api tests
         import data_refinery_api.management.commands.test_post_downloads_summary
         import data_refinery_api.test.test_api_general
+        import data_refinery_api.test.test_caching
         import data_refinery_api.test.test_compendia
         import data_refinery_api.test.test_dataset
         import data_refinery_api.test.test_dataset_stats
+        import data_refinery_api.test.test_export
+        import data_refinery_api.test.test_pagination
         import data_refinery_api.test.test_processor
         import data_refinery_api.test.test_qn_target
         import data_refinery_api.test.test_search
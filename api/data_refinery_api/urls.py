@@ -14,6 +14,7 @@ from drf_yasg.views import get_schema_view
 from data_refinery_api.views import (
     AboutStats,
     APITokenView,
+    CacheStats,
     CompendiumResultDetailView,
     CompendiumResultListView,
     ComputationalResultDetailView,
@@ -25,6 +26,7 @@ from data_refinery_api.views import (
     DownloaderJobListView,
     ExperimentDetailView,
     ExperimentDocumentView,
+    ExperimentExportView,
     ExperimentListView,
     FailedDownloaderJobStats,
     FailedProcessorJobStats,
@@ -41,6 +43,7 @@ from data_refinery_api.views import (
     QNTargetsAvailable,
     QNTargetsDetailView,
     SampleDetailView,
+    SampleExportView,
     SampleListView,
     Stats,
     SurveyJobDetailView,
@@ -113,12 +116,18 @@ urlpatterns = [
                 # Primary search and filter interface
                 url(r"^search/$", ExperimentDocumentView.as_view({"get": "list"}), name="search"),
                 url(r"^experiments/$", ExperimentListView.as_view(), name="experiments"),
+                url(
+                    r"^experiments/export/$",
+                    ExperimentExportView.as_view(),
+                    name="experiments_export",
+                ),
                 url(
                     r"^experiments/(?P<accession_code>.+)/$",
                     ExperimentDetailView.as_view(),
                     name="experiments_detail",
                 ),
                 url(r"^samples/$", SampleListView.as_view(), name="samples"),
+                url(r"^samples/export/$", SampleExportView.as_view(), name="samples_export"),
                 url(
                     r"^samples/(?P<accession_code>.+)/$",
                     SampleDetailView.as_view(),
@@ -182,6 +191,7 @@ urlpatterns = [
                     FailedProcessorJobStats.as_view(),
                     name="stats_failed_processor",
                 ),
+                url(r"^stats/cache$", CacheStats.as_view(), name="stats_cache"),
                 url(r"^stats-about/$", AboutStats.as_view(), name="stats_about"),
                 # Transcriptome Indices
                 path(
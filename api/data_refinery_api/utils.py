@@ -9,6 +9,14 @@ def check_filters(view, special_filters=None):
         if view.paginator:
             valid_filters += ["offset", "limit"]
 
+            cursor_query_param = getattr(view.paginator, "cursor_query_param", None)
+            if cursor_query_param:
+                valid_filters.append(cursor_query_param)
+
+    file_format_param = getattr(view, "file_format_param", None)
+    if file_format_param:
+        valid_filters.append(file_format_param)
+
     if hasattr(view, "ordering"):
         if view.ordering:
             valid_filters.append("ordering")
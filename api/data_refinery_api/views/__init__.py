@@ -9,7 +9,11 @@ from data_refinery_api.views.computational_result import (
 )
 from data_refinery_api.views.computed_file import ComputedFileDetailView, ComputedFileListView
 from data_refinery_api.views.dataset import DatasetView
-from data_refinery_api.views.experiment import ExperimentDetailView, ExperimentListView
+from data_refinery_api.views.experiment import (
+    ExperimentDetailView,
+    ExperimentExportView,
+    ExperimentListView,
+)
 from data_refinery_api.views.experiment_document import ExperimentDocumentView
 from data_refinery_api.views.institution import InstitutionListView
 from data_refinery_api.views.jobs import (
@@ -25,9 +29,10 @@ from data_refinery_api.views.original_file import OriginalFileDetailView, Origin
 from data_refinery_api.views.platform import PlatformListView
 from data_refinery_api.views.processor import ProcessorDetailView, ProcessorListView
 from data_refinery_api.views.qn_targets import QNTargetsAvailable, QNTargetsDetailView
-from data_refinery_api.views.sample import SampleDetailView, SampleListView
+from data_refinery_api.views.sample import SampleDetailView, SampleExportView, SampleListView
 from data_refinery_api.views.stats import (
     AboutStats,
+    CacheStats,
     FailedDownloaderJobStats,
     FailedProcessorJobStats,
     Stats,
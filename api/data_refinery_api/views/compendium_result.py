@@ -12,6 +12,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
+from data_refinery_api.caching import cached_view, latest_change
 from data_refinery_api.exceptions import InvalidFilters
 from data_refinery_api.utils import check_filters
 from data_refinery_api.views.relation_serializers import (
@@ -20,6 +21,10 @@ from data_refinery_api.views.relation_serializers import (
 )
 from data_refinery_common.models import APIToken, CompendiumResult
 
+# New compendia only come out every so often, and saving one drops these
+# pages from the cache anyway. Download URLs last much longer than this.
+COMPENDIA_CACHE_TIME_SECONDS = 60 * 60
+
 
 class CompendiumResultSerializer(serializers.ModelSerializer):
     primary_organism_name = serializers.StringRelatedField(
@@ -84,6 +89,16 @@ class CompendiumResultWithUrlSerializer(serializers.ModelSerializer):
         ]
     ),
 )
+# Requests with an API key get download URLs, so they're cached separately.
+@method_decorator(
+    name="get",
+    decorator=cached_view(
+        "compendia",
+        COMPENDIA_CACHE_TIME_SECONDS,
+        vary_on=("API-KEY",),
+        data_version=latest_change(CompendiumResult),
+    ),
+)
 class CompendiumResultListView(generics.ListAPIView):
     """
     List all CompendiaResults with filtering.
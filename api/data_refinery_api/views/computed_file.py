@@ -8,6 +8,7 @@ from rest_framework import filters, generics, serializers
 from django_filters.rest_framework import DjangoFilterBackend
 
 from data_refinery_api.exceptions import InvalidFilters
+from data_refinery_api.pagination import CursorOrLimitOffsetPagination
 from data_refinery_api.utils import check_filters
 from data_refinery_api.views.relation_serializers import (
     ComputationalResultNoFilesRelationSerializer,
@@ -110,6 +111,7 @@ class ComputedFileListView(generics.ListAPIView):
 
     queryset = ComputedFile.objects.all()
     serializer_class = ComputedFileListSerializer
+    pagination_class = CursorOrLimitOffsetPagination
     filter_backends = (
         DjangoFilterBackend,
         filters.OrderingFilter,
@@ -2,9 +2,11 @@
 # Contains DatasetView
 ##
 
-from collections import defaultdict
+import time
+from contextlib import contextmanager
 
 from django.core.exceptions import ValidationError
+from django.db.models import Exists, F, OuterRef
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from rest_framework import mixins, serializers, viewsets
@@ -40,30 +42,41 @@ def get_client_ip(request):
     return ip
 
 
-def experiment_has_downloadable_samples(experiment, quant_sf_only=False):
+def get_quant_sf_samples():
+    """Returns the samples with at least one uploaded quant.sf file."""
+    return Sample.objects.filter(
+        results__computedfile__filename="quant.sf",
+        results__computedfile__s3_key__isnull=False,
+        results__computedfile__s3_bucket__isnull=False,
+    )
+
+
+def get_downloadable_experiments(accession_codes, quant_sf_only=False):
+    """Returns which of the experiments have at least one downloadable sample.
+
+    This is one query no matter how many experiments there are.
+    """
     if quant_sf_only:
-        try:
-            experiment = Experiment.public_objects.get(accession_code=experiment)
-        except Experiment.DoesNotExist:
-            return False
-
-        samples = experiment.sample_set.filter(
-            # We only want samples with a quant.sf file associated with them
-            results__computedfile__filename="quant.sf",
-            results__computedfile__s3_key__isnull=False,
-            results__computedfile__s3_bucket__isnull=False,
+        experiments = Experiment.public_objects.filter(
+            Exists(get_quant_sf_samples().filter(experiments=OuterRef("pk")))
         )
+    else:
+        experiments = Experiment.processed_public_objects.all()
 
-        if samples.count() == 0:
-            return False
+    return set(
+        experiments.filter(accession_code__in=accession_codes).values_list(
+            "accession_code", flat=True
+        )
+    )
 
-    else:
-        try:
-            Experiment.processed_public_objects.get(accession_code=experiment)
-        except Experiment.DoesNotExist:
-            return False
 
-    return True
+@contextmanager
+def timed(timings, phase):
+    start_time = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[phase] = time.monotonic() - start_time
 
 
 def validate_dataset(data):
@@ -71,7 +84,22 @@ def validate_dataset(data):
     Dataset validation. Each experiment should always have at least one
     sample, all samples should be downloadable, and when starting the smasher
     there should be at least one experiment.
+
+    Logs how long each phase took, since this runs on every dataset update.
     """
+    timings = {}
+    try:
+        with timed(timings, "total"):
+            _validate_dataset(data, timings)
+    finally:
+        logger.info(
+            "Validated dataset.",
+            num_experiments=len(data["data"]) if type(data.get("data")) == dict else 0,
+            **{phase + "_time": round(duration, 4) for phase, duration in timings.items()},
+        )
+
+
+def _validate_dataset(data, timings):
     if data.get("data") is None or type(data["data"]) != dict:
         raise InvalidData("`data` must be a dict of lists.")
 
@@ -79,7 +107,7 @@ def validate_dataset(data):
         raise InvalidData("`data` must contain at least one experiment.")
 
     accessions = []
-    non_downloadable_experiments = []
+    all_experiments = []
     for key, value in data["data"].items():
         if type(value) != list:
             raise InvalidData("`data` must be a dict of lists. Problem with `" + str(key) + "`")
@@ -96,70 +124,66 @@ def validate_dataset(data):
 
         # If they want "ALL", just make sure that the experiment has at least one downloadable sample
         if value == ["ALL"]:
-            if not experiment_has_downloadable_samples(
-                key, quant_sf_only=data.get("quant_sf_only", False)
-            ):
-                non_downloadable_experiments.append(key)
+            all_experiments.append(key)
 
         # Otherwise, we will check that all the samples they requested are downloadable
         else:
             accessions.extend(value)
 
-    if len(non_downloadable_experiments) != 0:
-        raise InvalidData(
-            message="Experiment(s) in dataset have zero downloadable samples. See `details` for a full list",
-            details=non_downloadable_experiments,
-        )
+    quant_sf_only = data.get("quant_sf_only", False)
+
+    with timed(timings, "experiments"):
+        if all_experiments:
+            downloadable_experiments = get_downloadable_experiments(all_experiments, quant_sf_only)
+            non_downloadable_experiments = [
+                key for key in all_experiments if key not in downloadable_experiments
+            ]
+            if len(non_downloadable_experiments) != 0:
+                raise InvalidData(
+                    message="Experiment(s) in dataset have zero downloadable samples. See `details` for a full list",
+                    details=non_downloadable_experiments,
+                )
 
     if len(accessions) == 0:
         return
 
-    samples = Sample.public_objects.filter(accession_code__in=accessions)
-    if samples.count() != len(accessions):
+    with timed(timings, "samples"):
+        # Get everything we need to know about the samples in one go
+        # rather than loading them.
+        samples = Sample.public_objects.filter(accession_code__in=set(accessions))
+        if quant_sf_only:
+            samples = samples.annotate(
+                is_downloadable=Exists(get_quant_sf_samples().filter(pk=OuterRef("pk")))
+            )
+        else:
+            samples = samples.annotate(is_downloadable=F("is_processed"))
+
+        is_downloadable = dict(samples.values_list("accession_code", "is_downloadable"))
+
+    missing_samples = [code for code in accessions if code not in is_downloadable]
+    if missing_samples:
         raise InvalidData(
             message="Sample(s) in dataset do not exist on refine.bio. See `details` for a full list",
-            details=list(set(accessions) - set(s.accession_code for s in samples)),
+            details=missing_samples,
         )
 
-    if data.get("quant_sf_only", False):
-        samples_without_quant_sf = samples.exclude(
-            # Exclude samples that have at least one uploaded quant.sf file associated with them
-            results__computedfile__filename="quant.sf",
-            results__computedfile__s3_key__isnull=False,
-            results__computedfile__s3_bucket__isnull=False,
-        )
-        if samples_without_quant_sf.count() > 0:
+    non_downloadable_samples = [code for code in accessions if not is_downloadable[code]]
+    if non_downloadable_samples:
+        if quant_sf_only:
             raise InvalidData(
                 message="Sample(s) in dataset are missing quant.sf files. See `details` for a full list",
-                details=[s.accession_code for s in samples_without_quant_sf],
-            )
-
-    else:
-        unprocessed_samples = samples.exclude(is_processed=True)
-        if unprocessed_samples.count() > 0:
-            raise InvalidData(
-                message="Non-downloadable sample(s) in dataset. See `details` for a full list",
-                details=[s.accession_code for s in unprocessed_samples],
+                details=non_downloadable_samples,
             )
 
-
-class DatasetDetailsExperimentSerializer(serializers.ModelSerializer):
-    """This serializer contains all of the information about an experiment needed for the download
-    page
-    """
-
-    sample_metadata = serializers.ReadOnlyField(source="sample_metadata_fields")
-
-    class Meta:
-        model = Experiment
-        fields = ("title", "accession_code", "organism_names", "sample_metadata", "technology")
+        raise InvalidData(
+            message="Non-downloadable sample(s) in dataset. See `details` for a full list",
+            details=non_downloadable_samples,
+        )
 
 
 class DatasetSerializer(serializers.ModelSerializer):
     start = serializers.NullBooleanField(required=False)
-    experiments = DatasetDetailsExperimentSerializer(
-        source="get_experiments", many=True, read_only=True
-    )
+    experiments = serializers.SerializerMethodField(read_only=True)
     organism_samples = serializers.SerializerMethodField(read_only=True)
     worker_version = serializers.SerializerMethodField(read_only=True)
 
@@ -252,24 +276,20 @@ class DatasetSerializer(serializers.ModelSerializer):
         validate_dataset(data)
         return data
 
+    def get_experiments(self, obj):
+        """
+        The title, accession code, organisms, sample metadata fields and
+        technology of each experiment in the dataset, for the downloads page.
+        """
+        return obj.get_details()["experiments"]
+
     def get_organism_samples(self, obj):
         """
         Groups the sample accession codes inside a dataset by their organisms, eg:
         { HOMO_SAPIENS: [S1, S2], DANIO: [S3] }
         Useful to avoid sending sample information on the downloads page
         """
-        samples = (
-            obj.get_samples()
-            .prefetch_related("organism")
-            .values("organism__name", "accession_code")
-            .order_by("organism__name", "accession_code")
-        )
-
-        result = defaultdict(list)
-        for sample in samples:
-            result[sample["organism__name"]].append(sample["accession_code"])
-
-        return result
+        return obj.get_details()["organism_samples"]
 
     def get_worker_version(self, obj):
         processor_jobs = obj.processor_jobs.order_by("-created_at").values_list(
@@ -2,15 +2,22 @@
 # Contains ExperimentListView, ExperimentDetailView, and needed serializers
 ##
 
-from django.db.models import Count, Q
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count, OuterRef, Q, Subquery
 from rest_framework import generics, serializers
 
 from django_filters.rest_framework import DjangoFilterBackend
 
 from data_refinery_api.exceptions import InvalidFilters
+from data_refinery_api.export import MetadataExportView
+from data_refinery_api.pagination import CursorOrLimitOffsetPagination
 from data_refinery_api.utils import check_filters
 from data_refinery_api.views.relation_serializers import DetailedExperimentSampleSerializer
-from data_refinery_common.models import Experiment, ExperimentAnnotation
+from data_refinery_common.models import (
+    Experiment,
+    ExperimentAnnotation,
+    ExperimentOrganismAssociation,
+)
 
 
 class ExperimentAnnotationSerializer(serializers.ModelSerializer):
@@ -122,6 +129,7 @@ class ExperimentListView(generics.ListAPIView):
     model = Experiment
     queryset = Experiment.public_objects.all()
     serializer_class = ExperimentSerializer
+    pagination_class = CursorOrLimitOffsetPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_fields = (
         "title",
@@ -151,6 +159,49 @@ class ExperimentListView(generics.ListAPIView):
         return self.queryset
 
 
+class ExperimentExportView(MetadataExportView, ExperimentListView):
+    """Streams the metadata of every experiment matching the same filters
+    as the experiments list as TSV, or JSON lines with
+    `?file_format=jsonl`.
+
+    Exports are rate limited per API token."""
+
+    export_name = "experiments"
+    export_fields = [
+        "accession_code",
+        "alternate_accession_code",
+        "title",
+        "description",
+        "source_database",
+        "technology",
+        "submitter_institution",
+        "has_publication",
+        "publication_title",
+        "publication_doi",
+        "pubmed_id",
+        "organism_names",
+        "platform_accession_codes",
+        "platform_names",
+        "sample_metadata_fields",
+        "num_total_samples",
+        "num_processed_samples",
+        "num_downloadable_samples",
+        "source_first_published",
+        "source_last_modified",
+    ]
+
+    def get_export_queryset(self):
+        # A subquery rather than joining organisms so filtering on
+        # organisms doesn't limit which names come back.
+        organism_names = (
+            ExperimentOrganismAssociation.objects.filter(experiment=OuterRef("id"))
+            .values("experiment")
+            .annotate(names=ArrayAgg("organism__name", ordering="organism__name"))
+            .values("names")
+        )
+        return super().get_export_queryset().annotate(organism_names=Subquery(organism_names))
+
+
 class ExperimentDetailView(generics.RetrieveAPIView):
     """ Retrieve details for an experiment given it's accession code """
 
@@ -2,10 +2,14 @@
 # Experiment document views
 ##
 
-from django.http import QueryDict
+from typing import Dict
+
+from django.http import HttpRequest, QueryDict
 from django.utils.decorators import method_decorator
 from rest_framework import serializers
 from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
 
 from django_elasticsearch_dsl_drf.constants import (
     LOOKUP_FILTER_RANGE,
@@ -27,9 +31,25 @@ from drf_yasg.utils import swagger_auto_schema
 from elasticsearch_dsl import TermsFacet
 from six import iteritems
 
+from data_refinery_api import search_cache
 from data_refinery_api.exceptions import InvalidFilters
+from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models.documents import ExperimentDocument
 
+logger = get_and_configure_logger(__name__)
+
+# The facets whose values get their own precomputed facets, and the
+# filter parameter that selects each of their values.
+PRECOMPUTED_FACET_FILTERS = {
+    "technology": "technology",
+    "organism_names": "organism",
+    "platform_accession_codes": "platform",
+    "has_publication": "has_publication",
+}
+
+# Only precompute the facets for this many of each facet's most common values.
+PRECOMPUTED_VALUES_PER_FACET = 50
+
 
 class FormlessBrowsableAPIRenderer(BrowsableAPIRenderer):
     """A BrowsableAPIRenderer that never tries to display a form for any
@@ -54,7 +74,12 @@ class FacetedSearchFilterBackendExtended(FacetedSearchFilterBackend):
         https://www.elastic.co/guide/en/elasticsearch/reference/current/search-aggregations-metrics-cardinality-aggregation.html#_counts_are_approximate
         I used the highest possible precision threshold, but this might increase the amount
         of memory used.
+
+        Views can set `skip_facets` when they already have the facets.
         """
+        if getattr(view, "skip_facets", False):
+            return queryset
+
         facets = self.construct_facets(request, view)
         for field, facet in iteritems(facets):
             agg = facet["facet"].get_aggregation()
@@ -380,11 +405,28 @@ class ExperimentDocumentView(DocumentViewSet):
         return self.list(request, *args, **kwargs)
 
     def list(self, request, *args, **kwargs):
+        params = search_cache.get_search_params(request)
+        cached_results = search_cache.get_cached_results(params)
+        if cached_results is not None:
+            return Response(cached_results)
+
+        precomputed_facets = None
+        facet_filter = search_cache.get_facet_filter(params, PRECOMPUTED_FACET_FILTERS.values())
+        if facet_filter is not None:
+            precomputed_facets = search_cache.get_precomputed_facets(facet_filter)
+        self.skip_facets = precomputed_facets is not None
+
         response = super(ExperimentDocumentView, self).list(request, args, kwargs)
-        response.data["facets"] = self.transform_es_facets(response.data["facets"])
+        if precomputed_facets is not None:
+            response.data["facets"] = precomputed_facets
+        else:
+            response.data["facets"] = self.transform_es_facets(response.data["facets"])
+
+        search_cache.cache_results(params, response.data)
         return response
 
-    def transform_es_facets(self, facets):
+    @staticmethod
+    def transform_es_facets(facets):
         """Transforms Elastic Search facets into a set of objects where each one corresponds
         to a filter group. Example:
 
@@ -403,3 +445,40 @@ class ExperimentDocumentView(DocumentViewSet):
                     filter_group[bucket["key"]] = bucket["total_samples"]["value"]
             result[field] = filter_group
         return result
+
+
+def get_facets(search) -> Dict:
+    """Runs just the facet aggregations for `search` and returns them transformed."""
+    search = search.extra(size=0)
+    # No facet parameter, so only the facets enabled by default.
+    search = FacetedSearchFilterBackendExtended().aggregate(
+        Request(HttpRequest()), search, ExperimentDocumentView
+    )
+    return ExperimentDocumentView.transform_es_facets(search.execute().aggregations.to_dict())
+
+
+def precompute_facets() -> int:
+    """Computes and caches the facets the most common searches need.
+
+    That's the facets for no filters at all, and for each of the most
+    common values of each facet on its own. Returns how many sets of
+    facets were stored.
+    """
+    search = ExperimentDocument.search()
+
+    facets = get_facets(search)
+    search_cache.store_precomputed_facets({}, facets)
+    stored = 1
+
+    for facet, filter_param in PRECOMPUTED_FACET_FILTERS.items():
+        field = ExperimentDocumentView.filter_fields[filter_param]
+        counts = facets.get(facet, {})
+        values = sorted(counts, key=counts.get, reverse=True)[:PRECOMPUTED_VALUES_PER_FACET]
+
+        for value in values:
+            filtered_facets = get_facets(search.filter("term", **{field: value}))
+            search_cache.store_precomputed_facets({filter_param: [str(value)]}, filtered_facets)
+            stored += 1
+
+    logger.info("Precomputed search facets.", count=stored)
+    return stored
@@ -11,6 +11,7 @@ from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
 from data_refinery_api.exceptions import InvalidFilters
+from data_refinery_api.pagination import CursorOrLimitOffsetPagination
 from data_refinery_api.utils import check_filters
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import ProcessorJob
@@ -74,6 +75,7 @@ class ProcessorJobListView(generics.ListAPIView):
 
     model = ProcessorJob
     serializer_class = ProcessorJobSerializer
+    pagination_class = CursorOrLimitOffsetPagination
     filter_backends = (
         DjangoFilterBackend,
         filters.OrderingFilter,
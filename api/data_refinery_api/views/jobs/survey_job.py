@@ -8,6 +8,7 @@ import boto3
 from django_filters.rest_framework import DjangoFilterBackend
 
 from data_refinery_api.exceptions import InvalidFilters
+from data_refinery_api.pagination import CursorOrLimitOffsetPagination
 from data_refinery_api.utils import check_filters
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import SurveyJob
@@ -51,6 +52,7 @@ class SurveyJobListView(generics.ListAPIView):
     model = SurveyJob
     queryset = SurveyJob.objects.all()
     serializer_class = SurveyJobSerializer
+    pagination_class = CursorOrLimitOffsetPagination
     filter_backends = (
         DjangoFilterBackend,
         filters.OrderingFilter,
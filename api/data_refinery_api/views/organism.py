@@ -1,10 +1,12 @@
+from django.utils.decorators import method_decorator
 from rest_framework import generics, serializers
 
 from django_filters.rest_framework import DjangoFilterBackend
 
+from data_refinery_api.caching import cached_view, latest_change
 from data_refinery_api.exceptions import InvalidFilters
 from data_refinery_api.utils import check_filters
-from data_refinery_common.models import Organism
+from data_refinery_common.models import CompendiumResult, Organism
 
 
 class OrganismSerializer(serializers.ModelSerializer):
@@ -19,6 +21,20 @@ class OrganismSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+# Organisms are only added or changed when they're surveyed or get
+# compendia, and either of those drops these pages from the cache anyway.
+ORGANISMS_CACHE_TIME_SECONDS = 60 * 60
+
+
+@method_decorator(
+    name="get",
+    decorator=cached_view(
+        "organisms",
+        ORGANISMS_CACHE_TIME_SECONDS,
+        # Whether an organism has compendia comes from its CompendiumResults.
+        data_version=latest_change(Organism, CompendiumResult),
+    ),
+)
 class OrganismListView(generics.ListAPIView):
     """
     Paginated list of all the available organisms.
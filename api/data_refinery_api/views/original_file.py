@@ -7,6 +7,7 @@ from rest_framework import filters, generics, serializers
 from django_filters.rest_framework import DjangoFilterBackend
 
 from data_refinery_api.exceptions import InvalidFilters
+from data_refinery_api.pagination import CursorOrLimitOffsetPagination
 from data_refinery_api.utils import check_filters
 from data_refinery_api.views.relation_serializers import (
     DetailedExperimentSampleSerializer,
@@ -75,6 +76,7 @@ class OriginalFileListView(generics.ListAPIView):
 
     queryset = OriginalFile.objects.all()
     serializer_class = OriginalFileListSerializer
+    pagination_class = CursorOrLimitOffsetPagination
     filter_backends = (
         DjangoFilterBackend,
         filters.OrderingFilter,
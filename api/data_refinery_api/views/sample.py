@@ -13,6 +13,8 @@ from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
 from data_refinery_api.exceptions import InvalidFilters
+from data_refinery_api.export import MetadataExportView
+from data_refinery_api.pagination import CursorOrLimitOffsetPagination
 from data_refinery_api.utils import check_filters
 from data_refinery_api.views.relation_serializers import (
     OrganismIndexRelationSerializer,
@@ -129,6 +131,7 @@ class SampleListView(generics.ListAPIView):
 
     model = Sample
     serializer_class = DetailedSampleSerializer
+    pagination_class = CursorOrLimitOffsetPagination
     filter_backends = (filters.OrderingFilter, DjangoFilterBackend)
     ordering_fields = "__all__"
     ordering = "-is_processed"
@@ -247,6 +250,45 @@ class SampleListView(generics.ListAPIView):
         return filter_dict
 
 
+class SampleExportView(MetadataExportView, SampleListView):
+    """Streams the metadata of every sample matching the same filters as
+    the samples list as TSV, or JSON lines with `?file_format=jsonl`.
+
+    This is much faster than paging through the samples list for big
+    metadata tables. Exports are rate limited per API token."""
+
+    # Rows always come out in id order.
+    filter_backends = (DjangoFilterBackend,)
+    ordering = None
+    export_name = "samples"
+    export_fields = [
+        "accession_code",
+        "title",
+        "source_database",
+        "organism__name",
+        "platform_accession_code",
+        "platform_name",
+        "technology",
+        "manufacturer",
+        "has_raw",
+        "sex",
+        "age",
+        "specimen_part",
+        "genotype",
+        "disease",
+        "disease_stage",
+        "cell_line",
+        "treatment",
+        "race",
+        "subject",
+        "compound",
+        "time",
+        "is_processed",
+        "created_at",
+        "last_modified",
+    ]
+
+
 class SampleDetailView(generics.RetrieveAPIView):
     """ Retrieve the details for a Sample given its accession code """
 
@@ -1,51 +1,52 @@
 ##
-# Contains the views Stats, FailedDownloaderJobStats, FailedProcessorJobStats, and AboutStats
+# Contains the views Stats, FailedDownloaderJobStats, FailedProcessorJobStats, AboutStats,
+# and CacheStats
 ##
 
-import functools
-import itertools
 from datetime import datetime, timedelta
 
-from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import caches
 from django.db.models import Count, DateTimeField
-from django.db.models.aggregates import Avg, Sum
-from django.db.models.expressions import F, Q
+from django.db.models.aggregates import Sum
+from django.db.models.expressions import Q
 from django.db.models.functions import Left, Trunc
 from django.utils import timezone
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from rest_framework import status
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-import boto3
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
+from data_refinery_api import search_cache
+from data_refinery_api.caching import TieredCache, cached_view
+from data_refinery_common import batch_jobs_breakdown, stats_rollups
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import (
     ComputedFile,
-    Dataset,
     DownloaderJob,
     Experiment,
     Organism,
     OriginalFile,
     ProcessorJob,
     Sample,
-    SurveyJob,
 )
-from data_refinery_common.utils import get_env_variable
 
 logger = get_and_configure_logger(__name__)
 
-JOB_CREATED_AT_CUTOFF = datetime(2019, 9, 19, tzinfo=timezone.utc)
-
 # We want to cache all stats pages for 10 minutes to reduce the load on our
-# servers, because computing all of the stats is really expensive
+# servers. Most stats are read from data_refinery_common.stats_rollups,
+# which the Foreman keeps up to date about that often anyway.
 CACHE_TIME_SECONDS = 10 * 60
 
+# The about page's numbers only move slowly and are the most expensive to compute.
+ABOUT_CACHE_TIME_SECONDS = 60 * 60
+
+# How long each interval of a timeline is for each range.
+RANGE_TO_TRUNC = {"day": "hour", "week": "day", "month": "day", "year": "month"}
+
 
 def get_start_date(range_param):
     current_date = datetime.now(tz=timezone.utc)
@@ -71,113 +72,15 @@ def paginate_queryset_response(queryset, request):
     )
 
 
-AWS_REGION = get_env_variable(
-    "AWS_REGION", "us-east-1"
-)  # Default to us-east-1 if the region variable can't be found
-batch = boto3.client("batch", region_name=AWS_REGION)
-
-
-PENDING_STATUSES = [
-    "SUBMITTED",
-    "PENDING",
-    "RUNNABLE",
-    "STARTING",
-]
-
-
-def add_type(job_json: dict) -> dict:
-    """Get the type for a job based on its name and add that to the job dict."""
-    # A job name is user_stage_NAME_GOES_HERE_..., so we need to
-    # remove the first two underscore-delimited fields, and then what
-    # comes after depends on the name
-    split_name = job_json["jobName"].split("_")[2:]
-
-    # The last field of a job name is always an ID, so strip that
-    split_name = split_name[:-1]
-
-    # If the new last field is numeric, then it must be a RAM amount, so
-    # strip that too. Otherwise, the last field will be part of the job
-    # name for jobs without RAM amounts, so we want to keep it.
-    if split_name[-1].isnumeric():
-        split_name = split_name[:-1]
-
-    job_json["type"] = "_".join(split_name)
-    return job_json
-
-
-def get_jobs_in_queue(batch_job_queue: str) -> list:
-    """Gets all of the information for the jobs in a batch queue."""
-    jobs = []
-    # AWS Batch only returns one status at a time and doesn't provide a `count` or `total`.
-    for status in [*PENDING_STATUSES, "RUNNING"]:
-        list_jobs_dict = batch.list_jobs(jobQueue=batch_job_queue, jobStatus=status)
-
-        jobs.extend(list_jobs_dict["jobSummaryList"])
-
-        while "nextToken" in list_jobs_dict and list_jobs_dict["nextToken"]:
-            list_jobs_dict = batch.list_jobs(
-                jobQueue=batch_job_queue, jobStatus=status, nextToken=list_jobs_dict["nextToken"],
-            )
-            jobs.extend(list_jobs_dict["jobSummaryList"])
-
-    return jobs
-
-
-def get_batch_jobs_breakdown(force=False):
-    data = {}
+def get_batch_jobs_breakdown():
+    """Returns the latest snapshot of the Batch queues collected by the Foreman."""
+    snapshot = batch_jobs_breakdown.get_latest_snapshot()
+    if not snapshot:
+        return {}
 
-    if not settings.RUNNING_IN_CLOUD and not force:
-        return data
-
-    job_queue_lists = {}
-    for queue_name in settings.AWS_BATCH_QUEUE_ALL_NAMES:
-        try:
-            job_queue_lists[queue_name] = list(map(add_type, get_jobs_in_queue(queue_name)))
-        except Exception:
-            logger.exception(f"Could not get jobs for queue {queue_name}")
-            raise
-
-    all_jobs = functools.reduce(lambda acc, x: acc + x, job_queue_lists.values(), [])
-
-    def is_pending(job):
-        return job["status"] in PENDING_STATUSES
-
-    def is_running(job):
-        return job["status"] == "RUNNING"
-
-    def count_occurrences(pred, it):
-        return functools.reduce(lambda acc, x: acc + 1 if pred(x) else acc, it, 0)
-
-    data["pending_jobs"] = count_occurrences(is_pending, all_jobs)
-    data["running_jobs"] = count_occurrences(is_running, all_jobs)
-
-    def get_job_type(job):
-        return job["type"]
-
-    # groupby must be executed on a sorted iterable
-    # ref: https://docs.python.org/3.8/library/itertools.html#itertools.groupby
-    sorted_jobs_by_type = sorted(all_jobs, key=get_job_type)
-    # We turn this into a dict because we need to iterate it more than once
-    aggregated_jobs_by_type = {
-        k: list(v) for k, v in itertools.groupby(sorted_jobs_by_type, get_job_type)
-    }
-
-    data["pending_jobs_by_type"] = {
-        k: count_occurrences(is_pending, v) for k, v in aggregated_jobs_by_type.items()
-    }
-    data["running_jobs_by_type"] = {
-        k: count_occurrences(is_running, v) for k, v in aggregated_jobs_by_type.items()
-    }
-
-    # Our original data is already aggregated by queue, so we don't need to
-    # re-aggregate here.
-
-    data["pending_jobs_by_queue"] = {
-        k: count_occurrences(is_pending, v) for k, v in job_queue_lists.items()
-    }
-    data["running_jobs_by_queue"] = {
-        k: count_occurrences(is_running, v) for k, v in job_queue_lists.items()
-    }
+    data = dict(snapshot["summary"])
+    data["batch_jobs_collected_on"] = snapshot["collected_at"]
+    data["batch_jobs_age"] = (timezone.now() - snapshot["collected_at"]).total_seconds()
 
     return data
 
@@ -196,7 +99,7 @@ class Stats(APIView):
             )
         ]
     )
-    @method_decorator(cache_page(CACHE_TIME_SECONDS))
+    @method_decorator(cached_view("stats", CACHE_TIME_SECONDS))
     def get(self, request, version, format=None):
         range_param = request.query_params.dict().pop("range", None)
         is_dashboard = request.query_params.dict().pop("dashboard", False)
@@ -214,18 +117,14 @@ class Stats(APIView):
         dashboard cares about"""
         data = {}
         data["generated_on"] = timezone.now()
-        data["survey_jobs"] = cls._get_job_stats(SurveyJob.objects, range_param)
-        data["downloader_jobs"] = cls._get_job_stats(DownloaderJob.objects, range_param)
-        data["processor_jobs"] = cls._get_job_stats(ProcessorJob.objects, range_param)
-        data["experiments"] = cls._get_object_stats(Experiment.objects, range_param)
+        data["survey_jobs"] = cls._get_job_stats("survey", range_param)
+        data["downloader_jobs"] = cls._get_job_stats("downloader", range_param)
+        data["processor_jobs"] = cls._get_job_stats("processor", range_param)
+        data["experiments"] = cls._get_object_stats("experiments", range_param)
 
         # processed and unprocessed samples stats
-        data["unprocessed_samples"] = cls._get_object_stats(
-            Sample.objects.filter(is_processed=False), range_param, "last_modified"
-        )
-        data["processed_samples"] = cls._get_object_stats(
-            Sample.processed_objects, range_param, "last_modified"
-        )
+        data["unprocessed_samples"] = cls._get_unprocessed_sample_stats(range_param)
+        data["processed_samples"] = cls._get_object_stats("processed_samples", range_param)
 
         data["dataset"] = cls._get_dataset_stats(range_param)
 
@@ -240,151 +139,125 @@ class Stats(APIView):
         data["processed_samples"]["last_hour"] = cls._samples_processed_last_hour()
 
         data["processed_samples"]["technology"] = {}
-        techs = Sample.processed_objects.values("technology").annotate(count=Count("technology"))
-        for tech in techs:
-            if not tech["technology"] or not tech["technology"].strip():
+        techs = stats_rollups.get_totals_by_dimension("processed_samples")
+        for tech, counts in techs.items():
+            if not tech.strip() or not counts["total"]:
                 continue
-            data["processed_samples"]["technology"][tech["technology"]] = tech["count"]
+            data["processed_samples"]["technology"][tech] = counts["total"]
 
         data["processed_samples"]["organism"] = {}
-        organisms = Sample.processed_objects.values("organism__name").annotate(
-            count=Count("organism__name")
-        )
-        for organism in organisms:
-            if not organism["organism__name"]:
+        organisms = stats_rollups.get_totals_by_dimension("processed_samples_by_organism")
+        for organism, counts in organisms.items():
+            if not organism or not counts["total"]:
                 continue
-            data["processed_samples"]["organism"][organism["organism__name"]] = organism["count"]
+            data["processed_samples"]["organism"][organism] = counts["total"]
 
-        data["processed_experiments"] = cls._get_object_stats(Experiment.processed_public_objects)
+        data["processed_experiments"] = cls._get_object_stats("processed_experiments")
 
         if range_param:
-            data["input_data_size"] = cls._get_input_data_size()
-            data["output_data_size"] = cls._get_output_data_size()
-
-        data.update(get_batch_jobs_breakdown())
+            data["input_data_size"] = stats_rollups.get_totals("input_data_size")["size_in_bytes"]
+            data["output_data_size"] = stats_rollups.get_totals("output_data_size")["size_in_bytes"]
 
         return data
 
     @classmethod
     def _get_dataset_stats(cls, range_param):
         """Returns stats for processed datasets"""
-        result = Dataset.processed_filtered_objects.aggregate(
-            total=Count("id"),
-            aggregated_by_experiment=Count("id", filter=Q(aggregate_by="EXPERIMENT")),
-            aggregated_by_species=Count("id", filter=Q(aggregate_by="SPECIES")),
-            scale_by_none=Count("id", filter=Q(scale_by="NONE")),
-            scale_by_minmax=Count("id", filter=Q(scale_by="MINMAX")),
-            scale_by_standard=Count("id", filter=Q(scale_by="STANDARD")),
-            scale_by_robust=Count("id", filter=Q(scale_by="ROBUST")),
-        )
+        aggregations = stats_rollups.get_totals_by_dimension("processed_datasets_by_aggregation")
+        scalings = stats_rollups.get_totals_by_dimension("processed_datasets_by_scaling")
+
+        def count(totals, dimension):
+            return totals.get(dimension, {}).get("total", 0)
+
+        result = {
+            "total": sum(counts["total"] for counts in aggregations.values()),
+            "aggregated_by_experiment": count(aggregations, "EXPERIMENT"),
+            "aggregated_by_species": count(aggregations, "SPECIES"),
+            "scale_by_none": count(scalings, "NONE"),
+            "scale_by_minmax": count(scalings, "MINMAX"),
+            "scale_by_standard": count(scalings, "STANDARD"),
+            "scale_by_robust": count(scalings, "ROBUST"),
+        }
 
         if range_param:
-            # We don't save the dates when datasets are processed, but we can use
-            # `last_modified`, since datasets aren't modified again after they are processed
-            result["timeline"] = cls._get_intervals(
-                Dataset.processed_filtered_objects, range_param, "last_modified"
-            ).annotate(total=Count("id"), total_size=Sum("size_in_bytes"))
+            result["timeline"] = [
+                {
+                    "start": interval["start"],
+                    "total": interval["total"],
+                    "total_size": interval["size_in_bytes"],
+                }
+                for interval in cls._get_intervals(
+                    "processed_datasets_by_aggregation", range_param, ["total", "size_in_bytes"]
+                )
+            ]
         return result
 
     @classmethod
     def _samples_processed_last_hour(cls):
+        # The rollups are only hourly, so this has to look at the samples themselves.
         current_date = datetime.now(tz=timezone.utc)
         start = current_date - timedelta(hours=1)
-        return Sample.processed_objects.filter(last_modified__range=(start, current_date)).count()
+        return Sample.processed_objects.filter(processed_at__range=(start, current_date)).count()
 
     @classmethod
-    def _get_input_data_size(cls):
-        total_size = OriginalFile.objects.filter(sample__is_processed=True).aggregate(  # <-- SLOW
-            Sum("size_in_bytes")
-        )
-        return total_size["size_in_bytes__sum"] if total_size["size_in_bytes__sum"] else 0
-
-    @classmethod
-    def _get_output_data_size(cls):
-        total_size = (
-            ComputedFile.public_objects.all()
-            .filter(s3_bucket__isnull=False, s3_key__isnull=True)
-            .aggregate(Sum("size_in_bytes"))
-        )
-        return total_size["size_in_bytes__sum"] if total_size["size_in_bytes__sum"] else 0
+    def _get_job_stats(cls, job_type, range_param):
+        start_date = get_start_date(range_param) if range_param else None
 
-    @classmethod
-    def _get_job_stats(cls, jobs, range_param):
-        start_filter = Q()
+        # Jobs which haven't started are always counted.
+        totals = stats_rollups.get_totals(job_type + "_jobs", since=start_date)
+        result = {
+            column: totals[column]
+            for column in ["total", "successful", "failed", "pending", "open"]
+        }
+        result["average_time"] = totals["duration"] / totals["timed"] if totals["timed"] else 0
 
         if range_param:
-            start_date = get_start_date(range_param)
-            start_filter = start_filter | Q(start_time__gte=start_date) | Q(start_time__isnull=True)
-
-        result = jobs.filter(start_filter).aggregate(
-            total=Count("id"),
-            successful=Count("id", filter=Q(success=True)),
-            failed=Count("id", filter=Q(success=False)),
-            pending=Count(
-                "id",
-                filter=Q(
-                    start_time__isnull=True,
-                    success__isnull=True,
-                    created_at__gt=JOB_CREATED_AT_CUTOFF,
-                ),
-            ),
-            open=Count(
-                "id",
-                filter=Q(
-                    start_time__isnull=False,
-                    success__isnull=True,
-                    created_at__gt=JOB_CREATED_AT_CUTOFF,
-                ),
-            ),
-        )
-        # via https://stackoverflow.com/questions/32520655/get-average-of-difference-of-datetime-fields-in-django
-        result["average_time"] = (
-            jobs.filter(start_filter)
-            .filter(start_time__isnull=False, end_time__isnull=False, success=True)
-            .aggregate(average_time=Avg(F("end_time") - F("start_time")))["average_time"]
-        )
+            result["timeline"] = cls._get_intervals(
+                job_type + "_jobs_timeline",
+                range_param,
+                ["total", "successful", "failed", "pending", "open"],
+            )
 
-        if not result["average_time"]:
-            result["average_time"] = 0
-        else:
-            result["average_time"] = result["average_time"].total_seconds()
+        return result
+
+    @classmethod
+    def _get_object_stats(cls, metric, range_param=False):
+        result = {"total": stats_rollups.get_totals(metric)["total"]}
 
         if range_param:
-            result["timeline"] = cls._get_intervals(jobs, range_param).annotate(
-                total=Count("id"),
-                successful=Count("id", filter=Q(success=True)),
-                failed=Count("id", filter=Q(success=False)),
-                pending=Count("id", filter=Q(start_time__isnull=True, success__isnull=True)),
-                open=Count("id", filter=Q(start_time__isnull=False, success__isnull=True)),
-            )
+            result["timeline"] = cls._get_intervals(metric, range_param, ["total"])
 
         return result
 
     @classmethod
-    def _get_object_stats(cls, objects, range_param=False, field="created_at"):
-        result = {"total": objects.count()}
+    def _get_unprocessed_sample_stats(cls, range_param):
+        """Unprocessed samples go by when they were last modified, which
+        can't be rolled up, so they're counted from the samples table."""
+        samples = Sample.objects.filter(is_processed=False)
+        result = {"total": samples.count()}
 
         if range_param:
-            result["timeline"] = cls._get_intervals(objects, range_param, field).annotate(
-                total=Count("id")
+            # truncate last_modified so it can be annotated by range
+            start_trunc = Trunc(
+                "last_modified", RANGE_TO_TRUNC.get(range_param), output_field=DateTimeField()
+            )
+            result["timeline"] = (
+                samples.annotate(start=start_trunc)
+                .values("start")
+                .filter(start__gte=get_start_date(range_param))
+                .annotate(total=Count("id"))
+                .order_by("start")
             )
 
         return result
 
     @classmethod
-    def _get_intervals(cls, objects, range_param, field="last_modified"):
-        range_to_trunc = {"day": "hour", "week": "day", "month": "day", "year": "month"}
-
-        # truncate the parameterized field so it can be annotated by range
+    def _get_intervals(cls, metric, range_param, columns):
+        # Each interval is the sum of the hourly rollups in it
         # ie. each day is composed of 24 hours...
-        start_trunc = Trunc(field, range_to_trunc.get(range_param), output_field=DateTimeField())
-
-        # get the correct start time for the range
-        start_range = get_start_date(range_param)
-
-        # annotate and filter in a single query
-        # ref https://stackoverflow.com/a/38359913/763705
-        return objects.annotate(start=start_trunc).values("start").filter(start__gte=start_range)
+        return stats_rollups.get_timeline(
+            metric, RANGE_TO_TRUNC.get(range_param), get_start_date(range_param), columns
+        )
 
 
 class FailedDownloaderJobStats(APIView):
@@ -399,7 +272,7 @@ class FailedDownloaderJobStats(APIView):
             )
         ]
     )
-    @method_decorator(cache_page(CACHE_TIME_SECONDS))
+    @method_decorator(cached_view("failure_stats", CACHE_TIME_SECONDS))
     def get(self, request, version, format=None):
         range_param = request.query_params.dict().pop("range", "day")
         start_date = get_start_date(range_param)
@@ -433,7 +306,7 @@ class FailedProcessorJobStats(APIView):
             )
         ]
     )
-    @method_decorator(cache_page(CACHE_TIME_SECONDS))
+    @method_decorator(cached_view("failure_stats", CACHE_TIME_SECONDS))
     def get(self, request, version, format=None):
         range_param = request.query_params.dict().pop("range", "day")
         start_date = get_start_date(range_param)
@@ -458,7 +331,7 @@ class FailedProcessorJobStats(APIView):
 class AboutStats(APIView):
     """Returns general stats for the site, used in the about page"""
 
-    @method_decorator(cache_page(CACHE_TIME_SECONDS))
+    @method_decorator(cached_view("about_stats", ABOUT_CACHE_TIME_SECONDS))
     def get(self, request, version, format=None):
         # static values for now
         dummy = request.query_params.dict().pop("dummy", None)
@@ -525,3 +398,19 @@ class AboutStats(APIView):
             .count()
         )
         return processed_samples + unprocessed_samples_with_quant
+
+
+class CacheStats(APIView):
+    """Hit, miss and latency counts for each tier of the API's cache, and
+    hit and miss counts for cached searches and precomputed facets.
+
+    These are only for the process handling the request."""
+
+    def get(self, request, version, format=None):
+        metrics = search_cache.get_metrics()
+
+        cache = caches["default"]
+        if isinstance(cache, TieredCache):
+            metrics.update(cache.get_metrics())
+
+        return Response(metrics)
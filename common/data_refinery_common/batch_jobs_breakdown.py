@@ -0,0 +1,143 @@
+"""Snapshots of what's in our Batch job queues, for the stats dashboard.
+
+Listing every job in every queue takes far too long to do while
+someone waits on the stats endpoint, so the Foreman collects a summary
+of the queues every so often and stores it in the database cache,
+which it shares with the API. The API serves whatever the latest snapshot is along with how
+old it is.
+"""
+
+from typing import Dict, Iterable, Iterator
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+import boto3
+
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.utils import get_env_variable
+
+logger = get_and_configure_logger(__name__)
+
+AWS_REGION = get_env_variable(
+    "AWS_REGION", "us-east-1"
+)  # Default to us-east-1 if the region variable can't be found
+batch = boto3.client("batch", region_name=AWS_REGION)
+
+CACHE_ALIAS = "database"
+CACHE_KEY = "batch_jobs_breakdown"
+
+PENDING_STATUSES = [
+    "SUBMITTED",
+    "PENDING",
+    "RUNNABLE",
+    "STARTING",
+]
+
+
+def get_job_type(job_name: str) -> str:
+    """Get the type for a job based on its name."""
+    # A job name is user_stage_NAME_GOES_HERE_..., so we need to
+    # remove the first two underscore-delimited fields, and then what
+    # comes after depends on the name
+    split_name = job_name.split("_")[2:]
+
+    # The last field of a job name is always an ID, so strip that
+    split_name = split_name[:-1]
+
+    # If the new last field is numeric, then it must be a RAM amount, so
+    # strip that too. Otherwise, the last field will be part of the job
+    # name for jobs without RAM amounts, so we want to keep it.
+    if split_name[-1].isnumeric():
+        split_name = split_name[:-1]
+
+    return "_".join(split_name)
+
+
+def list_unfinished_jobs(batch_job_queue: str, batch_client=None) -> Iterator[Dict]:
+    """Yields the summaries of every pending or running job in a Batch queue."""
+    batch_client = batch_client or batch
+
+    # AWS Batch only returns one status at a time and doesn't provide a `count` or `total`.
+    for status in [*PENDING_STATUSES, "RUNNING"]:
+        list_jobs_dict = batch_client.list_jobs(jobQueue=batch_job_queue, jobStatus=status)
+        yield from list_jobs_dict["jobSummaryList"]
+
+        while "nextToken" in list_jobs_dict and list_jobs_dict["nextToken"]:
+            list_jobs_dict = batch_client.list_jobs(
+                jobQueue=batch_job_queue, jobStatus=status, nextToken=list_jobs_dict["nextToken"],
+            )
+            yield from list_jobs_dict["jobSummaryList"]
+
+
+def summarize_jobs(jobs_by_queue: Dict[str, Iterable[Dict]]) -> Dict:
+    """Counts the pending and running jobs, overall and by type and queue.
+
+    Every job is only looked at once, so this is fine for big queues.
+    """
+    summary = {
+        "pending_jobs": 0,
+        "running_jobs": 0,
+        "pending_jobs_by_type": {},
+        "running_jobs_by_type": {},
+        "pending_jobs_by_queue": {},
+        "running_jobs_by_queue": {},
+    }
+
+    for queue_name, jobs in jobs_by_queue.items():
+        summary["pending_jobs_by_queue"][queue_name] = 0
+        summary["running_jobs_by_queue"][queue_name] = 0
+
+        for job in jobs:
+            job_type = get_job_type(job["jobName"])
+            summary["pending_jobs_by_type"].setdefault(job_type, 0)
+            summary["running_jobs_by_type"].setdefault(job_type, 0)
+
+            if job["status"] in PENDING_STATUSES:
+                state = "pending"
+            elif job["status"] == "RUNNING":
+                state = "running"
+            else:
+                continue
+
+            summary[state + "_jobs"] += 1
+            summary[state + "_jobs_by_type"][job_type] += 1
+            summary[state + "_jobs_by_queue"][queue_name] += 1
+
+    return summary
+
+
+def collect_snapshot(batch_client=None) -> Dict:
+    """Summarizes every Batch queue and stores that as the latest snapshot.
+
+    Returns the new snapshot. If any queue can't be listed the previous
+    snapshot is left alone, since a partial one would be misleading.
+    """
+    start_time = timezone.now()
+
+    # Summarize the jobs as they're listed instead of holding onto them all.
+    jobs_by_queue = {
+        queue_name: list_unfinished_jobs(queue_name, batch_client)
+        for queue_name in settings.AWS_BATCH_QUEUE_ALL_NAMES
+    }
+    try:
+        summary = summarize_jobs(jobs_by_queue)
+    except Exception:
+        logger.exception("Could not get the jobs in the Batch queues.")
+        raise
+
+    snapshot = {
+        "collected_at": timezone.now(),
+        "collection_time": (timezone.now() - start_time).total_seconds(),
+        "summary": summary,
+    }
+    # The API should always have something to show, however old.
+    caches[CACHE_ALIAS].set(CACHE_KEY, snapshot, timeout=None)
+
+    return snapshot
+
+
+def get_latest_snapshot() -> Dict:
+    """Returns the most recently collected snapshot, or None if there isn't one."""
+    return caches[CACHE_ALIAS].get(CACHE_KEY)
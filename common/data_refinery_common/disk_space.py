@@ -0,0 +1,249 @@
+"""Node-level accounting for the space on the volume holding LOCAL_ROOT_DIR.
+
+Every job running on a node shares the same volume, so before a job
+writes anything big it reserves an estimate of the bytes it's going
+to need. If there isn't enough free space to cover that reservation
+and everyone else's, cached indexes nobody is using and the working
+directories of finished jobs are evicted least-recently-used first. If that still
+isn't enough the reservation is refused so the job can be deferred
+instead of dying with ENOSPC halfway through writing its files.
+
+Reservations are kept in a small JSON ledger next to the data itself
+and guarded with a file lock, because the jobs sharing a volume run in
+separate containers.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from data_refinery_common import index_cache
+from data_refinery_common.constants import LOCAL_ROOT_DIR
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.models import ProcessorJob
+from data_refinery_common.utils import get_env_variable
+
+logger = get_and_configure_logger(__name__)
+
+BYTES_IN_GB = 1024 * 1024 * 1024
+
+RESERVATIONS_FILE = ".disk_space_reservations.json"
+LOCK_FILE = ".disk_space.lock"
+
+# Always leave this much space free, for logs, temp files and
+# estimates that turned out to be too low.
+DISK_SPACE_HEADROOM = int(get_env_variable("DISK_SPACE_HEADROOM", str(5 * BYTES_IN_GB)))
+
+# Reservations older than this belong to jobs that died without
+# releasing them.
+RESERVATION_TIMEOUT = 60 * 60 * 12
+
+# Salmon won't run for more than three hours, so an index directory
+# left over from before the index cache that hasn't been used for
+# longer than that isn't in use.
+INDEX_IDLE_TIME = 60 * 60 * 3
+
+# How many processor job ids to look up per query.
+LOOKUP_PAGE_SIZE = 1000
+
+
+class InsufficientDiskSpaceError(Exception):
+    """Raised when a reservation can't be satisfied even after evicting everything we can."""
+
+    def __init__(self, reservation_id, requested_bytes, available_bytes):
+        super(InsufficientDiskSpaceError, self).__init__(
+            "Not enough disk space for {}: requested {} bytes but only {} are available.".format(
+                reservation_id, requested_bytes, available_bytes
+            )
+        )
+        self.reservation_id = reservation_id
+        self.requested_bytes = requested_bytes
+        self.available_bytes = available_bytes
+
+
+def estimate_files_size(files: Iterable, multiplier: float = 1, default_size: int = 0) -> int:
+    """Estimates how many bytes writing `files` will take.
+
+    Works for both OriginalFiles and ComputedFiles, since they both
+    have size_in_bytes. Files which don't know their size yet, such
+    as OriginalFiles that have never been downloaded, are counted as
+    `default_size` bytes.
+    """
+    return int(sum(file.size_in_bytes or default_size for file in files) * multiplier)
+
+
+@contextmanager
+def _locked_reservations():
+    """Yields the reservation ledger while holding the node-wide lock.
+
+    Any changes made to the yielded dict are written back before the
+    lock is released.
+    """
+    os.makedirs(LOCAL_ROOT_DIR, exist_ok=True)
+    with open(os.path.join(LOCAL_ROOT_DIR, LOCK_FILE), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            reservations_path = os.path.join(LOCAL_ROOT_DIR, RESERVATIONS_FILE)
+            try:
+                with open(reservations_path) as reservations_file:
+                    reservations = json.load(reservations_file)
+            except (OSError, ValueError):
+                reservations = {}
+
+            now = time.time()
+            reservations = {
+                reservation_id: reservation
+                for reservation_id, reservation in reservations.items()
+                if now - reservation["reserved_at"] < RESERVATION_TIMEOUT
+            }
+
+            yield reservations
+
+            # Write to a temporary file first so a crash can't leave
+            # a half written ledger behind.
+            temp_path = reservations_path + ".tmp"
+            with open(temp_path, "w") as reservations_file:
+                json.dump(reservations, reservations_file)
+            os.replace(temp_path, reservations_path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _get_available_bytes(reservations: Dict, exclude_id: str = None) -> int:
+    """Returns the free bytes on the volume that haven't been promised to anyone else."""
+    reserved_bytes = sum(
+        reservation["bytes"]
+        for reservation_id, reservation in reservations.items()
+        if reservation_id != exclude_id
+    )
+    return shutil.disk_usage(LOCAL_ROOT_DIR).free - reserved_bytes - DISK_SPACE_HEADROOM
+
+
+def _get_directory_size(path: str) -> int:
+    """Returns the number of bytes taken up by the files under `path`."""
+    total_size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total_size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+
+    return total_size
+
+
+def _remove_directory(path: str) -> bool:
+    shutil.rmtree(path, ignore_errors=True)
+    return True
+
+
+def _find_eviction_candidates(reservations: Dict) -> List[Tuple[float, str, Callable]]:
+    """Returns (last used time, path, evict function) tuples for eviction, oldest first.
+
+    Candidates are cached indexes nobody holds a reference to, old
+    index directories nobody has used recently and the working
+    directories of processor jobs which have finished or vanished from
+    the database. Directories of jobs holding a reservation are never
+    candidates.
+    """
+    now = time.time()
+    candidates = [
+        (last_used, path, index_cache.evict_index)
+        for last_used, path in index_cache.find_cold_indexes()
+    ]
+    job_directories = {}
+    for item in os.listdir(LOCAL_ROOT_DIR):
+        if not item.startswith("processor_job_") or item in reservations:
+            continue
+
+        path = os.path.join(LOCAL_ROOT_DIR, item)
+        try:
+            last_used = os.stat(path).st_mtime
+        except OSError:
+            continue
+
+        if item.endswith("_index"):
+            if now - last_used > INDEX_IDLE_TIME:
+                candidates.append((last_used, path, _remove_directory))
+            continue
+
+        try:
+            job_directories[int(item.split("processor_job_")[1])] = (last_used, path)
+        except ValueError:
+            continue
+
+    job_ids = list(job_directories.keys())
+    unfinished_job_ids = set()
+    for page_start in range(0, len(job_ids), LOOKUP_PAGE_SIZE):
+        page = job_ids[page_start : page_start + LOOKUP_PAGE_SIZE]
+        unfinished_job_ids.update(
+            ProcessorJob.objects.filter(id__in=page, end_time__isnull=True).values_list(
+                "id", flat=True
+            )
+        )
+
+    for job_id, (last_used, path) in job_directories.items():
+        if job_id not in unfinished_job_ids:
+            candidates.append((last_used, path, _remove_directory))
+
+    return sorted(candidates, key=lambda candidate: candidate[0])
+
+
+def _evict(reservations: Dict, reservation_id: str, num_bytes: int) -> int:
+    """Evicts directories LRU-first until `num_bytes` are available.
+
+    Returns the number of bytes that were freed.
+    """
+    freed_bytes = 0
+    for _, path, evict in _find_eviction_candidates(reservations):
+        if _get_available_bytes(reservations, reservation_id) >= num_bytes:
+            break
+
+        size = _get_directory_size(path)
+        if evict(path):
+            logger.info("Evicted directory to free up disk space.", path=path, size_in_bytes=size)
+            freed_bytes += size
+
+    return freed_bytes
+
+
+def reserve_space(reservation_id: str, num_bytes: int) -> None:
+    """Reserves `num_bytes` on the volume for `reservation_id`.
+
+    Calling this more than once for the same id adds to its existing
+    reservation. Jobs should use their working directory name as the
+    id so that directory is never evicted out from under them.
+
+    Raises InsufficientDiskSpaceError if the space can't be found even
+    after evicting everything that can be evicted.
+    """
+    with _locked_reservations() as reservations:
+        existing_bytes = reservations.get(reservation_id, {}).get("bytes", 0)
+        total_bytes = existing_bytes + num_bytes
+
+        available_bytes = _get_available_bytes(reservations, reservation_id)
+        if available_bytes < total_bytes:
+            freed_bytes = _evict(reservations, reservation_id, total_bytes)
+            available_bytes = _get_available_bytes(reservations, reservation_id)
+            logger.info(
+                "Evicted directories to satisfy a disk space reservation.",
+                reservation_id=reservation_id,
+                freed_bytes=freed_bytes,
+                available_bytes=available_bytes,
+                requested_bytes=total_bytes,
+            )
+
+        if available_bytes < total_bytes:
+            raise InsufficientDiskSpaceError(reservation_id, total_bytes, available_bytes)
+
+        reservations[reservation_id] = {"bytes": total_bytes, "reserved_at": time.time()}
+
+
+def release_space(reservation_id: str) -> None:
+    """Releases whatever space was reserved for `reservation_id`, if any."""
+    with _locked_reservations() as reservations:
+        reservations.pop(reservation_id, None)
@@ -0,0 +1,98 @@
+"""Hashing files as they're written rather than reading them back afterwards.
+
+Downloads used to be followed by calculate_sha1 and calculate_file_size,
+which reread the whole file. For the biggest SRA files that's tens of
+gigabytes of extra disk reads per file. Writing a download through a
+HashingWriter instead produces its SHA1 and size as the bytes go by.
+
+Setting VERIFY_FILE_DIGESTS rereads the file anyway and checks that
+the two agree, which the tests do.
+"""
+
+import hashlib
+
+from django.conf import settings
+
+from data_refinery_common.constants import CHUNK_SIZE
+from data_refinery_common.utils import calculate_file_size, calculate_sha1
+
+
+class FileDigestMismatchError(Exception):
+    pass
+
+
+class FileDigest:
+    """The SHA1 and size of everything passed to `update`."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Starts over, for when a download has to be restarted from the beginning."""
+        self._sha1 = hashlib.sha1()
+        self.size = 0
+
+    def update(self, data: bytes) -> None:
+        self._sha1.update(data)
+        self.size += len(data)
+
+    def update_from_file(self, path: str) -> None:
+        """For files written by something we can't see the bytes of, like ascp."""
+        with open(path, "rb") as open_file:
+            for chunk in iter(lambda: open_file.read(CHUNK_SIZE), b""):
+                self.update(chunk)
+
+    @property
+    def sha1(self) -> str:
+        return self._sha1.hexdigest()
+
+    def verify(self, path: str) -> None:
+        """Checks that this matches what's on disk at `path`, if VERIFY_FILE_DIGESTS is set."""
+        # Only the common and workers settings define this.
+        if not getattr(settings, "VERIFY_FILE_DIGESTS", False):
+            return
+
+        sha1 = calculate_sha1(path)
+        size = calculate_file_size(path)
+        if sha1 != self.sha1 or size != self.size:
+            raise FileDigestMismatchError(
+                "{} has SHA1 {} and size {} but was written with SHA1 {} and size {}.".format(
+                    path, sha1, size, self.sha1, self.size
+                )
+            )
+
+
+class HashingWriter:
+    """A file opened for writing which hashes everything written to it.
+
+    It can't seek, so anything writing to it has to write in order.
+    boto3 notices that and does too.
+    """
+
+    def __init__(self, path: str, digest: FileDigest = None):
+        self.path = path
+        self.digest = digest if digest is not None else FileDigest()
+        self._file = open(path, "wb")
+
+    def write(self, data: bytes) -> int:
+        written = self._file.write(data)
+        self.digest.update(data)
+        return written
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
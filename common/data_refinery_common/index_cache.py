@@ -0,0 +1,246 @@
+"""A per-node cache of extracted Salmon transcriptome indexes.
+
+Each OrganismIndex is extracted at most once per volume, into its own
+directory under CACHE_DIRECTORY. Jobs coordinate through a lock file
+per OrganismIndex: whoever gets the lock first downloads the tarball,
+verifies its checksum and extracts it while everyone else waits for
+them to finish rather than starting their own extraction.
+
+Jobs using an index hold a reference to it for as long as they need
+it, so it's never evicted out from under them. Indexes without any
+live references are evicted least-recently-used first when
+data_refinery_common.disk_space needs to make room.
+"""
+
+import fcntl
+import os
+import shutil
+import tarfile
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+from data_refinery_common.constants import LOCAL_ROOT_DIR
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.utils import calculate_sha1
+
+logger = get_and_configure_logger(__name__)
+
+CACHE_DIRECTORY = os.path.join(LOCAL_ROOT_DIR, "INDEX_CACHE")
+
+# Salmon and tximport jobs won't run anywhere near this long, so a
+# reference older than this was left behind by a job that died.
+REFERENCE_TIMEOUT = 60 * 60 * 12
+
+# Salmon writes this file last when it builds an index, so an index
+# without it is incomplete.
+VERSION_INFO_FILE = "versionInfo.json"
+
+
+class IndexCacheError(Exception):
+    """Raised when an index can't be downloaded, verified or extracted."""
+
+
+def get_index_directory(organism_index_id: int) -> str:
+    """Returns where the cache keeps the index for an OrganismIndex."""
+    return os.path.join(CACHE_DIRECTORY, str(organism_index_id))
+
+
+def _get_lock_path(organism_index_id: int) -> str:
+    return get_index_directory(organism_index_id) + ".lock"
+
+
+def _get_references_directory(organism_index_id: int) -> str:
+    return get_index_directory(organism_index_id) + ".refs"
+
+
+def _get_download_directory(organism_index_id: int) -> str:
+    return get_index_directory(organism_index_id) + ".download"
+
+
+def is_index_installed(index_directory: str) -> bool:
+    """Returns whether `index_directory` holds a complete Salmon index."""
+    version_info_path = os.path.join(index_directory, VERSION_INFO_FILE)
+    return os.path.exists(version_info_path) and os.path.getsize(version_info_path) > 0
+
+
+@contextmanager
+def _locked_index(organism_index_id: int, blocking: bool = True):
+    """Holds the lock for an OrganismIndex, yielding whether it was acquired.
+
+    If `blocking` is False and someone else holds the lock this yields
+    False immediately instead of waiting for them.
+    """
+    os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+    with open(_get_lock_path(organism_index_id), "w") as lock_file:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file, flags)
+        except BlockingIOError:
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _count_live_references(organism_index_id: int) -> int:
+    """Counts the references to an index, removing any which have timed out."""
+    references_directory = _get_references_directory(organism_index_id)
+    try:
+        holders = os.listdir(references_directory)
+    except FileNotFoundError:
+        return 0
+
+    now = time.time()
+    num_references = 0
+    for holder in holders:
+        reference_path = os.path.join(references_directory, holder)
+        try:
+            if now - os.stat(reference_path).st_mtime < REFERENCE_TIMEOUT:
+                num_references += 1
+            else:
+                os.remove(reference_path)
+        except OSError:
+            pass
+
+    return num_references
+
+
+def _install_index(organism_index, index_directory: str) -> None:
+    """Downloads, verifies and extracts an index. Must be called with its lock held."""
+    index_file = organism_index.get_computed_file()
+    if not index_file:
+        raise IndexCacheError(
+            "OrganismIndex {} doesn't have a computed file.".format(organism_index.id)
+        )
+
+    # Anything here was left behind by a job that died partway through.
+    download_directory = _get_download_directory(organism_index.id)
+    shutil.rmtree(download_directory, ignore_errors=True)
+    shutil.rmtree(index_directory, ignore_errors=True)
+    os.makedirs(download_directory)
+
+    try:
+        index_tarball = index_file.sync_from_s3(
+            path=os.path.join(download_directory, index_file.filename)
+        )
+        if not index_tarball:
+            raise IndexCacheError("Couldn't download " + str(index_file.filename))
+
+        if index_file.sha1 and calculate_sha1(index_tarball) != index_file.sha1:
+            raise IndexCacheError(
+                "SHA1 of index tarball {} doesn't match the database.".format(index_file.filename)
+            )
+
+        # Extract next to where the index goes and rename it into
+        # place so a half extracted index is never visible.
+        extraction_directory = os.path.join(download_directory, "index")
+        with tarfile.open(index_tarball, "r:gz") as index_archive:
+            index_archive.extractall(extraction_directory)
+
+        if not is_index_installed(extraction_directory):
+            raise IndexCacheError(
+                "Index tarball {} didn't contain a complete index.".format(index_file.filename)
+            )
+
+        os.rename(extraction_directory, index_directory)
+    finally:
+        shutil.rmtree(download_directory, ignore_errors=True)
+
+
+def acquire_index(organism_index, holder: str) -> Tuple[str, bool]:
+    """Makes sure an index is extracted and takes a reference to it for `holder`.
+
+    `holder` should be unique to the job using the index, and the job
+    must call release_index with it once it's done with the index.
+
+    Returns the directory the index is in and whether it was already
+    cached. Raises IndexCacheError if the index couldn't be installed.
+    """
+    index_directory = get_index_directory(organism_index.id)
+    with _locked_index(organism_index.id):
+        was_cached = is_index_installed(index_directory)
+        if not was_cached:
+            _install_index(organism_index, index_directory)
+
+        references_directory = _get_references_directory(organism_index.id)
+        os.makedirs(references_directory, exist_ok=True)
+        with open(os.path.join(references_directory, holder), "w"):
+            pass
+
+        # The directory's mtime is what LRU eviction goes by.
+        os.utime(index_directory)
+
+    return index_directory, was_cached
+
+
+def release_index(organism_index_id: int, holder: str) -> None:
+    """Drops the reference `holder` took on an index, if it has one."""
+    with _locked_index(organism_index_id):
+        try:
+            os.remove(os.path.join(_get_references_directory(organism_index_id), holder))
+        except FileNotFoundError:
+            pass
+
+        try:
+            os.utime(get_index_directory(organism_index_id))
+        except OSError:
+            pass
+
+
+def prewarm_index(organism_index) -> bool:
+    """Installs an index so the next job to need it doesn't have to.
+
+    No reference is taken, so the index can be evicted again if space
+    is needed before anyone uses it. Returns whether the index had to
+    be installed.
+    """
+    index_directory = get_index_directory(organism_index.id)
+    with _locked_index(organism_index.id):
+        if is_index_installed(index_directory):
+            return False
+
+        _install_index(organism_index, index_directory)
+        return True
+
+
+def find_cold_indexes() -> List[Tuple[float, str]]:
+    """Returns (last used time, directory) pairs for indexes nobody holds a reference to."""
+    try:
+        items = os.listdir(CACHE_DIRECTORY)
+    except FileNotFoundError:
+        return []
+
+    cold_indexes = []
+    for item in items:
+        if not item.isdigit():
+            continue
+
+        if _count_live_references(int(item)) > 0:
+            continue
+
+        index_directory = os.path.join(CACHE_DIRECTORY, item)
+        try:
+            cold_indexes.append((os.stat(index_directory).st_mtime, index_directory))
+        except OSError:
+            continue
+
+    return cold_indexes
+
+
+def evict_index(index_directory: str) -> bool:
+    """Removes an index from the cache unless it's in use.
+
+    Doesn't wait on the index's lock, since whoever holds it is about
+    to use the index. Returns whether the index was removed.
+    """
+    organism_index_id = int(os.path.basename(index_directory))
+    with _locked_index(organism_index_id, blocking=False) as acquired:
+        if not acquired or _count_live_references(organism_index_id) > 0:
+            return False
+
+        shutil.rmtree(index_directory, ignore_errors=True)
+        return True
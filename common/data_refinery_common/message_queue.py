@@ -5,6 +5,7 @@ from __future__ import absolute_import, unicode_literals
 import datetime
 import sys
 from enum import Enum
+from typing import List
 
 from django.conf import settings
 from django.utils import timezone
@@ -18,6 +19,7 @@ from data_refinery_common.enums import (
     SurveyJobTypes,
 )
 from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.models import ProcessorJob, Sample
 from data_refinery_common.utils import get_env_variable
 
 logger = get_and_configure_logger(__name__)
@@ -279,12 +281,102 @@ def is_job_processor(job_type):
     return job_type not in list(Downloaders) and job_type not in list(SurveyJobTypes)
 
 
+def get_organism_to_prewarm(job, job_queue) -> str:
+    """Returns the organism of the next SALMON job waiting in job_queue.
+
+    Each job queue's jobs run on the same instance, so a SALMON job
+    being dispatched there can install that organism's index after
+    it's done and save the next job from extracting it. Returns an
+    empty string if there's nothing to prewarm.
+    """
+    try:
+        next_job = (
+            ProcessorJob.objects.filter(
+                pipeline_applied=ProcessorPipeline.SALMON.value,
+                batch_job_queue=job_queue,
+                start_time__isnull=True,
+                end_time__isnull=True,
+            )
+            .exclude(id=job.id)
+            .order_by("created_at")
+            .first()
+        )
+        if not next_job:
+            return ""
+
+        organism_id = (
+            Sample.objects.filter(original_files__processor_jobs=next_job, organism__isnull=False)
+            .values_list("organism_id", flat=True)
+            .first()
+        )
+    except Exception:
+        logger.exception("Unable to find an organism to prewarm.", job_id=job.id)
+        return ""
+
+    return str(organism_id) if organism_id else ""
+
+
+def _submit_to_batch(job_type: Enum, jobs: List) -> bool:
+    """Submits one Batch job which runs every one of `jobs`.
+
+    They all have to be the same type and need the same amount of RAM.
+    """
+    job = jobs[0]
+    batch = boto3.client("batch", region_name=AWS_REGION)
+
+    job_name = JOB_DEFINITION_PREFIX + get_job_name(job_type, job.id)
+
+    # Smasher related and tximport jobs  don't have RAM tiers.
+    if job_type not in [
+        *SMASHER_JOB_TYPES,
+        ProcessorPipeline.TXIMPORT,
+        ProcessorPipeline.JANITOR,
+    ]:
+        job_name = job_name + "_" + str(job.ram_amount)
+
+    job_queue = get_batch_queue_for_job(job_type, job)
+
+    if not job_queue:
+        # There's no capacity for the job. That's okay. The
+        # Foreman will requeue when there is.
+        return False
+
+    # Downloader jobs can be run several to a Batch job, see
+    # data_refinery_workers.downloaders.batch.
+    job_ids = ",".join(str(each_job.id) for each_job in jobs)
+    parameters = {"job_name": job_type.value, "job_id": job_ids}
+    if job_type is ProcessorPipeline.SALMON:
+        parameters["prewarm_organism_id"] = get_organism_to_prewarm(job, job_queue)
+
+    try:
+        batch_response = batch.submit_job(
+            jobName=job_name + f"_{job.id}",
+            jobQueue=job_queue,
+            jobDefinition=job_name,
+            parameters=parameters,
+        )
+        for each_job in jobs:
+            each_job.batch_job_queue = job_queue
+            each_job.batch_job_id = batch_response["jobId"]
+            each_job.save()
+
+        increment_job_queue_depth(job_queue)
+        if job_type in list(Downloaders):
+            increment_downloader_job_queue_depth(job_queue)
+
+        return True
+    except Exception as e:
+        logger.warn(
+            "Unable to Dispatch Batch Job.", job_name=job_type.value, job_id=job_ids, reason=str(e),
+        )
+        raise
+
+
 def send_job(job_type: Enum, job, is_dispatch=False) -> bool:
     # There's no Batch to dispatch jobs to locally, so don't even try.
     if not settings.RUNNING_IN_CLOUD:
         return False
 
-    job_name = get_job_name(job_type, job.id)
     is_processor = is_job_processor(job_type)
 
     if settings.AUTO_DISPATCH_BATCH_JOBS:
@@ -295,48 +387,18 @@ def send_job(job_type: Enum, job, is_dispatch=False) -> bool:
         should_dispatch = is_dispatch  # only dispatch when specifically requested to
 
     if should_dispatch:
-        batch = boto3.client("batch", region_name=AWS_REGION)
-
-        job_name = JOB_DEFINITION_PREFIX + job_name
-
-        # Smasher related and tximport jobs  don't have RAM tiers.
-        if job_type not in [
-            *SMASHER_JOB_TYPES,
-            ProcessorPipeline.TXIMPORT,
-            ProcessorPipeline.JANITOR,
-        ]:
-            job_name = job_name + "_" + str(job.ram_amount)
-
-        job_queue = get_batch_queue_for_job(job_type, job)
-
-        if not job_queue:
-            # There's no capacity for the job. That's okay. The
-            # Foreman will requeue when there is.
-            return False
-
-        try:
-            batch_response = batch.submit_job(
-                jobName=job_name + f"_{job.id}",
-                jobQueue=job_queue,
-                jobDefinition=job_name,
-                parameters={"job_name": job_type.value, "job_id": str(job.id)},
-            )
-            job.batch_job_queue = job_queue
-            job.batch_job_id = batch_response["jobId"]
-            job.save()
-
-            increment_job_queue_depth(job_queue)
-            if job_type in list(Downloaders):
-                increment_downloader_job_queue_depth(job_queue)
-
-            return True
-        except Exception as e:
-            logger.warn(
-                "Unable to Dispatch Batch Job.",
-                job_name=job_type.value,
-                job_id=str(job.id),
-                reason=str(e),
-            )
-            raise
+        return _submit_to_batch(job_type, [job])
 
     return True
+
+
+def send_downloader_jobs(job_type: Downloaders, jobs: List) -> bool:
+    """Dispatches `jobs` to be run one after another by a single Batch job.
+
+    For small files, starting a container takes longer than
+    downloading them, so the Foreman groups them up with this.
+    """
+    if not settings.RUNNING_IN_CLOUD:
+        return False
+
+    return _submit_to_batch(job_type, jobs)
@@ -0,0 +1,14 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_refinery_common", "0067_dataset_notify_me"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="processorjob", name="metrics", field=models.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,39 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_refinery_common", "0068_processorjob_metrics"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatsRollup",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("metric", models.CharField(max_length=64)),
+                ("dimension", models.CharField(blank=True, default="", max_length=255)),
+                ("bucket", models.DateTimeField()),
+                ("total", models.BigIntegerField(default=0)),
+                ("successful", models.BigIntegerField(default=0)),
+                ("failed", models.BigIntegerField(default=0)),
+                ("pending", models.BigIntegerField(default=0)),
+                ("open", models.BigIntegerField(default=0)),
+                ("size_in_bytes", models.BigIntegerField(default=0)),
+                ("duration", models.FloatField(default=0)),
+                ("timed", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "db_table": "stats_rollups",
+                "unique_together": {("metric", "dimension", "bucket")},
+            },
+        ),
+    ]
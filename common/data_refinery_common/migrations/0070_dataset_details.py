@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_refinery_common", "0069_statsrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataset",
+            name="details",
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_refinery_common", "0070_dataset_details"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="surveyjob", name="http_cache_hits", field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="surveyjob", name="http_cache_misses", field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_refinery_common", "0071_surveyjob_http_cache_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="downloaderjob",
+            name="downloaded_bytes",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="downloaderjob", name="download_seconds", field=models.FloatField(default=0),
+        ),
+    ]
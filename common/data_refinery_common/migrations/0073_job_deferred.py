@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_refinery_common", "0072_downloaderjob_download_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="downloaderjob", name="deferred", field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="processorjob", name="deferred", field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_processed_at(apps, schema_editor):
+    """Stats used to go by last_modified, so start from that."""
+    for model_name in ["Sample", "Dataset"]:
+        model = apps.get_model("data_refinery_common", model_name)
+        model.objects.filter(is_processed=True).update(processed_at=F("last_modified"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_refinery_common", "0073_job_deferred"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sample",
+            name="processed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="dataset",
+            name="processed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_processed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_last_surveyed_at(apps, schema_editor):
+    SurveyedAccession = apps.get_model("data_refinery_common", "SurveyedAccession")
+    SurveyedAccession.objects.update(last_surveyed_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_refinery_common", "0074_processed_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="surveyedaccession",
+            name="last_surveyed_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_last_surveyed_at, migrations.RunPython.noop),
+    ]
@@ -58,3 +58,4 @@ from data_refinery_common.models.pipeline import Pipeline  # noqa
 from data_refinery_common.models.processor import Processor  # noqa
 from data_refinery_common.models.sample import Sample  # noqa
 from data_refinery_common.models.sample_annotation import SampleAnnotation  # noqa
+from data_refinery_common.models.stats_rollup import StatsRollup  # noqa
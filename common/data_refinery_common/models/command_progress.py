@@ -6,12 +6,15 @@ class SurveyedAccession(models.Model):
 
     accession_code = models.CharField(max_length=64, unique=True)
     created_at = models.DateTimeField(editable=False, default=timezone.now)
+    # Moved up each time the accession is surveyed again.
+    last_surveyed_at = models.DateTimeField(default=timezone.now)
 
     def save(self, *args, **kwargs):
         """ On save, update timestamps """
         current_time = timezone.now()
         if not self.id:
             self.created_at = current_time
+            self.last_surveyed_at = current_time
         else:
             raise AssertionError("This accession has already been surveyed!")
         return super(SurveyedAccession, self).save(*args, **kwargs)
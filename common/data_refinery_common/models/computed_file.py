@@ -8,6 +8,7 @@ from django.utils import timezone
 import boto3
 from botocore.client import Config
 
+from data_refinery_common.file_digest import HashingWriter
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models.managers import PublicObjectsManager
 from data_refinery_common.utils import calculate_file_size, calculate_sha1
@@ -150,12 +151,13 @@ class ComputedFile(models.Model):
             raise ValueError("Tried to download a computed file with no s3_bucket or s3_key")
 
         try:
-            S3.download_file(self.s3_bucket, self.s3_key, path)
+            # Hash it on the way down instead of reading it back.
+            with HashingWriter(path) as synced_file:
+                S3.download_fileobj(self.s3_bucket, self.s3_key, synced_file)
+            synced_file.digest.verify(path)
 
             # Veryify sync integrity
-            synced_sha1 = calculate_sha1(path)
-
-            if self.sha1 != synced_sha1:
+            if self.sha1 != synced_file.digest.sha1:
                 raise AssertionError("SHA1 of downloaded ComputedFile doesn't match database SHA1!")
 
             return path
@@ -1,13 +1,19 @@
+import copy
 import uuid
+from datetime import timedelta
 
 from django.conf import settings
 from django.db import models
 from django.db.models.expressions import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 import boto3
 from botocore.client import Config
 
+from data_refinery_common.models.associations.experiment_sample_association import (
+    ExperimentSampleAssociation,
+)
 from data_refinery_common.models.experiment import Experiment
 from data_refinery_common.models.sample import Sample
 
@@ -31,6 +37,10 @@ EMAIL_USERNAME_BLACKLIST = [
 
 EMAIL_DOMAIN_BLACKLIST = ["@alexslemonade.org", "@ccdatalab.org", "@example.com"]
 
+# The details include things about the experiments which can change
+# without the dataset changing, so don't keep them forever.
+DETAILS_MAX_AGE = timedelta(days=1)
+
 
 class ProcessedFilteredDatasets(models.Manager):
     """Returns only Dataset downloads that are processed and not
@@ -133,6 +143,8 @@ class Dataset(models.Model):
     # State properties
     is_processing = models.BooleanField(default=False)  # Data is still editable when False
     is_processed = models.BooleanField(default=False)  # Result has been made
+    # When the result was first made, which stats go by.
+    processed_at = models.DateTimeField(null=True, blank=True)
     is_available = models.BooleanField(default=False)  # Result is ready for delivery
 
     processor_jobs = models.ManyToManyField(
@@ -161,17 +173,42 @@ class Dataset(models.Model):
     )
     sha1 = models.CharField(max_length=64, null=True, default="")
 
+    # What the downloads page needs to know about the experiments and
+    # samples in `data`, built by get_details(). Cleared whenever `data`
+    # changes.
+    details = models.JSONField(null=True, blank=True, default=None)
+
     # Common Properties
     created_at = models.DateTimeField(editable=False, default=timezone.now)
     last_modified = models.DateTimeField(default=timezone.now)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so save() can tell if `data` changed,
+        # even if it was changed in place.
+        if "data" in field_names:
+            instance._loaded_data = copy.deepcopy(instance.data)
+        return instance
+
     def save(self, *args, **kwargs):
-        """On save, update timestamps"""
+        """On save, update timestamps and drop the details if the data changed"""
         current_time = timezone.now()
         if not self.id:
             self.created_at = current_time
         self.last_modified = current_time
-        return super(Dataset, self).save(*args, **kwargs)
+        if self.is_processed and not self.processed_at:
+            self.processed_at = current_time
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "data" in update_fields:
+            if self.data != getattr(self, "_loaded_data", None):
+                self.details = None
+                if update_fields is not None:
+                    kwargs["update_fields"] = {*update_fields, "details"}
+
+        super(Dataset, self).save(*args, **kwargs)
+        self._loaded_data = copy.deepcopy(self.data)
 
     def get_samples(self):
         """Retuns all of the Sample objects in this Dataset"""
@@ -200,6 +237,73 @@ class Dataset(models.Model):
         all_experiments = self.data.keys()
         return Experiment.objects.filter(accession_code__in=all_experiments)
 
+    def compute_details(self):
+        """Builds the experiment and sample information shown on the downloads page.
+
+        This takes the same few queries no matter how many experiments
+        there are.
+        """
+        organism_samples = {}
+        samples = (
+            self.get_samples()
+            .values_list("organism__name", "accession_code")
+            .order_by("organism__name", "accession_code")
+        )
+        for organism_name, accession_code in samples:
+            organism_samples.setdefault(organism_name, []).append(accession_code)
+
+        # Only organisms with at least one downloadable sample count.
+        experiment_organisms = {}
+        associations = (
+            ExperimentSampleAssociation.objects.filter(
+                experiment__accession_code__in=self.data.keys(),
+                sample__is_processed=True,
+                sample__organism__qn_target__isnull=False,
+            )
+            .values_list("experiment__accession_code", "sample__organism__name")
+            .distinct()
+        )
+        for accession_code, organism_name in associations:
+            experiment_organisms.setdefault(accession_code, []).append(organism_name)
+
+        experiments = [
+            {
+                "title": title,
+                "accession_code": accession_code,
+                "organism_names": experiment_organisms.get(accession_code, []),
+                "sample_metadata": sample_metadata_fields,
+                "technology": technology,
+            }
+            for title, accession_code, sample_metadata_fields, technology in (
+                self.get_experiments().values_list(
+                    "title", "accession_code", "sample_metadata_fields", "technology"
+                )
+            )
+        ]
+
+        return {
+            "computed_at": timezone.now().isoformat(),
+            "experiments": experiments,
+            "organism_samples": organism_samples,
+        }
+
+    def get_details(self):
+        """Returns the stored details, building and storing them first if they're missing or old."""
+        if self.details:
+            computed_at = parse_datetime(self.details["computed_at"])
+            if computed_at and timezone.now() - computed_at < DETAILS_MAX_AGE:
+                return self.details
+
+        details = self.compute_details()
+
+        # Don't go through save(), which would bump last_modified, and
+        # don't store anything if the dataset changed while we were
+        # working on it.
+        Dataset.objects.filter(pk=self.pk, last_modified=self.last_modified).update(details=details)
+        self.details = details
+
+        return details
+
     def get_samples_by_experiment(self):
         """Returns a dict of sample QuerySets, for samples grouped by experiment."""
         all_samples = {}
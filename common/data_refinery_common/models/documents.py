@@ -95,3 +95,19 @@ class ExperimentDocument(Document):
     def get_queryset(self):
         """ Override default queryset """
         return super(ExperimentDocument, self).get_queryset().order_by("id")
+
+    def prepare_organism_names(self, instance):
+        """ Uses the samples the bulk indexer prefetched if it did, to save a query """
+        if hasattr(instance, "prefetched_downloadable_samples"):
+            return list(
+                {sample.organism.name: None for sample in instance.prefetched_downloadable_samples}
+            )
+
+        return instance.organism_names
+
+    def prepare_downloadable_samples(self, instance):
+        """ Uses the samples the bulk indexer prefetched if it did, to save a query """
+        if hasattr(instance, "prefetched_downloadable_samples"):
+            return [sample.accession_code for sample in instance.prefetched_downloadable_samples]
+
+        return instance.downloadable_samples
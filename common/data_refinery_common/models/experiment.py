@@ -1,3 +1,6 @@
+from typing import Dict, Iterable
+
+from django.contrib.postgres.aggregates import ArrayAgg
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.db.models import Count
@@ -6,6 +9,34 @@ from django.utils import timezone
 
 from data_refinery_common.models.managers import ProcessedPublicObjectsManager, PublicObjectsManager
 
+# The sample fields that an experiment's sample_metadata_fields says
+# whether any of its samples have filled in.
+SAMPLE_METADATA_FIELDS = [
+    "sex",
+    "age",
+    "specimen_part",
+    "genotype",
+    "disease",
+    "disease_stage",
+    "cell_line",
+    "treatment",
+    "race",
+    "subject",
+    "compound",
+    "time",
+]
+
+# Fields on Experiment that are computed from its samples.
+CACHED_FIELDS = [
+    "num_total_samples",
+    "num_processed_samples",
+    "num_downloadable_samples",
+    "sample_keywords",
+    "sample_metadata_fields",
+    "platform_names",
+    "platform_accession_codes",
+]
+
 
 class Experiment(models.Model):
     """ An Experiment or Study """
@@ -131,41 +162,18 @@ class Experiment(models.Model):
         """ Get the human-readable name of all of the keywords that are defined
         on at least one sample
         """
-        keywords = set()
-
-        for sample in self.samples.all():
-            keywords |= set(sample.keywords.values_list("name__human_readable_name", flat=True))
-
-        return list(keywords)
+        return get_cached_field_values([self.id])[self.id]["sample_keywords"]
 
     def get_sample_metadata_fields(self):
         """ Get all metadata fields that are non-empty for at least one sample in the experiment.
         See https://github.com/AlexsLemonade/refinebio-frontend/issues/211 for why this is needed.
         """
-        fields = []
-
-        possible_fields = [
-            "sex",
-            "age",
-            "specimen_part",
-            "genotype",
-            "disease",
-            "disease_stage",
-            "cell_line",
-            "treatment",
-            "race",
-            "subject",
-            "compound",
-            "time",
-        ]
-        samples = self.samples.all()
-        for field in possible_fields:
-            for sample in samples:
-                if getattr(sample, field) != None and getattr(sample, field) != "":
-                    fields.append(field)
-                    break
+        return get_cached_field_values([self.id])[self.id]["sample_metadata_fields"]
 
-        return fields
+    def update_cached_fields(self):
+        """ Update all of our cache values at once. Doesn't save. """
+        for field, value in get_cached_field_values([self.id])[self.id].items():
+            setattr(self, field, value)
 
     def update_sample_keywords(self):
         self.sample_keywords = self.get_sample_keywords()
@@ -230,3 +238,96 @@ class Experiment(models.Model):
                 "accession_code", flat=True
             )
         )
+
+
+def _is_filled_in(field_name: str) -> Q:
+    """ Matches experiment-sample associations whose sample has `field_name` filled in. """
+    sample_field = Experiment.samples.field.related_model._meta.get_field(field_name)
+    filled_in = Q(**{"sample__{}__isnull".format(field_name): False})
+    if isinstance(sample_field, (models.CharField, models.TextField)):
+        filled_in &= ~Q(**{"sample__" + field_name: ""})
+
+    return filled_in
+
+
+def get_cached_field_values(experiment_ids: Iterable[int]) -> Dict[int, Dict]:
+    """ Computes the cached fields of a batch of experiments from their samples.
+
+    This is two queries no matter how many experiments or samples there
+    are: one aggregating the samples and one for their keywords.
+    Returns a dict of field values for each experiment id.
+    """
+    experiment_ids = list(experiment_ids)
+    associations = Experiment.samples.through.objects.filter(experiment_id__in=experiment_ids)
+
+    values = {
+        experiment_id: {
+            "num_total_samples": 0,
+            "num_processed_samples": 0,
+            "num_downloadable_samples": 0,
+            "sample_keywords": [],
+            "sample_metadata_fields": [],
+            "platform_names": [],
+            "platform_accession_codes": [],
+        }
+        for experiment_id in experiment_ids
+    }
+
+    aggregates = associations.values("experiment_id").annotate(
+        num_total_samples=Count("sample_id"),
+        num_processed_samples=Count("sample_id", filter=Q(sample__is_processed=True)),
+        num_downloadable_samples=Count(
+            "sample_id",
+            filter=Q(sample__is_processed=True, sample__organism__qn_target__isnull=False),
+        ),
+        platform_names=ArrayAgg("sample__platform_name", distinct=True),
+        platform_accession_codes=ArrayAgg("sample__platform_accession_code", distinct=True),
+        **{
+            "num_with_" + field: Count("sample_id", filter=_is_filled_in(field))
+            for field in SAMPLE_METADATA_FIELDS
+        },
+    )
+    for aggregate in aggregates:
+        experiment_values = values[aggregate["experiment_id"]]
+        for field in CACHED_FIELDS:
+            if field in aggregate:
+                experiment_values[field] = aggregate[field]
+
+        experiment_values["sample_metadata_fields"] = [
+            field for field in SAMPLE_METADATA_FIELDS if aggregate["num_with_" + field] > 0
+        ]
+
+    keywords = (
+        associations.filter(sample__keywords__isnull=False)
+        .values_list("experiment_id", "sample__keywords__name__human_readable_name")
+        .order_by("experiment_id", "sample__keywords__name__human_readable_name")
+        .distinct()
+    )
+    for experiment_id, keyword in keywords:
+        values[experiment_id]["sample_keywords"].append(keyword)
+
+    return values
+
+
+def bulk_update_cached_fields(experiments) -> int:
+    """ Recomputes the cached fields of a batch of experiments and saves the ones that changed.
+
+    Returns how many changed. last_modified is bumped on those so
+    they'll be picked up by the next search index update.
+    """
+    experiments = list(experiments)
+    values = get_cached_field_values(experiment.id for experiment in experiments)
+
+    changed = []
+    current_time = timezone.now()
+    for experiment in experiments:
+        experiment_values = values[experiment.id]
+        if any(getattr(experiment, field) != value for field, value in experiment_values.items()):
+            for field, value in experiment_values.items():
+                setattr(experiment, field, value)
+            experiment.last_modified = current_time
+            changed.append(experiment)
+
+    Experiment.objects.bulk_update(changed, [*CACHED_FIELDS, "last_modified"])
+
+    return len(changed)
@@ -41,6 +41,11 @@ class DownloaderJob(models.Model):
     accession_code = models.CharField(max_length=256, blank=True, null=True)
     no_retry = models.BooleanField(default=False)
 
+    # Set when the job was ended because its node didn't have the disk
+    # space for it. That isn't the job's fault, so the Foreman retries
+    # it without counting it against its retries.
+    deferred = models.BooleanField(default=False)
+
     original_files = models.ManyToManyField(
         "OriginalFile", through="DownloaderJobOriginalFileAssociation"
     )
@@ -92,9 +97,22 @@ class DownloaderJob(models.Model):
     # This helps prevent an infinite loop of DownloaderJob recreation.
     was_recreated = models.BooleanField(default=False)
 
+    # How many bytes the job pulled over the network and how long it
+    # spent doing it, so downloads can be compared across sources.
+    downloaded_bytes = models.BigIntegerField(default=0)
+    download_seconds = models.FloatField(default=0)
+
     created_at = models.DateTimeField(editable=False, default=timezone.now)
     last_modified = models.DateTimeField(default=timezone.now)
 
+    @property
+    def download_throughput(self) -> float:
+        """Bytes per second the job's downloads averaged, or 0 if it hasn't downloaded anything."""
+        if not self.download_seconds:
+            return 0
+
+        return self.downloaded_bytes / self.download_seconds
+
     def get_samples(self) -> Set[Sample]:
         samples = set()
         for original_file in self.original_files.all():
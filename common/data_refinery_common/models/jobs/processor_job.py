@@ -48,6 +48,11 @@ class ProcessorJob(models.Model):
     no_retry = models.BooleanField(default=False)
     abort = models.BooleanField(default=False)
 
+    # Set when the job was ended because its node didn't have the disk
+    # space for it. That isn't the job's fault, so the Foreman retries
+    # it without counting it against its retries.
+    deferred = models.BooleanField(default=False)
+
     # Resources
     ram_amount = models.IntegerField(default=2048)
 
@@ -86,6 +91,10 @@ class ProcessorJob(models.Model):
     # This field allows jobs to specify why they failed.
     failure_reason = models.TextField(null=True)
 
+    # Measurements taken while the job ran, such as how quickly data
+    # was streamed through it, to help track down slow jobs.
+    metrics = models.JSONField(default=dict)
+
     # If the job had data downloaded for it, this is the DownloaderJob that did so.
     downloader_job = models.ForeignKey(
         "data_refinery_common.DownloaderJob", on_delete=models.SET_NULL, null=True,
@@ -55,6 +55,11 @@ class SurveyJob(models.Model):
     # This field allows jobs to specify why they failed.
     failure_reason = models.TextField(null=True)
 
+    # How many of the job's fetches from external sources were served
+    # by the surveyor's cache, and how many had to be downloaded.
+    http_cache_hits = models.IntegerField(default=0)
+    http_cache_misses = models.IntegerField(default=0)
+
     created_at = models.DateTimeField(editable=False, default=timezone.now)
     last_modified = models.DateTimeField(default=timezone.now)
 
@@ -6,6 +6,7 @@ from django.utils import timezone
 
 from data_refinery_common.constants import CURRENT_SALMON_VERSION, SYSTEM_VERSION
 from data_refinery_common.enums import ProcessorPipeline
+from data_refinery_common.file_digest import FileDigest
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models.managers import PublicObjectsManager
 from data_refinery_common.utils import FileUtils, calculate_file_size, calculate_sha1
@@ -74,15 +75,21 @@ class OriginalFile(models.Model):
         self.last_modified = current_time
         return super(OriginalFile, self).save(*args, **kwargs)
 
-    def set_downloaded(self, absolute_file_path, filename=None):
+    def set_downloaded(self, absolute_file_path, filename=None, digest: FileDigest = None):
         """ Marks the file as downloaded, if `filename` is not provided it will
-        be parsed from the `absolute_file_path` """
+        be parsed from the `absolute_file_path`. If the file was hashed while
+        it was written, pass its `digest` to avoid reading it again. """
         self.is_downloaded = True
         self.is_archive = FileUtils.is_archive(absolute_file_path)
         self.absolute_file_path = absolute_file_path
         self.filename = filename if filename else os.path.basename(absolute_file_path)
-        self.calculate_size()
-        self.calculate_sha1()
+        if digest is not None:
+            digest.verify(absolute_file_path)
+            self.size_in_bytes = digest.size
+            self.sha1 = digest.sha1
+        else:
+            self.calculate_size()
+            self.calculate_sha1()
         self.save()
 
     def calculate_sha1(self) -> None:
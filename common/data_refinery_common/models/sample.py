@@ -70,6 +70,8 @@ class Sample(models.Model):
 
     # Crunch Properties
     is_processed = models.BooleanField(default=False)
+    # When the sample was first processed, which stats go by.
+    processed_at = models.DateTimeField(null=True, blank=True)
 
     # Blacklisting
     is_blacklisted = models.BooleanField(default=False)
@@ -85,6 +87,8 @@ class Sample(models.Model):
         if not self.id:
             self.created_at = current_time
         self.last_modified = current_time
+        if self.is_processed and not self.processed_at:
+            self.processed_at = current_time
         return super(Sample, self).save(*args, **kwargs)
 
     def to_metadata_dict(self, computed_file=None):
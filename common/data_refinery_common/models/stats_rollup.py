@@ -0,0 +1,38 @@
+from django.db import models
+from django.utils import timezone
+
+
+class StatsRollup(models.Model):
+    """ Precomputed counts and sizes for one hour of one stat.
+
+    These back the /stats endpoints so they don't have to aggregate
+    entire tables on every request. See data_refinery_common.stats_rollups
+    for how they're kept up to date. """
+
+    class Meta:
+        db_table = "stats_rollups"
+        unique_together = ("metric", "dimension", "bucket")
+
+    # What is being counted, e.g. "processor_jobs" or "processed_samples".
+    metric = models.CharField(max_length=64)
+    # What the counts are broken down by for this row, e.g. a
+    # technology or organism name. Empty for stats that aren't broken down.
+    dimension = models.CharField(max_length=255, default="", blank=True)
+    # The start of the hour this row covers.
+    bucket = models.DateTimeField()
+
+    total = models.BigIntegerField(default=0)
+    successful = models.BigIntegerField(default=0)
+    failed = models.BigIntegerField(default=0)
+    pending = models.BigIntegerField(default=0)
+    open = models.BigIntegerField(default=0)
+    size_in_bytes = models.BigIntegerField(default=0)
+    # The summed run time of the jobs counted by `timed`, so averages
+    # can be computed over any range of buckets.
+    duration = models.FloatField(default=0)
+    timed = models.BigIntegerField(default=0)
+
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return "StatsRollup: {} {} {}".format(self.metric, self.dimension, self.bucket)
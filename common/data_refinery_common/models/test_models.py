@@ -8,6 +8,7 @@ from data_refinery_common.models import (
     Sample,
     SampleKeyword,
 )
+from data_refinery_common.models.experiment import bulk_update_cached_fields
 
 
 class ExperimentModelTestCase(TestCase):
@@ -100,3 +101,35 @@ class ExperimentModelTestCase(TestCase):
         sk.save()
 
         self.assertEqual(set(experiment.get_sample_keywords()), set(["medulloblastoma"]))
+
+    def test_bulk_update_cached_fields(self):
+        """All of the cached fields should be computed together for a batch of experiments."""
+        experiments = []
+        for i in range(3):
+            experiment = Experiment(accession_code="GSE" + str(i))
+            experiment.save()
+            experiments.append(experiment)
+
+            for j in range(2):
+                sample = Sample()
+                sample.accession_code = "GSM{}{}".format(i, j)
+                sample.platform_name = "AFFY"
+                sample.is_processed = j == 0
+                sample.sex = "female" if i == 0 else ""
+                sample.save()
+
+                ExperimentSampleAssociation.objects.create(experiment=experiment, sample=sample)
+
+        with self.assertNumQueries(3):
+            self.assertEqual(bulk_update_cached_fields(experiments), 3)
+
+        experiment = Experiment.objects.get(accession_code="GSE0")
+        self.assertEqual(experiment.num_total_samples, 2)
+        self.assertEqual(experiment.num_processed_samples, 1)
+        self.assertEqual(experiment.num_downloadable_samples, 0)
+        self.assertEqual(experiment.platform_names, ["AFFY"])
+        self.assertEqual(experiment.sample_metadata_fields, ["sex"])
+        self.assertEqual(Experiment.objects.get(accession_code="GSE1").sample_metadata_fields, [])
+
+        # Nothing changed, so nothing should be saved.
+        self.assertEqual(bulk_update_cached_fields(Experiment.objects.all()), 0)
@@ -127,6 +127,10 @@ STATIC_URL = "/static/"
 
 RUNNING_IN_CLOUD = get_env_variable("RUNNING_IN_CLOUD") == "True"
 
+# Files are hashed as they're downloaded rather than read back afterwards.
+# Setting this rereads them anyway and checks the two agree.
+VERIFY_FILE_DIGESTS = get_env_variable_gracefully("VERIFY_FILE_DIGESTS") == "True"
+
 
 # Caching
 # https://docs.djangoproject.com/en/2.2/topics/cache/
@@ -135,7 +139,13 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.db.DatabaseCache",
         "LOCATION": "cache_table",
-    }
+    },
+    # The API's default cache isn't always the database, so anything
+    # shared with it goes through this explicitly.
+    "database": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_table",
+    },
 }
 
 # Setting the RAVEN_CONFIG when RAVEN_DSN isn't set will cause the
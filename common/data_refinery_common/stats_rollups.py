@@ -0,0 +1,447 @@
+"""Hourly rollups of the counts and sizes reported by the /stats endpoints.
+
+Aggregating the jobs, samples and files tables on every request is far
+too slow, so each stat is rolled up into one StatsRollup row per hour,
+and per dimension for stats that are broken down by something like
+technology. The views sum those rows over whatever range they need,
+which also gives them their daily and monthly timelines.
+
+The Foreman calls update_rollups() every few minutes with the time it
+last did so. Only the hours containing rows that changed since then are
+recomputed. Rows with nothing to bucket them by, like jobs that haven't
+started yet, are all rolled up under UNBUCKETED, which is recomputed
+every time.
+
+That only works if a row never moves from one hour to another, because
+there's no way to tell which hour it used to be in, so rows are bucketed
+by fields which are set once, like created_at or processed_at. Rows changed with
+QuerySet.update() don't get a new last_modified, so they still aren't
+noticed. The Foreman runs check_rollups() every day to fix the buckets
+which have drifted, and backfill_rollups() recomputes everything from
+scratch.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Count, DateTimeField, DurationField, F, Max, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.models import (
+    ComputedFile,
+    Dataset,
+    DownloaderJob,
+    Experiment,
+    OriginalFile,
+    ProcessorJob,
+    Sample,
+    StatsRollup,
+    SurveyJob,
+)
+
+logger = get_and_configure_logger(__name__)
+
+# Jobs created before this were never cleaned up properly, so they
+# shouldn't count as pending or open.
+JOB_CREATED_AT_CUTOFF = datetime(2019, 9, 19, tzinfo=timezone.utc)
+
+# The bucket for rows whose bucket field is null.
+UNBUCKETED = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+HOUR = timedelta(hours=1)
+
+COLUMNS = [
+    "total",
+    "successful",
+    "failed",
+    "pending",
+    "open",
+    "size_in_bytes",
+    "duration",
+    "timed",
+]
+
+BATCH_SIZE = 1000
+
+
+class RollupDefinition:
+    """Describes how to compute the rollups for one metric.
+
+    `get_queryset` returns the rows to aggregate, which are bucketed by
+    the hour of `bucket_field` and grouped by `dimension_field` if
+    there is one. `bucket_field` must not change once it's set.
+    `aggregates` maps StatsRollup columns to the aggregates that fill
+    them in. Whenever any of `changed_fields` is more recent than the
+    last update, the row's bucket is recomputed.
+    """
+
+    def __init__(
+        self,
+        metric: str,
+        get_queryset,
+        bucket_field: str,
+        aggregates: Dict,
+        dimension_field: str = None,
+        changed_fields: Tuple[str, ...] = ("last_modified",),
+    ):
+        self.metric = metric
+        self.get_queryset = get_queryset
+        self.bucket_field = bucket_field
+        self.aggregates = aggregates
+        self.dimension_field = dimension_field
+        self.changed_fields = changed_fields
+
+    @property
+    def model(self):
+        return self.get_queryset().model
+
+    @property
+    def has_unbucketed(self) -> bool:
+        return self.model._meta.get_field(self.bucket_field).null
+
+
+def _get_job_aggregates(apply_cutoff: bool) -> Dict:
+    cutoff_filter = Q(created_at__gt=JOB_CREATED_AT_CUTOFF) if apply_cutoff else Q()
+    timed_filter = Q(success=True, start_time__isnull=False, end_time__isnull=False)
+    return {
+        "total": Count("id"),
+        "successful": Count("id", filter=Q(success=True)),
+        "failed": Count("id", filter=Q(success=False)),
+        "pending": Count(
+            "id", filter=Q(start_time__isnull=True, success__isnull=True) & cutoff_filter
+        ),
+        "open": Count(
+            "id", filter=Q(start_time__isnull=False, success__isnull=True) & cutoff_filter
+        ),
+        "duration": Sum(
+            F("end_time") - F("start_time"), filter=timed_filter, output_field=DurationField()
+        ),
+        "timed": Count("id", filter=timed_filter),
+    }
+
+
+def _get_job_definitions(name: str, model) -> List[RollupDefinition]:
+    return [
+        # The totals are filtered by when jobs started. Processor jobs
+        # restarted by Batch start again, but that's rare enough to leave
+        # to the daily check...
+        RollupDefinition(
+            name + "_jobs", model.objects.all, "start_time", _get_job_aggregates(apply_cutoff=True),
+        ),
+        # ...but their timelines go by when they were created, so jobs
+        # which haven't started yet show up in them too.
+        RollupDefinition(
+            name + "_jobs_timeline",
+            model.objects.all,
+            "created_at",
+            _get_job_aggregates(apply_cutoff=False),
+        ),
+    ]
+
+
+ROLLUP_DEFINITIONS = [
+    *_get_job_definitions("survey", SurveyJob),
+    *_get_job_definitions("downloader", DownloaderJob),
+    *_get_job_definitions("processor", ProcessorJob),
+    RollupDefinition("experiments", Experiment.objects.all, "created_at", {"total": Count("id")}),
+    RollupDefinition(
+        "processed_experiments",
+        Experiment.processed_public_objects.all,
+        "created_at",
+        {"total": Count("id")},
+    ),
+    # Samples and datasets go by when they were processed. Unprocessed
+    # samples don't have a time that doesn't change, so the views
+    # count those themselves.
+    RollupDefinition(
+        "processed_samples",
+        Sample.processed_objects.all,
+        "processed_at",
+        {"total": Count("id")},
+        dimension_field="technology",
+    ),
+    RollupDefinition(
+        "processed_samples_by_organism",
+        Sample.processed_objects.all,
+        "processed_at",
+        {"total": Count("id")},
+        dimension_field="organism__name",
+    ),
+    RollupDefinition(
+        "processed_datasets_by_aggregation",
+        Dataset.processed_filtered_objects.all,
+        "processed_at",
+        {"total": Count("id"), "size_in_bytes": Sum("size_in_bytes")},
+        dimension_field="aggregate_by",
+    ),
+    RollupDefinition(
+        "processed_datasets_by_scaling",
+        Dataset.processed_filtered_objects.all,
+        "processed_at",
+        {"total": Count("id")},
+        dimension_field="scale_by",
+    ),
+    # Original files don't change when their samples get processed,
+    # so their samples changing has to count too.
+    RollupDefinition(
+        "input_data_size",
+        lambda: OriginalFile.objects.filter(sample__is_processed=True),
+        "created_at",
+        {"size_in_bytes": Sum("size_in_bytes")},
+        changed_fields=("last_modified", "sample__last_modified"),
+    ),
+    RollupDefinition(
+        "output_data_size",
+        lambda: ComputedFile.public_objects.filter(s3_bucket__isnull=False, s3_key__isnull=True),
+        "created_at",
+        {"size_in_bytes": Sum("size_in_bytes")},
+    ),
+]
+
+
+def _get_definitions(metrics: List[str] = None) -> List[RollupDefinition]:
+    if not metrics:
+        return ROLLUP_DEFINITIONS
+
+    definitions = [definition for definition in ROLLUP_DEFINITIONS if definition.metric in metrics]
+    unknown_metrics = set(metrics) - {definition.metric for definition in definitions}
+    if unknown_metrics:
+        raise ValueError("Unknown stats rollup metrics: " + ", ".join(sorted(unknown_metrics)))
+
+    return definitions
+
+
+def _to_number(value):
+    if value is None:
+        return 0
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return value
+
+
+def _get_buckets_filter(field: str, buckets: Set[datetime]) -> Q:
+    """Builds a filter matching the rows in `buckets`, using ranges so indexes can be used."""
+    ranges = []
+    for bucket in sorted(bucket for bucket in buckets if bucket != UNBUCKETED):
+        if ranges and ranges[-1][1] == bucket:
+            ranges[-1][1] = bucket + HOUR
+        else:
+            ranges.append([bucket, bucket + HOUR])
+
+    buckets_filter = Q(pk__in=[])
+    for start, end in ranges:
+        buckets_filter |= Q(**{field + "__gte": start, field + "__lt": end})
+
+    if UNBUCKETED in buckets:
+        buckets_filter |= Q(**{field + "__isnull": True})
+
+    return buckets_filter
+
+
+def _compute_rollups(
+    definition: RollupDefinition, buckets: Set[datetime] = None
+) -> Dict[Tuple[datetime, str], Dict]:
+    """Aggregates the rollups for `buckets`, or every bucket if it's None.
+
+    Returns a dict of column values keyed by (bucket, dimension).
+    """
+    queryset = definition.get_queryset()
+    if buckets is not None:
+        queryset = queryset.filter(_get_buckets_filter(definition.bucket_field, buckets))
+
+    group_by = ["rollup_bucket"]
+    if definition.dimension_field:
+        group_by.append(definition.dimension_field)
+
+    rows = (
+        queryset.annotate(
+            rollup_bucket=Trunc(definition.bucket_field, "hour", output_field=DateTimeField())
+        )
+        .values(*group_by)
+        .annotate(**definition.aggregates)
+        .order_by()
+    )
+
+    rollups = {}
+    for row in rows:
+        bucket = row["rollup_bucket"] or UNBUCKETED
+        dimension = ""
+        if definition.dimension_field and row[definition.dimension_field]:
+            dimension = str(row[definition.dimension_field])
+
+        # Null and blank dimensions both end up as "", so add them up.
+        counts = rollups.setdefault((bucket, dimension), dict.fromkeys(definition.aggregates, 0))
+        for column in definition.aggregates:
+            counts[column] += _to_number(row[column])
+
+    return rollups
+
+
+def _store_rollups(
+    definition: RollupDefinition, rollups: Dict, buckets: Set[datetime] = None
+) -> None:
+    """Replaces the stored rollups for `buckets`, or every bucket if it's None."""
+    now = timezone.now()
+    new_rollups = [
+        StatsRollup(
+            metric=definition.metric, dimension=dimension, bucket=bucket, updated_at=now, **counts,
+        )
+        for (bucket, dimension), counts in rollups.items()
+    ]
+
+    with transaction.atomic():
+        old_rollups = StatsRollup.objects.filter(metric=definition.metric)
+        if buckets is not None:
+            old_rollups = old_rollups.filter(bucket__in=buckets)
+        old_rollups.delete()
+
+        StatsRollup.objects.bulk_create(new_rollups, batch_size=BATCH_SIZE)
+
+
+def _find_changed_buckets(definition: RollupDefinition, since: datetime) -> Set[datetime]:
+    """Returns the buckets which could have changed since `since`."""
+    changed_filter = Q()
+    for field in definition.changed_fields:
+        changed_filter |= Q(**{field + "__gte": since})
+
+    # Look at all of the model's rows, not just the ones that count, so
+    # rows that stopped counting are caught too.
+    changed_buckets = (
+        definition.model.objects.filter(changed_filter)
+        .annotate(
+            rollup_bucket=Trunc(definition.bucket_field, "hour", output_field=DateTimeField())
+        )
+        .values_list("rollup_bucket", flat=True)
+        .distinct()
+    )
+    buckets = {bucket or UNBUCKETED for bucket in changed_buckets}
+
+    if definition.has_unbucketed:
+        buckets.add(UNBUCKETED)
+
+    return buckets
+
+
+def get_last_update_time() -> datetime:
+    """Returns when the rollups were last written to, or None if they never have been."""
+    return StatsRollup.objects.aggregate(last_update=Max("updated_at"))["last_update"]
+
+
+def update_rollups(since: datetime) -> None:
+    """Recomputes the buckets containing anything that changed since `since`."""
+    for definition in ROLLUP_DEFINITIONS:
+        buckets = _find_changed_buckets(definition, since)
+        if not buckets:
+            continue
+
+        _store_rollups(definition, _compute_rollups(definition, buckets), buckets)
+        logger.debug(
+            "Updated stats rollups.", metric=definition.metric, num_buckets=len(buckets),
+        )
+
+
+def backfill_rollups(metrics: List[str] = None) -> None:
+    """Recomputes every bucket of `metrics`, or of every metric if not specified."""
+    for definition in _get_definitions(metrics):
+        rollups = _compute_rollups(definition)
+        _store_rollups(definition, rollups)
+        logger.info(
+            "Backfilled stats rollups.", metric=definition.metric, num_rollups=len(rollups),
+        )
+
+
+def check_rollups(metrics: List[str] = None, fix: bool = False) -> List[Dict]:
+    """Compares the stored rollups to what they should be.
+
+    Returns a description of every (metric, bucket, dimension) that
+    doesn't match. If `fix` is True the buckets that don't match are
+    recomputed.
+    """
+    mismatches = []
+    for definition in _get_definitions(metrics):
+        expected_rollups = _compute_rollups(definition)
+
+        stored_rollups = {}
+        for rollup in StatsRollup.objects.filter(metric=definition.metric).values():
+            stored_rollups[(rollup["bucket"], rollup["dimension"])] = {
+                column: rollup[column] for column in definition.aggregates
+            }
+
+        empty_counts = dict.fromkeys(definition.aggregates, 0)
+        mismatched_buckets = set()
+        for key in expected_rollups.keys() | stored_rollups.keys():
+            expected = expected_rollups.get(key, empty_counts)
+            stored = stored_rollups.get(key, empty_counts)
+            if any(abs(expected[column] - stored[column]) > 1e-6 for column in expected):
+                bucket, dimension = key
+                mismatched_buckets.add(bucket)
+                mismatches.append(
+                    {
+                        "metric": definition.metric,
+                        "bucket": bucket,
+                        "dimension": dimension,
+                        "stored": stored,
+                        "expected": expected,
+                    }
+                )
+
+        if fix and mismatched_buckets:
+            _store_rollups(
+                definition,
+                {
+                    key: counts
+                    for key, counts in expected_rollups.items()
+                    if key[0] in mismatched_buckets
+                },
+                mismatched_buckets,
+            )
+
+    return mismatches
+
+
+def _sum_columns() -> Dict:
+    return {column: Sum(column) for column in COLUMNS}
+
+
+def get_totals(metric: str, since: datetime = None) -> Dict:
+    """Sums a metric's rollups over every bucket, or just the ones since `since`.
+
+    Rows which aren't bucketed are always included.
+    """
+    rollups = StatsRollup.objects.filter(metric=metric)
+    if since:
+        rollups = rollups.filter(Q(bucket__gte=since) | Q(bucket=UNBUCKETED))
+
+    totals = rollups.aggregate(**_sum_columns())
+    return {column: _to_number(value) for column, value in totals.items()}
+
+
+def get_totals_by_dimension(metric: str) -> Dict[str, Dict]:
+    """Sums a metric's rollups for each of its dimensions."""
+    rows = (
+        StatsRollup.objects.filter(metric=metric)
+        .values("dimension")
+        .annotate(**_sum_columns())
+        .order_by()
+    )
+    return {
+        row["dimension"]: {column: _to_number(row[column]) for column in COLUMNS} for row in rows
+    }
+
+
+def get_timeline(metric: str, interval: str, start: datetime, columns: List[str]) -> List[Dict]:
+    """Sums a metric's rollups into intervals of `interval` starting no earlier than `start`.
+
+    `interval` is anything Trunc accepts that's at least an hour long.
+    """
+    return list(
+        StatsRollup.objects.filter(metric=metric, bucket__gte=start)
+        .annotate(start=Trunc("bucket", interval, output_field=DateTimeField()))
+        .filter(start__gte=start)
+        .values("start")
+        .annotate(**{column: Sum(column) for column in columns})
+        .order_by("start")
+    )
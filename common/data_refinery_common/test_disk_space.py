@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import time
+from collections import namedtuple
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from data_refinery_common import disk_space
+from data_refinery_common.constants import LOCAL_ROOT_DIR
+from data_refinery_common.models import ProcessorJob
+
+DiskUsage = namedtuple("DiskUsage", ["total", "used", "free"])
+GB = 1024 * 1024 * 1024
+
+# Keep a reference to the real thing so it can still be called while it's patched.
+real_rmtree = shutil.rmtree
+
+
+def fake_disk_usage(free_bytes):
+    return DiskUsage(total=100 * GB, used=100 * GB - free_bytes, free=free_bytes)
+
+
+class DiskSpaceTestCase(TestCase):
+    def setUp(self):
+        os.makedirs(LOCAL_ROOT_DIR, exist_ok=True)
+        for ledger_file in [disk_space.RESERVATIONS_FILE, disk_space.LOCK_FILE]:
+            try:
+                os.remove(os.path.join(LOCAL_ROOT_DIR, ledger_file))
+            except OSError:
+                pass
+
+        self.created_directories = []
+
+    def tearDown(self):
+        for directory in self.created_directories:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def make_job_directory(self, name, size_in_bytes, age_in_seconds=0):
+        path = os.path.join(LOCAL_ROOT_DIR, name)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "data"), "wb") as data_file:
+            data_file.write(b"a" * size_in_bytes)
+
+        last_used = time.time() - age_in_seconds
+        os.utime(path, (last_used, last_used))
+        self.created_directories.append(path)
+        return path
+
+    @patch("data_refinery_common.disk_space.DISK_SPACE_HEADROOM", 0)
+    @patch("data_refinery_common.disk_space.shutil.disk_usage")
+    def test_reservations_add_up(self, mock_disk_usage):
+        """Reservations should be counted against each other until they're released."""
+        mock_disk_usage.return_value = fake_disk_usage(10 * GB)
+
+        disk_space.reserve_space("processor_job_1", 6 * GB)
+
+        with self.assertRaises(disk_space.InsufficientDiskSpaceError):
+            disk_space.reserve_space("processor_job_2", 6 * GB)
+
+        disk_space.release_space("processor_job_1")
+        disk_space.reserve_space("processor_job_2", 6 * GB)
+
+        # Reserving more for the same id adds to its reservation.
+        disk_space.reserve_space("processor_job_2", 3 * GB)
+        with self.assertRaises(disk_space.InsufficientDiskSpaceError):
+            disk_space.reserve_space("processor_job_2", 2 * GB)
+
+    @patch("data_refinery_common.disk_space.DISK_SPACE_HEADROOM", 0)
+    @patch("data_refinery_common.disk_space.shutil.disk_usage")
+    def test_evicts_finished_jobs_lru_first(self, mock_disk_usage):
+        """Finished jobs' directories should be evicted oldest first, running ones left alone."""
+        finished_job = ProcessorJob(pipeline_applied="SALMON", end_time=timezone.now())
+        finished_job.save()
+        newer_finished_job = ProcessorJob(pipeline_applied="SALMON", end_time=timezone.now())
+        newer_finished_job.save()
+        running_job = ProcessorJob(pipeline_applied="SALMON")
+        running_job.save()
+
+        day = 60 * 60 * 24
+        old_path = self.make_job_directory("processor_job_" + str(finished_job.id), 10, 10 * day)
+        new_path = self.make_job_directory(
+            "processor_job_" + str(newer_finished_job.id), 10, 5 * day
+        )
+        running_path = self.make_job_directory("processor_job_" + str(running_job.id), 10, 20 * day)
+        index_path = self.make_job_directory("processor_job_999999_index", 10, 60)
+
+        # Pretend each eviction frees up a GB, so only one should be needed.
+        free_bytes = [1 * GB]
+
+        def rmtree(path, ignore_errors=False):
+            real_rmtree(path, ignore_errors=ignore_errors)
+            free_bytes[0] += GB
+
+        mock_disk_usage.side_effect = lambda path: fake_disk_usage(free_bytes[0])
+
+        with patch("data_refinery_common.disk_space.shutil.rmtree", rmtree):
+            disk_space.reserve_space("processor_job_1000000", 2 * GB)
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(new_path))
+        self.assertTrue(os.path.exists(running_path))
+        # The index was used recently so it isn't eligible.
+        self.assertTrue(os.path.exists(index_path))
+
+    @patch("data_refinery_common.disk_space.DISK_SPACE_HEADROOM", 0)
+    @patch("data_refinery_common.disk_space.shutil.disk_usage")
+    def test_stale_reservations_expire(self, mock_disk_usage):
+        """Reservations left behind by jobs that died shouldn't hold space forever."""
+        mock_disk_usage.return_value = fake_disk_usage(10 * GB)
+
+        disk_space.reserve_space("processor_job_1", 8 * GB)
+
+        much_later = time.time() + disk_space.RESERVATION_TIMEOUT + 1
+        with patch("data_refinery_common.disk_space.time.time") as mock_time:
+            mock_time.return_value = much_later
+            # Would raise InsufficientDiskSpaceError if the first
+            # reservation still counted.
+            disk_space.reserve_space("processor_job_2", 8 * GB)
+
+        with open(os.path.join(LOCAL_ROOT_DIR, disk_space.RESERVATIONS_FILE)) as ledger:
+            reservations = json.load(ledger)
+        self.assertEqual(list(reservations.keys()), ["processor_job_2"])
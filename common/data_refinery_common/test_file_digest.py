@@ -0,0 +1,65 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from data_refinery_common.file_digest import FileDigest, FileDigestMismatchError, HashingWriter
+
+CONTENT = b"ACGT" * 100000
+
+
+class FileDigestTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "SRR123.fastq")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hashing_writer(self):
+        with HashingWriter(self.path) as target_file:
+            shutil.copyfileobj(io.BytesIO(CONTENT), target_file, 1000)
+
+        self.assertEqual(target_file.digest.sha1, hashlib.sha1(CONTENT).hexdigest())
+        self.assertEqual(target_file.digest.size, len(CONTENT))
+
+        from_file = FileDigest()
+        from_file.update_from_file(self.path)
+        self.assertEqual(from_file.sha1, target_file.digest.sha1)
+        self.assertEqual(from_file.size, target_file.digest.size)
+
+    @override_settings(VERIFY_FILE_DIGESTS=True)
+    def test_verify(self):
+        with HashingWriter(self.path) as target_file:
+            target_file.write(CONTENT)
+        target_file.digest.verify(self.path)
+
+        with open(self.path, "ab") as changed_file:
+            changed_file.write(b"N")
+
+        with self.assertRaises(FileDigestMismatchError):
+            target_file.digest.verify(self.path)
+
+    @override_settings(VERIFY_FILE_DIGESTS=False)
+    def test_dont_verify(self):
+        digest = FileDigest()
+        digest.update(b"not what's on disk")
+        with open(self.path, "wb") as target_file:
+            target_file.write(CONTENT)
+
+        digest.verify(self.path)
+
+    def test_verify_without_setting(self):
+        """The API and Foreman settings don't define VERIFY_FILE_DIGESTS."""
+        digest = FileDigest()
+        digest.update(b"not what's on disk")
+        with open(self.path, "wb") as target_file:
+            target_file.write(CONTENT)
+
+        with self.settings():
+            del settings.VERIFY_FILE_DIGESTS
+            digest.verify(self.path)
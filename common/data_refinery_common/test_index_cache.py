@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import tarfile
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from data_refinery_common import index_cache
+from data_refinery_common.constants import LOCAL_ROOT_DIR
+from data_refinery_common.models import ComputationalResult, ComputedFile, Organism, OrganismIndex
+from data_refinery_common.utils import calculate_sha1
+
+TEST_DIR = os.path.join(LOCAL_ROOT_DIR, "index_cache_tests")
+
+
+def prepare_organism_index(sha1=None):
+    """Creates an OrganismIndex whose computed file is a tiny index tarball."""
+    os.makedirs(TEST_DIR, exist_ok=True)
+    version_info_path = os.path.join(TEST_DIR, "versionInfo.json")
+    with open(version_info_path, "w") as version_info_file:
+        json.dump({"indexVersion": 2}, version_info_file)
+
+    tarball_path = os.path.join(TEST_DIR, "index.tar.gz")
+    with tarfile.open(tarball_path, "w:gz") as tarball:
+        tarball.add(version_info_path, arcname="versionInfo.json")
+
+    organism = Organism.get_object_for_name("HOMO_SAPIENS", taxonomy_id=9606)
+    result = ComputationalResult()
+    result.save()
+
+    computed_file = ComputedFile()
+    computed_file.filename = "index.tar.gz"
+    computed_file.absolute_file_path = tarball_path
+    computed_file.sha1 = sha1 if sha1 else calculate_sha1(tarball_path)
+    computed_file.size_in_bytes = os.path.getsize(tarball_path)
+    computed_file.result = result
+    computed_file.save()
+
+    organism_index = OrganismIndex()
+    organism_index.organism = organism
+    organism_index.index_type = "TRANSCRIPTOME_SHORT"
+    organism_index.result = result
+    organism_index.save()
+
+    # Ids can be reused between test runs, so don't trust anything
+    # that's already in the cache for this one.
+    index_directory = index_cache.get_index_directory(organism_index.id)
+    for suffix in ["", ".refs", ".download"]:
+        shutil.rmtree(index_directory + suffix, ignore_errors=True)
+
+    return organism_index
+
+
+class IndexCacheTestCase(TestCase):
+    def tearDown(self):
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    def test_index_extracted_once(self):
+        """Every job after the first should use the already extracted index."""
+        organism_index = prepare_organism_index()
+
+        with patch(
+            "data_refinery_common.index_cache.tarfile.open", wraps=tarfile.open
+        ) as mock_open:
+            index_directory, was_cached = index_cache.acquire_index(organism_index, "job_1")
+            self.assertFalse(was_cached)
+            self.assertTrue(index_cache.is_index_installed(index_directory))
+
+            second_directory, was_cached = index_cache.acquire_index(organism_index, "job_2")
+            self.assertTrue(was_cached)
+            self.assertEqual(index_directory, second_directory)
+
+        self.assertEqual(mock_open.call_count, 1)
+
+    def test_checksum_mismatch(self):
+        """A tarball that doesn't match its checksum should never be extracted."""
+        organism_index = prepare_organism_index(sha1="ABC")
+
+        with self.assertRaises(index_cache.IndexCacheError):
+            index_cache.acquire_index(organism_index, "job_1")
+
+        index_directory = index_cache.get_index_directory(organism_index.id)
+        self.assertFalse(os.path.exists(index_directory))
+
+    def test_referenced_indexes_not_evicted(self):
+        """Only indexes nobody holds a reference to can be evicted."""
+        organism_index = prepare_organism_index()
+        index_directory, _ = index_cache.acquire_index(organism_index, "job_1")
+        index_cache.acquire_index(organism_index, "job_2")
+
+        index_cache.release_index(organism_index.id, "job_1")
+        self.assertNotIn(index_directory, [path for _, path in index_cache.find_cold_indexes()])
+        self.assertFalse(index_cache.evict_index(index_directory))
+        self.assertTrue(index_cache.is_index_installed(index_directory))
+
+        index_cache.release_index(organism_index.id, "job_2")
+        self.assertIn(index_directory, [path for _, path in index_cache.find_cold_indexes()])
+        self.assertTrue(index_cache.evict_index(index_directory))
+        self.assertFalse(os.path.exists(index_directory))
+
+    def test_prewarm_index(self):
+        """Prewarming should install the index without holding a reference to it."""
+        organism_index = prepare_organism_index()
+
+        self.assertTrue(index_cache.prewarm_index(organism_index))
+        self.assertFalse(index_cache.prewarm_index(organism_index))
+
+        index_directory = index_cache.get_index_directory(organism_index.id)
+        self.assertIn(index_directory, [path for _, path in index_cache.find_cold_indexes()])
@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from data_refinery_common import stats_rollups
+from data_refinery_common.models import Organism, ProcessorJob, Sample, StatsRollup
+
+
+def make_sample(accession_code, technology, organism, is_processed=True):
+    sample = Sample()
+    sample.accession_code = accession_code
+    sample.technology = technology
+    sample.organism = organism
+    sample.is_processed = is_processed
+    sample.save()
+    return sample
+
+
+def make_job(success=None, started_ago=None, duration=None):
+    job = ProcessorJob(pipeline_applied="SALMON", success=success)
+    if started_ago is not None:
+        job.start_time = timezone.now() - started_ago
+        if duration is not None:
+            job.end_time = job.start_time + duration
+    job.save()
+    return job
+
+
+class StatsRollupsTestCase(TestCase):
+    def test_backfill(self):
+        """The rollups should add up to the same thing as aggregating the tables."""
+        human = Organism.get_object_for_name("HOMO_SAPIENS", taxonomy_id=9606)
+        make_sample("SRR1", "RNA-SEQ", human)
+        make_sample("SRR2", "RNA-SEQ", human)
+        make_sample("GSM1", "MICROARRAY", human)
+        make_sample("GSM2", "MICROARRAY", human, is_processed=False)
+
+        make_job(success=True, started_ago=timedelta(hours=3), duration=timedelta(minutes=10))
+        make_job(success=True, started_ago=timedelta(days=3), duration=timedelta(minutes=20))
+        make_job(success=False, started_ago=timedelta(hours=2))
+        make_job()
+
+        stats_rollups.backfill_rollups()
+
+        by_technology = stats_rollups.get_totals_by_dimension("processed_samples")
+        self.assertEqual(by_technology["RNA-SEQ"]["total"], 2)
+        self.assertEqual(by_technology["MICROARRAY"]["total"], 1)
+
+        by_organism = stats_rollups.get_totals_by_dimension("processed_samples_by_organism")
+        self.assertEqual(by_organism["HOMO_SAPIENS"]["total"], 3)
+
+        totals = stats_rollups.get_totals("processor_jobs")
+        self.assertEqual(totals["total"], 4)
+        self.assertEqual(totals["successful"], 2)
+        self.assertEqual(totals["failed"], 1)
+        self.assertEqual(totals["pending"], 1)
+        self.assertEqual(totals["duration"] / totals["timed"], 15 * 60)
+
+        # Unstarted jobs are counted no matter the range.
+        recent_totals = stats_rollups.get_totals(
+            "processor_jobs", since=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(recent_totals["total"], 3)
+        self.assertEqual(recent_totals["duration"], 10 * 60)
+
+        self.assertEqual(stats_rollups.check_rollups(), [])
+
+    def test_update_changed_buckets(self):
+        """Updating should pick up jobs that changed and leave everything else alone."""
+        job = make_job()
+        stats_rollups.backfill_rollups()
+        last_update_time = stats_rollups.get_last_update_time()
+
+        job.start_time = timezone.now() - timedelta(days=2)
+        job.end_time = timezone.now()
+        job.success = True
+        job.save()
+
+        stats_rollups.update_rollups(last_update_time)
+
+        totals = stats_rollups.get_totals("processor_jobs")
+        self.assertEqual(totals["total"], 1)
+        self.assertEqual(totals["successful"], 1)
+        self.assertEqual(totals["pending"], 0)
+
+        # The job's old bucket shouldn't be left around.
+        self.assertFalse(
+            StatsRollup.objects.filter(
+                metric="processor_jobs", bucket=stats_rollups.UNBUCKETED, total__gt=0
+            ).exists()
+        )
+        self.assertEqual(stats_rollups.check_rollups(["processor_jobs"]), [])
+
+    def test_update_modified_samples(self):
+        """Samples should count from when they were processed, and only once."""
+        human = Organism.get_object_for_name("HOMO_SAPIENS", taxonomy_id=9606)
+        sample = make_sample("GSM1", "MICROARRAY", human, is_processed=False)
+        Sample.objects.filter(id=sample.id).update(created_at=timezone.now() - timedelta(days=2))
+        make_sample("GSM2", "MICROARRAY", human)
+        stats_rollups.backfill_rollups()
+        last_update_time = stats_rollups.get_last_update_time()
+
+        sample.refresh_from_db()
+        sample.is_processed = True
+        sample.save()
+        stats_rollups.update_rollups(last_update_time)
+
+        self.assertEqual(stats_rollups.get_totals("processed_samples")["total"], 2)
+        since = timezone.now() - timedelta(hours=1)
+        self.assertEqual(stats_rollups.get_totals("processed_samples", since=since)["total"], 2)
+
+        last_update_time = stats_rollups.get_last_update_time()
+        processed_at = sample.processed_at
+        sample.title = "Renamed"
+        sample.save()
+        self.assertEqual(sample.processed_at, processed_at)
+        stats_rollups.update_rollups(last_update_time)
+
+        self.assertEqual(stats_rollups.get_totals("processed_samples")["total"], 2)
+        self.assertEqual(stats_rollups.check_rollups(), [])
+
+    def test_check_finds_drift(self):
+        """Rows changed without updating last_modified should be caught and fixable."""
+        make_job(success=True, started_ago=timedelta(hours=1), duration=timedelta(minutes=1))
+        stats_rollups.backfill_rollups(["processor_jobs"])
+
+        ProcessorJob.objects.update(success=False)
+
+        mismatches = stats_rollups.check_rollups(["processor_jobs"], fix=True)
+        self.assertEqual(len(mismatches), 1)
+        self.assertEqual(mismatches[0]["stored"]["successful"], 1)
+        self.assertEqual(mismatches[0]["expected"]["failed"], 1)
+
+        self.assertEqual(stats_rollups.get_totals("processor_jobs")["failed"], 1)
+        self.assertEqual(stats_rollups.check_rollups(["processor_jobs"]), [])
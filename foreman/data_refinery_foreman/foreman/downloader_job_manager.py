@@ -1,15 +1,33 @@
-from typing import List
+from collections import defaultdict
+from typing import List, Tuple
+from urllib.parse import urlparse
 
 import data_refinery_foreman.foreman.utils as utils
 from data_refinery_common.enums import Downloaders
 from data_refinery_common.logging import get_and_configure_logger
-from data_refinery_common.message_queue import get_capacity_for_downloader_jobs, send_job
+from data_refinery_common.message_queue import (
+    get_capacity_for_downloader_jobs,
+    send_downloader_jobs,
+    send_job,
+)
 from data_refinery_common.models import DownloaderJob
 from data_refinery_common.performant_pagination.pagination import PerformantPaginator as Paginator
 from data_refinery_foreman.foreman.job_requeuing import requeue_downloader_job
 
 logger = get_and_configure_logger(__name__)
 
+# GEO jobs for files smaller than this are run several to a Batch job,
+# since starting a container for each of them takes longer than
+# downloading them does. ArrayExpress jobs all download a zip of a
+# whole experiment, and we can't tell how big it is beforehand.
+BATCHABLE_DOWNLOADER_TASKS = {Downloaders.GEO.value}
+SMALL_FILE_SIZE = 64 * 1024 * 1024
+DOWNLOADER_JOB_BATCH_SIZE = 25
+
+# Until they've been downloaded we don't know how big files are, but
+# these are whole experiments so they're usually big.
+EXPERIMENT_ARCHIVE_EXTENSIONS = (".tar", ".tgz", ".tar.gz", ".zip")
+
 
 def handle_downloader_jobs(jobs: List[DownloaderJob]) -> None:
     """For each job in jobs, either retry it or log it.
@@ -155,11 +173,63 @@ def retry_lost_downloader_jobs() -> None:
             break
 
 
+def is_batchable(job: DownloaderJob) -> bool:
+    """Returns True if `job` only downloads small files from GEO."""
+    if job.downloader_task not in BATCHABLE_DOWNLOADER_TASKS:
+        return False
+
+    original_files = job.original_files.all()
+    if not original_files:
+        return False
+
+    for original_file in original_files:
+        if original_file.size_in_bytes:
+            if original_file.size_in_bytes > SMALL_FILE_SIZE:
+                return False
+        elif original_file.source_url.lower().endswith(EXPERIMENT_ARCHIVE_EXTENSIONS):
+            return False
+
+    return True
+
+
+def group_downloader_jobs(
+    jobs: List[DownloaderJob],
+) -> Tuple[List[DownloaderJob], List[List[DownloaderJob]]]:
+    """Splits jobs into the ones to dispatch alone and batches to dispatch together.
+
+    Jobs in a batch all have the same downloader task and RAM amount
+    so that they can share a job definition, and download from the
+    same host so a batch's concurrency also limits how hard we hit it.
+    """
+    single_jobs = []
+    groups = defaultdict(list)
+    for job in jobs:
+        if not is_batchable(job):
+            single_jobs.append(job)
+            continue
+
+        host = urlparse(job.original_files.all()[0].source_url).netloc
+        groups[(job.downloader_task, job.ram_amount, host)].append(job)
+
+    batches = []
+    for group in groups.values():
+        for start in range(0, len(group), DOWNLOADER_JOB_BATCH_SIZE):
+            batch = group[start : start + DOWNLOADER_JOB_BATCH_SIZE]
+            if len(batch) == 1:
+                single_jobs.extend(batch)
+            else:
+                batches.append(batch)
+
+    return single_jobs, batches
+
+
 def retry_unqueued_downloader_jobs() -> None:
     """Requeue downloader jobs that never made it into the Batch job queue."""
-    potentially_lost_jobs = DownloaderJob.unqueued_objects.filter(
-        created_at__gt=utils.JOB_CREATED_AT_CUTOFF
-    ).order_by("created_at")
+    potentially_lost_jobs = (
+        DownloaderJob.unqueued_objects.filter(created_at__gt=utils.JOB_CREATED_AT_CUTOFF)
+        .order_by("created_at")
+        .prefetch_related("original_files")
+    )
     paginator = Paginator(potentially_lost_jobs, utils.PAGE_SIZE, "created_at")
     database_page = paginator.page()
     database_page_count = 0
@@ -176,7 +246,13 @@ def retry_unqueued_downloader_jobs() -> None:
         )
 
     while queue_capacity > 0:
-        for downloader_job in database_page.object_list:
+        single_jobs, batches = group_downloader_jobs(database_page.object_list)
+
+        for batch in batches:
+            if send_downloader_jobs(Downloaders[batch[0].downloader_task], batch):
+                queue_capacity -= 1
+
+        for downloader_job in single_jobs:
             if send_job(
                 Downloaders[downloader_job.downloader_task], job=downloader_job, is_dispatch=True
             ):
@@ -4,6 +4,7 @@ import time
 from django.conf import settings
 from django.utils import timezone
 
+from data_refinery_common import batch_jobs_breakdown, stats_rollups
 from data_refinery_common.enums import ProcessorPipeline
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.message_queue import send_job
@@ -41,6 +42,20 @@ JANITOR_DISPATCH_TIME = datetime.timedelta(minutes=30)
 # How frequently we clean up the database.
 DBCLEAN_TIME = datetime.timedelta(hours=6)
 
+# How frequently we snapshot the Batch queues for the stats dashboard.
+BATCH_JOBS_BREAKDOWN_TIME = datetime.timedelta(minutes=1)
+
+# How frequently we update the rollups the stats endpoints read from.
+STATS_ROLLUP_TIME = datetime.timedelta(minutes=10)
+
+# Rows modified just before the last update could have been committed
+# after it ran, so look back a little further than that.
+STATS_ROLLUP_OVERLAP = datetime.timedelta(minutes=5)
+
+# How frequently we fix the stats rollups that updating can't keep
+# right, like ones for rows changed with QuerySet.update().
+STATS_ROLLUP_REPAIR_TIME = datetime.timedelta(days=1)
+
 
 def send_janitor_jobs():
     """Dispatch a Janitor job for each job queue.
@@ -75,12 +90,46 @@ def clean_database():
     logger.info("Cleaned files!")
 
 
+def update_stats_rollups(last_update_time):
+    """Updates the stats rollups with everything that changed since `last_update_time`.
+
+    Returns the time to pass in next time. If the rollups have never
+    been backfilled there's nothing to update, so this returns None.
+    """
+    if not last_update_time:
+        last_update_time = stats_rollups.get_last_update_time()
+        if not last_update_time:
+            return None
+
+    update_time = timezone.now()
+    stats_rollups.update_rollups(last_update_time - STATS_ROLLUP_OVERLAP)
+    logger.info("Updated stats rollups.", duration=str(timezone.now() - update_time))
+
+    return update_time
+
+
+def repair_stats_rollups():
+    """Recomputes the stats rollups which don't match the tables anymore."""
+    if not stats_rollups.get_last_update_time():
+        # There's nothing to repair until they're backfilled.
+        return
+
+    repair_time = timezone.now()
+    mismatches = stats_rollups.check_rollups(fix=True)
+    logger.info(
+        "Repaired stats rollups.",
+        num_mismatches=len(mismatches),
+        duration=str(timezone.now() - repair_time),
+    )
+
+
 def monitor_jobs():
     """Main Foreman thread that helps manage the Batch job queue.
 
     Will find jobs that failed, hung, or got lost and requeue them.
 
-    Also will queue up Janitor jobs regularly to free up disk space.
+    Also will queue up Janitor jobs regularly to free up disk space and
+    keep the stats rollups up to date.
 
 
     It does so on a loop forever that won't spin faster than
@@ -88,6 +137,10 @@ def monitor_jobs():
     """
     # last_janitorial_time = timezone.now()
     last_dbclean_time = timezone.now()
+    last_batch_jobs_breakdown_time = None
+    last_stats_rollup_time = None
+    last_stats_rollup_attempt = None
+    last_stats_rollup_repair_time = timezone.now()
 
     while True:
         # Perform two heartbeats, one for the logs and one for Monit:
@@ -138,6 +191,33 @@ def monitor_jobs():
                 clean_database()
                 last_dbclean_time = timezone.now()
 
+            if (
+                not last_batch_jobs_breakdown_time
+                or timezone.now() - last_batch_jobs_breakdown_time > BATCH_JOBS_BREAKDOWN_TIME
+            ):
+                last_batch_jobs_breakdown_time = timezone.now()
+                try:
+                    batch_jobs_breakdown.collect_snapshot()
+                except Exception:
+                    logger.exception("Caught exception while snapshotting the Batch queues.")
+
+        if (
+            not last_stats_rollup_attempt
+            or timezone.now() - last_stats_rollup_attempt > STATS_ROLLUP_TIME
+        ):
+            last_stats_rollup_attempt = timezone.now()
+            try:
+                last_stats_rollup_time = update_stats_rollups(last_stats_rollup_time)
+            except Exception:
+                logger.exception("Caught exception while updating stats rollups.")
+
+        if timezone.now() - last_stats_rollup_repair_time > STATS_ROLLUP_REPAIR_TIME:
+            last_stats_rollup_repair_time = timezone.now()
+            try:
+                repair_stats_rollups()
+            except Exception:
+                logger.exception("Caught exception while repairing stats rollups.")
+
         loop_time = timezone.now() - start_time
         if loop_time < MIN_LOOP_TIME:
             remaining_time = MIN_LOOP_TIME - loop_time
@@ -18,12 +18,12 @@ def requeue_downloader_job(last_job: DownloaderJob) -> (bool, str):
     """Queues a new downloader job.
 
     The new downloader job will have num_retries one greater than
-    last_job.num_retries.
+    last_job.num_retries, unless last_job was deferred.
 
     Returns True and the volume index of the downloader job upon successful dispatching,
     False and an empty string otherwise.
     """
-    num_retries = last_job.num_retries + 1
+    num_retries = last_job.num_retries if last_job.deferred else last_job.num_retries + 1
 
     ram_amount = last_job.ram_amount
     # If there's no start time then it's likely that the instance got
@@ -121,9 +121,9 @@ def requeue_processor_job(last_job: ProcessorJob) -> None:
     """Queues a new processor job.
 
     The new processor job will have num_retries one greater than
-    last_job.num_retries.
+    last_job.num_retries, unless last_job was deferred.
     """
-    num_retries = last_job.num_retries + 1
+    num_retries = last_job.num_retries if last_job.deferred else last_job.num_retries + 1
 
     # The Salmon pipeline is quite RAM-sensitive.
     # Try it again with an increased RAM amount, if possible.
@@ -131,8 +131,8 @@ def requeue_processor_job(last_job: ProcessorJob) -> None:
 
     # If there's no start time then it's likely that the instance got
     # cycled which means we didn't get OOM-killed, so we don't need to
-    # increase the RAM amount.
-    if last_job.start_time:
+    # increase the RAM amount. Deferred jobs didn't run out of RAM either.
+    if last_job.start_time and not last_job.deferred:
         # There's only one size of tximport jobs.
         if last_job.pipeline_applied == "TXIMPORT":
             new_ram_amount = 32768
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from data_refinery_common import stats_rollups
+from data_refinery_common.logging import get_and_configure_logger
+
+logger = get_and_configure_logger(__name__)
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--metrics",
+            type=str,
+            help=(
+                "Comma separated names of the metrics to backfill, such as processor_jobs. "
+                "Defaults to all of them."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        """Recomputes the stats rollups from scratch.
+
+        This has to be run once before the Foreman will start keeping
+        the rollups up to date, and can be run again any time
+        check_stats_rollups finds that they've drifted.
+        """
+        metrics = options["metrics"].split(",") if options["metrics"] else None
+        stats_rollups.backfill_rollups(metrics)
+        logger.info("Backfilled stats rollups.")
@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from data_refinery_common import stats_rollups
+from data_refinery_common.logging import get_and_configure_logger
+
+logger = get_and_configure_logger(__name__)
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--metrics",
+            type=str,
+            help=(
+                "Comma separated names of the metrics to check, such as processor_jobs. "
+                "Defaults to all of them."
+            ),
+        )
+        parser.add_argument(
+            "--fix", action="store_true", help="Recompute the buckets that don't match.",
+        )
+
+    def handle(self, *args, **options):
+        """Compares the stats rollups against the tables they summarize.
+
+        Exits with a non-zero status if anything doesn't match, unless
+        --fix was passed, in which case the mismatched buckets are recomputed.
+        """
+        metrics = options["metrics"].split(",") if options["metrics"] else None
+        mismatches = stats_rollups.check_rollups(metrics, fix=options["fix"])
+
+        for mismatch in mismatches:
+            logger.warning(
+                "Stats rollup doesn't match.",
+                metric=mismatch["metric"],
+                bucket=str(mismatch["bucket"]),
+                dimension=mismatch["dimension"],
+                stored=mismatch["stored"],
+                expected=mismatch["expected"],
+            )
+
+        logger.info(
+            "Checked stats rollups.", num_mismatches=len(mismatches), fixed=options["fix"],
+        )
+
+        if mismatches and not options["fix"]:
+            sys.exit(1)
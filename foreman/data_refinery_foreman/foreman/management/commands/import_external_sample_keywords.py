@@ -60,7 +60,7 @@ def import_keywords(keywords: Dict, source: Contribution):
             )
 
     for experiment in dirty_experiments:
-        experiment.update_sample_metadata_fields()
+        experiment.update_cached_fields()
         experiment.save()
 
 
@@ -0,0 +1,63 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.models import Experiment
+from data_refinery_common.models.experiment import bulk_update_cached_fields
+
+logger = get_and_configure_logger(__name__)
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source-database",
+            type=str,
+            help=(
+                "The name of a source database, such as ARRAY_EXPRESS, GEO, or SRA. "
+                "Only experiments from this source database will be updated."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="How many experiments to update at a time.",
+        )
+
+    def handle(self, *args, **options):
+        """Recomputes the sample counts, metadata fields, keywords and platforms cached on
+        experiments, a batch at a time.
+        """
+        possible_source_databases = ["ARRAY_EXPRESS", "GEO", "SRA"]
+
+        if options.get("source_database", None) is None:
+            experiments = Experiment.objects.all()
+        elif options["source_database"] in possible_source_databases:
+            experiments = Experiment.objects.filter(source_database=options["source_database"])
+        else:
+            logger.error(
+                'Invalid source database "{}"'.format(options["source_database"])
+                + "\nPossible source databases: {}".format(", ".join(possible_source_databases))
+            )
+            sys.exit(1)
+
+        experiments = experiments.order_by("id")
+        total = 0
+        changed = 0
+        last_id = 0
+        while True:
+            batch = list(experiments.filter(id__gt=last_id)[: options["batch_size"]])
+            if not batch:
+                break
+
+            changed += bulk_update_cached_fields(batch)
+            total += len(batch)
+            last_id = batch[-1].id
+
+            logger.info("Updated a batch of experiments.", total=total, changed=changed)
+
+        logger.info("Updated the cached fields of experiments.", total=total, changed=changed)
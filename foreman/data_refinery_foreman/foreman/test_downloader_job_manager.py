@@ -5,7 +5,11 @@ from django.conf import settings
 from django.test import TestCase
 from django.utils import timezone
 
-from data_refinery_common.models import DownloaderJob
+from data_refinery_common.models import (
+    DownloaderJob,
+    DownloaderJobOriginalFileAssociation,
+    OriginalFile,
+)
 from data_refinery_foreman.foreman import downloader_job_manager, utils
 from data_refinery_foreman.foreman.test_utils import create_downloader_job
 
@@ -23,6 +27,24 @@ def fake_send_job(job_type, job, is_dispatch=False):
     return True
 
 
+def create_geo_downloader_job(source_url, size_in_bytes=None):
+    job = DownloaderJob(downloader_task="GEO", accession_code="GSE1234")
+    job.save()
+
+    original_file = OriginalFile(
+        source_url=source_url,
+        source_filename=source_url.split("/")[-1],
+        size_in_bytes=size_in_bytes,
+    )
+    original_file.save()
+
+    DownloaderJobOriginalFileAssociation.objects.create(
+        downloader_job=job, original_file=original_file
+    )
+
+    return job
+
+
 class DownloaderJobManagerTestCase(TestCase):
     @patch("data_refinery_foreman.foreman.job_requeuing.send_job")
     @patch("data_refinery_common.message_queue.batch.list_jobs")
@@ -228,3 +250,54 @@ class DownloaderJobManagerTestCase(TestCase):
 
         # Make sure no additional job was created.
         self.assertEqual(jobs.count(), 1)
+
+    def test_group_downloader_jobs(self):
+        sample_url = "ftp://ftp.ncbi.nlm.nih.gov/geo/samples/GSM1nnn/GSM{0}/suppl/GSM{0}.CEL.gz"
+        small_jobs = [create_geo_downloader_job(sample_url.format(i)) for i in range(3)]
+
+        other_host_job = create_geo_downloader_job("ftp://example.com/GSM4.CEL.gz")
+        big_job = create_geo_downloader_job(
+            sample_url.format(5), size_in_bytes=downloader_job_manager.SMALL_FILE_SIZE + 1
+        )
+        archive_job = create_geo_downloader_job(
+            "ftp://ftp.ncbi.nlm.nih.gov/geo/series/GSE1nnn/GSE1234/suppl/GSE1234_RAW.tar"
+        )
+        sra_job = create_downloader_job()
+        array_express_jobs = [create_downloader_job() for _ in range(2)]
+        for job in array_express_jobs:
+            job.downloader_task = "ARRAY_EXPRESS"
+            job.save()
+
+        jobs = DownloaderJob.objects.order_by("id").prefetch_related("original_files")
+        single_jobs, batches = downloader_job_manager.group_downloader_jobs(jobs)
+
+        self.assertEqual(batches, [small_jobs])
+        self.assertEqual(
+            {job.id for job in single_jobs},
+            {other_host_job.id, big_job.id, archive_job.id, sra_job.id}
+            | {job.id for job in array_express_jobs},
+        )
+
+    @patch("data_refinery_foreman.foreman.downloader_job_manager.send_job")
+    @patch("data_refinery_foreman.foreman.downloader_job_manager.send_downloader_jobs")
+    @patch("data_refinery_foreman.foreman.downloader_job_manager.get_capacity_for_downloader_jobs")
+    def test_batching_unqueued_downloader_jobs(
+        self, mock_get_capacity, mock_send_downloader_jobs, mock_send_job
+    ):
+        mock_get_capacity.return_value = 10
+        mock_send_downloader_jobs.return_value = True
+        mock_send_job.return_value = True
+
+        sample_url = "ftp://ftp.ncbi.nlm.nih.gov/geo/samples/GSM1nnn/GSM{0}/suppl/GSM{0}.CEL.gz"
+        small_jobs = [create_geo_downloader_job(sample_url.format(i)) for i in range(2)]
+        sra_job = create_downloader_job()
+        DownloaderJob.objects.update(batch_job_id=None)
+
+        downloader_job_manager.retry_unqueued_downloader_jobs()
+
+        mock_send_downloader_jobs.assert_called_once()
+        batch = mock_send_downloader_jobs.call_args[0][1]
+        self.assertEqual([job.id for job in batch], [job.id for job in small_jobs])
+
+        mock_send_job.assert_called_once()
+        self.assertEqual(mock_send_job.call_args[1]["job"].id, sra_job.id)
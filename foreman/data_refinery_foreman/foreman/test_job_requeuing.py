@@ -132,6 +132,40 @@ class JobRequeuingTestCase(TestCase):
         self.assertEqual(original_job.ram_amount, 16384)
         self.assertEqual(retried_job.ram_amount, 32768)
 
+    @patch("data_refinery_foreman.foreman.job_requeuing.send_job")
+    def test_requeuing_deferred_processor_job(self, mock_send_job):
+        """Jobs deferred for lack of disk space don't use up a retry or get more RAM."""
+        mock_send_job.side_effect = fake_send_job
+
+        job = create_processor_job(pipeline="SALMON", ram_amount=16384, start_time=timezone.now())
+        job.num_retries = 1
+        job.deferred = True
+        job.success = False
+        job.save()
+
+        job_requeuing.requeue_processor_job(job)
+        self.assertEqual(len(mock_send_job.mock_calls), 1)
+
+        retried_job = ProcessorJob.objects.order_by("id")[1]
+        self.assertEqual(retried_job.num_retries, 1)
+        self.assertEqual(retried_job.ram_amount, 16384)
+        self.assertFalse(retried_job.deferred)
+
+    @patch("data_refinery_foreman.foreman.job_requeuing.send_job")
+    def test_requeuing_deferred_downloader_job(self, mock_send_job):
+        mock_send_job.side_effect = fake_send_job
+
+        job = create_downloader_job()
+        job.deferred = True
+        job.success = False
+        job.save()
+
+        job_requeuing.requeue_downloader_job(job)
+        self.assertEqual(len(mock_send_job.mock_calls), 1)
+
+        retried_job = DownloaderJob.objects.order_by("id")[1]
+        self.assertEqual(retried_job.num_retries, 0)
+
     @patch("data_refinery_foreman.foreman.job_requeuing.send_job")
     def test_requeuing_survey_job(self, mock_send_job):
         mock_send_job.side_effect = fake_send_job
@@ -7,13 +7,8 @@ from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import (
     Experiment,
     ExperimentAnnotation,
-    ExperimentOrganismAssociation,
-    ExperimentSampleAssociation,
-    Organism,
     OriginalFile,
-    OriginalFileSampleAssociation,
     Sample,
-    SampleAnnotation,
     SurveyJobKeyValue,
 )
 from data_refinery_common.utils import (
@@ -21,8 +16,9 @@ from data_refinery_common.utils import (
     get_readable_affymetrix_names,
     get_supported_microarray_platforms,
 )
-from data_refinery_foreman.surveyor import harmony, utils
+from data_refinery_foreman.surveyor import harmony, http_cache, utils
 from data_refinery_foreman.surveyor.external_source import ExternalSourceSurveyor
+from data_refinery_foreman.surveyor.persistence import SurveyWriter
 
 logger = get_and_configure_logger(__name__)
 
@@ -82,7 +78,7 @@ class ArrayExpressSurveyor(ExternalSourceSurveyor):
         See an example at: https://www.ebi.ac.uk/arrayexpress/json/v3/experiments/E-MTAB-3050/sample
         """
         request_url = EXPERIMENTS_URL + experiment_accession_code
-        experiment_request = utils.requests_retry_session().get(request_url, timeout=60)
+        experiment_request = http_cache.get(request_url)
 
         try:
             parsed_json = experiment_request.json()["experiments"]["experiment"][0]
@@ -175,7 +171,7 @@ class ArrayExpressSurveyor(ExternalSourceSurveyor):
             # Fetch and parse the IDF/SDRF file for any other fields
             IDF_URL_TEMPLATE = "https://www.ebi.ac.uk/arrayexpress/files/{code}/{code}.idf.txt"
             idf_url = IDF_URL_TEMPLATE.format(code=experiment_accession_code)
-            idf_text = utils.requests_retry_session().get(idf_url, timeout=60).text
+            idf_text = http_cache.get(idf_url).text
 
             lines = idf_text.split("\n")
             idf_dict = {}
@@ -209,7 +205,7 @@ class ArrayExpressSurveyor(ExternalSourceSurveyor):
             # instead of from idf_dict, because the former provides more
             # details.
             protocol_url = request_url + "/protocols"
-            protocol_request = utils.requests_retry_session().get(protocol_url, timeout=60)
+            protocol_request = http_cache.get(protocol_url)
             try:
                 experiment_object.protocol_description = protocol_request.json()["protocols"]
             except KeyError:
@@ -415,20 +411,29 @@ class ArrayExpressSurveyor(ExternalSourceSurveyor):
         """
 
         created_samples = []
+        writer = SurveyWriter()
 
         samples_endpoint = SAMPLES_URL.format(experiment.accession_code)
-        r = utils.requests_retry_session().get(samples_endpoint, timeout=60)
+        r = http_cache.get(samples_endpoint)
         samples = r.json()["experiment"]["sample"]
 
         # The SDRF is the complete metadata record on a sample/property basis.
         # We run this through our harmonizer and then attach the properties
         # to our created samples.
         SDRF_URL_TEMPLATE = "https://www.ebi.ac.uk/arrayexpress/files/{code}/{code}.sdrf.txt"
+        # It's read through twice rather than held in memory, since it
+        # can have tens of thousands of rows.
         sdrf_url = SDRF_URL_TEMPLATE.format(code=experiment.accession_code)
-        sdrf_samples = harmony.parse_sdrf(sdrf_url)
-
-        title_field = harmony.determine_title_field(sdrf_samples, samples)
-        harmonized_samples = harmony.harmonize_all_samples(sdrf_samples, title_field)
+        title_field = harmony.determine_title_field(harmony.iter_sdrf(sdrf_url), samples)
+        harmonized_samples = harmony.harmonize_all_samples(harmony.iter_sdrf(sdrf_url), title_field)
+
+        # Each sample's accession code is made from either its source or
+        # its assay name, so look up which already exist all at once.
+        writer.load_existing_samples(
+            experiment.accession_code + "-" + sample_data.get(field, {}).get("name", "")
+            for sample_data in samples
+            for field in ["source", "assay"]
+        )
 
         # An experiment can have many samples
         for sample_data in samples:
@@ -548,15 +553,15 @@ class ArrayExpressSurveyor(ExternalSourceSurveyor):
                 organism = None
                 continue
             else:
-                organism = Organism.get_object_for_name(organism_name)
+                organism = writer.get_organism(organism_name)
 
             # Create the sample object
-            try:
+            sample_object = writer.get_sample(sample_accession_code)
+            if sample_object:
                 # Associate it with the experiment, but since it
                 # already exists it already has original files
                 # associated with it and it's already been downloaded,
                 # so don't add it to created_samples.
-                sample_object = Sample.objects.get(accession_code=sample_accession_code)
 
                 # If input experiment includes new protocol information,
                 # update sample's protocol_info.
@@ -568,7 +573,7 @@ class ArrayExpressSurveyor(ExternalSourceSurveyor):
                 )
                 if is_updated:
                     sample_object.protocol_info = protocol_info
-                    sample_object.save()
+                    writer.update_sample(sample_object)
 
                 logger.debug(
                     "Sample %s already exists, skipping object creation.",
@@ -576,7 +581,7 @@ class ArrayExpressSurveyor(ExternalSourceSurveyor):
                     experiment_accession_code=experiment.accession_code,
                     survey_job=self.survey_job.id,
                 )
-            except Sample.DoesNotExist:
+            else:
                 sample_object = Sample()
 
                 # The basics
@@ -599,19 +604,13 @@ class ArrayExpressSurveyor(ExternalSourceSurveyor):
                 # save a list so we can append to it later.
                 sample_object.protocol_info = protocol_info
 
-                sample_object.save()
-
                 # Directly assign the harmonized properties
                 harmonized_sample = harmonized_samples[title]
                 ArrayExpressSurveyor._apply_harmonized_metadata_to_sample(
                     sample_object, harmonized_sample
                 )
 
-                sample_annotation = SampleAnnotation()
-                sample_annotation.data = sample_data
-                sample_annotation.sample = sample_object
-                sample_annotation.is_ccdl = False
-                sample_annotation.save()
+                writer.add_sample(sample_object, sample_data)
 
                 original_file = OriginalFile()
                 original_file.filename = filename
@@ -620,12 +619,8 @@ class ArrayExpressSurveyor(ExternalSourceSurveyor):
                 original_file.is_downloaded = False
                 original_file.is_archive = True
                 original_file.has_raw = has_raw
-                original_file.save()
-
-                original_file_sample_association = OriginalFileSampleAssociation()
-                original_file_sample_association.original_file = original_file
-                original_file_sample_association.sample = sample_object
-                original_file_sample_association.save()
+                writer.add_original_file(original_file)
+                writer.add_original_file_sample(original_file, sample_object)
 
                 created_samples.append(sample_object)
 
@@ -633,17 +628,13 @@ class ArrayExpressSurveyor(ExternalSourceSurveyor):
                     "Created " + str(sample_object),
                     experiment_accession_code=experiment.accession_code,
                     survey_job=self.survey_job.id,
-                    sample=sample_object.id,
                 )
 
             # Create associations if they don't already exist
-            ExperimentSampleAssociation.objects.get_or_create(
-                experiment=experiment, sample=sample_object
-            )
+            writer.add_experiment_sample(experiment, sample_object)
+            writer.add_experiment_organism(experiment, organism)
 
-            ExperimentOrganismAssociation.objects.get_or_create(
-                experiment=experiment, organism=organism
-            )
+        writer.flush()
 
         return created_samples
 
@@ -0,0 +1,118 @@
+"""Fetching metadata XML from ENA's browser API.
+
+Surveying an SRA study needs the run, experiment, sample, study and
+submission documents for every one of its runs, but most of those are
+shared between runs. EnaFetcher keeps each document it has fetched, so
+they're only fetched once per survey, and can prefetch a list of
+accessions in batches, since the API accepts several accessions
+separated by commas, with a few batches going at once.
+"""
+
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
+
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_foreman.surveyor import utils
+
+logger = get_and_configure_logger(__name__)
+
+
+ENA_METADATA_URL_TEMPLATE = "https://www.ebi.ac.uk/ena/browser/api/xml/{}"
+
+# How many accessions to ask ENA for in one request.
+DEFAULT_BATCH_SIZE = 50
+
+# How many requests to have going at once.
+DEFAULT_MAX_WORKERS = 4
+
+
+class EnaFetcher:
+    """Fetches and remembers ENA's XML documents by accession.
+
+    Documents are returned as the root element of a response containing
+    just that document, which is what a request for it alone returns.
+    """
+
+    def __init__(
+        self,
+        url_template=ENA_METADATA_URL_TEMPLATE,
+        batch_size=DEFAULT_BATCH_SIZE,
+        max_workers=DEFAULT_MAX_WORKERS,
+    ):
+        self.url_template = url_template
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.session = utils.requests_retry_session(pool_maxsize=max_workers)
+
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def get_response(self, accession: str):
+        return self.session.get(self.url_template.format(accession), timeout=60)
+
+    def remember(self, accession: str, document: ET.Element) -> None:
+        with self._lock:
+            self._documents[accession] = document
+
+    def get_xml(self, accession: str) -> ET.Element:
+        """Returns the document for `accession`, fetching it if we don't have it yet.
+
+        Raises ET.ParseError if ENA sends back something that isn't XML.
+        """
+        with self._lock:
+            document = self._documents.get(accession)
+        if document is not None:
+            return document
+
+        response = self.get_response(accession)
+        try:
+            document = ET.fromstring(response.text)
+        except ET.ParseError:
+            logger.exception("Unable to decode response", response=response.text)
+            raise
+
+        self.remember(accession, document)
+        return document
+
+    def _fetch_batch(self, accessions: List[str]) -> None:
+        response = self.get_response(",".join(accessions))
+        try:
+            root = ET.fromstring(response.text)
+        except ET.ParseError:
+            logger.warning(
+                "Unable to decode batch of ENA documents, they'll be fetched one at a time.",
+                accessions=accessions,
+            )
+            return
+
+        for element in root:
+            accession = element.attrib.get("accession")
+            if accession in accessions:
+                document = ET.Element(root.tag, root.attrib)
+                document.append(element)
+                self.remember(accession, document)
+
+    def prefetch(self, accessions: Iterable[str]) -> None:
+        """Fetches all of `accessions` that we don't have yet, in batches.
+
+        Anything that doesn't come back from its batch, like accessions
+        ENA doesn't know, is left for get_xml to fetch on its own so it
+        gets the same response as before.
+        """
+        with self._lock:
+            missing = sorted({acc for acc in accessions if acc and acc not in self._documents})
+
+        if not missing:
+            return
+
+        batches = [
+            missing[start : start + self.batch_size]
+            for start in range(0, len(missing), self.batch_size)
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # list() so any exceptions get raised here.
+            list(executor.map(self._fetch_batch, batches))
+
+        logger.debug("Prefetched ENA documents.", accessions=len(missing), batches=len(batches))
@@ -1,6 +1,8 @@
 import abc
 from typing import List
 
+from django.db import transaction
+
 from data_refinery_common import logging
 from data_refinery_common.enums import Downloaders
 from data_refinery_common.job_lookup import determine_downloader_task
@@ -38,37 +40,45 @@ class ExternalSourceSurveyor:
         There is a complementary function below for enqueueing multi-file
         DownloaderJobs.
         """
-        files_to_download = []
-        for sample in samples:
-            files_for_sample = OriginalFile.objects.filter(sample=sample, is_downloaded=False)
-            for og_file in files_for_sample:
-                files_to_download.append(og_file)
+        files_to_download = (
+            OriginalFile.objects.filter(samples__in=samples, is_downloaded=False)
+            .distinct()
+            .order_by("id")
+            .prefetch_related("samples")
+        )
+
+        # Look up which URLs already have a DownloaderJob all at once.
+        source_urls = {original_file.source_url for original_file in files_to_download}
+        urls_with_old_jobs = set(
+            DownloaderJobOriginalFileAssociation.objects.filter(
+                original_file__source_url__in=source_urls
+            ).values_list("original_file__source_url", flat=True)
+        )
 
         download_urls_with_jobs = {}
+        new_jobs = []
+        files_for_jobs = []
         for original_file in files_to_download:
 
             # We don't need to create multiple downloaders for the same file.
             # However, we do want to associate original_files with the
             # DownloaderJobs that will download them.
             if original_file.source_url in download_urls_with_jobs.keys():
-                DownloaderJobOriginalFileAssociation.objects.get_or_create(
-                    downloader_job=download_urls_with_jobs[original_file.source_url],
-                    original_file=original_file,
+                files_for_jobs.append(
+                    (download_urls_with_jobs[original_file.source_url], original_file)
                 )
                 continue
 
             # There is already a downloader job associated with this file.
-            old_assocs_count = DownloaderJobOriginalFileAssociation.objects.filter(
-                original_file__source_url=original_file.source_url
-            ).count()
-            if old_assocs_count > 0:
+            if original_file.source_url in urls_with_old_jobs:
                 logger.debug(
                     "We found an existing DownloaderJob for this file/url.",
                     original_file_id=original_file.id,
                 )
                 continue
 
-            sample_object = original_file.samples.first()
+            # The same sample samples.first() would give, without another query.
+            sample_object = min(original_file.samples.all(), key=lambda sample: sample.id)
             downloader_task = determine_downloader_task(sample_object)
 
             if downloader_task == Downloaders.NONE:
@@ -81,24 +91,34 @@ class ExternalSourceSurveyor:
                 downloader_job = DownloaderJob()
                 downloader_job.downloader_task = downloader_task.value
                 downloader_job.accession_code = experiment.accession_code
-                downloader_job.save()
-
-                DownloaderJobOriginalFileAssociation.objects.get_or_create(
-                    downloader_job=downloader_job, original_file=original_file
-                )
+                new_jobs.append((downloader_job, downloader_task, original_file.source_url))
 
+                files_for_jobs.append((downloader_job, original_file))
                 download_urls_with_jobs[original_file.source_url] = downloader_job
 
-                try:
-                    logger.info(
-                        "Queuing downloader job for URL: " + original_file.source_url,
-                        survey_job=self.survey_job.id,
-                        downloader_job=downloader_job.id,
+        with transaction.atomic():
+            DownloaderJob.objects.bulk_create([job for job, _, _ in new_jobs])
+            DownloaderJobOriginalFileAssociation.objects.bulk_create(
+                [
+                    DownloaderJobOriginalFileAssociation(
+                        downloader_job_id=downloader_job.id, original_file=original_file
                     )
-                    send_job(downloader_task, downloader_job)
-                except Exception:
-                    # If we fail to queue the job, it will be requeued.
-                    pass
+                    for downloader_job, original_file in files_for_jobs
+                ],
+                ignore_conflicts=True,
+            )
+
+        for downloader_job, downloader_task, source_url in new_jobs:
+            try:
+                logger.info(
+                    "Queuing downloader job for URL: " + source_url,
+                    survey_job=self.survey_job.id,
+                    downloader_job=downloader_job.id,
+                )
+                send_job(downloader_task, downloader_job)
+            except Exception:
+                # If we fail to queue the job, it will be requeued.
+                pass
 
     def queue_downloader_job_for_original_files(
         self,
@@ -206,9 +226,7 @@ class ExternalSourceSurveyor:
             return False
 
         # Update our cached values
-        experiment.update_num_samples()
-        experiment.update_sample_metadata_fields()
-        experiment.update_platform_names()
+        experiment.update_cached_fields()
         experiment.save()
 
         logger.debug("Survey job completed successfully.", survey_job=self.survey_job.id)
@@ -2,23 +2,14 @@ import shutil
 from re import sub
 from typing import Dict, List
 
+from django.utils import timezone
+
 import dateutil.parser
 import GEOparse
 
 from data_refinery_common.enums import Downloaders
 from data_refinery_common.logging import get_and_configure_logger
-from data_refinery_common.models import (
-    Experiment,
-    ExperimentAnnotation,
-    ExperimentOrganismAssociation,
-    ExperimentSampleAssociation,
-    Organism,
-    OriginalFile,
-    OriginalFileSampleAssociation,
-    Sample,
-    SampleAnnotation,
-    SurveyJobKeyValue,
-)
+from data_refinery_common.models import Experiment, ExperimentAnnotation, Sample, SurveyJobKeyValue
 from data_refinery_common.utils import (
     FileUtils,
     get_normalized_platform,
@@ -26,8 +17,9 @@ from data_refinery_common.utils import (
     get_supported_microarray_platforms,
     get_supported_rnaseq_platforms,
 )
-from data_refinery_foreman.surveyor import harmony, utils
+from data_refinery_foreman.surveyor import harmony, http_cache, soft, utils
 from data_refinery_foreman.surveyor.external_source import ExternalSourceSurveyor
+from data_refinery_foreman.surveyor.persistence import SurveyWriter
 
 logger = get_and_configure_logger(__name__)
 GEOparse.logger.set_verbosity("WARN")
@@ -35,6 +27,10 @@ GEOparse.logger.set_verbosity("WARN")
 
 UNKNOWN = "UNKNOWN"
 
+# How many samples to read from the SOFT file before looking up which
+# exist, and to write to the database at once.
+SAMPLE_BATCH_SIZE = 500
+
 
 class GeoSurveyor(ExternalSourceSurveyor):
 
@@ -50,7 +46,7 @@ class GeoSurveyor(ExternalSourceSurveyor):
         return "/tmp/" + str(self.survey_job.id) + "/"
 
     def set_platform_properties(
-        self, sample_object: Sample, sample_metadata: Dict, gse: GEOparse.GSM
+        self, sample_object: Sample, sample_metadata: Dict, gse: soft.SeriesFile
     ) -> Sample:
         """Sets platform-related properties on `sample_object`.
 
@@ -74,7 +70,7 @@ class GeoSurveyor(ExternalSourceSurveyor):
 
         platform_accession_code = UNKNOWN
 
-        gpl = GEOparse.get_GEO(external_accession, destdir=self.get_temp_path(), silent=True)
+        gpl = http_cache.get_geo(external_accession)
         platform_title = gpl.metadata.get("title", [UNKNOWN])[0]
 
         # Check if this is a supported microarray platform.
@@ -239,12 +235,15 @@ class GeoSurveyor(ExternalSourceSurveyor):
     ) -> (Experiment, List[Sample]):
         """ The main surveyor - find the Experiment and Samples from NCBI GEO.
 
-        Uses the GEOParse library, for which docs can be found here: https://geoparse.readthedocs.io/en/latest/usage.html#working-with-geo-objects
-
+        GEOparse downloads the family SOFT file, then surveyor.soft reads
+        the series' and samples' metadata out of it a sample at a time,
+        without loading the data tables GEOparse would parse.
         """
-        # Cleaning up is tracked here: https://github.com/guma44/GEOparse/issues/41
-        gse = GEOparse.get_GEO(experiment_accession_code, destdir=self.get_temp_path(), silent=True)
-        harmonizer = harmony.Harmonizer()
+        soft_path, _ = GEOparse.get_GEO_file(
+            experiment_accession_code, destdir=self.get_temp_path(), silent=True
+        )
+        gse = soft.SeriesFile(soft_path)
+        harmonizer = harmony.get_harmonizer()
 
         # Create the experiment object
         try:
@@ -269,204 +268,191 @@ class GeoSurveyor(ExternalSourceSurveyor):
         # Okay, here's the situation!
         # Sometimes, samples have a direct single representation for themselves.
         # Othertimes, there is a single file with references to every sample in it.
-        created_samples = []
-        for sample_accession_code, sample in gse.gsms.items():
-            try:
-                sample_object = Sample.objects.get(accession_code=sample_accession_code)
-                logger.debug(
-                    "Sample %s from experiment %s already exists, skipping object creation.",
-                    sample_accession_code,
-                    experiment_object.accession_code,
-                    survey_job=self.survey_job.id,
-                )
-
-                # Associate it with the experiment, but since it
-                # already exists it already has original files
-                # associated with it and it's already been downloaded,
-                # so don't add it to created_samples.
-                ExperimentSampleAssociation.objects.get_or_create(
-                    experiment=experiment_object, sample=sample_object
-                )
-
-                ExperimentOrganismAssociation.objects.get_or_create(
-                    experiment=experiment_object, organism=sample_object.organism
-                )
-            except Sample.DoesNotExist:
-                organism = Organism.get_object_for_name(sample.metadata["organism_ch1"][0].upper())
-
-                sample_object = Sample()
-                sample_object.source_database = "GEO"
-                sample_object.accession_code = sample_accession_code
-                sample_object.organism = organism
-
-                # If data processing step, it isn't raw.
-                sample_object.has_raw = not sample.metadata.get("data_processing", None)
-
-                ExperimentOrganismAssociation.objects.get_or_create(
-                    experiment=experiment_object, organism=organism
-                )
-                sample_object.title = sample.metadata["title"][0]
-
-                self.set_platform_properties(sample_object, sample.metadata, gse)
-
-                preprocessed_sample = harmony.preprocess_geo_sample(sample)
-                harmonized_sample = harmonizer.harmonize_sample(preprocessed_sample)
-                GeoSurveyor._apply_harmonized_metadata_to_sample(sample_object, harmonized_sample)
-
-                # Sample-level protocol_info
-                sample_object.protocol_info = self.get_sample_protocol_info(
-                    sample.metadata, sample_accession_code
-                )
-
-                sample_object.save()
-                logger.debug("Created Sample: " + str(sample_object))
-
-                metadata = sample.metadata
-                metadata["geo_columns"] = list(sample.columns.index)
-
-                sample_annotation = SampleAnnotation()
-                sample_annotation.sample = sample_object
-                sample_annotation.data = metadata
-                sample_annotation.is_ccdl = False
-                sample_annotation.save()
-
-                sample_supplements = sample.metadata.get("supplementary_file", [])
-                for supplementary_file_url in sample_supplements:
-
-                    # Why do they give us this?
-                    if supplementary_file_url == "NONE":
-                        break
-
-                    # We never want these!
-                    if "idat.gz" in supplementary_file_url.lower():
-                        continue
-                    if ".chp" in supplementary_file_url.lower():
-                        continue
-                    if "chp.gz" in supplementary_file_url.lower():
-                        continue
-                    if "ndf.gz" in supplementary_file_url.lower():
-                        continue
-                    if "pos.gz" in supplementary_file_url.lower():
-                        continue
-                    if "pair.gz" in supplementary_file_url.lower():
-                        continue
-                    if "gff.gz" in supplementary_file_url.lower():
-                        continue
-
-                    # Sometimes, we are lied to about the data processing step.
-                    lower_file_url = supplementary_file_url.lower()
-                    if (
-                        ".cel" in lower_file_url
-                        or ("_non_normalized.txt" in lower_file_url)
-                        or ("_non-normalized.txt" in lower_file_url)
-                        or ("-non-normalized.txt" in lower_file_url)
-                        or ("-non_normalized.txt" in lower_file_url)
-                    ):
-                        sample_object.has_raw = True
-                        sample_object.save()
-
-                    # filename and source_filename are the same for these
-                    filename = FileUtils.get_filename(supplementary_file_url)
-                    original_file = OriginalFile.objects.get_or_create(
-                        source_url=supplementary_file_url,
-                        filename=filename,
-                        source_filename=filename,
-                        has_raw=sample_object.has_raw,
-                        is_archive=FileUtils.is_archive(filename),
-                    )[0]
-
-                    logger.debug("Created OriginalFile: " + str(original_file))
-
-                    OriginalFileSampleAssociation.objects.get_or_create(
-                        original_file=original_file, sample=sample_object
+        writer = SurveyWriter()
+
+        # Only what's needed once every sample has been written is kept,
+        # so memory doesn't grow with the size of the series.
+        created_sample_ids = []
+        sample_ids_without_raw = []
+        for batch in gse.iter_sample_batches(SAMPLE_BATCH_SIZE):
+            writer.load_existing_samples([sample.name for sample in batch])
+            batch_created_samples = []
+            for sample in batch:
+                sample_accession_code = sample.name
+                sample_object = writer.get_sample(sample_accession_code)
+                if sample_object:
+                    logger.debug(
+                        "Sample %s from experiment %s already exists, skipping object creation.",
+                        sample_accession_code,
+                        experiment_object.accession_code,
+                        survey_job=self.survey_job.id,
+                    )
+
+                    # Associate it with the experiment, but since it
+                    # already exists it already has original files
+                    # associated with it and it's already been downloaded,
+                    # so don't add it to batch_created_samples.
+                    writer.add_experiment_sample(experiment_object, sample_object)
+                    writer.add_experiment_organism(experiment_object, sample_object.organism)
+                else:
+                    organism = writer.get_organism(sample.metadata["organism_ch1"][0].upper())
+
+                    sample_object = Sample()
+                    sample_object.source_database = "GEO"
+                    sample_object.accession_code = sample_accession_code
+                    sample_object.organism = organism
+
+                    # If data processing step, it isn't raw.
+                    sample_object.has_raw = not sample.metadata.get("data_processing", None)
+
+                    writer.add_experiment_organism(experiment_object, organism)
+                    sample_object.title = sample.metadata["title"][0]
+
+                    self.set_platform_properties(sample_object, sample.metadata, gse)
+
+                    preprocessed_sample = harmony.preprocess_geo_sample(sample)
+                    harmonized_sample = harmonizer.harmonize_sample(preprocessed_sample)
+                    GeoSurveyor._apply_harmonized_metadata_to_sample(
+                        sample_object, harmonized_sample
+                    )
+
+                    # Sample-level protocol_info
+                    sample_object.protocol_info = self.get_sample_protocol_info(
+                        sample.metadata, sample_accession_code
                     )
 
-                    if original_file.is_affy_data():
-                        # Only Affymetrix Microarrays produce .CEL files
-                        sample_object.technology = "MICROARRAY"
-                        sample_object.manufacturer = "AFFYMETRIX"
-                        sample_object.save()
-
-                # It's okay to survey RNA-Seq samples from GEO, but we
-                # don't actually want to download/process any RNA-Seq
-                # data unless it comes from SRA.
-                if sample_object.technology != "RNA-SEQ":
-                    created_samples.append(sample_object)
-
-                # Now that we've determined the technology at the
-                # sample level, we can set it at the experiment level,
-                # just gotta make sure to only do it once. There can
-                # be more than one technology, this should be changed
-                # as part of:
-                # https://github.com/AlexsLemonade/refinebio/issues/1099
-                if not experiment_object.technology:
-                    experiment_object.technology = sample_object.technology
-                    experiment_object.save()
-
-                ExperimentSampleAssociation.objects.get_or_create(
-                    experiment=experiment_object, sample=sample_object
-                )
-
-        # These supplementary files _may-or-may-not_ contain the type of raw data we can process.
+                    metadata = sample.metadata
+                    metadata["geo_columns"] = list(sample.column_names)
+
+                    writer.add_sample(sample_object, metadata)
+                    logger.debug("Created Sample: " + str(sample_object))
+
+                    sample_supplements = sample.metadata.get("supplementary_file", [])
+                    for supplementary_file_url in sample_supplements:
+
+                        # Why do they give us this?
+                        if supplementary_file_url == "NONE":
+                            break
+
+                        # We never want these!
+                        if "idat.gz" in supplementary_file_url.lower():
+                            continue
+                        if ".chp" in supplementary_file_url.lower():
+                            continue
+                        if "chp.gz" in supplementary_file_url.lower():
+                            continue
+                        if "ndf.gz" in supplementary_file_url.lower():
+                            continue
+                        if "pos.gz" in supplementary_file_url.lower():
+                            continue
+                        if "pair.gz" in supplementary_file_url.lower():
+                            continue
+                        if "gff.gz" in supplementary_file_url.lower():
+                            continue
+
+                        # Sometimes, we are lied to about the data processing step.
+                        lower_file_url = supplementary_file_url.lower()
+                        if (
+                            ".cel" in lower_file_url
+                            or ("_non_normalized.txt" in lower_file_url)
+                            or ("_non-normalized.txt" in lower_file_url)
+                            or ("-non-normalized.txt" in lower_file_url)
+                            or ("-non_normalized.txt" in lower_file_url)
+                        ):
+                            sample_object.has_raw = True
+
+                        # filename and source_filename are the same for these
+                        filename = FileUtils.get_filename(supplementary_file_url)
+                        original_file = writer.get_original_file(
+                            source_url=supplementary_file_url,
+                            filename=filename,
+                            source_filename=filename,
+                            has_raw=sample_object.has_raw,
+                            is_archive=FileUtils.is_archive(filename),
+                        )
+
+                        logger.debug("Created OriginalFile: " + str(original_file))
+
+                        writer.add_original_file_sample(original_file, sample_object)
+
+                        if original_file.is_affy_data():
+                            # Only Affymetrix Microarrays produce .CEL files
+                            sample_object.technology = "MICROARRAY"
+                            sample_object.manufacturer = "AFFYMETRIX"
+
+                    # It's okay to survey RNA-Seq samples from GEO, but we
+                    # don't actually want to download/process any RNA-Seq
+                    # data unless it comes from SRA.
+                    if sample_object.technology != "RNA-SEQ":
+                        batch_created_samples.append(sample_object)
+
+                    # Now that we've determined the technology at the
+                    # sample level, we can set it at the experiment level,
+                    # just gotta make sure to only do it once. There can
+                    # be more than one technology, this should be changed
+                    # as part of:
+                    # https://github.com/AlexsLemonade/refinebio/issues/1099
+                    if not experiment_object.technology:
+                        experiment_object.technology = sample_object.technology
+                        experiment_object.save()
+
+                    writer.add_experiment_sample(experiment_object, sample_object)
+
+            writer.flush()
+            created_sample_ids.extend(sample.id for sample in batch_created_samples)
+            sample_ids_without_raw.extend(
+                sample.id for sample in batch_created_samples if not sample.has_raw
+            )
+
+        # These supplementary files _may-or-may-not_ contain the type
+        # of raw data we can process. They're only kept if some
+        # samples are associated with them.
         for experiment_supplement_url in gse.metadata.get("supplementary_file", []):
+            lower_supplement_url = experiment_supplement_url.lower()
+            if not created_sample_ids or not (
+                ("_non_normalized.txt" in lower_supplement_url)
+                or ("_non-normalized.txt" in lower_supplement_url)
+                or ("-non-normalized.txt" in lower_supplement_url)
+                or ("-non_normalized.txt" in lower_supplement_url)
+            ):
+                continue
 
             # filename and source_filename are the same for these
             filename = experiment_supplement_url.split("/")[-1]
-            original_file = OriginalFile.objects.get_or_create(
+            original_file = writer.get_original_file(
                 source_url=experiment_supplement_url,
                 filename=filename,
                 source_filename=filename,
                 has_raw=sample_object.has_raw,
                 is_archive=True,
-            )[0]
+            )
 
             logger.debug("Created OriginalFile: " + str(original_file))
 
-            lower_supplement_url = experiment_supplement_url.lower()
-            if (
-                ("_non_normalized.txt" in lower_supplement_url)
-                or ("_non-normalized.txt" in lower_supplement_url)
-                or ("-non-normalized.txt" in lower_supplement_url)
-                or ("-non_normalized.txt" in lower_supplement_url)
-            ):
-                for sample_object in created_samples:
-                    sample_object.has_raw = True
-                    sample_object.save()
+            for sample_id in created_sample_ids:
+                writer.add_original_file_sample(original_file, Sample(id=sample_id))
 
-                    OriginalFileSampleAssociation.objects.get_or_create(
-                        sample=sample_object, original_file=original_file
-                    )
-
-            # Delete this Original file if it isn't being used.
-            if (
-                OriginalFileSampleAssociation.objects.filter(original_file=original_file).count()
-                == 0
-            ):
-                original_file.delete()
+            # The samples have already been written.
+            Sample.objects.filter(id__in=sample_ids_without_raw).update(
+                has_raw=True, last_modified=timezone.now()
+            )
+            sample_ids_without_raw = []
 
         # These are the Miniml/Soft/Matrix URLs that are always(?) provided.
         # GEO describes different types of data formatting as "families"
-        family_url = self.get_miniml_url(experiment_accession_code)
-        miniml_original_file = OriginalFile.objects.get_or_create(
-            source_url=family_url,
-            source_filename=family_url.split("/")[-1],
-            has_raw=sample_object.has_raw,
-            is_archive=True,
-        )[0]
-        for sample_object in created_samples:
-            # We don't need a .txt if we have a .CEL
-            if sample_object.has_raw:
-                continue
-            OriginalFileSampleAssociation.objects.get_or_create(
-                sample=sample_object, original_file=miniml_original_file
+        # We don't need a .txt if we have a .CEL
+        if sample_ids_without_raw:
+            family_url = self.get_miniml_url(experiment_accession_code)
+            miniml_original_file = writer.get_original_file(
+                source_url=family_url,
+                source_filename=family_url.split("/")[-1],
+                has_raw=sample_object.has_raw,
+                is_archive=True,
             )
+            for sample_id in sample_ids_without_raw:
+                writer.add_original_file_sample(miniml_original_file, Sample(id=sample_id))
 
-        # Delete this Original file if it isn't being used.
-        if (
-            OriginalFileSampleAssociation.objects.filter(original_file=miniml_original_file).count()
-            == 0
-        ):
-            miniml_original_file.delete()
+        writer.flush()
 
         # Trash the temp path
         try:
@@ -476,7 +462,7 @@ class GeoSurveyor(ExternalSourceSurveyor):
             # It's not a big deal.
             pass
 
-        return experiment_object, created_samples
+        return experiment_object, Sample.objects.filter(id__in=created_sample_ids)
 
     def discover_experiment_and_samples(self) -> (Experiment, List[Sample]):
         """ Dispatches the surveyor, returns the results """
@@ -245,11 +245,11 @@ GEO:
 """
 
 import csv
-from io import StringIO
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 from data_refinery_common.logging import get_and_configure_logger
-from data_refinery_foreman.surveyor.utils import requests_retry_session
+from data_refinery_foreman.surveyor import http_cache
 
 logger = get_and_configure_logger(__name__)
 
@@ -264,29 +264,56 @@ TITLE_FIELDS = [
 ]
 
 
-def extract_title(sample: Dict, priority_field: str = None) -> str:
-    """ Given a flat sample dictionary, find the title """
-    if priority_field:
-        title_fields = [priority_field] + [tf for tf in TITLE_FIELDS if tf != priority_field]
-    else:
-        title_fields = TITLE_FIELDS
+@lru_cache(maxsize=None)
+def get_title_variants(title_field: str) -> Tuple[str]:
+    return tuple(create_variants([title_field]))
+
 
+def _find_titles(sample: Dict, title_fields: List[str]) -> Dict:
+    """Returns the title `sample` has under each of `title_fields`, if any.
+
+    If the sample has a title comment that's the only title it has, under None.
+    """
     # Specifically look up for imported, non-SDRF AE samples
     for comment in sample.get("source_comment", []):
         if "title" in comment.get("name", ""):
-            return comment["value"]
+            return {None: comment["value"]}
+
+    titles = {}
+    for title_field in title_fields:
+        for variant in get_title_variants(title_field):
+            if variant in sample:
+                titles[title_field] = sample[variant]
+                break
 
-    expanded_title_fields = create_variants(title_fields)
+    return titles
 
-    for title_field in expanded_title_fields:
-        if title_field in sample:
-            return sample[title_field]
+
+def _pick_title(titles: Dict, priority_field: str = None):
+    if None in titles:
+        return titles[None]
+
+    if priority_field in titles:
+        return titles[priority_field]
+
+    for title_field in TITLE_FIELDS:
+        if title_field in titles:
+            return titles[title_field]
 
     # If we can't even find a unique title for this sample
     # something has gone horribly wrong.
     return None
 
 
+def extract_title(sample: Dict, priority_field: str = None) -> str:
+    """ Given a flat sample dictionary, find the title """
+    title_fields = list(TITLE_FIELDS)
+    if priority_field and priority_field not in title_fields:
+        title_fields.append(priority_field)
+
+    return _pick_title(_find_titles(sample, title_fields), priority_field)
+
+
 def create_variants(fields_list: List):
     """ Given a list of strings, create variations likely to give metadata hits.
 
@@ -323,44 +350,38 @@ def create_variants(fields_list: List):
     return variants
 
 
-def parse_sdrf(sdrf_url: str) -> List:
-    """ Given a URL to an SDRF file, download parses it into JSON. """
+def iter_sdrf(sdrf_url: str) -> Iterator[Dict]:
+    """Yields each sample in an SDRF file, read a line at a time.
 
+    The file is cached on disk by http_cache, so reading it more than
+    once only downloads it once.
+    """
     try:
-        sdrf_response = requests_retry_session().get(sdrf_url, timeout=60)
+        sdrf_file = http_cache.open_text(sdrf_url)
     except Exception:
         logger.exception("Unable to fetch URL: " + sdrf_url)
-        return []
-
-    if sdrf_response.status_code != 200:
-        logger.error("Unable to fetch URL: " + sdrf_url, response_code=sdrf_response.status_code)
-        return []
+        return
 
-    sdrf_text = sdrf_response.text
+    with sdrf_file:
+        reader = csv.reader(sdrf_file, delimiter="\t")
+        keys = None
+        for line in reader:
 
-    samples = []
+            # Get the keys
+            if keys is None:
+                keys = [key.strip().lower() for key in line]
+                continue
 
-    reader = csv.reader(StringIO(sdrf_text), delimiter="\t")
-    for offset, line in enumerate(reader):
+            # Skip malformed lines
+            if len(line) != len(keys):
+                continue
 
-        # Get the keys
-        if offset == 0:
-            keys = line
-            continue
+            yield dict(zip(keys, line))
 
-        sample_values = line
-
-        # Skip malformed lines
-        if len(sample_values) != len(keys):
-            continue
 
-        sample = {}
-        for col, value in enumerate(sample_values):
-            key = keys[col]
-            sample[key.strip().lower()] = value
-        samples.append(sample)
-
-    return samples
+def parse_sdrf(sdrf_url: str) -> List:
+    """ Given a URL to an SDRF file, download parses it into JSON. """
+    return list(iter_sdrf(sdrf_url))
 
 
 def preprocess_geo_sample(sample) -> List:
@@ -388,6 +409,31 @@ def preprocess_geo_sample(sample) -> List:
 
 
 class Harmonizer:
+    """Pulls the fields at the top of this file out of sample metadata.
+
+    Each field has a list of keys that samples are known to keep it
+    under. These are compiled into one index of which fields each key
+    could hold, so a sample is harmonized in one pass over its keys.
+    Building that is the slow part, so use get_harmonizer() rather than
+    making new ones.
+    """
+
+    FIELDS = [
+        "sex_fields",
+        "age_fields",
+        "specimen_part_fields",
+        "genetic_information_fields",
+        "disease_fields",
+        "disease_stage_fields",
+        "cell_line_fields",
+        "treatment_fields",
+        "race_fields",
+        "subject_fields",
+        "developmental_stage_fields",
+        "compound_fields",
+        "time_fields",
+    ]
+
     def __init__(self):
         sex_fields = [
             "sex",
@@ -565,6 +611,16 @@ class Harmonizer:
         ]
         self.time_fields = create_variants(time_fields)
 
+        # Some keys are variants of more than one field, like "disease
+        # state", so each key maps to all of the fields it could hold.
+        self.key_index = {}
+        for field in self.FIELDS:
+            field_name = field.split("_fields")[0]
+            for key in getattr(self, field):
+                field_names = self.key_index.setdefault(key, [])
+                if field_name not in field_names:
+                    field_names.append(field_name)
+
     def harmonize_value(self, field_name: str, value):
         if field_name == "age":
             try:
@@ -585,45 +641,34 @@ class Harmonizer:
         else:
             return value.lower().strip()
 
-    def harmonize_field(self, sample_metadata: Dict, harmonized_sample: Dict, field: str):
-        field_name = field.split("_fields")[0]
+    def harmonize_sample(self, sample_metadata: Dict, title_field: str = None) -> Dict:
+        """Each field gets the first of the sample's keys for it that has a usable value."""
+        harmonized_sample = {}
+        harmonized_sample["title"] = extract_title(sample_metadata, title_field)
 
         for key, value in sample_metadata.items():
-            lower_key = key.lower().strip()
+            field_names = self.key_index.get(key.lower().strip())
+            if not field_names:
+                continue
 
-            if lower_key in getattr(self, field):
-                harmonized_value = self.harmonize_value(field_name, value)
+            for field_name in field_names:
+                if field_name in harmonized_sample:
+                    continue
 
+                harmonized_value = self.harmonize_value(field_name, value)
                 if harmonized_value:
                     harmonized_sample[field_name] = harmonized_value
-                    break
 
-    def harmonize_sample(self, sample_metadata: Dict, title_field: str = None) -> Dict:
-        fields = [
-            "sex_fields",
-            "age_fields",
-            "specimen_part_fields",
-            "genetic_information_fields",
-            "disease_fields",
-            "disease_stage_fields",
-            "cell_line_fields",
-            "treatment_fields",
-            "race_fields",
-            "subject_fields",
-            "developmental_stage_fields",
-            "compound_fields",
-            "time_fields",
-        ]
+        return harmonized_sample
 
-        harmonized_sample = {}
-        harmonized_sample["title"] = extract_title(sample_metadata, title_field)
-        for field in fields:
-            self.harmonize_field(sample_metadata, harmonized_sample, field)
 
-        return harmonized_sample
+@lru_cache(maxsize=None)
+def get_harmonizer() -> Harmonizer:
+    """Returns a Harmonizer that's shared by everything in this process."""
+    return Harmonizer()
 
 
-def determine_title_field(a_samples: List[Dict], b_samples: List[Dict]) -> str:
+def determine_title_field(a_samples: Iterable[Dict], b_samples: Iterable[Dict]) -> str:
     """Determines which field should be used for the title of the sample.
 
     Sometimes there is more metadata than actual samples, so we just
@@ -632,11 +677,16 @@ def determine_title_field(a_samples: List[Dict], b_samples: List[Dict]) -> str:
     max_title_field = ""
     max_matching_titles = 0
 
+    # Look up every title each sample has once, rather than once per
+    # title field.
+    a_sample_titles = [_find_titles(sample, TITLE_FIELDS) for sample in a_samples]
+    b_sample_titles = [_find_titles(sample, TITLE_FIELDS) for sample in b_samples]
+
     # Reverse the order so if there's a tie for number of matches
     # we'll prioritize the fields at the front of the list.
     for title_field in reversed(TITLE_FIELDS):
-        a_titles = {extract_title(sample, title_field) for sample in a_samples}
-        b_titles = {extract_title(sample, title_field) for sample in b_samples}
+        a_titles = {_pick_title(titles, title_field) for titles in a_sample_titles}
+        b_titles = {_pick_title(titles, title_field) for titles in b_sample_titles}
 
         if a_titles == b_titles:
             max_title_field = title_field
@@ -646,11 +696,11 @@ def determine_title_field(a_samples: List[Dict], b_samples: List[Dict]) -> str:
         return max_title_field
 
 
-def harmonize_all_samples(sample_metadata: List[Dict], title_field: str = None) -> Dict:
+def harmonize_all_samples(sample_metadata: Iterable[Dict], title_field: str = None) -> Dict:
     """Returns a mapping of sample title to harmonized sample metadata.
 
     See docstring at top of file for further clarfication of what "harmonized" means."""
-    harmonizer = Harmonizer()
+    harmonizer = get_harmonizer()
 
     harmonized_samples = {}
     for sample in sample_metadata:
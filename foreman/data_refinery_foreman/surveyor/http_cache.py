@@ -0,0 +1,406 @@
+"""A per-node cache of what surveyors fetch from external sources.
+
+Surveyors fetch the same things over and over: every GEO experiment on
+a platform needs that platform's GPL file, every ArrayExpress survey
+fetches the same kinds of JSON and SDRF files and every transcriptome
+index survey asks Ensembl for the same species lists. Responses are kept
+on disk under CACHE_DIRECTORY, keyed by URL, so they're shared between
+the surveyor jobs running on a node.
+
+A cached response younger than its TTL is used as is. An older one is
+revalidated with If-None-Match/If-Modified-Since if the source gave us
+an ETag or Last-Modified header, so an unchanged file isn't downloaded
+again. GEO platforms' SOFT files are fetched by GEOparse rather than by
+us, so they're kept for their TTL and then fetched again. Series' SOFT
+files aren't cached since they can be huge and are rarely surveyed
+twice.
+
+Entries that haven't been fetched or revalidated for MAX_AGE are
+removed, and the least recently used go first once the cache is bigger
+than MAX_SIZE. That's checked after writing to the cache, at most once
+every EVICTION_INTERVAL per node.
+
+How many fetches the cache saved is counted per thread, since a
+SurveyRunner runs several jobs at once, and surveyor.run_job records
+the counts on the SurveyJob.
+"""
+
+import collections
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, TextIO, Tuple
+
+import GEOparse
+import requests
+
+from data_refinery_common.constants import CHUNK_SIZE, LOCAL_ROOT_DIR
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.utils import get_env_variable
+from data_refinery_foreman.surveyor import utils
+
+logger = get_and_configure_logger(__name__)
+
+CACHE_DIRECTORY = os.path.join(LOCAL_ROOT_DIR, "SURVEYOR_CACHE")
+
+# How long to use a cached response without checking whether it's changed.
+DEFAULT_TTL = 60 * 60 * 24
+
+# GEO platforms are almost never updated.
+GEO_PLATFORM_TTL = 60 * 60 * 24 * 7
+
+MAX_AGE = 60 * 60 * 24 * 30
+MAX_SIZE = int(get_env_variable("SURVEYOR_CACHE_MAX_SIZE", str(10 * 1024 * 1024 * 1024)))
+EVICTION_INTERVAL = 60 * 60
+
+# Entries used more recently than this are never evicted, since a job
+# could be about to read them.
+MIN_AGE = 60 * 60
+
+EVICTION_STAMP = ".last_eviction"
+
+_local = threading.local()
+
+
+class CachedResponse:
+    """The parts of a requests.Response that surveyors use."""
+
+    def __init__(self, url: str, status_code: int, content: bytes, encoding: str = None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding or "utf-8"
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def _get_stats() -> collections.Counter:
+    if not hasattr(_local, "stats"):
+        _local.stats = collections.Counter()
+
+    return _local.stats
+
+
+def _get_cache_path(url: str) -> str:
+    return os.path.join(CACHE_DIRECTORY, hashlib.sha1(url.encode()).hexdigest())
+
+
+@contextmanager
+def _locked(path: str):
+    """Holds the lock for a cache entry so only one job fetches it at a time."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_metadata(path: str) -> Dict:
+    if not os.path.exists(path + ".body"):
+        return None
+
+    try:
+        with open(path + ".json") as metadata_file:
+            return json.load(metadata_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_body(path: str) -> bytes:
+    with open(path + ".body", "rb") as body_file:
+        return body_file.read()
+
+
+def _write_metadata(path: str, metadata: Dict) -> None:
+    with open(path + ".json.tmp", "w") as metadata_file:
+        json.dump(metadata, metadata_file)
+
+    os.replace(path + ".json.tmp", path + ".json")
+
+
+def _touch(path: str) -> None:
+    """Marks an entry as used, so it's the last to be evicted."""
+    os.utime(path + ".json")
+
+
+def _write_body(path: str, chunks: Iterable[bytes]) -> None:
+    # Written somewhere else first so nobody reading the old body sees
+    # part of the new one.
+    with open(path + ".body.tmp", "wb") as body_file:
+        for chunk in chunks:
+            body_file.write(chunk)
+
+    os.replace(path + ".body.tmp", path + ".body")
+
+
+def _list_entries() -> List[Tuple[float, int, List[str], str]]:
+    """Returns when each cache entry was last used, its size, its files
+    and its lock file."""
+    entries = []
+
+    for name in os.listdir(CACHE_DIRECTORY):
+        # Each response is a .body and a .json, which is touched
+        # whenever the response is used.
+        if not name.endswith(".json"):
+            continue
+
+        path = os.path.join(CACHE_DIRECTORY, name[: -len(".json")])
+        paths = [path + ".json", path + ".body"]
+        try:
+            last_used = os.path.getmtime(path + ".json")
+            size = sum(os.path.getsize(each) for each in paths if os.path.exists(each))
+        except FileNotFoundError:
+            continue
+        entries.append((last_used, size, paths, path + ".lock"))
+
+    # get_geo's files are locked by accession.
+    geo_directory = os.path.join(CACHE_DIRECTORY, "GEO")
+    if os.path.isdir(geo_directory):
+        for name in os.listdir(geo_directory):
+            if name.endswith(".lock") or name.startswith("."):
+                continue
+
+            path = os.path.join(geo_directory, name)
+            accession = re.split(r"[._]", name)[0]
+            try:
+                entries.append(
+                    (
+                        os.path.getmtime(path),
+                        os.path.getsize(path),
+                        [path],
+                        os.path.join(geo_directory, accession + ".lock"),
+                    )
+                )
+            except FileNotFoundError:
+                continue
+
+    return entries
+
+
+def _remove_entry(paths: List[str], lock_path: str) -> bool:
+    """Removes an entry unless a job is using it right now."""
+    with open(lock_path, "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+
+        try:
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    return True
+
+
+def evict() -> None:
+    """Removes entries older than MAX_AGE, then the least recently used
+    ones until the cache is no bigger than MAX_SIZE."""
+    entries = sorted(_list_entries())
+    total_size = sum(size for _, size, _, _ in entries)
+    now = time.time()
+
+    evicted = 0
+    for last_used, size, paths, lock_path in entries:
+        if now - last_used < MIN_AGE:
+            break
+        if now - last_used < MAX_AGE and total_size <= MAX_SIZE:
+            break
+
+        if _remove_entry(paths, lock_path):
+            total_size -= size
+            evicted += 1
+
+    if evicted:
+        logger.info("Evicted surveyor cache entries.", evicted=evicted, cache_size=total_size)
+
+
+def _maybe_evict() -> None:
+    """Runs evict if nothing on this node has in the last EVICTION_INTERVAL."""
+    stamp_path = os.path.join(CACHE_DIRECTORY, EVICTION_STAMP)
+    try:
+        if time.time() - os.path.getmtime(stamp_path) < EVICTION_INTERVAL:
+            return
+    except FileNotFoundError:
+        pass
+
+    try:
+        with open(stamp_path, "w"):
+            pass
+        evict()
+    except Exception:
+        # Not being able to clean up shouldn't fail the survey.
+        logger.exception("Couldn't evict surveyor cache entries.")
+
+
+def _fetch(url: str, ttl: int, session, **kwargs):
+    """Makes sure there's a fresh copy of `url` in the cache.
+
+    Returns its metadata, or the response if it couldn't be fetched.
+    """
+    path = _get_cache_path(url)
+    with _locked(path):
+        metadata = _read_metadata(path)
+        if metadata and time.time() - metadata["fetched_at"] < ttl:
+            _get_stats()["hits"] += 1
+            _touch(path)
+            return metadata, None
+
+        headers = {}
+        if metadata and metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata and metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+        session = session or utils.requests_retry_session()
+        kwargs.setdefault("timeout", 60)
+        response = session.get(url, headers=headers, stream=True, **kwargs)
+
+        if response.status_code == 304 and metadata:
+            response.close()
+            _get_stats()["hits"] += 1
+            _get_stats()["revalidations"] += 1
+            metadata["fetched_at"] = time.time()
+            _write_metadata(path, metadata)
+            return metadata, None
+
+        _get_stats()["misses"] += 1
+        if response.status_code != 200:
+            return None, response
+
+        # Streamed to disk so big files are never all in memory.
+        _write_body(path, response.iter_content(chunk_size=CHUNK_SIZE))
+        metadata = {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": response.encoding,
+        }
+        _write_metadata(path, metadata)
+
+    _maybe_evict()
+    return metadata, None
+
+
+def get(url: str, ttl: int = DEFAULT_TTL, session=None, **kwargs) -> CachedResponse:
+    """Like requests_retry_session().get(url), but uses the cache.
+
+    Only successful responses are cached. Anything else is returned
+    without being cached so callers can handle it like they always have.
+    """
+    metadata, error_response = _fetch(url, ttl, session, **kwargs)
+    if error_response is not None:
+        return error_response
+
+    content = _read_body(_get_cache_path(url))
+    return CachedResponse(url, 200, content, metadata.get("encoding"))
+
+
+def open_text(url: str, ttl: int = DEFAULT_TTL, session=None, **kwargs) -> TextIO:
+    """Returns the cached copy of `url` opened as text, so it can be
+    read a line at a time.
+
+    Raises requests.HTTPError if it couldn't be fetched.
+    """
+    metadata, error_response = _fetch(url, ttl, session, **kwargs)
+    if error_response is not None:
+        error_response.raise_for_status()
+        raise requests.HTTPError("Unexpected response", response=error_response)
+
+    return open(
+        _get_cache_path(url) + ".body",
+        encoding=metadata.get("encoding") or "utf-8",
+        errors="replace",
+        newline="",
+    )
+
+
+def get_content(url: str, ttl: int = DEFAULT_TTL) -> bytes:
+    """Returns the contents of an FTP or other non-HTTP URL, using the cache.
+
+    There's nothing to revalidate against, so these are fetched again
+    once they're older than `ttl`.
+    """
+    path = _get_cache_path(url)
+    with _locked(path):
+        metadata = _read_metadata(path)
+        if metadata and time.time() - metadata["fetched_at"] < ttl:
+            _get_stats()["hits"] += 1
+            _touch(path)
+            return _read_body(path)
+
+        _get_stats()["misses"] += 1
+
+        # Ancient unresolved bug. WTF python: https://bugs.python.org/issue27973
+        urllib.request.urlcleanup()
+        with urllib.request.urlopen(url) as response:
+            content = response.read()
+        urllib.request.urlcleanup()
+
+        _write_body(path, [content])
+        _write_metadata(path, {"url": url, "fetched_at": time.time()})
+
+    _maybe_evict()
+    return content
+
+
+def get_geo(accession: str, ttl: int = GEO_PLATFORM_TTL):
+    """Like GEOparse.get_GEO, but keeps the SOFT file in the cache.
+
+    GEOparse uses a file that's already in its destdir instead of
+    downloading it again, so all we have to do is clear out files
+    older than `ttl` first.
+    """
+    geo_directory = os.path.join(CACHE_DIRECTORY, "GEO")
+    with _locked(os.path.join(geo_directory, accession)):
+        cached_files = glob.glob(os.path.join(geo_directory, accession + "[._]*"))
+        cached_files = [path for path in cached_files if not path.endswith(".lock")]
+
+        is_fresh = bool(cached_files) and all(
+            time.time() - os.path.getmtime(path) < ttl for path in cached_files
+        )
+        if is_fresh:
+            _get_stats()["hits"] += 1
+        else:
+            _get_stats()["misses"] += 1
+            for path in cached_files:
+                os.remove(path)
+
+        try:
+            geo_object = GEOparse.get_GEO(accession, destdir=geo_directory + "/", silent=True)
+        except Exception:
+            # Don't leave a partial download behind for the next job to use.
+            for path in glob.glob(os.path.join(geo_directory, accession + "[._]*")):
+                if not path.endswith(".lock"):
+                    os.remove(path)
+            raise
+
+    if not is_fresh:
+        _maybe_evict()
+    return geo_object
+
+
+def reset_stats() -> None:
+    _get_stats().clear()
+
+
+def get_stats() -> Dict:
+    stats = _get_stats()
+    return {key: stats[key] for key in ["hits", "revalidations", "misses"]}
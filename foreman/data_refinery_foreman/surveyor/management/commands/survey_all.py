@@ -6,6 +6,7 @@ determined by the pattern of the accession.
 import uuid
 
 from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date, parse_datetime
 
 import boto3
 import botocore
@@ -14,17 +15,19 @@ from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import SurveyJob
 from data_refinery_common.utils import parse_s3_url
 from data_refinery_foreman.surveyor import surveyor
+from data_refinery_foreman.surveyor.survey_runner import (
+    DEFAULT_WORKERS,
+    SurveyRunner,
+    get_source_type_for_accession,
+)
 
 logger = get_and_configure_logger(__name__)
 
 
-def run_surveyor_for_accession(accession: str) -> None:
+def run_surveyor_for_accession(accession: str) -> SurveyJob:
     """Chooses the correct surveyor based on the pattern of the accession"""
-    if "GSE" in accession[:3]:
-        surveyor.survey_experiment(accession, "GEO")
-    elif "E-" in accession[:2]:
-        surveyor.survey_experiment(accession, "ARRAY_EXPRESS")
-    elif " " in accession:
+    source_type = get_source_type_for_accession(accession)
+    if source_type == "TRANSCRIPTOME_INDEX":
         args = accession.split(",")
         # Allow organism to be unspecified so we survey the entire division.
         organism = args[0] if len(args[0]) > 0 else None
@@ -32,9 +35,9 @@ def run_surveyor_for_accession(accession: str) -> None:
             division = args[1].strip()
         else:
             division = "Ensembl"
-        surveyor.survey_transcriptome_index(organism, division)
+        return surveyor.survey_transcriptome_index(organism, division)
     else:
-        surveyor.survey_experiment(accession, "SRA")
+        return surveyor.survey_experiment(accession, source_type)
 
 
 class Command(BaseCommand):
@@ -51,6 +54,29 @@ class Command(BaseCommand):
         parser.add_argument(
             "--job-id", type=int, help=("An ID of a SurveyJob to execute"), default=None
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help=("How many accessions from --file to survey at once"),
+            default=DEFAULT_WORKERS,
+        )
+        parser.add_argument(
+            "--skip-surveyed",
+            action="store_true",
+            help=(
+                "Skip accessions from --file that have already been surveyed, so an "
+                "interrupted run can be resumed."
+            ),
+        )
+        parser.add_argument(
+            "--surveyed-since",
+            type=str,
+            help=(
+                "With --skip-surveyed, only skip accessions that have been surveyed since "
+                "this ISO 8601 date, so a resurvey can be resumed."
+            ),
+            default=None,
+        )
 
     def handle(self, *args, **options):
         if options["file"] is None and options["accession"] is None and options["job_id"] is None:
@@ -73,14 +99,18 @@ class Command(BaseCommand):
             else:
                 filepath = options["file"]
             with open(filepath) as accession_file:
-                for i, accession in enumerate(accession_file):
-                    if i < options["offset"]:
-                        continue
-                    accession = accession.strip()
-                    try:
-                        run_surveyor_for_accession(accession)
-                    except Exception as e:
-                        logger.exception(e)
+                accessions = [line.strip() for line in accession_file][options["offset"] :]
+
+            surveyed_since = None
+            if options["surveyed_since"]:
+                surveyed_since = parse_datetime(options["surveyed_since"]) or parse_date(
+                    options["surveyed_since"]
+                )
+
+            runner = SurveyRunner(run_surveyor_for_accession, workers=options["workers"])
+            runner.run(
+                accessions, skip_surveyed=options["skip_surveyed"], surveyed_since=surveyed_since,
+            )
 
         if options["accession"]:
             accession = options["accession"]
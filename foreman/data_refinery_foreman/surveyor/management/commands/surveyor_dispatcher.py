@@ -3,7 +3,6 @@ in the experiment_list. experiment list should be a file containing
 one experiment accession code per line.
 """
 
-import time
 import uuid
 
 from django.core.management.base import BaseCommand
@@ -14,6 +13,11 @@ import botocore
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import SurveyJob, SurveyJobKeyValue
 from data_refinery_common.utils import parse_s3_url
+from data_refinery_foreman.surveyor.survey_runner import (
+    SOURCE_HOSTS,
+    get_host_buckets,
+    get_source_type_for_accession,
+)
 
 logger = get_and_configure_logger(__name__)
 
@@ -22,19 +26,10 @@ SURVEYOR_JOB_NAME = "SURVEYOR_256"
 
 def set_source_type_for_accession(survey_job, accession: str) -> None:
     """Type a surveyor based on accession structure"""
-    if "GSE" in accession[:3]:
-        survey_job.source_type = "GEO"
-        survey_job.save()
-        return
-    elif "E-" in accession[:2]:
-        survey_job.source_type = "ARRAY_EXPRESS"
-        survey_job.save()
-        return
-    elif " " in accession:
-
-        survey_job.source_type = "TRANSCRIPTOME_INDEX"
-        survey_job.save()
+    survey_job.source_type = get_source_type_for_accession(accession)
+    survey_job.save()
 
+    if survey_job.source_type == "TRANSCRIPTOME_INDEX":
         args = accession.split(",")
         # Allow organism to be unspecified so we survey the entire division.
         organism_name = args[0] if len(args[0]) > 0 else None
@@ -53,12 +48,6 @@ def set_source_type_for_accession(survey_job, accession: str) -> None:
             )
             key_value_pair.save()
 
-        return
-    else:
-        survey_job.source_type = "SRA"
-        survey_job.save()
-        return
-
 
 def queue_surveyor_for_accession(accession: str) -> None:
     """Dispatches a surveyor job for the accession code."""
@@ -113,18 +102,19 @@ Note: One entry per line, GSE* entries survey GEO, E-GEO-* entries survey ArrayE
         else:
             filepath = options["file"]
 
+        # Space out each source's jobs so they don't all start at the
+        # exact same time and overload the database or the source.
+        buckets = get_host_buckets()
+
         with open(filepath) as accession_file:
             for i, accession in enumerate(accession_file):
                 if i < options["offset"]:
                     continue
                 accession = accession.strip()
                 try:
+                    buckets[SOURCE_HOSTS[get_source_type_for_accession(accession)]].acquire()
+
                     logger.info(f"Queuing surveyor job for {accession}.")
                     queue_surveyor_for_accession(accession)
-
-                    # Sleep for 30 seconds so all surveyor jobs don't
-                    # start at the exact same time and overload the
-                    # database or ENA.
-                    time.sleep(30)
                 except Exception as e:
                     logger.exception(e)
@@ -0,0 +1,220 @@
+"""Writing what a surveyor discovers to the database in bulk.
+
+Surveying an experiment used to save every sample, original file and
+association as soon as it was found, which is tens of thousands of
+queries for a big GEO series. SurveyWriter collects them instead,
+looks up the ones that already exist with one query per model, and
+inserts everything else with bulk_create in one transaction when it's
+flushed. Nothing has an id until then. Flushing also forgets everything
+that was written, so flushing a batch at a time keeps memory bounded.
+"""
+
+from typing import Dict, Iterable
+
+from django.db import transaction
+
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.models import (
+    ExperimentOrganismAssociation,
+    ExperimentSampleAssociation,
+    Organism,
+    OriginalFile,
+    OriginalFileSampleAssociation,
+    Sample,
+    SampleAnnotation,
+)
+
+logger = get_and_configure_logger(__name__)
+
+# How many rows to insert per query.
+BULK_CREATE_BATCH_SIZE = 1000
+
+
+def _get_file_key(fields: Dict):
+    return tuple(sorted(fields.items()))
+
+
+class SurveyWriter:
+    def __init__(self):
+        self.samples = {}
+        self.new_samples = []
+        self.sample_annotations = []
+        self.organisms = {}
+
+        self.original_files = {}
+        self.new_original_files = []
+        self.original_file_samples = []
+        self.experiment_samples = []
+        self.experiment_organisms = []
+
+    def load_existing_samples(self, accession_codes: Iterable[str]) -> None:
+        """Looks up which of `accession_codes` already have samples, all at once."""
+        missing = {code for code in accession_codes if code not in self.samples}
+        # Remember the ones that don't exist too, so get_sample doesn't look them up again.
+        self.samples.update(dict.fromkeys(missing))
+        for sample in Sample.objects.filter(accession_code__in=missing).select_related("organism"):
+            self.samples[sample.accession_code] = sample
+
+    def get_sample(self, accession_code: str) -> Sample:
+        """Returns the sample for `accession_code` if it exists or has been added, otherwise None.
+
+        Samples that load_existing_samples didn't look up are looked up
+        one at a time.
+        """
+        if accession_code not in self.samples:
+            self.samples[accession_code] = Sample.objects.filter(
+                accession_code=accession_code
+            ).first()
+
+        return self.samples[accession_code]
+
+    def add_sample(self, sample: Sample, annotation_data: Dict = None) -> None:
+        """Adds a new sample, and the metadata to annotate it with if there is any."""
+        self.samples[sample.accession_code] = sample
+        self.new_samples.append(sample)
+
+        if annotation_data is not None:
+            self.sample_annotations.append((sample, annotation_data))
+
+    def update_sample(self, sample: Sample) -> None:
+        """Saves changes to a sample, unless it's new and flush() will save it anyway."""
+        if sample.pk:
+            sample.save()
+
+    def get_organism(self, name: str) -> Organism:
+        """Organism.get_object_for_name, but only once per name."""
+        if name not in self.organisms:
+            self.organisms[name] = Organism.get_object_for_name(name)
+
+        return self.organisms[name]
+
+    def get_original_file(self, **fields) -> OriginalFile:
+        """Like OriginalFile.objects.get_or_create(**fields)[0], except
+        that a file that doesn't exist yet won't be created until
+        flush()."""
+        key = _get_file_key(fields)
+        if key not in self.original_files:
+            self.original_files[key] = OriginalFile(**fields)
+
+        return self.original_files[key]
+
+    def add_original_file(self, original_file: OriginalFile) -> None:
+        """Adds a file that should be created even if there's already one like it."""
+        self.new_original_files.append(original_file)
+
+    def add_original_file_sample(self, original_file: OriginalFile, sample: Sample) -> None:
+        self.original_file_samples.append((original_file, sample))
+
+    def add_experiment_sample(self, experiment, sample: Sample) -> None:
+        self.experiment_samples.append((experiment, sample))
+
+    def add_experiment_organism(self, experiment, organism: Organism) -> None:
+        self.experiment_organisms.append((experiment, organism))
+
+    def _resolve_original_files(self) -> None:
+        """Swaps in the files that already exist and creates the rest."""
+        new_files = list(self.new_original_files)
+
+        keys_by_url = {}
+        for key in self.original_files:
+            keys_by_url.setdefault(dict(key)["source_url"], []).append(key)
+
+        existing = {}
+        for original_file in OriginalFile.objects.filter(source_url__in=keys_by_url).order_by("id"):
+            for key in keys_by_url[original_file.source_url]:
+                if key not in existing and all(
+                    getattr(original_file, field) == value for field, value in key
+                ):
+                    existing[key] = original_file
+
+        for key, original_file in self.original_files.items():
+            if key in existing:
+                # Turn the placeholder into the file that already
+                # exists, since associations have been added with it.
+                existing_file = existing[key]
+                for field in OriginalFile._meta.concrete_fields:
+                    setattr(original_file, field.attname, getattr(existing_file, field.attname))
+                original_file._state.adding = False
+                original_file._state.db = existing_file._state.db
+            else:
+                new_files.append(original_file)
+
+        OriginalFile.objects.bulk_create(new_files, batch_size=BULK_CREATE_BATCH_SIZE)
+
+    def _create_samples(self) -> None:
+        """Creates the new samples, using the ones that already exist
+        if another survey created them since they were looked up."""
+        Sample.objects.bulk_create(
+            self.new_samples, batch_size=BULK_CREATE_BATCH_SIZE, ignore_conflicts=True
+        )
+
+        # Samples created while ignoring conflicts don't get their ids set.
+        sample_ids = dict(
+            Sample.objects.filter(
+                accession_code__in=[sample.accession_code for sample in self.new_samples]
+            ).values_list("accession_code", "id")
+        )
+        for sample in self.new_samples:
+            sample.id = sample_ids[sample.accession_code]
+            sample._state.adding = False
+
+    def flush(self) -> None:
+        """Writes everything that's been added in one transaction.
+
+        Afterwards only the organisms are remembered. Samples and files
+        that were written are looked up again if they're needed.
+        """
+        with transaction.atomic():
+            self._create_samples()
+            SampleAnnotation.objects.bulk_create(
+                [
+                    SampleAnnotation(sample=sample, data=data, is_ccdl=False)
+                    for sample, data in self.sample_annotations
+                ],
+                batch_size=BULK_CREATE_BATCH_SIZE,
+            )
+
+            self._resolve_original_files()
+
+            # Any of these could already exist.
+            OriginalFileSampleAssociation.objects.bulk_create(
+                [
+                    OriginalFileSampleAssociation(original_file_id=file.id, sample_id=sample.id)
+                    for file, sample in self.original_file_samples
+                ],
+                batch_size=BULK_CREATE_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            ExperimentSampleAssociation.objects.bulk_create(
+                [
+                    ExperimentSampleAssociation(experiment=experiment, sample_id=sample.id)
+                    for experiment, sample in self.experiment_samples
+                ],
+                batch_size=BULK_CREATE_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            ExperimentOrganismAssociation.objects.bulk_create(
+                [
+                    ExperimentOrganismAssociation(experiment=experiment, organism=organism)
+                    for experiment, organism in self.experiment_organisms
+                ],
+                batch_size=BULK_CREATE_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+
+        logger.debug(
+            "Saved surveyed objects.",
+            samples=len(self.new_samples),
+            original_files=len(self.original_files) + len(self.new_original_files),
+            original_file_samples=len(self.original_file_samples),
+            experiment_samples=len(self.experiment_samples),
+        )
+
+        self.samples = {}
+        self.new_samples = []
+        self.sample_annotations = []
+        self.original_files = {}
+        self.new_original_files = []
+        self.original_file_samples = []
+        self.experiment_samples = []
+        self.experiment_organisms = []
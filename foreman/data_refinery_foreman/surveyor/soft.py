@@ -0,0 +1,138 @@
+"""Streaming the metadata out of GEO's SOFT files.
+
+GEOparse parses a whole family SOFT file into memory, including every
+sample's data table, even though surveying only needs the metadata.
+For series with tens of thousands of samples the tables are nearly all
+of the file. These parsers read a file a line at a time, skip the
+tables and yield one entry's metadata at a time, parsed the same way
+GEOparse parses it so the rest of the surveyor can't tell the
+difference.
+"""
+
+import gzip
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+ENTRY_PREFIX = "^"
+METADATA_PREFIX = "!"
+COLUMN_PREFIX = "#"
+
+METADATA_PREFIX_PATTERN = re.compile(r"!\w*?_")
+
+
+class SoftEntry:
+    """One ^SERIES, ^PLATFORM or ^SAMPLE entry from a SOFT file, without its data table.
+
+    `metadata` maps keys like `title` or `characteristics_ch1` to lists
+    of values, like GEOparse's `metadata`. `column_names` lists the
+    columns of its data table.
+    """
+
+    def __init__(self, entry_type: str, name: str):
+        self.entry_type = entry_type
+        self.name = name
+        self.metadata = {}
+        self.column_names = []
+
+
+def _parse_line(line: str) -> Tuple[str, str]:
+    """Splits a ^, ! or # line into its key and value like GEOparse does."""
+    if line.startswith(METADATA_PREFIX):
+        line = METADATA_PREFIX_PATTERN.sub("", line)
+    else:
+        line = line.strip()[1:]
+
+    key, _, value = line.partition("=")
+    return key.strip(), value.strip()
+
+
+def iter_entries(lines: Iterable[str]) -> Iterator[SoftEntry]:
+    """Yields each entry in the SOFT file that `lines` come from, in order."""
+    entry = None
+    in_table = False
+    for line in lines:
+        line = line.rstrip()
+
+        if in_table:
+            if line.startswith(METADATA_PREFIX) and "_table_end" in line:
+                in_table = False
+            continue
+
+        if line.startswith(ENTRY_PREFIX):
+            if entry:
+                yield entry
+
+            entry = SoftEntry(*_parse_line(line))
+            entry.entry_type = entry.entry_type.upper()
+        elif entry is None:
+            continue
+        elif line.startswith(METADATA_PREFIX):
+            if "_table_begin" in line:
+                in_table = True
+            elif "_table_end" not in line:
+                key, value = _parse_line(line)
+                entry.metadata.setdefault(key, []).append(value)
+        elif line.startswith(COLUMN_PREFIX):
+            entry.column_names.append(_parse_line(line)[0])
+
+    if entry:
+        yield entry
+
+
+def open_soft_file(path: str):
+    """Opens a SOFT file, gzipped or not, the way GEOparse does."""
+    if path.endswith("gz"):
+        return gzip.open(path, "rt", errors="ignore")
+
+    return open(path, "r", errors="ignore")
+
+
+class SeriesFile:
+    """A family SOFT file for a series.
+
+    The series' own entry comes before its platforms and samples, so
+    `metadata` is available as soon as it's opened and the samples can
+    be read afterwards without holding them all in memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open_soft_file(path)
+        self._entries = iter_entries(self._file)
+
+        self.name = None
+        self.metadata = {}
+        for entry in self._entries:
+            if entry.entry_type == "SERIES":
+                self.name = entry.name
+                self.metadata = entry.metadata
+                break
+
+    def iter_samples(self) -> Iterator[SoftEntry]:
+        """Yields each sample entry. Can only be read through once."""
+        try:
+            for entry in self._entries:
+                if entry.entry_type == "SAMPLE":
+                    yield entry
+        finally:
+            self.close()
+
+    def iter_sample_batches(self, batch_size: int) -> Iterator[List[SoftEntry]]:
+        batch = []
+        for sample in self.iter_samples():
+            batch.append(sample)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
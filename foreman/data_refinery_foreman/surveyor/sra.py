@@ -7,28 +7,19 @@ from django.utils.dateparse import parse_date
 
 from data_refinery_common.enums import Downloaders
 from data_refinery_common.logging import get_and_configure_logger
-from data_refinery_common.models import (
-    Experiment,
-    ExperimentAnnotation,
-    ExperimentOrganismAssociation,
-    ExperimentSampleAssociation,
-    Organism,
-    OriginalFile,
-    OriginalFileSampleAssociation,
-    Sample,
-    SurveyJob,
-)
+from data_refinery_common.models import Experiment, ExperimentAnnotation, Sample, SurveyJob
 from data_refinery_common.rna_seq import _build_ena_file_url
 from data_refinery_common.utils import get_fasp_sra_download
 from data_refinery_foreman.surveyor import harmony, utils
+from data_refinery_foreman.surveyor.ena import EnaFetcher
 from data_refinery_foreman.surveyor.external_source import ExternalSourceSurveyor
+from data_refinery_foreman.surveyor.persistence import SurveyWriter
 
 logger = get_and_configure_logger(__name__)
 
 
 DOWNLOAD_SOURCE = "NCBI"  # or "ENA". Change this to download from NCBI (US) or ENA (UK).
 ENA_URL_TEMPLATE = "https://www.ebi.ac.uk/ena/browser/view/{}"
-ENA_METADATA_URL_TEMPLATE = "https://www.ebi.ac.uk/ena/browser/api/xml/{}"
 NCBI_DOWNLOAD_URL_TEMPLATE = (
     "anonftp@ftp.ncbi.nlm.nih.gov:/sra/sra-instant/reads/ByRun/sra/"
     "{first_three}/{first_six}/{accession}/{accession}.sra"
@@ -62,11 +53,8 @@ class SraSurveyor(ExternalSourceSurveyor):
         return Downloaders.SRA.value
 
     @staticmethod
-    def gather_submission_metadata(metadata: Dict) -> None:
-
-        formatted_metadata_URL = ENA_METADATA_URL_TEMPLATE.format(metadata["submission_accession"])
-        response = utils.requests_retry_session().get(formatted_metadata_URL)
-        submission_xml = ET.fromstring(response.text)[0]
+    def gather_submission_metadata(metadata: Dict, fetcher: EnaFetcher) -> None:
+        submission_xml = fetcher.get_xml(metadata["submission_accession"])[0]
         submission_metadata = submission_xml.attrib
 
         # We already have these
@@ -123,10 +111,8 @@ class SraSurveyor(ExternalSourceSurveyor):
                         read_spec_counter = read_spec_counter + 1
 
     @staticmethod
-    def gather_experiment_metadata(metadata: Dict) -> None:
-        formatted_metadata_URL = ENA_METADATA_URL_TEMPLATE.format(metadata["experiment_accession"])
-        response = utils.requests_retry_session().get(formatted_metadata_URL)
-        experiment_xml = ET.fromstring(response.text)
+    def gather_experiment_metadata(metadata: Dict, fetcher: EnaFetcher) -> None:
+        experiment_xml = fetcher.get_xml(metadata["experiment_accession"])
 
         experiment = experiment_xml[0]
         for child in experiment:
@@ -182,18 +168,15 @@ class SraSurveyor(ExternalSourceSurveyor):
         return (key, value)
 
     @staticmethod
-    def gather_run_metadata(run_accession: str) -> Dict:
+    def gather_run_metadata(run_accession: str, fetcher: EnaFetcher) -> Dict:
         """A run refers to a specific read in an experiment."""
 
         discoverable_accessions = ["study_accession", "sample_accession", "submission_accession"]
 
-        response = utils.requests_retry_session().get(
-            ENA_METADATA_URL_TEMPLATE.format(run_accession)
-        )
         try:
-            run_xml = ET.fromstring(response.text)
-        except Exception:
-            logger.exception("Unable to decode response", response=response.text)
+            run_xml = fetcher.get_xml(run_accession)
+        except ET.ParseError:
+            # The fetcher logs the response.
             return {}
 
         # Necessary because ERP000263 has only one ROOT element containing this error:
@@ -226,10 +209,8 @@ class SraSurveyor(ExternalSourceSurveyor):
         return metadata
 
     @staticmethod
-    def gather_sample_metadata(metadata: Dict) -> None:
-        formatted_metadata_URL = ENA_METADATA_URL_TEMPLATE.format(metadata["sample_accession"])
-        response = utils.requests_retry_session().get(formatted_metadata_URL)
-        sample_xml = ET.fromstring(response.text)
+    def gather_sample_metadata(metadata: Dict, fetcher: EnaFetcher) -> None:
+        sample_xml = fetcher.get_xml(metadata["sample_accession"])
 
         sample = sample_xml[0]
 
@@ -251,10 +232,8 @@ class SraSurveyor(ExternalSourceSurveyor):
                     metadata[key] = value
 
     @staticmethod
-    def gather_study_metadata(metadata: Dict) -> None:
-        formatted_metadata_URL = ENA_METADATA_URL_TEMPLATE.format(metadata["study_accession"])
-        response = utils.requests_retry_session().get(formatted_metadata_URL)
-        study_xml = ET.fromstring(response.text)
+    def gather_study_metadata(metadata: Dict, fetcher: EnaFetcher) -> None:
+        study_xml = fetcher.get_xml(metadata["study_accession"])
 
         study = study_xml[0]
         for child in study:
@@ -294,17 +273,43 @@ class SraSurveyor(ExternalSourceSurveyor):
                         break
 
     @staticmethod
-    def gather_all_metadata(run_accession):
-        metadata = SraSurveyor.gather_run_metadata(run_accession)
+    def gather_all_metadata(run_accession, fetcher: EnaFetcher = None):
+        """Gathers the metadata of a run and everything it links to.
+
+        Pass the same `fetcher` for every run of a study so the
+        documents they share are only fetched once.
+        """
+        fetcher = fetcher or EnaFetcher()
+        metadata = SraSurveyor.gather_run_metadata(run_accession, fetcher)
 
         if metadata != {}:
-            SraSurveyor.gather_experiment_metadata(metadata)
-            SraSurveyor.gather_sample_metadata(metadata)
-            SraSurveyor.gather_study_metadata(metadata)
-            SraSurveyor.gather_submission_metadata(metadata)
+            SraSurveyor.gather_experiment_metadata(metadata, fetcher)
+            SraSurveyor.gather_sample_metadata(metadata, fetcher)
+            SraSurveyor.gather_study_metadata(metadata, fetcher)
+            SraSurveyor.gather_submission_metadata(metadata, fetcher)
 
         return metadata
 
+    @staticmethod
+    def prefetch_metadata(run_accessions: List[str], fetcher: EnaFetcher) -> None:
+        """Fetches the documents for all of `run_accessions`, and everything
+        they link to, in batches ahead of time."""
+        fetcher.prefetch(run_accessions)
+
+        linked_accessions = set()
+        for run_accession in run_accessions:
+            metadata = SraSurveyor.gather_run_metadata(run_accession, fetcher)
+            for key in [
+                "experiment_accession",
+                "sample_accession",
+                "study_accession",
+                "submission_accession",
+            ]:
+                if key in metadata:
+                    linked_accessions.add(metadata[key])
+
+        fetcher.prefetch(linked_accessions)
+
     @staticmethod
     def _build_ncbi_file_url(run_accession: str):
         """Build the path to the hypothetical .sra file we want"""
@@ -331,7 +336,7 @@ class SraSurveyor(ExternalSourceSurveyor):
     @staticmethod
     def _apply_harmonized_metadata_to_sample(sample: Sample, metadata: dict):
         """Harmonizes the metadata and applies it to `sample`"""
-        harmonizer = harmony.Harmonizer()
+        harmonizer = harmony.get_harmonizer()
         harmonized_sample = harmonizer.harmonize_sample(metadata)
         for key, value in harmonized_sample.items():
             setattr(sample, key, value)
@@ -388,10 +393,22 @@ class SraSurveyor(ExternalSourceSurveyor):
             experiment.publication_authors = pubmed_metadata[1]
 
     def _generate_experiment_and_samples(
-        self, run_accession: str, study_accession: str = None
+        self,
+        run_accession: str,
+        study_accession: str = None,
+        fetcher: EnaFetcher = None,
+        writer: SurveyWriter = None,
     ) -> (Experiment, List[Sample]):
-        """Generates Experiments and Samples for the provided run_accession."""
-        metadata = SraSurveyor.gather_all_metadata(run_accession)
+        """Generates Experiments and Samples for the provided run_accession.
+
+        If `writer` is given, the samples are added to it and won't be
+        saved until it's flushed.
+        """
+        should_flush = writer is None
+        if writer is None:
+            writer = SurveyWriter()
+
+        metadata = SraSurveyor.gather_all_metadata(run_accession, fetcher)
 
         if metadata == {}:
             if study_accession:
@@ -422,7 +439,7 @@ class SraSurveyor(ExternalSourceSurveyor):
             return (None, None)  # This will cascade properly
 
         organism_name = organism_name.upper()
-        organism = Organism.get_object_for_name(organism_name)
+        organism = writer.get_organism(organism_name)
 
         ##
         # Experiment
@@ -457,8 +474,8 @@ class SraSurveyor(ExternalSourceSurveyor):
 
         sample_accession_code = metadata.pop("run_accession")
         # Create the sample object
-        try:
-            sample_object = Sample.objects.get(accession_code=sample_accession_code)
+        sample_object = writer.get_sample(sample_accession_code)
+        if sample_object:
             # If current experiment includes new protocol information,
             # merge it into the sample's existing protocol_info.
             protocol_info, is_updated = self.update_sample_protocol_info(
@@ -468,7 +485,7 @@ class SraSurveyor(ExternalSourceSurveyor):
             )
             if is_updated:
                 sample_object.protocol_info = protocol_info
-                sample_object.save()
+                writer.update_sample(sample_object)
 
             logger.debug(
                 "Sample %s already exists, skipping object creation.",
@@ -476,7 +493,7 @@ class SraSurveyor(ExternalSourceSurveyor):
                 experiment_accession_code=experiment_object.accession_code,
                 survey_job=self.survey_job.id,
             )
-        except Sample.DoesNotExist:
+        else:
             sample_object = Sample()
             sample_object.source_database = "SRA"
             sample_object.accession_code = sample_accession_code
@@ -508,24 +525,20 @@ class SraSurveyor(ExternalSourceSurveyor):
             # save a list so we can append to it later.
             sample_object.protocol_info = protocol_info
 
-            sample_object.save()
+            writer.add_sample(sample_object)
 
             for file_url in files_urls:
-                original_file = OriginalFile.objects.get_or_create(
+                original_file = writer.get_original_file(
                     source_url=file_url, source_filename=file_url.split("/")[-1], has_raw=True
-                )[0]
-                OriginalFileSampleAssociation.objects.get_or_create(
-                    original_file=original_file, sample=sample_object
                 )
+                writer.add_original_file_sample(original_file, sample_object)
 
         # Create associations if they don't already exist
-        ExperimentSampleAssociation.objects.get_or_create(
-            experiment=experiment_object, sample=sample_object
-        )
+        writer.add_experiment_sample(experiment_object, sample_object)
+        writer.add_experiment_organism(experiment_object, organism)
 
-        ExperimentOrganismAssociation.objects.get_or_create(
-            experiment=experiment_object, organism=organism
-        )
+        if should_flush:
+            writer.flush()
 
         return experiment_object, [sample_object]
 
@@ -557,15 +570,17 @@ class SraSurveyor(ExternalSourceSurveyor):
 
         # SRA Surveyor is mainly designed for SRRs, this handles SRPs
         if "SRP" in accession or "ERP" in accession or "DRP" in accession:
-            response = utils.requests_retry_session().get(
-                ENA_METADATA_URL_TEMPLATE.format(accession)
-            )
+            fetcher = EnaFetcher()
+            response = fetcher.get_response(accession)
 
             # If the status code is 404, then SRA doesn't know about this accession
             if response.status_code == 404:
                 return None, None
 
-            experiment_xml = ET.fromstring(response.text)[0]
+            study_xml = ET.fromstring(response.text)
+            # Every run's metadata needs this too.
+            fetcher.remember(accession, study_xml)
+            experiment_xml = study_xml[0]
             study_links = experiment_xml[2]  # STUDY_LINKS
 
             accessions_to_run = []
@@ -590,6 +605,11 @@ class SraSurveyor(ExternalSourceSurveyor):
                             accessions_to_run.append(accession[0] + "RR" + run_id)
                     break
 
+            SraSurveyor.prefetch_metadata(accessions_to_run, fetcher)
+
+            writer = SurveyWriter()
+            writer.load_existing_samples(accessions_to_run)
+
             experiment = None
             all_samples = []
             for run_id in accessions_to_run:
@@ -601,7 +621,7 @@ class SraSurveyor(ExternalSourceSurveyor):
                 )
 
                 returned_experiment, samples = self._generate_experiment_and_samples(
-                    run_id, accession
+                    run_id, accession, fetcher, writer
                 )
 
                 # Some runs may return (None, None). If this happens
@@ -612,6 +632,8 @@ class SraSurveyor(ExternalSourceSurveyor):
                 if samples:
                     all_samples += samples
 
+            writer.flush()
+
             # So we prevent duplicate downloads, ex for SRP111553
             all_samples = list(set(all_samples))
 
@@ -0,0 +1,254 @@
+"""Surveying long lists of accessions in parallel.
+
+Surveys spend nearly all of their time waiting on NCBI, EBI or Ensembl,
+so SurveyRunner runs several at once on a pool of threads. Rather than
+sleeping between accessions, each host gets a token bucket limiting how
+many surveys can start against it per minute, so a list mixing sources
+isn't held to the slowest host's pace.
+
+Every accession that's been surveyed successfully is recorded as a
+SurveyedAccession as soon as its survey finishes, so an interrupted run
+can be started again with the same list and told to skip what's already
+been surveyed to pick up where it left off.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List
+
+from django.db import connection
+from django.utils import timezone
+
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.models import SurveyedAccession, SurveyJob
+
+logger = get_and_configure_logger(__name__)
+
+# Which host each kind of survey spends its time fetching from.
+SOURCE_HOSTS = {
+    "GEO": "NCBI",
+    "SRA": "EBI",
+    "ARRAY_EXPRESS": "EBI",
+    "TRANSCRIPTOME_INDEX": "ENSEMBL",
+}
+
+# How many surveys can start against each host per minute. A survey
+# makes many requests, so these are well under the hosts' own limits.
+HOST_SURVEYS_PER_MINUTE = {
+    "NCBI": 20,
+    "EBI": 20,
+    "ENSEMBL": 4,
+}
+
+DEFAULT_WORKERS = 8
+
+# How often to log how fast each source is going.
+REPORT_INTERVAL = 60 * 10
+
+# How many accessions to check against SurveyedAccession per query.
+CHECKPOINT_PAGE_SIZE = 1000
+
+
+def get_source_type_for_accession(accession: str) -> str:
+    """Determines which surveyor an accession needs from its structure."""
+    if "GSE" in accession[:3]:
+        return "GEO"
+    elif "E-" in accession[:2]:
+        return "ARRAY_EXPRESS"
+    elif " " in accession:
+        return "TRANSCRIPTOME_INDEX"
+    else:
+        return "SRA"
+
+
+class TokenBucket:
+    """Lets `rate` things happen per second on average, with bursts of
+    up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+
+        self.tokens = capacity
+        self.last_refill = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self) -> None:
+        """Takes a token, waiting for one if there aren't any."""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            self.sleep(wait)
+
+
+def get_host_buckets(host_surveys_per_minute=HOST_SURVEYS_PER_MINUTE) -> Dict[str, TokenBucket]:
+    return {
+        host: TokenBucket(surveys_per_minute / 60)
+        for host, surveys_per_minute in host_surveys_per_minute.items()
+    }
+
+
+def get_surveyed_accessions(accessions: List[str], surveyed_since=None) -> set:
+    """Returns which of `accessions` have been surveyed, optionally only
+    counting surveys since `surveyed_since`."""
+    surveyed = set()
+    for page_start in range(0, len(accessions), CHECKPOINT_PAGE_SIZE):
+        page = accessions[page_start : page_start + CHECKPOINT_PAGE_SIZE]
+        surveyed_accessions = SurveyedAccession.objects.filter(accession_code__in=page)
+        if surveyed_since:
+            surveyed_accessions = surveyed_accessions.filter(last_surveyed_at__gte=surveyed_since)
+
+        surveyed.update(surveyed_accessions.values_list("accession_code", flat=True))
+
+    return surveyed
+
+
+def record_surveyed_accession(accession: str) -> None:
+    """Checkpoints `accession`, moving its last survey time up if it's been surveyed before."""
+    now = timezone.now()
+    SurveyedAccession.objects.bulk_create(
+        [SurveyedAccession(accession_code=accession, created_at=now, last_surveyed_at=now)],
+        ignore_conflicts=True,
+    )
+    SurveyedAccession.objects.filter(accession_code=accession).update(last_surveyed_at=now)
+
+
+class SurveyRunner:
+    """Runs `survey_function` on accessions with a pool of `workers` threads.
+
+    `survey_function` returns the accession's SurveyJob, which says
+    whether the survey succeeded.
+    """
+
+    def __init__(
+        self,
+        survey_function: Callable[[str], SurveyJob],
+        workers: int = DEFAULT_WORKERS,
+        host_surveys_per_minute=HOST_SURVEYS_PER_MINUTE,
+    ):
+        self.survey_function = survey_function
+        self.workers = workers
+        self.buckets = get_host_buckets(host_surveys_per_minute)
+
+        self.lock = threading.Lock()
+        self.completed = {}
+        self.failed = {}
+        self.start_time = None
+        self.last_report_time = None
+
+    def get_rates(self) -> Dict[str, float]:
+        """Returns how many accessions of each source have been surveyed per hour."""
+        hours = max(time.monotonic() - self.start_time, 1) / (60 * 60)
+        with self.lock:
+            return {source: count / hours for source, count in self.completed.items()}
+
+    def report(self) -> None:
+        rates = self.get_rates()
+        logger.info(
+            "Survey runner progress.",
+            completed=dict(self.completed),
+            failed=dict(self.failed),
+            accessions_per_hour={source: round(rate, 1) for source, rate in rates.items()},
+        )
+
+    def _survey(self, accession: str) -> None:
+        source_type = get_source_type_for_accession(accession)
+        self.buckets[SOURCE_HOSTS[source_type]].acquire()
+
+        try:
+            survey_job = self.survey_function(accession)
+            # Surveyors catch their own exceptions and mark the job failed.
+            succeeded = bool(survey_job and survey_job.success)
+            if succeeded:
+                record_surveyed_accession(accession)
+            else:
+                logger.error("Survey failed.", accession=accession)
+        except Exception:
+            logger.exception("Exception caught while surveying accession.", accession=accession)
+            succeeded = False
+
+        if not succeeded:
+            with self.lock:
+                self.failed[source_type] = self.failed.get(source_type, 0) + 1
+            return
+
+        with self.lock:
+            self.completed[source_type] = self.completed.get(source_type, 0) + 1
+
+            should_report = time.monotonic() - self.last_report_time > REPORT_INTERVAL
+            if should_report:
+                self.last_report_time = time.monotonic()
+
+        if should_report:
+            self.report()
+
+    def _work(self, accession_queue: queue.Queue) -> None:
+        try:
+            while True:
+                try:
+                    accession = accession_queue.get_nowait()
+                except queue.Empty:
+                    return
+
+                self._survey(accession)
+        finally:
+            # Each thread has its own database connection.
+            connection.close()
+
+    def run(
+        self, accessions: Iterable[str], skip_surveyed=False, surveyed_since=None
+    ) -> Dict[str, int]:
+        """Surveys every one of `accessions`.
+
+        If `skip_surveyed` is set, accessions that have already been
+        surveyed are skipped, unless they were surveyed before
+        `surveyed_since`. Returns how many accessions of each source
+        were surveyed.
+        """
+        accessions = list(dict.fromkeys(accession for accession in accessions if accession))
+        if skip_surveyed:
+            surveyed = get_surveyed_accessions(accessions, surveyed_since)
+        else:
+            surveyed = set()
+        logger.info(
+            "Starting survey runner.",
+            accessions=len(accessions),
+            already_surveyed=len(surveyed),
+            workers=self.workers,
+        )
+
+        accession_queue = queue.Queue()
+        for accession in accessions:
+            if accession not in surveyed:
+                accession_queue.put(accession)
+
+        self.completed = {}
+        self.failed = {}
+        self.start_time = time.monotonic()
+        self.last_report_time = self.start_time
+
+        threads = [
+            threading.Thread(target=self._work, args=(accession_queue,))
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.report()
+        return dict(self.completed)
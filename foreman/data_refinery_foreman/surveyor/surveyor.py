@@ -1,10 +1,12 @@
 import signal
 import sys
+import threading
 
 from django.utils import timezone
 
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import SurveyJob, SurveyJobKeyValue
+from data_refinery_foreman.surveyor import http_cache
 from data_refinery_foreman.surveyor.array_express import ArrayExpressSurveyor
 from data_refinery_foreman.surveyor.geo import GeoSurveyor
 from data_refinery_foreman.surveyor.sra import SraSurveyor
@@ -52,15 +54,20 @@ def _start_job(survey_job: SurveyJob) -> SurveyJob:
         "Starting Survey Job for source type: %s.", survey_job.source_type, survey_job=survey_job.id
     )
 
-    # Set up the SIGTERM handler so we can appropriately handle being interrupted.
-    signal.signal(signal.SIGTERM, signal_handler)
-    signal.signal(signal.SIGINT, signal_handler)
-
     survey_job.start_time = timezone.now()
     survey_job.save()
 
-    global CURRENT_JOB
-    CURRENT_JOB = survey_job
+    http_cache.reset_stats()
+
+    # Set up the SIGTERM handler so we can appropriately handle being
+    # interrupted. Only the main thread can, so jobs being run by a
+    # SurveyRunner are left to be found as lost jobs instead.
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, signal_handler)
+        signal.signal(signal.SIGINT, signal_handler)
+
+        global CURRENT_JOB
+        CURRENT_JOB = survey_job
 
     return survey_job
 
@@ -69,6 +76,12 @@ def _end_job(survey_job: SurveyJob, success=True) -> SurveyJob:
     """Ends survey job, setting success and time properties."""
     survey_job.success = success
     survey_job.end_time = timezone.now()
+
+    cache_stats = http_cache.get_stats()
+    survey_job.http_cache_hits = cache_stats["hits"]
+    survey_job.http_cache_misses = cache_stats["misses"]
+    logger.debug("Surveyor cache stats.", survey_job=survey_job.id, **cache_stats)
+
     survey_job.save()
 
     return survey_job
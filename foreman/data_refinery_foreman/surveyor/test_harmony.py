@@ -1,3 +1,5 @@
+import time
+
 from django.test import TestCase, tag
 
 import GEOparse
@@ -10,6 +12,7 @@ from data_refinery_foreman.surveyor.harmony import (
     Harmonizer,
     determine_title_field,
     extract_title,
+    get_harmonizer,
     harmonize_all_samples,
     parse_sdrf,
     preprocess_geo_sample,
@@ -374,3 +377,102 @@ class HarmonyTestCase(TestCase):
         # So if this doesn't raise a KeyError, then we're good.
         for title in json_titles:
             sdrf_samples[title]
+
+
+# Shaped like the ArrayExpress, SRA and GEO examples at the top of harmony.py.
+BENCHMARK_FIXTURES = [
+    {
+        "Characteristics[age]": "38",
+        "Characteristics[developmental stage]": "adult",
+        "Characteristics[organism part]": "islet",
+        "Characteristics[sex]": "male",
+        "Factor Value[individual]": "B",
+        "Material Type": "cell",
+        "Source Name": "donor B islets",
+        "Unit [time unit]": "year",
+    },
+    {
+        "alias": "GSM2997959_r1",
+        "library_layout": "PAIRED",
+        "organism_name": "HOMO SAPIENS",
+        "sample_cell_type": "Immortalized normal ovarian fibroblast",
+        "sample_source_name": "INOF cell line",
+        "sample_title": "INOF_FRT",
+        "sample_treatment": "none",
+        "study_title": "Simultaneous detection and relative quantification",
+    },
+    {
+        "age": "65",
+        "cell type": "keratinocyte",
+        "gender": "female",
+        "immunosuppressive drugs": "azathioprine + prednison",
+        "patient": "P-39",
+        "sample type": "squamous cell carcinoma",
+        "source_name_ch1": "cutaneous squamous cell carcinoma",
+        "title": "SCC_P-39",
+    },
+]
+
+
+def harmonize_sample_per_field(harmonizer: Harmonizer, sample_metadata, title_field=None):
+    """Harmonizes a sample by checking every key against every field in turn."""
+    harmonized_sample = {"title": extract_title(sample_metadata, title_field)}
+    for field in Harmonizer.FIELDS:
+        field_name = field.split("_fields")[0]
+        for key, value in sample_metadata.items():
+            if key.lower().strip() in getattr(harmonizer, field):
+                harmonized_value = harmonizer.harmonize_value(field_name, value)
+                if harmonized_value:
+                    harmonized_sample[field_name] = harmonized_value
+                    break
+
+    return harmonized_sample
+
+
+class HarmonizerIndexTestCase(TestCase):
+    def test_keys_for_several_fields(self):
+        """A key that's a variant of more than one field should fill in all of them."""
+        harmonized = get_harmonizer().harmonize_sample(
+            {"Characteristics [Disease State]": "Tumor", "title": "A"}
+        )
+        self.assertEqual(harmonized["disease"], "tumor")
+        self.assertEqual(harmonized["disease_stage"], "tumor")
+
+    def test_first_usable_key_wins(self):
+        harmonized = get_harmonizer().harmonize_sample({"age": ".", "patient age": "65"})
+        self.assertEqual(harmonized["age"], 65.0)
+
+        harmonized = get_harmonizer().harmonize_sample({"gender": "F", "sex": "male"})
+        self.assertEqual(harmonized["sex"], "female")
+
+    def test_determine_title_field(self):
+        a_samples = [{"sample name": "a", "title": "1"}, {"sample name": "b", "title": "2"}]
+        b_samples = [{"title": "2"}, {"title": "1"}]
+        self.assertEqual(determine_title_field(a_samples, b_samples), "title")
+
+    @tag("slow")
+    def test_benchmark(self):
+        """The index should harmonize the same as checking each field in turn, only faster."""
+        samples = []
+        for i in range(2000):
+            sample = dict(BENCHMARK_FIXTURES[i % len(BENCHMARK_FIXTURES)])
+            sample["extract name"] = "sample {}".format(i)
+            sample.update({"unrelated_{}".format(key): "value" for key in range(20)})
+            samples.append(sample)
+
+        harmonizer = get_harmonizer()
+        start_time = time.perf_counter()
+        expected = [harmonize_sample_per_field(harmonizer, sample) for sample in samples]
+        per_field_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        harmonized = [harmonizer.harmonize_sample(sample) for sample in samples]
+        index_time = time.perf_counter() - start_time
+
+        print(
+            "Harmonized {} samples in {:.3f}s with the index, {:.3f}s checking each field".format(
+                len(samples), index_time, per_field_time
+            )
+        )
+        self.assertEqual(harmonized, expected)
+        self.assertLess(index_time, per_field_time)
@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from data_refinery_foreman.surveyor import http_cache
+
+ETAG = '"version-1"'
+
+
+class ETagHandler(BaseHTTPRequestHandler):
+    """Serves one JSON document with an ETag, or a 404 for /missing."""
+
+    def do_GET(self):
+        self.server.requested.append(self.headers.get("If-None-Match"))
+
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = b'{"release": 100}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ETagHandler)
+        self.server.requested = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/release".format(self.server.server_port)
+
+        self.cache_directory = tempfile.mkdtemp()
+        patcher = patch.object(http_cache, "CACHE_DIRECTORY", self.cache_directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        http_cache.reset_stats()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+
+    def test_cached_until_ttl(self):
+        self.assertEqual(http_cache.get(self.url).json(), {"release": 100})
+        self.assertEqual(http_cache.get(self.url).json(), {"release": 100})
+
+        self.assertEqual(len(self.server.requested), 1)
+        self.assertEqual(http_cache.get_stats(), {"hits": 1, "revalidations": 0, "misses": 1})
+
+    def test_revalidated_after_ttl(self):
+        http_cache.get(self.url)
+        time.sleep(0.01)
+        response = http_cache.get(self.url, ttl=0)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"release": 100})
+        self.assertEqual(self.server.requested, [None, ETAG])
+        self.assertEqual(http_cache.get_stats(), {"hits": 1, "revalidations": 1, "misses": 1})
+
+    def test_errors_arent_cached(self):
+        missing_url = self.url.replace("release", "missing")
+        self.assertEqual(http_cache.get(missing_url).status_code, 404)
+        self.assertEqual(http_cache.get(missing_url).status_code, 404)
+
+        self.assertEqual(len(self.server.requested), 2)
+        self.assertEqual(http_cache.get_stats()["misses"], 2)
+
+    def test_evict_old_entries(self):
+        http_cache.get(self.url)
+        old_path = http_cache._get_cache_path(self.url)
+        long_ago = time.time() - http_cache.MAX_AGE - 1
+        os.utime(old_path + ".json", (long_ago, long_ago))
+
+        new_url = self.url.replace("release", "new-release")
+        http_cache.get(new_url)
+
+        http_cache.evict()
+
+        self.assertFalse(os.path.exists(old_path + ".body"))
+        self.assertFalse(os.path.exists(old_path + ".json"))
+        self.assertTrue(os.path.exists(http_cache._get_cache_path(new_url) + ".body"))
+
+    def test_evict_least_recently_used_over_max_size(self):
+        urls = [self.url.replace("release", "release-{}".format(i)) for i in range(3)]
+        for i, url in enumerate(urls):
+            http_cache.get(url)
+            used_at = time.time() - http_cache.MIN_AGE - 100 + i
+            os.utime(http_cache._get_cache_path(url) + ".json", (used_at, used_at))
+
+        # Using the first one again makes the second the least recently used.
+        http_cache.get(urls[0])
+        used_at = time.time() - http_cache.MIN_AGE - 10
+        os.utime(http_cache._get_cache_path(urls[0]) + ".json", (used_at, used_at))
+
+        entry_size = sum(size for _, size, _, _ in http_cache._list_entries()) // 3
+        with patch.object(http_cache, "MAX_SIZE", entry_size * 2):
+            http_cache.evict()
+
+        remaining = [
+            url for url in urls if os.path.exists(http_cache._get_cache_path(url) + ".body")
+        ]
+        self.assertEqual(remaining, [urls[0], urls[2]])
+
+    def test_evicts_at_most_once_per_interval(self):
+        with patch.object(http_cache, "evict") as mock_evict:
+            http_cache.get(self.url)
+            http_cache.get(self.url.replace("release", "other-release"))
+
+        self.assertEqual(mock_evict.call_count, 1)
@@ -0,0 +1,163 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from data_refinery_common.models import (
+    Experiment,
+    ExperimentSampleAssociation,
+    Organism,
+    OriginalFile,
+    OriginalFileSampleAssociation,
+    Sample,
+    SampleAnnotation,
+)
+from data_refinery_foreman.surveyor.persistence import SurveyWriter
+
+
+class SurveyWriterTestCase(TestCase):
+    def setUp(self):
+        self.organism = Organism(name="HOMO_SAPIENS", taxonomy_id=9606, is_scientific_name=True)
+        self.organism.save()
+
+        self.experiment = Experiment(accession_code="GSE1234")
+        self.experiment.save()
+
+        self.existing_sample = Sample(accession_code="GSM0", organism=self.organism)
+        self.existing_sample.save()
+
+        self.existing_file = OriginalFile(
+            source_url="ftp://example.com/GSM0.CEL.gz",
+            filename="GSM0.CEL.gz",
+            source_filename="GSM0.CEL.gz",
+            has_raw=True,
+            is_archive=True,
+        )
+        self.existing_file.save()
+
+    def add_samples(self, writer, accession_codes):
+        writer.load_existing_samples(accession_codes)
+        for accession_code in accession_codes:
+            sample = writer.get_sample(accession_code)
+            if not sample:
+                sample = Sample(accession_code=accession_code, organism=self.organism)
+                writer.add_sample(sample, {"title": accession_code})
+
+            filename = accession_code + ".CEL.gz"
+            original_file = writer.get_original_file(
+                source_url="ftp://example.com/" + filename,
+                filename=filename,
+                source_filename=filename,
+                has_raw=True,
+                is_archive=True,
+            )
+            writer.add_original_file_sample(original_file, sample)
+            writer.add_experiment_sample(self.experiment, sample)
+            writer.add_experiment_organism(self.experiment, self.organism)
+
+    def test_flush(self):
+        accession_codes = ["GSM{}".format(i) for i in range(20)]
+        writer = SurveyWriter()
+        self.add_samples(writer, accession_codes)
+
+        with CaptureQueriesContext(connection) as queries:
+            writer.flush()
+
+        # Each kind of object is written at once, however many samples there are.
+        self.assertLess(len(queries), 15)
+
+        self.assertEqual(Sample.objects.count(), 20)
+        self.assertEqual(SampleAnnotation.objects.count(), 19)
+        self.assertEqual(OriginalFile.objects.count(), 20)
+        self.assertEqual(OriginalFileSampleAssociation.objects.count(), 20)
+        self.assertEqual(ExperimentSampleAssociation.objects.count(), 20)
+        self.assertEqual(self.experiment.organisms.count(), 1)
+
+        # The existing file was reused rather than created again.
+        self.assertEqual(
+            list(self.existing_sample.original_files.all()), [self.existing_file],
+        )
+
+    def test_flush_twice(self):
+        """Surveying the same samples again shouldn't create anything new."""
+        accession_codes = ["GSM{}".format(i) for i in range(5)]
+        writer = SurveyWriter()
+        self.add_samples(writer, accession_codes)
+        writer.flush()
+
+        writer = SurveyWriter()
+        self.add_samples(writer, accession_codes)
+        writer.flush()
+
+        self.assertEqual(Sample.objects.count(), 5)
+        self.assertEqual(OriginalFile.objects.count(), 5)
+        self.assertEqual(OriginalFileSampleAssociation.objects.count(), 5)
+        self.assertEqual(ExperimentSampleAssociation.objects.count(), 5)
+
+    def test_flush_in_batches(self):
+        """Files shared by samples in different batches should only be created once."""
+        writer = SurveyWriter()
+        shared_file = None
+        for batch in [["GSM1", "GSM2"], ["GSM3", "GSM4"]]:
+            self.add_samples(writer, batch)
+            shared_file = writer.get_original_file(
+                source_url="ftp://example.com/GSE1234_non_normalized.txt",
+                filename="GSE1234_non_normalized.txt",
+                source_filename="GSE1234_non_normalized.txt",
+                has_raw=True,
+                is_archive=True,
+            )
+            for accession_code in batch:
+                writer.add_original_file_sample(shared_file, writer.get_sample(accession_code))
+            writer.flush()
+
+            # What was written is forgotten.
+            self.assertEqual(writer.samples, {})
+            self.assertEqual(writer.original_files, {})
+
+        self.assertEqual(Sample.objects.count(), 5)
+        self.assertEqual(OriginalFile.objects.count(), 6)
+        self.assertEqual(shared_file.samples.count(), 4)
+
+    def test_flush_sample_created_elsewhere(self):
+        """Samples another survey created since they were looked up should be used instead."""
+        writer = SurveyWriter()
+        self.add_samples(writer, ["GSM1", "GSM2"])
+
+        other_sample = Sample(accession_code="GSM1", organism=self.organism)
+        other_sample.save()
+
+        writer.flush()
+
+        self.assertEqual(Sample.objects.count(), 3)
+        self.assertEqual(
+            [original_file.filename for original_file in other_sample.original_files.all()],
+            ["GSM1.CEL.gz"],
+        )
+        self.assertEqual(ExperimentSampleAssociation.objects.count(), 2)
+
+    def test_load_existing_samples(self):
+        """Samples which were looked up, whether they exist or not, shouldn't be looked up again."""
+        writer = SurveyWriter()
+        writer.load_existing_samples(["GSM0", "GSM1"])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(writer.get_sample("GSM0"), self.existing_sample)
+            self.assertIsNone(writer.get_sample("GSM1"))
+
+    def test_add_original_file(self):
+        """Files added with add_original_file are created even if they match one that exists."""
+        writer = SurveyWriter()
+        original_file = OriginalFile(
+            source_url=self.existing_file.source_url,
+            filename=self.existing_file.filename,
+            source_filename=self.existing_file.source_filename,
+            has_raw=True,
+            is_archive=True,
+        )
+        writer.add_original_file(original_file)
+        writer.add_original_file_sample(original_file, self.existing_sample)
+        writer.flush()
+
+        self.assertIsNotNone(original_file.id)
+        self.assertNotEqual(original_file.id, self.existing_file.id)
+        self.assertEqual(self.existing_sample.original_files.count(), 1)
@@ -0,0 +1,82 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from data_refinery_foreman.surveyor import soft
+
+FAMILY_SOFT = """^DATABASE = GeoMiame
+!Database_name = Gene Expression Omnibus (GEO)
+^SERIES = GSE1234
+!Series_title = A series
+!Series_summary = Summary = with an equals sign
+!Series_platform_id = GPL570
+!Series_supplementary_file = ftp://example.com/GSE1234_RAW.tar
+^PLATFORM = GPL570
+!Platform_title = An Affymetrix array
+#ID = Probe ID
+#SEQUENCE = Probe sequence
+!platform_table_begin
+ID\tSEQUENCE
+1007_s_at\tACGT
+!platform_table_end
+^SAMPLE = GSM1
+!Sample_title = Sample 1
+!Sample_characteristics_ch1 = tissue: liver
+!Sample_characteristics_ch1 = sex: female
+#ID_REF =
+#VALUE = normalized signal
+!sample_table_begin
+ID_REF\tVALUE
+1007_s_at\t12.5
+!sample_table_end
+^SAMPLE = GSM2
+!Sample_title = Sample 2
+!Sample_data_processing = RMA
+#ID_REF =
+#VALUE = normalized signal
+!sample_table_begin
+ID_REF\tVALUE
+1007_s_at\t8.25
+!sample_table_end
+"""
+
+
+class SoftTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "GSE1234_family.soft.gz")
+        with gzip.open(self.path, "wt") as soft_file:
+            soft_file.write(FAMILY_SOFT)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_series_metadata(self):
+        with soft.SeriesFile(self.path) as series:
+            self.assertEqual(series.name, "GSE1234")
+            self.assertEqual(series.metadata["title"], ["A series"])
+            self.assertEqual(series.metadata["summary"], ["Summary = with an equals sign"])
+            self.assertEqual(series.metadata["platform_id"], ["GPL570"])
+
+    def test_samples(self):
+        series = soft.SeriesFile(self.path)
+        samples = list(series.iter_samples())
+
+        self.assertEqual([sample.name for sample in samples], ["GSM1", "GSM2"])
+        self.assertEqual(
+            samples[0].metadata,
+            {"title": ["Sample 1"], "characteristics_ch1": ["tissue: liver", "sex: female"]},
+        )
+        self.assertEqual(samples[0].column_names, ["ID_REF", "VALUE"])
+
+        self.assertEqual(samples[1].metadata, {"title": ["Sample 2"], "data_processing": ["RMA"]})
+
+    def test_sample_batches(self):
+        series = soft.SeriesFile(self.path)
+        batches = list(series.iter_sample_batches(1))
+        self.assertEqual(
+            [[sample.name for sample in batch] for batch in batches], [["GSM1"], ["GSM2"]]
+        )
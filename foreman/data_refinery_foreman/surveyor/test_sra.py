@@ -1,4 +1,6 @@
 import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
 
 from django.test import TestCase
@@ -13,6 +15,7 @@ from data_refinery_common.models import (
     SurveyJob,
     SurveyJobKeyValue,
 )
+from data_refinery_foreman.surveyor.ena import EnaFetcher
 from data_refinery_foreman.surveyor.sra import SraSurveyor
 from data_refinery_foreman.surveyor.surveyor import run_job
 
@@ -251,3 +254,98 @@ class SraSurveyorTestCase(TestCase):
         )
         self.assertEqual(experiment.source_first_published, datetime.date(2017, 9, 25))
         self.assertEqual(experiment.source_last_modified, datetime.date(2017, 9, 25))
+
+
+# Trimmed down versions of what ENA sends back, keyed by accession.
+ENA_FIXTURES = {
+    "SRR0000001": (
+        '<RUN accession="SRR0000001"><EXPERIMENT_REF accession="SRX0000001"/><RUN_LINKS>'
+        "<RUN_LINK><XREF_LINK><DB>ENA-STUDY</DB><ID>SRP0000001</ID></XREF_LINK></RUN_LINK>"
+        "<RUN_LINK><XREF_LINK><DB>ENA-SAMPLE</DB><ID>SRS0000001</ID></XREF_LINK></RUN_LINK>"
+        "<RUN_LINK><XREF_LINK><DB>ENA-SUBMISSION</DB><ID>SRA0000001</ID></XREF_LINK></RUN_LINK>"
+        "</RUN_LINKS></RUN>"
+    ),
+    "SRR0000002": (
+        '<RUN accession="SRR0000002"><EXPERIMENT_REF accession="SRX0000001"/><RUN_LINKS>'
+        "<RUN_LINK><XREF_LINK><DB>ENA-STUDY</DB><ID>SRP0000001</ID></XREF_LINK></RUN_LINK>"
+        "<RUN_LINK><XREF_LINK><DB>ENA-SAMPLE</DB><ID>SRS0000001</ID></XREF_LINK></RUN_LINK>"
+        "<RUN_LINK><XREF_LINK><DB>ENA-SUBMISSION</DB><ID>SRA0000001</ID></XREF_LINK></RUN_LINK>"
+        "</RUN_LINKS></RUN>"
+    ),
+    "SRX0000001": (
+        '<EXPERIMENT accession="SRX0000001"><TITLE>An experiment</TITLE><DESIGN>'
+        "<LIBRARY_DESCRIPTOR><LIBRARY_STRATEGY>RNA-Seq</LIBRARY_STRATEGY>"
+        "<LIBRARY_SOURCE>TRANSCRIPTOMIC</LIBRARY_SOURCE>"
+        "<LIBRARY_LAYOUT><SINGLE/></LIBRARY_LAYOUT></LIBRARY_DESCRIPTOR>"
+        "</DESIGN></EXPERIMENT>"
+    ),
+    "SRS0000001": (
+        '<SAMPLE accession="SRS0000001"><TITLE>A sample</TITLE><SAMPLE_NAME>'
+        "<TAXON_ID>9606</TAXON_ID><SCIENTIFIC_NAME>Homo sapiens</SCIENTIFIC_NAME>"
+        "</SAMPLE_NAME></SAMPLE>"
+    ),
+    "SRP0000001": (
+        '<STUDY accession="SRP0000001"><DESCRIPTOR><STUDY_TITLE>A study</STUDY_TITLE>'
+        "</DESCRIPTOR></STUDY>"
+    ),
+    "SRA0000001": '<SUBMISSION accession="SRA0000001"><TITLE>A submission</TITLE></SUBMISSION>',
+}
+
+
+class EnaFixtureHandler(BaseHTTPRequestHandler):
+    """Serves ENA_FIXTURES like ENA's browser API, including several
+    comma separated accessions at once."""
+
+    def do_GET(self):
+        accessions = self.path.strip("/").split(",")
+        self.server.requested.append(accessions)
+
+        body = "".join(ENA_FIXTURES[acc] for acc in accessions if acc in ENA_FIXTURES)
+        body = '<?xml version="1.0" encoding="UTF-8"?><ROOT>{}</ROOT>'.format(body)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class EnaFetcherTestCase(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), EnaFixtureHandler)
+        self.server.requested = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        url_template = "http://127.0.0.1:{}/{{}}".format(self.server.server_port)
+        self.fetcher = EnaFetcher(url_template=url_template, batch_size=2)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_shared_documents_are_fetched_once(self):
+        runs = ["SRR0000001", "SRR0000002"]
+        SraSurveyor.prefetch_metadata(runs, self.fetcher)
+        requests_made = len(self.server.requested)
+
+        # One batch of runs, then two batches for the four linked documents.
+        self.assertEqual(requests_made, 3)
+
+        for run in runs:
+            metadata = SraSurveyor.gather_all_metadata(run, self.fetcher)
+            self.assertEqual(metadata["run_accession"], run)
+            self.assertEqual(metadata["experiment_title"], "An experiment")
+            self.assertEqual(metadata["organism_name"], "HOMO SAPIENS")
+            self.assertEqual(metadata["study_title"], "A study")
+            self.assertEqual(metadata["submission_title"], "A submission")
+
+        # Everything came from the prefetched documents.
+        self.assertEqual(len(self.server.requested), requests_made)
+
+    def test_unknown_accessions_are_fetched_alone(self):
+        """Accessions missing from a batch get the same empty response as before."""
+        self.fetcher.prefetch(["SRR0000001", "SRR9999999"])
+        self.assertEqual(SraSurveyor.gather_run_metadata("SRR9999999", self.fetcher), {})
+        self.assertEqual(self.server.requested[-1], ["SRR9999999"])
@@ -0,0 +1,130 @@
+import datetime
+import threading
+
+from django.test import SimpleTestCase, TransactionTestCase
+from django.utils import timezone
+
+from data_refinery_common.models import SurveyedAccession, SurveyJob
+from data_refinery_foreman.surveyor.survey_runner import (
+    SurveyRunner,
+    TokenBucket,
+    get_source_type_for_accession,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTestCase(SimpleTestCase):
+    def test_waits_for_tokens(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+
+        # The first two go straight through, then one every half second.
+        for _ in range(4):
+            bucket.acquire()
+
+        self.assertEqual(clock.sleeps, [0.5, 0.5])
+        self.assertEqual(clock.now, 1.0)
+
+    def test_doesnt_save_up_more_than_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=1, clock=clock, sleep=clock.sleep)
+
+        clock.now = 100
+        bucket.acquire()
+        bucket.acquire()
+
+        self.assertEqual(clock.sleeps, [1.0])
+
+    def test_source_types(self):
+        self.assertEqual(get_source_type_for_accession("GSE1234"), "GEO")
+        self.assertEqual(get_source_type_for_accession("E-MTAB-1234"), "ARRAY_EXPRESS")
+        self.assertEqual(get_source_type_for_accession("SRP1234"), "SRA")
+        self.assertEqual(
+            get_source_type_for_accession("SACCHAROMYCES_CEREVISIAE, Ensembl"),
+            "TRANSCRIPTOME_INDEX",
+        )
+
+
+class SurveyRunnerTestCase(TransactionTestCase):
+    def setUp(self):
+        self.surveyed = []
+        self.lock = threading.Lock()
+
+    def survey(self, accession):
+        if accession == "GSE3":
+            raise Exception("Couldn't survey it!")
+
+        with self.lock:
+            self.surveyed.append(accession)
+
+        # Surveyors mark the job failed instead of raising.
+        return SurveyJob(success=accession != "GSE4")
+
+    def get_runner(self):
+        # Don't let the rate limits slow the test down.
+        rates = {"NCBI": 60 * 1000, "EBI": 60 * 1000, "ENSEMBL": 60 * 1000}
+        return SurveyRunner(self.survey, workers=4, host_surveys_per_minute=rates)
+
+    def test_run(self):
+        accessions = ["GSE1", "GSE2", "GSE3", "GSE4", "E-MTAB-1", "SRP1", "SRP1"]
+        runner = self.get_runner()
+        completed = runner.run(accessions)
+
+        self.assertEqual(completed, {"GEO": 2, "ARRAY_EXPRESS": 1, "SRA": 1})
+        self.assertEqual(runner.failed, {"GEO": 2})
+        self.assertEqual(sorted(self.surveyed), ["E-MTAB-1", "GSE1", "GSE2", "GSE4", "SRP1"])
+
+        # Failed surveys aren't checkpointed.
+        self.assertEqual(
+            set(SurveyedAccession.objects.values_list("accession_code", flat=True)),
+            {"GSE1", "GSE2", "E-MTAB-1", "SRP1"},
+        )
+
+    def test_resume(self):
+        SurveyedAccession(accession_code="GSE1").save()
+        old_survey = SurveyedAccession(accession_code="GSE2")
+        old_survey.save()
+        SurveyedAccession.objects.filter(accession_code="GSE2").update(
+            created_at=timezone.now() - datetime.timedelta(days=30),
+            last_surveyed_at=timezone.now() - datetime.timedelta(days=30),
+        )
+
+        self.get_runner().run(["GSE1", "GSE2", "SRP1"], skip_surveyed=True)
+        self.assertEqual(sorted(self.surveyed), ["SRP1"])
+
+        # A resurvey started a week ago should still survey what was
+        # surveyed before it started.
+        self.surveyed = []
+        self.get_runner().run(
+            ["GSE1", "GSE2", "SRP1"],
+            skip_surveyed=True,
+            surveyed_since=timezone.now() - datetime.timedelta(days=7),
+        )
+        self.assertEqual(sorted(self.surveyed), ["GSE2"])
+        surveyed_accession = SurveyedAccession.objects.get(accession_code="GSE2")
+        self.assertGreater(
+            surveyed_accession.last_surveyed_at, timezone.now() - datetime.timedelta(days=1),
+        )
+        # When it was first surveyed is left alone.
+        self.assertLess(
+            surveyed_accession.created_at, timezone.now() - datetime.timedelta(days=29),
+        )
+
+    def test_resurvey(self):
+        """Without skip_surveyed, everything is surveyed again."""
+        SurveyedAccession(accession_code="GSE1").save()
+
+        self.get_runner().run(["GSE1", "SRP1"])
+        self.assertEqual(sorted(self.surveyed), ["GSE1", "SRP1"])
@@ -7,7 +7,7 @@ from typing import Dict, List
 from data_refinery_common.enums import Downloaders
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import Organism, OriginalFile, SurveyJobKeyValue
-from data_refinery_foreman.surveyor import utils
+from data_refinery_foreman.surveyor import http_cache
 from data_refinery_foreman.surveyor.external_source import ExternalSourceSurveyor
 
 logger = get_and_configure_logger(__name__)
@@ -81,29 +81,23 @@ def get_species_detail_by_assembly(assembly: str, division: str) -> str:
         short_division=DIVISION_LOOKUP[division], division=division
     )
 
-    urllib.request.urlcleanup()
+    header = None
 
-    with urllib.request.urlopen(bacteria_species_detail_url) as request:
-        header = None
+    for line in http_cache.get_content(bacteria_species_detail_url).splitlines():
+        # Generally bad to roll your own CSV parser, but some
+        # encoding issue seemed to have been breaking the csv
+        # parser module and this works.
+        row = line.decode("utf-8").strip().split("\t")
 
-        for line in request:
-            # Generally bad to roll your own CSV parser, but some
-            # encoding issue seemed to have been breaking the csv
-            # parser module and this works.
-            row = line.decode("utf-8").strip().split("\t")
-
-            if not header:
-                header = row
-            else:
-                row_dict = {}
-                for (index, key) in enumerate(header):
-                    row_dict[key] = row[index]
-
-                if row_dict["assembly"] == assembly:
-                    return row_dict
+        if not header:
+            header = row
+        else:
+            row_dict = {}
+            for (index, key) in enumerate(header):
+                row_dict[key] = row[index]
 
-    # Ancient unresolved bug. WTF python: https://bugs.python.org/issue27973
-    urllib.request.urlcleanup()
+            if row_dict["assembly"] == assembly:
+                return row_dict
 
 
 class EnsemblUrlBuilder(ABC):
@@ -130,7 +124,7 @@ class EnsemblUrlBuilder(ABC):
             self.assembly = species["assembly_name"].replace(" ", "_")
             self.strain = None
 
-        assembly_response = utils.requests_retry_session().get(DIVISION_RELEASE_URL)
+        assembly_response = http_cache.get(DIVISION_RELEASE_URL)
         self.assembly_version = assembly_response.json()["version"]
         self.species_sub_dir = species["name"]
         self.filename_species = species["name"].capitalize()
@@ -207,9 +201,7 @@ class MainEnsemblUrlBuilder(EnsemblUrlBuilder):
         self.collection = ""
         self.filename_species = species["name"].capitalize()
         self.assembly = species["assembly"]
-        self.assembly_version = (
-            utils.requests_retry_session().get(MAIN_RELEASE_URL).json()["release"]
-        )
+        self.assembly_version = http_cache.get(MAIN_RELEASE_URL).json()["release"]
         self.scientific_name = self.filename_species.replace("_", " ")
         self.taxonomy_id = species["taxon_id"]
 
@@ -401,14 +393,14 @@ class TranscriptomeIndexSurveyor(ExternalSourceSurveyor):
 
         # The main division has a different base URL for its REST API.
         if ensembl_division == "Ensembl":
-            r = utils.requests_retry_session().get(MAIN_DIVISION_URL_TEMPLATE)
+            r = http_cache.get(MAIN_DIVISION_URL_TEMPLATE)
 
             # Yes I'm aware that specieses isn't a word. However I need to
             # distinguish between a singlular species and multiple species.
             specieses = r.json()["species"]
         else:
             formatted_division_url = DIVISION_URL_TEMPLATE.format(division=ensembl_division)
-            r = utils.requests_retry_session().get(formatted_division_url)
+            r = http_cache.get(formatted_division_url)
             specieses = r.json()
 
         all_new_species = []
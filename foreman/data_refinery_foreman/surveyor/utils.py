@@ -1,17 +1,24 @@
 import collections
 
 import requests
-from requests.adapters import HTTPAdapter
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
 
 def requests_retry_session(
-    retries=3, backoff_factor=0.3, status_forcelist=(500, 502, 504), session=None
+    retries=3,
+    backoff_factor=0.3,
+    status_forcelist=(500, 502, 504),
+    session=None,
+    pool_maxsize=DEFAULT_POOLSIZE,
 ):
     """
     Exponential back off for requests.
 
     via https://www.peterbe.com/plog/best-practice-with-retries-with-requests
+
+    Sessions shared between threads should have a `pool_maxsize` of at
+    least the number of threads so they don't throw away connections.
     """
     session = session or requests.Session()
     retry = Retry(
@@ -21,7 +28,7 @@ def requests_retry_session(
         backoff_factor=backoff_factor,
         status_forcelist=status_forcelist,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     return session
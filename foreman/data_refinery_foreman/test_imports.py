@@ -29,6 +29,10 @@ class ImportTestCase(TestCase):
         import data_refinery_foreman.surveyor.test_external_source
         import data_refinery_foreman.surveyor.test_geo
         import data_refinery_foreman.surveyor.test_harmony
+        import data_refinery_foreman.surveyor.test_http_cache
+        import data_refinery_foreman.surveyor.test_persistence
+        import data_refinery_foreman.surveyor.test_soft
         import data_refinery_foreman.surveyor.test_sra
+        import data_refinery_foreman.surveyor.test_survey_runner
         import data_refinery_foreman.surveyor.test_surveyor
         import data_refinery_foreman.surveyor.test_transcriptome_index
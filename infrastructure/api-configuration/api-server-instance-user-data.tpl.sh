@@ -125,11 +125,10 @@ docker run \
        --name=dr_api \
        -it -d "${dockerhub_repo}/${api_docker_image}" /bin/sh -c "/home/user/collect_and_run_uwsgi.sh"
 
-# Nuke and rebuild the search index. It shouldn't take too long.
+# Rebuild the search index into a new index and swap the alias over to
+# it, so searches keep working while it runs.
 sleep 30
-docker exec dr_api python3 manage.py search_index --delete -f;
-docker exec dr_api python3 manage.py search_index --rebuild -f;
-docker exec dr_api python3 manage.py search_index --populate -f;
+docker exec dr_api python3 manage.py update_es_index --full;
 
 # Let's use this instance to call the populate command every twenty minutes.
 crontab -l > tempcron
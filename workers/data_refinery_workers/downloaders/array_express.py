@@ -3,9 +3,10 @@ import shutil
 import time
 import urllib.request
 import zipfile
-from typing import List
+from typing import Dict, List, Set
 
 from data_refinery_common import microarray
+from data_refinery_common.file_digest import HashingWriter
 from data_refinery_common.job_management import create_processor_jobs_for_original_files
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import (
@@ -18,49 +19,77 @@ from data_refinery_common.utils import (
     get_readable_affymetrix_names,
     get_supported_microarray_platforms,
 )
-from data_refinery_workers.downloaders import utils
+from data_refinery_workers.downloaders import segmented, utils
 
 logger = get_and_configure_logger(__name__)
 LOCAL_ROOT_DIR = get_env_variable("LOCAL_ROOT_DIR", "/home/user/data_store")
 # chunk_size is in bytes
 CHUNK_SIZE = 1024 * 256
+# The zip file and its extracted contents are on disk at the same time.
+EXTRACTION_DISK_SPACE_MULTIPLIER = 2
 
 
 def _download_file(download_url: str, file_path: str, job: DownloaderJob) -> None:
-    """ Download a file from ArrayExpress via FTP. There is no Aspera endpoint
-    which I can find. """
+    """ Download a file from ArrayExpress via HTTPS, or FTP for older URLs.
+    There is no Aspera endpoint which I can find. """
     try:
         logger.debug(
             "Downloading file from %s to %s.", download_url, file_path, downloader_job=job.id
         )
-        target_file = open(file_path, "wb")
-        with urllib.request.urlopen(download_url, timeout=60) as request:
-            shutil.copyfileobj(request, target_file, CHUNK_SIZE)
+        if segmented.is_segmentable(download_url):
+            result = segmented.download(download_url, file_path)
+            utils.record_download(job, result.bytes_downloaded, result.seconds)
+            return
+
+        start_time = time.monotonic()
+        with open(file_path, "wb") as target_file:
+            with urllib.request.urlopen(download_url, timeout=60) as request:
+                shutil.copyfileobj(request, target_file, CHUNK_SIZE)
+
+        utils.record_download(job, os.path.getsize(file_path), time.monotonic() - start_time)
     except Exception:
         logger.exception("Exception caught while downloading file.", downloader_job=job.id)
         job.failure_reason = "Exception caught while downloading file"
         raise
-    finally:
-        target_file.close()
 
 
-def _extract_files(file_path: str, accession_code: str, job: DownloaderJob) -> List[str]:
+def _extract_files(
+    file_path: str, accession_code: str, job: DownloaderJob, filenames: Set[str] = None
+) -> List[Dict]:
     """Extract zip and return a list of the raw files.
+
+    If `filenames` is given, only the members named in it are
+    written. Each file is hashed as it's extracted.
     """
     logger.debug("Extracting %s!", file_path, file_path=file_path, downloader_job=job.id)
     abs_with_code_raw = LOCAL_ROOT_DIR + "/" + accession_code + "/raw/"
 
     try:
+        extracted_files = []
         # This is technically an unsafe operation.
         # However, we're trusting AE as a data source.
         with zipfile.ZipFile(file_path, "r") as zip_ref:
-            zip_ref.extractall(abs_with_code_raw)
             # Other zips for this same accession will go into this
             # directory too, so look at what's in the zip file rather than
             # what's in the directory it's being extracted to.
-            files_in_zip = zip_ref.namelist()
+            for member in zip_ref.infolist():
+                if member.is_dir() or (filenames is not None and member.filename not in filenames):
+                    continue
+
+                absolute_path = abs_with_code_raw + member.filename
+                os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+                with zip_ref.open(member) as source, HashingWriter(absolute_path) as target:
+                    shutil.copyfileobj(source, target, CHUNK_SIZE)
+
+                extracted_files.append(
+                    {
+                        "absolute_path": absolute_path,
+                        "filename": member.filename,
+                        "digest": target.digest,
+                    }
+                )
 
-        return [{"absolute_path": abs_with_code_raw + f, "filename": f} for f in files_in_zip]
+        return extracted_files
 
     except Exception as e:
         reason = "Exception %s caught while extracting %s", str(e), str(file_path)
@@ -87,6 +116,10 @@ def download_array_express(job_id: int) -> None:
     url = original_file.source_url
     accession_code = job.accession_code
 
+    # All of the files come from the same zip, so only reserve space for one of them.
+    if not utils.reserve_disk_space(job, [original_file], EXTRACTION_DISK_SPACE_MULTIPLIER):
+        return
+
     # First, get all the unique sample archive URLs.
     # There may be more than one!
     # Then, unpack all the ones downloaded.
@@ -103,7 +136,12 @@ def download_array_express(job_id: int) -> None:
     dl_file_path = LOCAL_ROOT_DIR + "/" + accession_code + "/" + filename + ".zip"
     _download_file(url, dl_file_path, job)
 
-    extracted_files = _extract_files(dl_file_path, accession_code, job)
+    # Zips often hold files for samples we aren't surveying, which don't
+    # need to be written at all.
+    wanted_filenames = set(
+        OriginalFile.objects.filter(source_url=url).values_list("source_filename", flat=True)
+    )
+    extracted_files = _extract_files(dl_file_path, accession_code, job, wanted_filenames)
     os.remove(dl_file_path)  # remove zip file
 
     for extracted_file in extracted_files:
@@ -118,7 +156,9 @@ def download_array_express(job_id: int) -> None:
             # haven't actually been processed before marking them as
             # downloaded and queuing processor jobs.
             if original_file.needs_processing():
-                original_file.set_downloaded(extracted_file["absolute_path"])
+                original_file.set_downloaded(
+                    extracted_file["absolute_path"], digest=extracted_file["digest"]
+                )
                 unprocessed_original_files.append(original_file)
         except Exception:
             # The suspicion is that there are extra files related to
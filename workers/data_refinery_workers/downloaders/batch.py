@@ -0,0 +1,87 @@
+"""Running several downloader jobs in one Batch job.
+
+Most GEO downloader jobs fetch a single small file, which takes less
+time than starting the container to download it. The Foreman groups
+those up by the host they download from and dispatches them to run
+together here, a few at a time so they share the instance's bandwidth
+without hitting that host too hard.
+
+Each job is still started and ended on its own, so its result is
+recorded just like it would be if it had been run by itself.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from django.db import connection
+
+from data_refinery_common.logging import get_and_configure_logger
+from data_refinery_common.models import DownloaderJob
+from data_refinery_common.utils import get_env_variable
+from data_refinery_workers.downloaders import utils
+
+logger = get_and_configure_logger(__name__)
+
+DEFAULT_CONCURRENCY = int(get_env_variable("DOWNLOADER_BATCH_CONCURRENCY", "4"))
+
+
+def _fail_unfinished_job(job_id: int, failure_reason: str) -> None:
+    """Ends the job if the downloader function started it but didn't end it.
+
+    Jobs which were never started are left for the Foreman to requeue.
+    """
+    job = utils.CURRENT_JOBS.get(job_id)
+    if job is None:
+        return
+
+    if not job.failure_reason:
+        job.failure_reason = failure_reason
+    utils.end_downloader_job(job, success=False)
+
+
+def _run_job(downloader_function: Callable[[int], None], job_id: int) -> bool:
+    failure_reason = "Downloader job returned without being ended."
+    try:
+        downloader_function(job_id)
+    except SystemExit:
+        # start_job exits if there's nothing for the job to download.
+        pass
+    except Exception as e:
+        logger.exception("Exception caught while running downloader job.", downloader_job=job_id)
+        failure_reason = "Exception caught while running downloader job: " + str(e)
+
+    try:
+        _fail_unfinished_job(job_id, failure_reason)
+        return bool(DownloaderJob.objects.get(id=job_id).success)
+    except Exception:
+        logger.exception("Unable to record downloader job's result.", downloader_job=job_id)
+        return False
+    finally:
+        # Each thread has its own database connection.
+        connection.close()
+
+
+def run_downloader_jobs(
+    downloader_function: Callable[[int], None],
+    job_ids: List[int],
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[int, bool]:
+    """Runs `downloader_function` for each of `job_ids`, up to `concurrency` at once.
+
+    Returns whether each job succeeded, by id.
+    """
+    # The jobs are started in other threads which can't do this.
+    utils.register_signal_handlers()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = executor.map(lambda job_id: _run_job(downloader_function, job_id), job_ids)
+        job_results = dict(zip(job_ids, results))
+
+    logger.info(
+        "Finished batch of downloader jobs.",
+        downloader_jobs=job_ids,
+        succeeded=sum(job_results.values()),
+        failed=len(job_ids) - sum(job_results.values()),
+    )
+
+    return job_results
@@ -9,6 +9,7 @@ import urllib.request
 from contextlib import closing
 from typing import List
 
+from data_refinery_common.file_digest import HashingWriter
 from data_refinery_common.job_management import create_processor_jobs_for_original_files
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import (
@@ -24,6 +25,9 @@ logger = get_and_configure_logger(__name__)
 LOCAL_ROOT_DIR = get_env_variable("LOCAL_ROOT_DIR", "/home/user/data_store")
 # chunk_size is in bytes
 CHUNK_SIZE = 1024 * 256
+# GEO archives get extracted next to themselves, and the gzipped files
+# they often contain are decompressed as they're extracted.
+EXTRACTION_DISK_SPACE_MULTIPLIER = 3
 
 
 def _download_file(download_url: str, file_path: str, job: DownloaderJob, force_ftp=False) -> None:
@@ -33,10 +37,14 @@ def _download_file(download_url: str, file_path: str, job: DownloaderJob, force_
     # Ensure directory exists
     os.makedirs(file_path.rsplit("/", 1)[0], exist_ok=True)
 
+    start_time = time.monotonic()
     if not force_ftp:
-        return _download_file_aspera(
+        success = _download_file_aspera(
             download_url=download_url, downloader_job=job, target_file_path=file_path
         )
+        if success:
+            utils.record_download(job, os.path.getsize(file_path), time.monotonic() - start_time)
+        return success
     else:
         try:
             logger.debug(
@@ -58,6 +66,7 @@ def _download_file(download_url: str, file_path: str, job: DownloaderJob, force_
         finally:
             target_file.close()
 
+        utils.record_download(job, os.path.getsize(file_path), time.monotonic() - start_time)
         return True
 
 
@@ -160,6 +169,9 @@ class ArchivedFile:
         self.file_path = downloaded_file_path
         self.parent_archive = parent_archive
 
+        # Set if the file was hashed as it was extracted.
+        self.digest = None
+
         # thanks to https://stackoverflow.com/a/541394/763705
         self.filename = os.path.basename(self.file_path)
         self.extension = os.path.splitext(self.file_path)[1]
@@ -186,7 +198,12 @@ class ArchivedFile:
 
     def get_sample(self):
         """ Tries to find the sample associated with this file, and returns None if unable. """
-        return Sample.objects.filter(accession_code=self.sample_accession_code()).first()
+        if not hasattr(self, "_sample"):
+            self._sample = Sample.objects.filter(
+                accession_code=self.sample_accession_code()
+            ).first()
+
+        return self._sample
 
     def is_processable(self):
         """ There're some known file patterns that are found in GEO that we know we can ignore. """
@@ -202,26 +219,28 @@ class ArchivedFile:
     def is_archive(self):
         return self.extension.lower() in [".tar", ".tgz", ".gz"]
 
-    def get_files(self):
+    def get_files(self, should_extract=None):
+        """ Enumerates the files in this archive, extracting them as it goes, or just
+        this file if it isn't an archive.
+
+        Files that `should_extract` returns False for, judging only by
+        their names, are never written to disk. """
         if not self.is_archive():
             yield self
         else:
             # for archives extract them and enumerate all the files inside
-            for path in self._extract_files():
-                archived_file = ArchivedFile(path, self)
-                for file in archived_file.get_files():
+            for archived_file in self._extract_files(should_extract):
+                for file in archived_file.get_files(should_extract):
                     yield file
 
-    def _extract_files(self):
+    def _extract_files(self, should_extract=None) -> List["ArchivedFile"]:
         logger.debug("Extracting %s!", self.file_path, file_path=self.file_path)
 
         try:
-            if ".tar" == self.extension:
-                return self._extract_tar()
-            elif ".tgz" == self.extension:
-                return self._extract_tgz()
+            if self.extension in [".tar", ".tgz"]:
+                return self._extract_tar(should_extract)
             elif ".gz" == self.extension:
-                return self._extract_gz()
+                return self._extract_gz(should_extract)
         except Exception as e:
             logger.exception(
                 "While extracting %s caught exception %s",
@@ -242,45 +261,83 @@ class ArchivedFile:
         else:
             return LOCAL_ROOT_DIR + "/" + self.filename + "/raw/"
 
-    def _extract_tar(self) -> List[str]:
-        """ Extract tar and return a list of the raw files. """
+    def _write_member(self, source, archived_file: "ArchivedFile") -> None:
+        """ Writes `source` to where `archived_file` goes, hashing it on the way. """
+        os.makedirs(os.path.dirname(archived_file.file_path), exist_ok=True)
+        with HashingWriter(archived_file.file_path) as target_file:
+            shutil.copyfileobj(source, target_file, CHUNK_SIZE)
+
+        archived_file.digest = target_file.digest
+
+    def _extract_tar(self, should_extract=None) -> List["ArchivedFile"]:
+        """ Extract the members of a tar or tgz that `should_extract` wants, one at a
+        time straight out of the stream, and return them.
+
+        Gzipped members are decompressed as they're extracted, so only
+        the decompressed file is written. """
         # This is technically an unsafe operation.
         # However, we're trusting GEO as a data source.
         abs_with_code_raw = self._get_absolute_path()
 
-        with tarfile.TarFile(self.file_path, "r") as zip_ref:
-            zip_ref.extractall(abs_with_code_raw)
-            extracted_files = (
-                zip_ref.getnames()
-            )  # https://docs.python.org/3/library/tarfile.html#tarfile.TarFile.getnames
-
-        return [(abs_with_code_raw + f) for f in extracted_files]
+        extracted_files = []
+        skipped_files = 0
+        with tarfile.open(self.file_path, "r|*") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+
+                member_path = abs_with_code_raw + member.name
+                decompress = member_path.endswith(".gz") and not member_path.endswith(".tar.gz")
+                archived_file = ArchivedFile(member_path[:-3] if decompress else member_path, self)
+
+                # Archives inside archives get looked at when they're extracted.
+                if should_extract and not archived_file.is_archive():
+                    if not should_extract(archived_file):
+                        skipped_files += 1
+                        continue
+
+                source = archive.extractfile(member)
+                if decompress:
+                    source = gzip.GzipFile(fileobj=source)
+                self._write_member(source, archived_file)
+                extracted_files.append(archived_file)
 
-    def _extract_tgz(self) -> List[str]:
-        """Extract tgz and return a list of the raw files."""
-        abs_with_code_raw = self._get_absolute_path()
+        logger.debug(
+            "Extracted archive.",
+            file_path=self.file_path,
+            extracted_files=len(extracted_files),
+            skipped_files=skipped_files,
+        )
+        return extracted_files
 
-        extracted_filepath = self.file_path.replace(".tgz", ".tar")
+    def _extract_gz(self, should_extract=None) -> List["ArchivedFile"]:
+        """Extract gz and return the raw file, unless `should_extract` doesn't want it."""
+        archived_file = ArchivedFile(self.file_path.replace(".gz", ""), self)
+        if should_extract and not archived_file.is_archive():
+            if not should_extract(archived_file):
+                return []
 
         with gzip.open(self.file_path, "rb") as f_in:
-            with open(extracted_filepath, "wb") as f_out:
-                shutil.copyfileobj(f_in, f_out)
+            self._write_member(f_in, archived_file)
+        return [archived_file]
 
-        with tarfile.TarFile(extracted_filepath, "r") as zip_ref:
-            zip_ref.extractall(abs_with_code_raw)
-            extracted_files = (
-                zip_ref.getnames()
-            )  # https://docs.python.org/3/library/tarfile.html#tarfile.TarFile.getnames
 
-        return [(abs_with_code_raw + f) for f in extracted_files]
+def _is_wanted(archived_file: ArchivedFile, accession_code: str) -> bool:
+    """ Whether a file from an archive for `accession_code` is worth keeping. """
+    sample = archived_file.get_sample()
 
-    def _extract_gz(self) -> List[str]:
-        """Extract gz and return a list of the raw files."""
-        extracted_filepath = self.file_path.replace(".gz", "")
-        with gzip.open(self.file_path, "rb") as f_in:
-            with open(extracted_filepath, "wb") as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        return [extracted_filepath]
+    # We don't want RNA-Seq data from GEO:
+    # https://github.com/AlexsLemonade/refinebio/issues/966
+    if sample and sample.technology == "RNA-SEQ":
+        logger.warn("RNA-Seq sample found in GEO downloader job.", sample=sample)
+        return False
+
+    # skip the files that we know are not processable and can't be associated with a sample
+    # also skip the files were we couldn't find a sample and they don't mention the current experiment
+    return bool(sample) or (
+        archived_file.is_processable()
+        and archived_file.experiment_accession_code() == accession_code
+    )
 
 
 def download_geo(job_id: int) -> None:
@@ -300,6 +357,9 @@ def download_geo(job_id: int) -> None:
         utils.end_downloader_job(job, success=False)
         return
 
+    if not utils.reserve_disk_space(job, [original_file], EXTRACTION_DISK_SPACE_MULTIPLIER):
+        return
+
     url = original_file.source_url
     related_samples = original_file.samples.exclude(technology="RNA-SEQ")
 
@@ -321,8 +381,12 @@ def download_geo(job_id: int) -> None:
     unpacked_sample_files = []
 
     try:
-        # enumerate all files inside the archive
-        archived_files = list(ArchivedFile(dl_file_path).get_files())
+        # enumerate the files inside the archive, only extracting the ones we want
+        archived_files = list(
+            ArchivedFile(dl_file_path).get_files(
+                lambda archived_file: _is_wanted(archived_file, accession_code)
+            )
+        )
     except FileExtractionError as e:
         job.failure_reason = e
         logger.exception(
@@ -334,17 +398,9 @@ def download_geo(job_id: int) -> None:
     for og_file in archived_files:
         sample = og_file.get_sample()
 
-        # We don't want RNA-Seq data from GEO:
-        # https://github.com/AlexsLemonade/refinebio/issues/966
-        if sample and sample.technology == "RNA-SEQ":
-            logger.warn("RNA-Seq sample found in GEO downloader job.", sample=sample)
-            continue
-
-        if not sample and (
-            not og_file.is_processable() or og_file.experiment_accession_code() != accession_code
-        ):
-            # skip the files that we know are not processable and can't be associated with a sample
-            # also skip the files were we couldn't find a sample and they don't mention the current experiment
+        # Files extracted from archives have already been checked, but
+        # a file that was downloaded as-is hasn't.
+        if not _is_wanted(og_file, accession_code):
             continue
 
         potential_existing_file = OriginalFile.objects.filter(
@@ -370,8 +426,13 @@ def download_geo(job_id: int) -> None:
         actual_file.is_archive = False
         actual_file.absolute_file_path = og_file.file_path
         actual_file.filename = og_file.filename
-        actual_file.calculate_size()
-        actual_file.calculate_sha1()
+        if og_file.digest is not None:
+            og_file.digest.verify(og_file.file_path)
+            actual_file.size_in_bytes = og_file.digest.size
+            actual_file.sha1 = og_file.digest.sha1
+        else:
+            actual_file.calculate_size()
+            actual_file.calculate_sha1()
         actual_file.has_raw = True
         actual_file.source_url = original_file.source_url
         actual_file.source_filename = original_file.source_filename
@@ -5,6 +5,7 @@ from django.core.management.base import BaseCommand
 from data_refinery_common.enums import Downloaders
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_workers.downloaders.array_express import download_array_express
+from data_refinery_workers.downloaders.batch import run_downloader_jobs
 from data_refinery_workers.downloaders.geo import download_geo
 from data_refinery_workers.downloaders.sra import download_sra
 from data_refinery_workers.downloaders.transcriptome_index import download_transcriptome
@@ -19,7 +20,14 @@ class Command(BaseCommand):
             type=str,
             help=("The downloader job's name. Must be enumerated in data_refinery_common.enums."),
         )
-        parser.add_argument("--job-id", type=int, help=("The downloader job's ID."))
+        parser.add_argument(
+            "--job-id",
+            type=str,
+            help=(
+                "The downloader job's ID, or a comma separated list of IDs "
+                "to run together in a batch."
+            ),
+        )
 
     def handle(self, *args, **options):
         if options["job_id"] is None:
@@ -33,17 +41,17 @@ class Command(BaseCommand):
             sys.exit(1)
 
         if job_type is Downloaders.ARRAY_EXPRESS:
-            download_array_express(options["job_id"])
+            downloader_function = download_array_express
         elif job_type is Downloaders.TRANSCRIPTOME_INDEX:
-            download_transcriptome(options["job_id"])
+            downloader_function = download_transcriptome
         elif job_type is Downloaders.SRA:
-            download_sra(options["job_id"])
+            downloader_function = download_sra
         elif job_type is Downloaders.GEO:
-            download_geo(options["job_id"])
+            downloader_function = download_geo
         else:
             logger.error(
                 (
-                    "A valid job name was specified for job %s with id %d but "
+                    "A valid job name was specified for job %s with id %s but "
                     "no downloader function is known to run it."
                 ),
                 options["job_name"],
@@ -51,4 +59,15 @@ class Command(BaseCommand):
             )
             sys.exit(1)
 
+        try:
+            job_ids = [int(job_id) for job_id in options["job_id"].split(",")]
+        except ValueError:
+            logger.error("Job IDs must be integers.", job_id=options["job_id"])
+            sys.exit(1)
+
+        if len(job_ids) == 1:
+            downloader_function(job_ids[0])
+        else:
+            run_downloader_jobs(downloader_function, job_ids)
+
         sys.exit(0)
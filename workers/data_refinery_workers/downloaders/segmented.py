@@ -0,0 +1,508 @@
+"""Downloading large files over HTTP(S) with several connections at once.
+
+NCBI and EBI limit how fast a single connection can go well below what
+our instances can pull, so when a server accepts byte ranges the file
+is split into segments which are fetched in parallel and written
+straight into place in a partial file next to the target.
+
+Which segments are finished is recorded next to the partial file, so a
+download that's interrupted, whether by an error or by the job being
+killed, picks up where it left off the next time it's started, as long
+as the file on the server hasn't changed in the meantime.
+
+The file's SHA1 and size are worked out while it's downloaded, so
+callers don't have to read it again afterwards.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from data_refinery_common.constants import CHUNK_SIZE
+from data_refinery_common.file_digest import FileDigest
+from data_refinery_common.logging import get_and_configure_logger
+
+logger = get_and_configure_logger(__name__)
+
+DEFAULT_CONNECTIONS = 4
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Each segment is retried this many times, backing off exponentially
+# with jitter up to MAX_BACKOFF seconds between attempts.
+MAX_ATTEMPTS = 8
+BACKOFF_FACTOR = 2
+MAX_BACKOFF = 120
+
+TIMEOUT = 60
+
+# Responses that mean the server is struggling rather than that the
+# request was wrong.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Errors that mean the connection failed partway, including when the
+# server resets it in the middle of a response body.
+RETRY_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    ProtocolError,
+    ReadTimeoutError,
+)
+
+PARTIAL_SUFFIX = ".partial"
+STATE_SUFFIX = ".partial.json"
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ChecksumMismatchError(DownloadError):
+    pass
+
+
+class _RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super(_RetryableError, self).__init__(message)
+        self.retry_after = retry_after
+
+
+class DownloadResult:
+    """What happened while downloading `url` to `file_path`.
+
+    `bytes_downloaded` only counts what came over the network this
+    time, not anything left from an earlier, interrupted download.
+    `digest` covers the whole file.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        file_path: str,
+        digest: FileDigest,
+        bytes_downloaded: int,
+        seconds: float,
+        md5=None,
+    ):
+        self.url = url
+        self.file_path = file_path
+        self.digest = digest
+        self.size = digest.size
+        self.bytes_downloaded = bytes_downloaded
+        self.seconds = seconds
+        self.md5 = md5
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second."""
+        if not self.seconds:
+            return 0
+
+        return self.bytes_downloaded / self.seconds
+
+
+def get_backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    """How long to wait before retrying after `attempt` failed attempts.
+
+    A server that says how long to wait with Retry-After is listened
+    to, otherwise this backs off exponentially with jitter like
+    data_refinery_common.utils.download_file does.
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_BACKOFF)
+        except ValueError:
+            # It can also be an HTTP date, which isn't worth parsing.
+            pass
+
+    return random.uniform(0, min(BACKOFF_FACTOR * 2 ** attempt, MAX_BACKOFF))
+
+
+def _decode_content_md5(header: Optional[str]) -> Optional[str]:
+    """Content-MD5 is the base64 of the raw digest, but we compare hex digests."""
+    if not header:
+        return None
+
+    try:
+        return binascii.hexlify(base64.b64decode(header)).decode()
+    except (binascii.Error, ValueError):
+        return None
+
+
+def _raise_for_status(response: requests.Response) -> None:
+    if response.status_code in RETRY_STATUS_CODES:
+        raise _RetryableError(
+            "Server responded with {}.".format(response.status_code),
+            response.headers.get("Retry-After"),
+        )
+
+    response.raise_for_status()
+
+
+def _with_retries(function, description: str):
+    """Calls `function` until it doesn't raise a retryable error, up to MAX_ATTEMPTS times."""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return function()
+        except requests.HTTPError as e:
+            raise DownloadError("Failed {}: {}".format(description, e))
+        except (_RetryableError,) + RETRY_EXCEPTIONS as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise DownloadError(
+                    "Gave up {} after {} attempts: {}".format(description, MAX_ATTEMPTS, e)
+                )
+
+            backoff = get_backoff(attempt, getattr(e, "retry_after", None))
+            logger.info(
+                "Retrying download.", reason=str(e), attempt=attempt + 1, backoff=backoff,
+            )
+            time.sleep(backoff)
+
+
+class SegmentedDownload:
+    """Downloads `url` to `file_path`. See `download` for the parameters."""
+
+    def __init__(
+        self,
+        url: str,
+        file_path: str,
+        connections: int = DEFAULT_CONNECTIONS,
+        segment_size: int = SEGMENT_SIZE,
+        expected_md5: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+        digest: Optional[FileDigest] = None,
+    ):
+        self.url = url
+        self.file_path = file_path
+        self.partial_path = file_path + PARTIAL_SUFFIX
+        self.state_path = file_path + STATE_SUFFIX
+        self.connections = connections
+        self.segment_size = segment_size
+        self.expected_md5 = expected_md5.lower() if expected_md5 else None
+
+        if session:
+            self.session = session
+        else:
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=connections)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+        # Guards `completed` and the state file.
+        self.lock = threading.Lock()
+        self.failed = threading.Event()
+        self.bytes_lock = threading.Lock()
+        self.bytes_downloaded = 0
+
+        # Filled in by _probe.
+        self.size = None
+        self.accepts_ranges = False
+        self.validators = {}
+
+        self.completed = set()
+
+        # Segments are hashed in order as the ones before them finish,
+        # while they're likely still in the page cache. That reads whole
+        # segments, so it has its own lock rather than holding up the
+        # threads that are still downloading.
+        self.hash_lock = threading.Lock()
+        self.digest = digest if digest is not None else FileDigest()
+        self.md5 = None
+        self.hashed_segments = 0
+
+    def _probe(self) -> None:
+        """Finds out how big the file is and whether the server will send parts of it.
+
+        This asks for the first byte rather than making a HEAD request
+        because signed redirect URLs often only allow GETs.
+        """
+
+        def probe():
+            headers = {"Range": "bytes=0-0"}
+            with self.session.get(self.url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+                _raise_for_status(r)
+                return r.status_code, r.headers
+
+        status_code, headers = _with_retries(probe, "finding the size of " + self.url)
+
+        content_range = headers.get("Content-Range", "")
+        if status_code == 206 and "/" in content_range and not content_range.endswith("*"):
+            self.size = int(content_range.rsplit("/", 1)[1])
+            self.accepts_ranges = True
+        elif "Content-Length" in headers:
+            self.size = int(headers["Content-Length"])
+
+        self.validators = {
+            key: headers[key] for key in ("ETag", "Last-Modified") if headers.get(key)
+        }
+
+        # Ranged responses only cover the bytes they contain, so this
+        # only means something for whole-file responses.
+        if not self.expected_md5 and status_code == 200:
+            self.expected_md5 = _decode_content_md5(headers.get("Content-MD5"))
+
+    def _get_state(self) -> Dict:
+        return {
+            "url": self.url,
+            "size": self.size,
+            "segment_size": self.segment_size,
+            "validators": self.validators,
+        }
+
+    def _load_state(self) -> None:
+        """Picks up the segments an earlier attempt finished, if they're still good."""
+        try:
+            with open(self.state_path) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            state = None
+
+        completed = state.pop("completed", []) if state else []
+        if (
+            state == self._get_state()
+            and self.validators
+            and os.path.exists(self.partial_path)
+            and os.path.getsize(self.partial_path) == self.size
+        ):
+            self.completed = set(completed)
+            if self.completed:
+                logger.info(
+                    "Resuming download.",
+                    url=self.url,
+                    completed_segments=len(self.completed),
+                    total_segments=self._get_num_segments(),
+                )
+            return
+
+        # Start over, with space for the whole file.
+        self.completed = set()
+        with open(self.partial_path, "wb") as partial_file:
+            partial_file.truncate(self.size)
+
+    def _save_state(self) -> None:
+        """Must be called with the lock held."""
+        state = self._get_state()
+        state["completed"] = sorted(self.completed)
+
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w") as state_file:
+            json.dump(state, state_file)
+        os.replace(temp_path, self.state_path)
+
+    def _get_num_segments(self) -> int:
+        return (self.size + self.segment_size - 1) // self.segment_size
+
+    def _get_if_range(self) -> Dict:
+        """Makes the server send the whole file instead of a range if it's changed,
+        so we can tell rather than stitching two versions together."""
+        validator = self.validators.get("ETag") or self.validators.get("Last-Modified")
+        return {"If-Range": validator} if validator else {}
+
+    def _is_completed(self, index: int) -> bool:
+        with self.lock:
+            return index in self.completed
+
+    def _advance_hash(self, wait: bool = True) -> None:
+        """Hashes the completed segments that follow the ones already hashed.
+
+        If `wait` is False and another thread is already hashing, this
+        returns right away. That thread gets to the new segments too,
+        unless they finish just as it stops, so this is called again
+        with `wait` once every download has finished.
+        """
+        if not self.hash_lock.acquire(blocking=wait):
+            return
+
+        try:
+            self._hash_completed_segments()
+        finally:
+            self.hash_lock.release()
+
+    def _hash_completed_segments(self) -> None:
+        """Must be called with the hash lock held."""
+        hashes = [self.digest, self.md5] if self.md5 else [self.digest]
+        with open(self.partial_path, "rb") as partial_file:
+            while self._is_completed(self.hashed_segments):
+                partial_file.seek(self.hashed_segments * self.segment_size)
+                remaining = min(self.segment_size, self.size - partial_file.tell())
+                while remaining > 0:
+                    chunk = partial_file.read(min(CHUNK_SIZE, remaining))
+                    for hash_object in hashes:
+                        hash_object.update(chunk)
+                    remaining -= len(chunk)
+
+                self.hashed_segments += 1
+
+    def _download_segment(self, index: int) -> None:
+        start = index * self.segment_size
+        end = min(start + self.segment_size, self.size) - 1
+        offset = start
+
+        def fetch():
+            nonlocal offset
+            if self.failed.is_set():
+                return
+
+            headers = {"Range": "bytes={}-{}".format(offset, end)}
+            headers.update(self._get_if_range())
+            with self.session.get(self.url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+                _raise_for_status(r)
+                if r.status_code != 206:
+                    raise DownloadError(
+                        "{} changed on the server while it was being downloaded.".format(self.url)
+                    )
+
+                with open(self.partial_path, "r+b") as partial_file:
+                    partial_file.seek(offset)
+                    for chunk in r.iter_content(CHUNK_SIZE):
+                        partial_file.write(chunk)
+                        offset += len(chunk)
+                        with self.bytes_lock:
+                            self.bytes_downloaded += len(chunk)
+
+            if offset <= end:
+                # The connection dropped, pick up from where it stopped.
+                raise _RetryableError("Segment ended {} bytes early.".format(end + 1 - offset))
+
+        try:
+            _with_retries(fetch, "downloading bytes {}-{} of {}".format(start, end, self.url))
+        except Exception:
+            self.failed.set()
+            raise
+
+        if offset <= end:
+            # Skipped because another segment failed. Segments which
+            # finished anyway are still recorded below, so resuming
+            # doesn't download them again.
+            return
+
+        with self.lock:
+            self.completed.add(index)
+            self._save_state()
+
+        self._advance_hash(wait=False)
+
+    def _download_segments(self) -> None:
+        self._load_state()
+        self.digest.reset()
+        if self.expected_md5:
+            self.md5 = hashlib.md5()
+        # Catches up on whatever an earlier attempt finished.
+        self._advance_hash()
+
+        pending = [i for i in range(self._get_num_segments()) if i not in self.completed]
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            futures = [executor.submit(self._download_segment, index) for index in pending]
+
+        for future in futures:
+            # Raises the first error any of them hit.
+            future.result()
+
+        self._advance_hash()
+
+    def _download_whole_file(self) -> None:
+        """For servers that won't send ranges, which means starting over on every retry."""
+
+        def fetch():
+            self.digest.reset()
+            self.md5 = hashlib.md5() if self.expected_md5 else None
+            with self.session.get(self.url, stream=True, timeout=TIMEOUT) as r:
+                _raise_for_status(r)
+                with open(self.partial_path, "wb") as partial_file:
+                    for chunk in r.iter_content(CHUNK_SIZE):
+                        partial_file.write(chunk)
+                        self.bytes_downloaded += len(chunk)
+                        self.digest.update(chunk)
+                        if self.md5:
+                            self.md5.update(chunk)
+
+            if self.size is not None and os.path.getsize(self.partial_path) != self.size:
+                raise _RetryableError("Download ended early.")
+
+        _with_retries(fetch, "downloading " + self.url)
+        self.size = os.path.getsize(self.partial_path)
+
+    def _remove_partial_files(self) -> None:
+        for path in (self.partial_path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run(self) -> DownloadResult:
+        start_time = time.monotonic()
+        self._probe()
+
+        if self.accepts_ranges:
+            self._download_segments()
+        else:
+            if os.path.exists(self.state_path):
+                os.remove(self.state_path)
+            self._download_whole_file()
+
+        md5 = self.md5.hexdigest() if self.md5 else None
+        if self.expected_md5 and md5 != self.expected_md5:
+            # Resuming from these would only get the same result.
+            self._remove_partial_files()
+            raise ChecksumMismatchError(
+                "MD5 of {} was {} but should have been {}.".format(self.url, md5, self.expected_md5)
+            )
+
+        os.replace(self.partial_path, self.file_path)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+        result = DownloadResult(
+            self.url,
+            self.file_path,
+            self.digest,
+            self.bytes_downloaded,
+            time.monotonic() - start_time,
+            md5,
+        )
+        logger.debug(
+            "Finished download.",
+            url=self.url,
+            size=result.size,
+            bytes_downloaded=result.bytes_downloaded,
+            bytes_per_second=int(result.throughput),
+            segmented=self.accepts_ranges,
+        )
+        return result
+
+
+def download(
+    url: str,
+    file_path: str,
+    connections: int = DEFAULT_CONNECTIONS,
+    segment_size: int = SEGMENT_SIZE,
+    expected_md5: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    digest: Optional[FileDigest] = None,
+) -> DownloadResult:
+    """Downloads `url` to `file_path` using up to `connections` connections at once.
+
+    If the server accepts byte ranges the file is downloaded in
+    `segment_size` pieces which can be resumed if this is interrupted
+    and called again. If `expected_md5` is given, or the server sends
+    a Content-MD5 header, the file is checked against it. The file's
+    SHA1 and size go into `digest` if one is given. Raises
+    DownloadError if the file can't be downloaded, in which case
+    `file_path` isn't created.
+    """
+    return SegmentedDownload(
+        url, file_path, connections, segment_size, expected_md5, session, digest
+    ).run()
+
+
+def is_segmentable(url: str) -> bool:
+    """Whether `download` can handle `url`."""
+    return url.startswith("http://") or url.startswith("https://")
@@ -10,6 +10,7 @@ from typing import List
 
 from django.utils import timezone
 
+from data_refinery_common.file_digest import FileDigest, HashingWriter
 from data_refinery_common.job_management import create_processor_job_for_original_files
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import (
@@ -20,8 +21,8 @@ from data_refinery_common.models import (
     Sample,
 )
 from data_refinery_common.rna_seq import _build_ena_file_url
-from data_refinery_common.utils import download_file, get_env_variable, get_https_sra_download
-from data_refinery_workers.downloaders import utils
+from data_refinery_common.utils import get_env_variable, get_https_sra_download
+from data_refinery_workers.downloaders import segmented, utils
 
 logger = get_and_configure_logger(__name__)
 LOCAL_ROOT_DIR = get_env_variable("LOCAL_ROOT_DIR", "/home/user/data_store")
@@ -30,9 +31,15 @@ CHUNK_SIZE = 1024 * 256
 
 
 def _download_file(
-    download_url: str, downloader_job: DownloaderJob, target_file_path: str, force_ftp: bool = False
+    download_url: str,
+    downloader_job: DownloaderJob,
+    target_file_path: str,
+    force_ftp: bool = False,
+    digest: FileDigest = None,
 ) -> bool:
-    """ Download file dispatcher. Dispatches to the FTP or Aspera downloader """
+    """ Download file dispatcher. Dispatches to the FTP or Aspera downloader.
+
+    If `digest` is given, the downloaded file's SHA1 and size are put in it. """
 
     # SRA files have Apsera downloads.
     if "ftp.sra.ebi.ac.uk" in download_url and not force_ftp:
@@ -41,7 +48,19 @@ def _download_file(
         download_url = download_url.replace("ftp://", "era-fasp@")
         download_url = download_url.replace("ftp", "fasp")
         download_url = download_url.replace(".uk/", ".uk:/")
-        return _download_file_aspera(download_url, downloader_job, target_file_path, source="ENA")
+        start_time = time.monotonic()
+        success = _download_file_aspera(
+            download_url, downloader_job, target_file_path, source="ENA"
+        )
+        if success:
+            utils.record_download(
+                downloader_job, os.path.getsize(target_file_path), time.monotonic() - start_time
+            )
+            # ascp writes the file itself, so this is the one case
+            # where it has to be read back.
+            if digest is not None:
+                digest.update_from_file(target_file_path)
+        return success
     elif "ncbi.nlm.nih.gov" in download_url and not force_ftp:
         # Try to convert old-style endpoints into new-style endpoints if possible
         try:
@@ -52,13 +71,16 @@ def _download_file(
                     download_url = new_url
         except Exception:
             pass
-        return _download_file_http(download_url, downloader_job, target_file_path)
+        return _download_file_http(download_url, downloader_job, target_file_path, digest)
     else:
-        return _download_file_ftp(download_url, downloader_job, target_file_path)
+        return _download_file_ftp(download_url, downloader_job, target_file_path, digest)
 
 
 def _download_file_ftp(
-    download_url: str, downloader_job: DownloaderJob, target_file_path: str
+    download_url: str,
+    downloader_job: DownloaderJob,
+    target_file_path: str,
+    digest: FileDigest = None,
 ) -> bool:
     """ Download a file to a location using FTP via urllib. """
     try:
@@ -72,10 +94,14 @@ def _download_file_ftp(
         # Ancient unresolved bug. WTF python: https://bugs.python.org/issue27973
         urllib.request.urlcleanup()
 
+        start_time = time.monotonic()
         with closing(urllib.request.urlopen(download_url)) as request:
-            with open(target_file_path, "wb") as target_file:
+            with HashingWriter(target_file_path, digest) as target_file:
                 shutil.copyfileobj(request, target_file, CHUNK_SIZE)
 
+        utils.record_download(
+            downloader_job, os.path.getsize(target_file_path), time.monotonic() - start_time
+        )
         urllib.request.urlcleanup()
     except Exception:
         logger.exception(
@@ -92,7 +118,10 @@ def _download_file_ftp(
 
 
 def _download_file_http(
-    download_url: str, downloader_job: DownloaderJob, target_file_path: str
+    download_url: str,
+    downloader_job: DownloaderJob,
+    target_file_path: str,
+    digest: FileDigest = None,
 ) -> bool:
     try:
         logger.debug(
@@ -101,8 +130,10 @@ def _download_file_http(
             target_file_path,
             downloader_job=downloader_job.id,
         )
-        # This function will try to recover if the download fails
-        download_file(download_url, target_file_path)
+        # Downloads over several connections, retrying and resuming
+        # segments that fail.
+        result = segmented.download(download_url, target_file_path, digest=digest)
+        utils.record_download(downloader_job, result.bytes_downloaded, result.seconds)
     except Exception as e:
         logger.exception(
             "Exception caught while downloading file.", downloader_job=downloader_job.id
@@ -314,16 +345,20 @@ def download_sra(job_id: int) -> None:
         utils.end_downloader_job(job, success)
         return success, downloaded_files
 
+    if not utils.reserve_disk_space(job, original_files):
+        return False, downloaded_files
+
     for original_file in original_files:
         exp_path = LOCAL_ROOT_DIR + "/" + job.accession_code
         samp_path = exp_path + "/" + sample.accession_code
         os.makedirs(exp_path, exist_ok=True)
         os.makedirs(samp_path, exist_ok=True)
         dl_file_path = samp_path + "/" + original_file.source_filename
-        success = _download_file(original_file.source_url, job, dl_file_path)
+        digest = FileDigest()
+        success = _download_file(original_file.source_url, job, dl_file_path, digest=digest)
 
         if success:
-            original_file.set_downloaded(dl_file_path)
+            original_file.set_downloaded(dl_file_path, digest=digest)
             downloaded_files.append(original_file)
         else:
             break
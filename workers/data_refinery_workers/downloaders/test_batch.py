@@ -0,0 +1,59 @@
+from django.test import TransactionTestCase, tag
+
+from data_refinery_common.models import (
+    DownloaderJob,
+    DownloaderJobOriginalFileAssociation,
+    OriginalFile,
+)
+from data_refinery_workers.downloaders import batch, utils
+
+
+def create_downloader_job(accession_code: str) -> DownloaderJob:
+    job = DownloaderJob(downloader_task="GEO", accession_code=accession_code)
+    job.save()
+
+    original_file = OriginalFile(
+        source_url="ftp://ftp.ncbi.nlm.nih.gov/geo/samples/{0}.CEL.gz".format(accession_code),
+        source_filename=accession_code + ".CEL.gz",
+    )
+    original_file.save()
+
+    DownloaderJobOriginalFileAssociation.objects.create(
+        downloader_job=job, original_file=original_file
+    )
+
+    return job
+
+
+def fake_download(job_id: int) -> None:
+    job = utils.start_job(job_id)
+    if job.accession_code == "GSM2":
+        raise Exception("The server hung up.")
+    elif job.accession_code == "GSM3":
+        # Forgot to end the job.
+        return
+
+    utils.end_downloader_job(job, success=True)
+
+
+# The jobs are run in other threads, which can't see anything a
+# TestCase hasn't committed yet.
+class BatchTestCase(TransactionTestCase):
+    @tag("downloaders")
+    def test_run_downloader_jobs(self):
+        job_ids = [create_downloader_job("GSM{}".format(i)).id for i in range(1, 4)]
+
+        results = batch.run_downloader_jobs(fake_download, job_ids, concurrency=2)
+
+        self.assertEqual(results, {job_ids[0]: True, job_ids[1]: False, job_ids[2]: False})
+        self.assertEqual(utils.CURRENT_JOBS, {})
+
+        succeeded, raised, not_ended = DownloaderJob.objects.filter(id__in=job_ids).order_by("id")
+        self.assertTrue(succeeded.success)
+
+        self.assertFalse(raised.success)
+        self.assertIsNotNone(raised.end_time)
+        self.assertIn("The server hung up.", raised.failure_reason)
+
+        self.assertFalse(not_ended.success)
+        self.assertEqual(not_ended.failure_reason, "Downloader job returned without being ended.")
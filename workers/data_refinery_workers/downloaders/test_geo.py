@@ -1,4 +1,8 @@
+import gzip
+import hashlib
+import io
 import os
+import tarfile
 from unittest.mock import patch
 
 from django.test import TestCase, tag
@@ -39,10 +43,11 @@ class DownloadGeoTestCase(TestCase):
         )
         files = [file for file in archive_file.get_files()]
 
-        # There should be 8 files in total in the directory, 2 downloaded and 6 extracted
+        # There should be 7 files in total in the directory, 1 downloaded and 6 extracted
         # `archive_file.get_files()` only returns the files that are extracted from the archives
         # instead of enumerating over all files.
         self.assertEqual(6, len(files))
+        self.assertTrue(all(file.digest for file in files))
 
         # GPL File
         self.assertTrue(os.path.isfile("/home/user/data_store/GSE10241/raw/GPL6102-tbl-1.txt"))
@@ -58,7 +63,8 @@ class DownloadGeoTestCase(TestCase):
         self.assertTrue(
             os.path.isfile("/home/user/data_store/GSE10241/raw/GSE10241_family.xml.tgz")
         )
-        self.assertTrue(
+        # The tgz is extracted straight out of the stream, without an intermediate tar.
+        self.assertFalse(
             os.path.isfile("/home/user/data_store/GSE10241/raw/GSE10241_family.xml.tar")
         )
 
@@ -88,6 +94,37 @@ class DownloadGeoTestCase(TestCase):
             os.path.isfile("/home/user/data_store/GSE22427/raw/GSE22427_non-normalized.txt")
         )
 
+    @tag("downloaders")
+    def test_extract_only_wanted_files(self):
+        archive_directory = "/home/user/data_store/GSE12345"
+        os.makedirs(archive_directory, exist_ok=True)
+        archive_path = archive_directory + "/GSE12345_RAW.tgz"
+
+        cel_contents = b"CEL" * 1000
+        members = {
+            "GSM1234567_liver.CEL.gz": gzip.compress(cel_contents),
+            "GPL570-tbl-1.txt": b"ID\tSEQUENCE\n",
+        }
+        with tarfile.open(archive_path, "w:gz") as archive:
+            for name, contents in members.items():
+                member = tarfile.TarInfo(name)
+                member.size = len(contents)
+                archive.addfile(member, io.BytesIO(contents))
+
+        files = list(
+            geo.ArchivedFile(archive_path).get_files(
+                lambda archived_file: archived_file.is_processable()
+            )
+        )
+
+        # The CEL file was decompressed on the way out and the platform file never written.
+        self.assertEqual([file.filename for file in files], ["GSM1234567_liver.CEL"])
+        self.assertEqual(files[0].digest.sha1, hashlib.sha1(cel_contents).hexdigest())
+        with open(archive_directory + "/raw/GSM1234567_liver.CEL", "rb") as cel_file:
+            self.assertEqual(cel_file.read(), cel_contents)
+        self.assertFalse(os.path.exists(archive_directory + "/raw/GSM1234567_liver.CEL.gz"))
+        self.assertFalse(os.path.exists(archive_directory + "/raw/GPL570-tbl-1.txt"))
+
     @tag("downloaders")
     def test_download_aspera_and_ftp(self):
         """ Tests the main 'download_geo' function. """
@@ -6,6 +6,8 @@ class ImportTestCase(TestCase):
     def test_downloader_imports(self):
         # Make sure we can import the downloader tests
         import data_refinery_workers.downloaders.test_array_express
+        import data_refinery_workers.downloaders.test_batch
         import data_refinery_workers.downloaders.test_geo
+        import data_refinery_workers.downloaders.test_segmented
         import data_refinery_workers.downloaders.test_sra
         import data_refinery_workers.downloaders.test_transcriptome_index
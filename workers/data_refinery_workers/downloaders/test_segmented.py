@@ -0,0 +1,191 @@
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, tag
+
+import requests
+
+from data_refinery_workers.downloaders import segmented
+
+CONTENT = bytes(range(256)) * 40
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves CONTENT, honoring Range and If-Range like NCBI's and EBI's servers do."""
+
+    # Set by the tests.
+    accept_ranges = True
+    etag = '"v1"'
+    content_md5 = None
+    fail_from = None
+    unavailable = 0
+    requested_ranges = []
+
+    def do_GET(self):
+        if RangeHandler.unavailable:
+            RangeHandler.unavailable -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", "1")
+            self.end_headers()
+            return
+
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if (
+            not RangeHandler.accept_ranges
+            or not range_header
+            or (if_range and if_range != self.etag)
+        ):
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(CONTENT)))
+            self.send_header("ETag", self.etag)
+            if RangeHandler.content_md5:
+                self.send_header("Content-MD5", RangeHandler.content_md5)
+            self.end_headers()
+            self.wfile.write(CONTENT)
+            return
+
+        start, end = [int(part) for part in range_header.split("=")[1].split("-")]
+        RangeHandler.requested_ranges.append((start, end))
+        if RangeHandler.fail_from is not None and start >= RangeHandler.fail_from:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        self.send_response(206)
+        self.send_header("Content-Range", "bytes {}-{}/{}".format(start, end, len(CONTENT)))
+        self.send_header("Content-Length", str(end + 1 - start))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(CONTENT[start : end + 1])
+
+    def log_message(self, *args):
+        pass
+
+
+class SegmentedDownloadTestCase(SimpleTestCase):
+    def setUp(self):
+        RangeHandler.accept_ranges = True
+        RangeHandler.etag = '"v1"'
+        RangeHandler.content_md5 = None
+        RangeHandler.fail_from = None
+        RangeHandler.unavailable = 0
+        RangeHandler.requested_ranges = []
+
+        self.server = HTTPServer(("localhost", 0), RangeHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://localhost:{}/SRR123.sra".format(self.server.server_port)
+
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, "SRR123.sra")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def download(self, **kwargs):
+        return segmented.download(self.url, self.file_path, segment_size=1000, **kwargs)
+
+    def read_download(self):
+        with open(self.file_path, "rb") as downloaded_file:
+            return downloaded_file.read()
+
+    @tag("downloaders")
+    def test_download_in_segments(self):
+        md5 = hashlib.md5(CONTENT).hexdigest()
+        result = self.download(expected_md5=md5)
+
+        self.assertEqual(self.read_download(), CONTENT)
+        self.assertEqual(result.size, len(CONTENT))
+        self.assertEqual(result.bytes_downloaded, len(CONTENT))
+        self.assertEqual(result.md5, md5)
+        self.assertEqual(result.digest.sha1, hashlib.sha1(CONTENT).hexdigest())
+
+        # The probe plus one request per segment.
+        self.assertEqual(len(RangeHandler.requested_ranges), 1 + 11)
+        self.assertEqual(os.listdir(self.directory), ["SRR123.sra"])
+
+    @tag("downloaders")
+    def test_resume(self):
+        RangeHandler.fail_from = 5000
+        with self.assertRaises(segmented.DownloadError):
+            self.download()
+        self.assertFalse(os.path.exists(self.file_path))
+
+        RangeHandler.fail_from = None
+        RangeHandler.requested_ranges = []
+        result = self.download(expected_md5=hashlib.md5(CONTENT).hexdigest())
+
+        self.assertEqual(self.read_download(), CONTENT)
+        # Only what was missing is downloaded again.
+        self.assertTrue(all(start >= 5000 for start, _ in RangeHandler.requested_ranges[1:]))
+        self.assertEqual(result.bytes_downloaded, len(CONTENT) - 5000)
+        # The segments from before are still hashed.
+        self.assertEqual(result.digest.sha1, hashlib.sha1(CONTENT).hexdigest())
+        self.assertEqual(result.digest.size, len(CONTENT))
+
+    @tag("downloaders")
+    def test_dont_resume_changed_file(self):
+        RangeHandler.fail_from = 5000
+        with self.assertRaises(segmented.DownloadError):
+            self.download()
+
+        RangeHandler.fail_from = None
+        RangeHandler.etag = '"v2"'
+        result = self.download()
+
+        self.assertEqual(self.read_download(), CONTENT)
+        self.assertEqual(result.bytes_downloaded, len(CONTENT))
+
+    @tag("downloaders")
+    def test_checksum_mismatch(self):
+        with self.assertRaises(segmented.ChecksumMismatchError):
+            self.download(expected_md5="0" * 32)
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @tag("downloaders")
+    @patch("data_refinery_workers.downloaders.segmented.time.sleep")
+    def test_backs_off_when_unavailable(self, mock_sleep):
+        RangeHandler.unavailable = 2
+        self.download()
+
+        self.assertEqual(self.read_download(), CONTENT)
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list], [1.0, 1.0])
+
+    @tag("downloaders")
+    @patch("data_refinery_workers.downloaders.segmented.time.sleep")
+    def test_retries_connection_reset(self, mock_sleep):
+        iter_content = requests.Response.iter_content
+        resets = []
+
+        def reset_once(response, *args, **kwargs):
+            if not resets:
+                resets.append(True)
+                raise requests.exceptions.ChunkedEncodingError("Connection reset by peer")
+            return iter_content(response, *args, **kwargs)
+
+        with patch.object(requests.Response, "iter_content", reset_once):
+            result = self.download()
+
+        self.assertEqual(self.read_download(), CONTENT)
+        self.assertEqual(result.digest.sha1, hashlib.sha1(CONTENT).hexdigest())
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    @tag("downloaders")
+    def test_without_ranges(self):
+        RangeHandler.accept_ranges = False
+        RangeHandler.content_md5 = base64.b64encode(hashlib.md5(CONTENT).digest()).decode()
+        result = self.download()
+
+        self.assertEqual(self.read_download(), CONTENT)
+        self.assertEqual(result.md5, hashlib.md5(CONTENT).hexdigest())
+        self.assertEqual(result.digest.sha1, hashlib.sha1(CONTENT).hexdigest())
@@ -4,6 +4,7 @@ import urllib.request
 from contextlib import closing
 
 from data_refinery_common.enums import ProcessorPipeline
+from data_refinery_common.file_digest import FileDigest, HashingWriter
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.message_queue import send_job
 from data_refinery_common.models import (
@@ -20,8 +21,10 @@ LOCAL_ROOT_DIR = get_env_variable("LOCAL_ROOT_DIR", "/home/user/data_store")
 CHUNK_SIZE = 1024 * 256  # chunk_size is in bytes
 
 
-def _download_file(download_url: str, file_path: str, job: DownloaderJob) -> DownloaderJob:
-    """Download the file via FTP.
+def _download_file(
+    download_url: str, file_path: str, job: DownloaderJob, digest: FileDigest = None
+) -> DownloaderJob:
+    """Download the file via FTP, hashing it into `digest` as it's written.
 
     I spoke to Erin from Ensembl about ways to improve this. They're looking into it,
     but have decided against adding an Aspera endpoint.
@@ -34,7 +37,7 @@ def _download_file(download_url: str, file_path: str, job: DownloaderJob) -> Dow
             "Downloading file from %s to %s.", download_url, file_path, downloader_job=job.id
         )
         urllib.request.urlcleanup()
-        target_file = open(file_path, "wb")
+        target_file = HashingWriter(file_path, digest)
         with closing(urllib.request.urlopen(download_url)) as request:
             shutil.copyfileobj(request, target_file, CHUNK_SIZE)
 
@@ -79,7 +82,8 @@ def download_transcriptome(job_id: int) -> None:
 
         os.makedirs(LOCAL_ROOT_DIR + "/" + filename_species, exist_ok=True)
         dl_file_path = LOCAL_ROOT_DIR + "/" + filename_species + "/" + original_file.source_filename
-        job = _download_file(original_file.source_url, dl_file_path, job)
+        digest = FileDigest()
+        job = _download_file(original_file.source_url, dl_file_path, job, digest)
 
         if not job.success:
             break
@@ -89,8 +93,9 @@ def download_transcriptome(job_id: int) -> None:
         original_file.filename = original_file.source_filename
         original_file.is_archive = True
         original_file.has_raw = True
-        original_file.calculate_size()
-        original_file.calculate_sha1()
+        digest.verify(dl_file_path)
+        original_file.size_in_bytes = digest.size
+        original_file.sha1 = digest.sha1
         original_file.save()
         files_to_process.append(original_file)
 
@@ -1,8 +1,10 @@
 import signal
 import sys
+import threading
 
 from django.utils import timezone
 
+from data_refinery_common import disk_space
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import DownloaderJob, DownloaderJobOriginalFileAssociation
 from data_refinery_common.utils import get_env_variable, get_instance_id
@@ -11,22 +13,36 @@ logger = get_and_configure_logger(__name__)
 # Let this fail if SYSTEM_VERSION is unset.
 SYSTEM_VERSION = get_env_variable("SYSTEM_VERSION")
 
-CURRENT_JOB = None
+# We usually don't know how big a file is until we've downloaded it,
+# so assume it's this big if we've never seen it before.
+DEFAULT_DOWNLOAD_SIZE = int(get_env_variable("DEFAULT_DOWNLOAD_SIZE", str(2 * 1024 * 1024 * 1024)))
+
+# The jobs this process has started but not yet ended, by id. There's
+# usually only one, but see data_refinery_workers.downloaders.batch.
+CURRENT_JOBS = {}
 
 
 def signal_handler(sig, frame):
     """Signal Handler, works for both SIGTERM and SIGINT"""
-    global CURRENT_JOB
-    if CURRENT_JOB:
-        CURRENT_JOB.success = False
-        CURRENT_JOB.end_time = timezone.now()
-        CURRENT_JOB.num_retries = CURRENT_JOB.num_retries - 1
-        CURRENT_JOB.failure_reason = "Interruped by SIGTERM/SIGINT: " + str(sig)
-        CURRENT_JOB.save()
+    for job in list(CURRENT_JOBS.values()):
+        job.success = False
+        job.end_time = timezone.now()
+        job.num_retries = job.num_retries - 1
+        job.failure_reason = "Interruped by SIGTERM/SIGINT: " + str(sig)
+        job.save()
 
     sys.exit(0)
 
 
+def register_signal_handlers() -> None:
+    """Set up the SIGTERM handler so we can appropriately handle being interrupted.
+
+    (`docker stop` uses SIGTERM, not SIGINT, but better to catch both.)
+    """
+    signal.signal(signal.SIGTERM, signal_handler)
+    signal.signal(signal.SIGINT, signal_handler)
+
+
 def start_job(job_id: int) -> DownloaderJob:
     """Record in the database that this job is being started.
 
@@ -47,10 +63,10 @@ def start_job(job_id: int) -> DownloaderJob:
         logger.error("This downloader job has already been started!!!", downloader_job=job.id)
         raise Exception("downloaders.start_job called on a job that has already been started!")
 
-    # Set up the SIGTERM handler so we can appropriately handle being interrupted.
-    # (`docker stop` uses SIGTERM, not SIGINT, but better to catch both.)
-    signal.signal(signal.SIGTERM, signal_handler)
-    signal.signal(signal.SIGINT, signal_handler)
+    # Signal handlers can only be set from the main thread, so when
+    # jobs are run in batches the batch sets them up instead.
+    if threading.current_thread() is threading.main_thread():
+        register_signal_handlers()
 
     job.worker_id = worker_id
     job.worker_version = SYSTEM_VERSION
@@ -73,18 +89,61 @@ def start_job(job_id: int) -> DownloaderJob:
         job.save()
         sys.exit(0)
 
-    global CURRENT_JOB
-    CURRENT_JOB = job
+    CURRENT_JOBS[job.id] = job
 
     return job
 
 
+def get_disk_space_reservation_id(job_id: int) -> str:
+    """Returns the id a downloader job's disk space reservation is tracked under."""
+    return "downloader_job_" + str(job_id)
+
+
+def reserve_disk_space(job: DownloaderJob, original_files, multiplier: float = 1) -> bool:
+    """Reserves enough disk space to download `original_files`.
+
+    `multiplier` should account for anything else the downloader will
+    write, such as the contents of archives it extracts. If the space
+    can't be found the job is ended and False is returned, so it can
+    be retried later rather than failing partway through writing.
+    """
+    num_bytes = disk_space.estimate_files_size(original_files, multiplier, DEFAULT_DOWNLOAD_SIZE)
+    try:
+        disk_space.reserve_space(get_disk_space_reservation_id(job.id), num_bytes)
+    except disk_space.InsufficientDiskSpaceError as e:
+        logger.warning(
+            "Deferring downloader job because there isn't enough disk space.",
+            downloader_job=job.id,
+            requested_bytes=e.requested_bytes,
+            available_bytes=e.available_bytes,
+        )
+        job.failure_reason = "Deferring job because there isn't enough disk space: " + str(e)
+        # Running out of room on this node isn't the job's fault, so
+        # the Foreman won't count it against its retries.
+        job.deferred = True
+        end_downloader_job(job, success=False)
+        return False
+
+    return True
+
+
+def record_download(job: DownloaderJob, num_bytes: int, seconds: float) -> None:
+    """Adds a download to the job's throughput stats, which are saved when it ends."""
+    job.downloaded_bytes += num_bytes
+    job.download_seconds += seconds
+
+
 def end_downloader_job(job: DownloaderJob, success: bool):
     """
     Record in the database that this job has completed.
     """
     if success:
-        logger.debug("Downloader Job completed successfully.", downloader_job=job.id)
+        logger.debug(
+            "Downloader Job completed successfully.",
+            downloader_job=job.id,
+            downloaded_bytes=job.downloaded_bytes,
+            bytes_per_second=int(job.download_throughput),
+        )
     else:
         # Should be set by now, but make sure.
         success = False
@@ -108,6 +167,14 @@ def end_downloader_job(job: DownloaderJob, success: bool):
                 failure_reason=job.failure_reason,
             )
 
+    # Whatever this job reserved is either on disk by now or no longer needed.
+    try:
+        disk_space.release_space(get_disk_space_reservation_id(job.id))
+    except Exception:
+        logger.exception("Failed to release disk space reservation.", downloader_job=job.id)
+
     job.success = success
     job.end_time = timezone.now()
     job.save()
+
+    CURRENT_JOBS.pop(job.id, None)
@@ -1,5 +1,9 @@
 import os
 import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
 import boto3
 
@@ -19,44 +23,71 @@ AWS_REGION = get_env_variable("AWS_REGION", "us-east-1")
 # describe_jobs.
 DESCRIBE_JOBS_PAGE_SIZE = 100
 
+# How many accession codes or job ids to look up per query. This keeps
+# the `__in` clauses a reasonable size on nodes with lots of directories.
+LOOKUP_PAGE_SIZE = 1000
+
+# Deleting is mostly waiting on the disk, so a few threads go a long way.
+JANITOR_MAX_THREAD_COUNT = 8
+
 batch = boto3.client("batch", region_name=AWS_REGION)
 
 
-def _find_and_remove_expired_jobs(job_context):
-    """ Finds expired jobs and removes their working directories """
+def _get_disk_usage() -> Dict:
+    """Returns a snapshot of how full the volume holding LOCAL_ROOT_DIR is."""
+    usage = shutil.disk_usage(LOCAL_ROOT_DIR)
+    return {
+        "total_bytes": usage.total,
+        "used_bytes": usage.used,
+        "free_bytes": usage.free,
+        "percent_used": round(usage.used / usage.total * 100, 2) if usage.total else 0.0,
+    }
 
-    job_context["deleted_items"] = []
 
-    items_to_delete = []
-    jobs_to_check = []
+def _get_directory_size(path: str) -> int:
+    """Returns the number of bytes taken up by the files under `path`."""
+    total_size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total_size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                # The file went away while we were looking at it.
+                pass
+
+    return total_size
+
+
+def _delete_directory(path: str) -> Tuple[str, int]:
+    """Removes `path` and returns it along with the number of bytes reclaimed."""
+    size = _get_directory_size(path)
+    logger.debug("Janitor deleting " + path)
+    # This job is likely vanished. Not a problem, it's gone.
+    shutil.rmtree(path, ignore_errors=True)
+    return (path, size)
+
+
+def _scan_local_root_dir() -> Tuple[Dict[str, List[str]], Dict[int, str]]:
+    """Walks LOCAL_ROOT_DIR once and collects everything the janitor might delete.
+
+    Returns a dict mapping sample accession codes to the directories
+    that hold their files and a dict mapping processor job ids to
+    their working directories.
+    """
+    sample_directories = defaultdict(list)
+    job_directories = {}
     for item in os.listdir(LOCAL_ROOT_DIR):
 
         # There may be successful processors
         if "SRP" in item or "ERP" in item or "DRP" in item:
             sub_path = os.path.join(LOCAL_ROOT_DIR, item)
-            for sub_item in os.listdir(sub_path):
-                try:
-                    sample = Sample.objects.get(accession_code=sub_item)
-                    if sample.computed_files.count() == 0:
-                        # This doesn't have any associated computed files - leave it be.
-                        continue
-                except Sample.DoesNotExist:
-                    # Interesting. This shouldn't happen at all.
-                    continue
-                except Exception:
-                    # We can't contact the DB right now, skip deletion.
-                    continue
-
-                try:
-                    sub_item_path = os.path.join(sub_path, sub_item)
-                    logger.debug(
-                        "Janitor deleting " + sub_item_path, contents=str(os.listdir(sub_item_path))
-                    )
-                    shutil.rmtree(sub_item_path)
-                    job_context["deleted_items"].append(sub_item_path)
-                except Exception:
-                    # This job is likely vanished. No need for this directory.
-                    pass
+            try:
+                sub_items = os.listdir(sub_path)
+            except OSError:
+                continue
+
+            for sub_item in sub_items:
+                sample_directories[sub_item].append(os.path.join(sub_path, sub_item))
 
         # Processor job working directories
         if "processor_job_" in item:
@@ -66,43 +97,121 @@ def _find_and_remove_expired_jobs(job_context):
             if "_index" in item:
                 continue
 
-            # Okay, does this job exist?
             try:
-                job = ProcessorJob.objects.get(id=item.split("processor_job_")[1])
+                job_directories[int(item.split("processor_job_")[1])] = item
+            except ValueError:
+                logger.warning("Janitor found a malformed job directory " + item)
+
+    return sample_directories, job_directories
+
+
+def _find_processed_sample_directories(sample_directories: Dict[str, List[str]]) -> List[str]:
+    """Returns the directories belonging to samples which already have computed files.
+
+    Directories for samples without any computed files are left
+    alone. So are the ones for samples we've never heard of, which
+    shouldn't happen at all.
+    """
+    accession_codes = list(sample_directories.keys())
+    processed_accession_codes = set()
+    for page_start in range(0, len(accession_codes), LOOKUP_PAGE_SIZE):
+        page = accession_codes[page_start : page_start + LOOKUP_PAGE_SIZE]
+        processed_accession_codes.update(
+            Sample.objects.filter(accession_code__in=page, computed_files__isnull=False)
+            .values_list("accession_code", flat=True)
+            .distinct()
+        )
+
+    return [
+        path
+        for accession_code in processed_accession_codes
+        for path in sample_directories[accession_code]
+    ]
+
+
+def _find_expired_job_directories(job_directories: Dict[int, str]) -> List[str]:
+    """Returns the directories of processor jobs which are no longer running."""
+    job_ids = list(job_directories.keys())
+    batch_job_ids = {}
+    for page_start in range(0, len(job_ids), LOOKUP_PAGE_SIZE):
+        page = job_ids[page_start : page_start + LOOKUP_PAGE_SIZE]
+        batch_job_ids.update(
+            ProcessorJob.objects.filter(id__in=page).values_list("id", "batch_job_id")
+        )
 
-                jobs_to_check.append(job)
-            except ProcessorJob.DoesNotExist:
-                # This job has vanished from the DB - clean it up!
-                logger.error("Janitor found no record of " + item + " - why?")
-                items_to_delete.append(item)
+    items_to_delete = []
+    for job_id, item in job_directories.items():
+        if job_id not in batch_job_ids:
+            # This job has vanished from the DB - clean it up!
+            logger.error("Janitor found no record of " + item + " - why?")
+            items_to_delete.append(item)
 
+    jobs_to_check = list(batch_job_ids.items())
     for page_start in range(0, len(jobs_to_check), DESCRIBE_JOBS_PAGE_SIZE):
+        page_end = page_start + DESCRIBE_JOBS_PAGE_SIZE
+        page = jobs_to_check[page_start:page_end]
         try:
-            page_end = page_start + DESCRIBE_JOBS_PAGE_SIZE
-            page = jobs_to_check[page_start:page_end]
-
-            job_ids = [job.batch_job_id for job in page if job.batch_job_id]
+            job_ids = [batch_job_id for _, batch_job_id in page if batch_job_id]
             batch_jobs = batch.describe_jobs(jobs=job_ids)["jobs"]
+        except Exception:
+            # We're unable to connect to Batch right now, so hold
+            # onto these for right now.
+            logger.exception("Problem describing Batch jobs for janitor page.")
+            continue
 
-            running_ids = {job["jobId"] for job in batch_jobs if job["status"] == "RUNNING"}
+        running_ids = {job["jobId"] for job in batch_jobs if job["status"] == "RUNNING"}
 
-            for job in page:
-                if not job.batch_job_id or job.batch_job_id not in running_ids:
-                    # Reconstitute the path we broke apart previously.
-                    items_to_delete.append("processor_job_" + str(job.id))
+        for job_id, batch_job_id in page:
+            if not batch_job_id or batch_job_id not in running_ids:
+                items_to_delete.append(job_directories[job_id])
 
-        except Exception:
-            # We're unable to connect to the DB or Batch right
-            # now, so hold onto it for right now.
-            logger.exception("Problem finding job record for " + item + " - why?")
-            continue
+    return [os.path.join(LOCAL_ROOT_DIR, item) for item in items_to_delete]
 
-    for item in items_to_delete:
-        to_delete = LOCAL_ROOT_DIR + "/" + item
-        logger.debug("Janitor deleting " + to_delete)
-        # This job is likely vanished. Not a problem, it's go
-        shutil.rmtree(to_delete, ignore_errors=True)
-        job_context["deleted_items"].append(to_delete)
+
+def _find_and_remove_expired_jobs(job_context):
+    """Finds expired jobs and removes their working directories.
+
+    All of the candidate directories are collected in a single pass
+    over LOCAL_ROOT_DIR and then resolved against the database with a
+    handful of `__in` queries rather than one query per directory.
+    """
+    start_time = time.time()
+    job_context["deleted_items"] = []
+    job_context["bytes_reclaimed"] = 0
+    job_context["disk_usage_before"] = _get_disk_usage()
+
+    sample_directories, job_directories = _scan_local_root_dir()
+
+    paths_to_delete = []
+    for find_directories, candidates in [
+        (_find_processed_sample_directories, sample_directories),
+        (_find_expired_job_directories, job_directories),
+    ]:
+        try:
+            paths_to_delete.extend(find_directories(candidates))
+        except Exception:
+            # We can't contact the DB right now, skip deletion.
+            logger.exception(
+                "Janitor was unable to look up its candidate directories.",
+                lookup=find_directories.__name__,
+            )
+
+    with ThreadPoolExecutor(max_workers=JANITOR_MAX_THREAD_COUNT) as executor:
+        for path, size in executor.map(_delete_directory, paths_to_delete):
+            job_context["deleted_items"].append(path)
+            job_context["bytes_reclaimed"] += size
+
+    job_context["disk_usage_after"] = _get_disk_usage()
+    job_context["janitor_duration"] = time.time() - start_time
+
+    logger.info(
+        "Janitor finished removing expired job directories.",
+        num_deleted=len(job_context["deleted_items"]),
+        bytes_reclaimed=job_context["bytes_reclaimed"],
+        duration=job_context["janitor_duration"],
+        percent_used_before=job_context["disk_usage_before"]["percent_used"],
+        percent_used_after=job_context["disk_usage_after"]["percent_used"],
+    )
 
     job_context["success"] = True
     return job_context
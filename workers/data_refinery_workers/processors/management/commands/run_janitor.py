@@ -25,4 +25,16 @@ class Command(BaseCommand):
         for item in final_context["deleted_items"]:
             print("\t - " + item)
 
+        print(
+            "Reclaimed %d bytes in %.2f seconds."
+            % (final_context["bytes_reclaimed"], final_context["janitor_duration"])
+        )
+        print(
+            "Disk usage went from %.2f%% to %.2f%%."
+            % (
+                final_context["disk_usage_before"]["percent_used"],
+                final_context["disk_usage_after"]["percent_used"],
+            )
+        )
+
         sys.exit(0)
@@ -17,6 +17,12 @@ class Command(BaseCommand):
             help=("The processor job's name. Must be enumerated in data_refinery_common.enums."),
         )
         parser.add_argument("--job-id", type=int, help=("The processor job's ID."))
+        parser.add_argument(
+            "--prewarm-organism-id",
+            type=str,
+            default="",
+            help=("The organism whose salmon index should be installed after a SALMON job."),
+        )
 
     def handle(self, *args, **options):
         if options["job_id"] is None:
@@ -60,7 +66,8 @@ class Command(BaseCommand):
         elif job_type is ProcessorPipeline.SALMON:
             from data_refinery_workers.processors.salmon import salmon
 
-            salmon(options["job_id"])
+            prewarm_organism_id = options["prewarm_organism_id"]
+            salmon(options["job_id"], int(prewarm_organism_id) if prewarm_organism_id else None)
         elif job_type is ProcessorPipeline.TXIMPORT:
             from data_refinery_workers.processors.tximport import tximport
 
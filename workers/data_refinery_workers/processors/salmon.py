@@ -4,7 +4,9 @@ import re
 import shutil
 import subprocess
 import tarfile
-from typing import Dict, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
 from django.conf import settings
 from django.db import transaction
@@ -16,6 +18,7 @@ import pandas as pd
 import untangle
 from botocore.client import Config
 
+from data_refinery_common import disk_space, index_cache
 from data_refinery_common.enums import PipelineEnum
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import (
@@ -35,7 +38,7 @@ from data_refinery_common.rna_seq import (
     should_run_tximport,
 )
 from data_refinery_common.utils import get_env_variable
-from data_refinery_workers.processors import utils
+from data_refinery_workers.processors import sra_streaming, utils
 
 # We have to set the signature_version to v4 since us-east-1 buckets require
 # v4 authentication.
@@ -45,6 +48,20 @@ JOB_DIR_PREFIX = "processor_job_"
 LOCAL_ROOT_DIR = get_env_variable("LOCAL_ROOT_DIR", "/home/user/data_store")
 S3_BUCKET_NAME = get_env_variable("S3_BUCKET_NAME", "data-refinery")
 
+# SRA inputs are copied into the work dir and salmontools writes out
+# the unmapped reads, so reserve about twice the size of the inputs.
+INPUT_DISK_SPACE_MULTIPLIER = 2
+# Both the index tarball and its extracted contents need to fit.
+INDEX_DISK_SPACE_MULTIPLIER = 3
+
+# Rob recommends 16 threads/process, which fits snugly on an x1 at 8GB RAM per Salmon container:
+# (2 threads/core * 16 cores/socket * 64 vCPU) / (1TB/8GB) = ~17
+MAX_SALMON_THREADS = int(get_env_variable("MAX_SALMON_THREADS", "16"))
+
+# Staging quant.sf files for tximport is mostly waiting on S3, so use
+# more threads than we have CPUs.
+TXIMPORT_DOWNLOAD_THREAD_COUNT = int(get_env_variable("TXIMPORT_DOWNLOAD_THREAD_COUNT", "16"))
+
 
 def _set_job_prefix(job_context: Dict) -> Dict:
     """Sets the `job_dir_prefix` value in the job context object."""
@@ -119,6 +136,10 @@ def _prepare_files(job_context: Dict) -> Dict:
         job_context["job"].no_retry = True
         return job_context
 
+    job_context = utils.reserve_disk_space(
+        job_context, disk_space.estimate_files_size(original_files, INPUT_DISK_SPACE_MULTIPLIER)
+    )
+
     # Detect that this is an SRA file from the source URL
     if ("ncbi.nlm.nih.gov" in job_context["original_files"][0].source_url) or (
         job_context["input_file_path"][-4:].upper() == ".SRA"
@@ -362,86 +383,51 @@ def _find_or_download_index(job_context: Dict) -> Dict:
         job_context["success"] = False
         return job_context
 
-    job_context["index_directory"] = index_object.absolute_directory_path
+    # Indexes which were installed where the index says it should be,
+    # either by hand or before the index cache existed, are used in
+    # place. Everything else goes through the index cache.
+    if index_cache.is_index_installed(index_object.absolute_directory_path):
+        job_context["index_directory"] = index_object.absolute_directory_path
+        job_context["index_was_cached"] = True
+        job_context["index_cold_start_time"] = 0
+    else:
+        if not index_cache.is_index_installed(index_cache.get_index_directory(index_object.id)):
+            job_context = utils.reserve_disk_space(
+                job_context,
+                disk_space.estimate_files_size(
+                    index_object.result.computedfile_set.all(), INDEX_DISK_SPACE_MULTIPLIER
+                ),
+            )
 
-    try:
-        # The organism index only needs to be downloaded from S3 once per
-        # organism per index length per EBS volume. We don't know if
-        # another job has started downloading it yet, started extracting
-        # it yet, or already finished and been symlinked to a common
-        # location. Therefore check to see if it's happened before we
-        # complete each step.
-        version_info_path = job_context["index_directory"] + "/versionInfo.json"
-
-        # Something very bad happened and now there are corrupt indexes installed. Nuke 'em.
-        if os.path.exists(version_info_path) and (os.path.getsize(version_info_path) == 0):
-            logger.error("We have to nuke a zero-valued index directory: " + version_info_path)
-            shutil.rmtree(job_context["index_directory"], ignore_errors=True)
-            os.makedirs(job_context["index_directory"], exist_ok=True)
-
-        index_tarball = None
-        if not os.path.exists(version_info_path):
-            # Index is not installed yet, so download it.
-            index_file = ComputedFile.objects.filter(result=index_object.result)[0]
-            index_tarball = index_file.sync_from_s3(
-                path=job_context["work_dir"] + index_file.filename
+        # This includes any time spent waiting for another job to
+        # finish extracting the same index.
+        cold_start_begin = time.time()
+        try:
+            index_directory, was_cached = index_cache.acquire_index(
+                index_object, utils.get_disk_space_reservation_id(job_context["job_id"])
+            )
+        except Exception as e:
+            error_template = (
+                "Failed to download or extract transcriptome index for organism {0}: {1}"
             )
+            error_message = error_template.format(str(job_context["organism"]), str(e))
+            logger.exception(error_message, processor_job=job_context["job_id"])
+            job_context["job"].failure_reason = error_message
+            job_context["success"] = False
+            return job_context
 
-        index_hard_dir = None
-        if not os.path.exists(version_info_path):
-            # Index is still not installed yet, so extract it.
-
-            # Create a temporary location to download the index to, which
-            # can be symlinked to once extraction is complete.
-            index_hard_dir = os.path.join(LOCAL_ROOT_DIR, job_context["job_dir_prefix"]) + "_index/"
-            os.makedirs(index_hard_dir)
-            with tarfile.open(index_tarball, "r:gz") as index_archive:
-                index_archive.extractall(index_hard_dir)
-
-        if not os.path.exists(version_info_path):
-            # Index is still not installed yet, so symlink the files we
-            # have to where they are expected to reside.
-            os.makedirs(job_context["index_directory"], exist_ok=True)
-
-            index_files = [
-                "versionInfo.json",
-                "duplicate_clusters.tsv",
-                "hash.bin",
-                "indexing.log",
-                "refInfo.json",
-                "sa.bin",
-                "genes_to_transcripts.txt",
-                "header.json",
-                "quasi_index.log",
-                "rsd.bin",
-                "txpInfo.bin",
-            ]
-
-            for subfile in index_files:
-                # Remove any broken links before symlinking.
-                # If a link is broken, os.path.exists returns false because the
-                # file pointed to by the link does not exist but
-                # os.symlink throws an error because the broken link itself exists.
-                # os.path.lexists, however, returns true if a broken link exists
-                target_file = job_context["index_directory"] + "/" + subfile
-                if os.path.lexists(target_file):
-                    os.unlink(target_file)
-
-                os.symlink(index_hard_dir + subfile, target_file)
-        elif index_hard_dir:
-            # We have failed the race.
-            logger.error("We have failed the index extraction race! Removing dead trees.")
-            shutil.rmtree(index_hard_dir, ignore_errors=True)
-    except Exception as e:
-        error_template = "Failed to download or extract transcriptome index for organism {0}: {1}"
-        error_message = error_template.format(str(job_context["organism"]), str(e))
-        logger.exception(error_message, processor_job=job_context["job_id"])
-        job_context["job"].failure_reason = error_message
-        job_context["success"] = False
+        job_context["index_directory"] = index_directory
+        job_context["index_cache_reference"] = index_object.id
+        job_context["index_was_cached"] = was_cached
+        job_context["index_cold_start_time"] = time.time() - cold_start_begin
 
-        # Make sure we don't leave an empty index directory lying around.
-        shutil.rmtree(index_hard_dir, ignore_errors=True)
-        return job_context
+    logger.info(
+        "Salmon index is ready.",
+        processor_job=job_context["job_id"],
+        organism_index=index_object.id,
+        index_was_cached=job_context["index_was_cached"],
+        index_cold_start_time=job_context["index_cold_start_time"],
+    )
 
     # The index tarball contains a directory named index, so add that
     # to the path where we should put it.
@@ -454,32 +440,50 @@ def _find_or_download_index(job_context: Dict) -> Dict:
     return job_context
 
 
+def _stage_quant_file(work_dir: str, quant_file: ComputedFile) -> Tuple[str, int]:
+    """Downloads a quant.sf file into the work dir, returning its path and size.
+
+    We create a directory in the work directory for each quant.sf file,
+    as tximport assigns column names based on the parent directory
+    name, and we need those names so that we can reassociate with the
+    samples later. e.g., a file with absolute_file_path:
+    /processor_job_1/SRR123_output/quant.sf downloads to:
+    /processor_job_2/SRR123_output/quant.sf so the result file has
+    frame "SRR123_output", which we can associate with sample SRR123.
+    """
+    sample_output = work_dir + str(quant_file.absolute_file_path.split("/")[-2]) + "/"
+    os.makedirs(sample_output, exist_ok=True)
+    quant_file_path = quant_file.get_synced_file_path(path=sample_output + quant_file.filename)
+    if not quant_file_path:
+        raise utils.ProcessorJobError(
+            "Failed to download quant file for tximport.", success=False, quant_file=quant_file.id,
+        )
+
+    return quant_file_path, os.stat(quant_file_path).st_size
+
+
 def _run_tximport_for_experiment(
     job_context: Dict, experiment: Experiment, quant_files: List[ComputedFile]
 ) -> Dict:
+    phase_timings = {}
 
     # Download all the quant.sf fles for this experiment. Write all
     # their paths to a file so we can pass a path to that to
     # tximport.R rather than having to pass in one argument per
     # sample.
+    phase_start = time.time()
     tximport_path_list_file = job_context["work_dir"] + "tximport_inputs.txt"
     quant_file_paths = {}
-    with open(tximport_path_list_file, "w") as input_list:
-        for quant_file in quant_files:
-            # We create a directory in the work directory for each (quant.sf) file, as
-            # tximport assigns column names based on the parent directory name,
-            # and we need those names so that we can reassociate withe samples later.
-            # ex., a file with absolute_file_path: /processor_job_1/SRR123_output/quant.sf
-            # downloads to: /processor_job_2/SRR123_output/quant.sf
-            # So the result file has frame "SRR123_output", which we can associate with sample SRR123
-            sample_output = (
-                job_context["work_dir"] + str(quant_file.absolute_file_path.split("/")[-2]) + "/"
-            )
-            os.makedirs(sample_output, exist_ok=True)
-            quant_work_path = sample_output + quant_file.filename
-            quant_file_path = quant_file.get_synced_file_path(path=quant_work_path)
-            input_list.write(quant_file_path + "\n")
-            quant_file_paths[quant_file_path] = os.stat(quant_file_path).st_size
+    with ThreadPoolExecutor(max_workers=TXIMPORT_DOWNLOAD_THREAD_COUNT) as executor:
+        staged_files = executor.map(
+            lambda quant_file: _stage_quant_file(job_context["work_dir"], quant_file), quant_files
+        )
+        with open(tximport_path_list_file, "w") as input_list:
+            for quant_file_path, quant_file_size in staged_files:
+                input_list.write(quant_file_path + "\n")
+                quant_file_paths[quant_file_path] = quant_file_size
+
+    phase_timings["staging"] = time.time() - phase_start
 
     rds_filename = "txi_out.RDS"
     rds_file_path = job_context["work_dir"] + rds_filename
@@ -508,6 +512,7 @@ def _run_tximport_for_experiment(
         experiment=experiment.id,
     )
 
+    phase_start = time.time()
     try:
         tximport_result = subprocess.run(cmd_tokens, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     except Exception as e:
@@ -529,6 +534,8 @@ def _run_tximport_for_experiment(
             quant_file_paths=quant_file_paths,
         )
 
+    phase_timings["tximport"] = time.time() - phase_start
+
     result.time_end = timezone.now()
     result.commands.append(" ".join(cmd_tokens))
     result.is_ccdl = True
@@ -540,6 +547,7 @@ def _run_tximport_for_experiment(
             "Failed to set processor: {}".format(e), success=False, processor_key=processor_key
         )
 
+    phase_start = time.time()
     result.save()
     job_context["pipeline"].steps.append(result.id)
 
@@ -558,6 +566,7 @@ def _run_tximport_for_experiment(
     # Split the tximport result into smashable subfiles
     data = pd.read_csv(tpm_file_path, sep="\t", header=0, index_col=0)
     individual_files = []
+    sample_accession_codes = []
     frames = np.split(data, len(data.columns), axis=1)
     for frame in frames:
         # Create sample-specific TPM file.
@@ -566,8 +575,7 @@ def _run_tximport_for_experiment(
         frame.to_csv(frame_path, sep="\t", encoding="utf-8")
 
         # The frame column header is based off of the path, which includes _output.
-        sample_accession_code = frame.columns.values[0].replace("_output", "")
-        sample = Sample.objects.get(accession_code=sample_accession_code)
+        sample_accession_codes.append(frame.columns.values[0].replace("_output", ""))
 
         computed_file = ComputedFile()
         computed_file.absolute_file_path = frame_path
@@ -578,23 +586,59 @@ def _run_tximport_for_experiment(
         computed_file.is_public = True
         computed_file.calculate_sha1()
         computed_file.calculate_size()
-        computed_file.save()
-        job_context["computed_files"].append(computed_file)
-        job_context["smashable_files"].append(computed_file)
-
-        SampleResultAssociation.objects.get_or_create(sample=sample, result=result)
-
-        # Create association with the RDS file.
-        SampleComputedFileAssociation.objects.get_or_create(sample=sample, computed_file=rds_file)
+        individual_files.append(computed_file)
 
-        # Create association with TPM file.
-        SampleComputedFileAssociation.objects.get_or_create(
-            sample=sample, computed_file=computed_file
+    samples = Sample.objects.in_bulk(sample_accession_codes, field_name="accession_code")
+    missing_accession_codes = set(sample_accession_codes) - set(samples.keys())
+    if missing_accession_codes:
+        raise utils.ProcessorJobError(
+            "tximport produced output for samples we don't know about.",
+            success=False,
+            experiment=experiment.id,
+            accession_codes=sorted(missing_accession_codes),
         )
 
-        individual_files.append(computed_file)
+    # Postgres sets the ids of bulk created objects, which the
+    # associations below need.
+    ComputedFile.objects.bulk_create(individual_files)
+
+    sample_result_associations = []
+    sample_computed_file_associations = []
+    for accession_code, computed_file in zip(sample_accession_codes, individual_files):
+        sample = samples[accession_code]
+        sample_result_associations.append(SampleResultAssociation(sample=sample, result=result))
+        # Associate the sample with both the RDS file and its own TPM file.
+        sample_computed_file_associations.append(
+            SampleComputedFileAssociation(sample=sample, computed_file=rds_file)
+        )
+        sample_computed_file_associations.append(
+            SampleComputedFileAssociation(sample=sample, computed_file=computed_file)
+        )
         job_context["samples"].append(sample)
 
+    SampleResultAssociation.objects.bulk_create(sample_result_associations, ignore_conflicts=True)
+    SampleComputedFileAssociation.objects.bulk_create(
+        sample_computed_file_associations, ignore_conflicts=True
+    )
+
+    job_context["computed_files"].extend(individual_files)
+    job_context["smashable_files"].extend(individual_files)
+    phase_timings["post_processing"] = time.time() - phase_start
+
+    kv = ComputationalResultAnnotation()
+    kv.data = {"phase_timings": phase_timings, "num_quant_files": len(quant_files)}
+    kv.result = result
+    kv.is_public = False
+    kv.save()
+
+    logger.info(
+        "Finished running tximport for experiment.",
+        processor_job=job_context["job_id"],
+        experiment=experiment.id,
+        num_quant_files=len(quant_files),
+        **phase_timings,
+    )
+
     # Salmon-processed samples aren't marked as is_processed
     # until they are fully tximported, this value sets that
     # for the end_job function.
@@ -671,71 +715,49 @@ def tximport(job_context: Dict) -> Dict:
     return job_context
 
 
+def _get_salmon_thread_count() -> int:
+    """Returns how many threads salmon should use given this container's CPUs."""
+    return max(min(utils.get_cpu_allocation(), MAX_SALMON_THREADS), 1)
+
+
 def _run_salmon(job_context: Dict) -> Dict:
     """Runs Salmon Quant."""
     logger.debug("Running Salmon..")
 
+    job_context["salmon_thread_count"] = _get_salmon_thread_count()
+
     # Salmon needs to be run differently for different sample types.
     # SRA files also get processed differently as we don't want to use fasterq-dump to extract
     # them to disk.
+    sra_stream = None
     if job_context.get("sra_input_file_path", None):
+        sra_stream = sra_streaming.SraStream(
+            job_context["sra_input_file_path"], is_paired=job_context["sra_num_reads"] != 1
+        )
 
         # Single reads
         if job_context["sra_num_reads"] == 1:
-
-            fifo = "/tmp/barney"
-            os.mkfifo(fifo)
-
-            dump_str = "fastq-dump --stdout {input_sra_file} > {fifo} &"
-            formatted_dump_command = dump_str.format(
-                input_sra_file=job_context["sra_input_file_path"], fifo=fifo
-            )
-            subprocess.Popen(
-                formatted_dump_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-            )
-
             command_str = (
                 "salmon --no-version-check quant -l A -i {index} "
-                "-r {fifo} -p 16 -o {output_directory} --seqBias --dumpEq --writeUnmappedNames"
+                "-r {fifo} -p {threads} -o {output_directory} --seqBias --dumpEq --writeUnmappedNames"
             )
             formatted_command = command_str.format(
                 index=job_context["index_directory"],
-                input_sra_file=job_context["sra_input_file_path"],
-                fifo=fifo,
+                fifo=sra_stream.fifo_paths[0],
+                threads=job_context["salmon_thread_count"],
                 output_directory=job_context["output_directory"],
             )
         # Paired are trickier
         else:
-
-            # Okay, for some reason I can't explain, this only works in the temp directory,
-            # otherwise the `tee` part will only output to one or the other of the streams (non-deterministically),
-            # but not both. This doesn't appear to happen if the fifos are in tmp.
-            alpha = "/tmp/alpha"
-            os.mkfifo(alpha)
-            beta = "/tmp/beta"
-            os.mkfifo(beta)
-
-            dump_str = "fastq-dump --stdout --split-files -I {input_sra_file} | tee >(grep '@.*\.1\s' -A3 --no-group-separator > {fifo_alpha}) >(grep '@.*\.2\s' -A3 --no-group-separator > {fifo_beta}) > /dev/null &"
-            formatted_dump_command = dump_str.format(
-                input_sra_file=job_context["sra_input_file_path"], fifo_alpha=alpha, fifo_beta=beta
-            )
-            subprocess.Popen(
-                formatted_dump_command,
-                shell=True,
-                executable="/bin/bash",
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-            )
-
             command_str = (
                 "salmon --no-version-check quant -l A -i {index} "
-                "-1 {fifo_alpha} -2 {fifo_beta} -p 16 -o {output_directory} --seqBias --dumpEq --writeUnmappedNames"
+                "-1 {fifo_alpha} -2 {fifo_beta} -p {threads} -o {output_directory} --seqBias --dumpEq --writeUnmappedNames"
             )
             formatted_command = command_str.format(
                 index=job_context["index_directory"],
-                input_sra_file=job_context["sra_input_file_path"],
-                fifo_alpha=alpha,
-                fifo_beta=beta,
+                fifo_alpha=sra_stream.fifo_paths[0],
+                fifo_beta=sra_stream.fifo_paths[1],
+                threads=job_context["salmon_thread_count"],
                 output_directory=job_context["output_directory"],
             )
 
@@ -743,11 +765,9 @@ def _run_salmon(job_context: Dict) -> Dict:
         if "input_file_path_2" in job_context:
             second_read_str = " -2 {}".format(job_context["input_file_path_2"])
 
-            # Rob recommends 16 threads/process, which fits snugly on an x1 at 8GB RAM per Salmon container:
-            # (2 threads/core * 16 cores/socket * 64 vCPU) / (1TB/8GB) = ~17
             command_str = (
                 "salmon --no-version-check quant -l A --biasSpeedSamp 5 -i {index}"
-                " -1 {input_one}{second_read_str} -p 16 -o {output_directory}"
+                " -1 {input_one}{second_read_str} -p {threads} -o {output_directory}"
                 " --seqBias --gcBias --dumpEq --writeUnmappedNames"
             )
 
@@ -755,19 +775,21 @@ def _run_salmon(job_context: Dict) -> Dict:
                 index=job_context["index_directory"],
                 input_one=job_context["input_file_path"],
                 second_read_str=second_read_str,
+                threads=job_context["salmon_thread_count"],
                 output_directory=job_context["output_directory"],
             )
         else:
             # Related: https://github.com/COMBINE-lab/salmon/issues/83
             command_str = (
                 "salmon --no-version-check quant -l A -i {index}"
-                " -r {input_one} -p 16 -o {output_directory}"
+                " -r {input_one} -p {threads} -o {output_directory}"
                 " --seqBias --dumpEq --writeUnmappedNames"
             )
 
             formatted_command = command_str.format(
                 index=job_context["index_directory"],
                 input_one=job_context["input_file_path"],
+                threads=job_context["salmon_thread_count"],
                 output_directory=job_context["output_directory"],
             )
 
@@ -781,6 +803,9 @@ def _run_salmon(job_context: Dict) -> Dict:
     timeout = 60 * 60 * 3
     job_context["time_start"] = timezone.now()
     try:
+        if sra_stream:
+            sra_stream.start()
+
         completed_command = subprocess.run(
             formatted_command.split(),
             stdout=subprocess.PIPE,
@@ -798,8 +823,32 @@ def _run_salmon(job_context: Dict) -> Dict:
         job_context["job"].no_retry = True
         job_context["success"] = False
         return job_context
+    finally:
+        if sra_stream and sra_stream.reader:
+            job_context["sra_stream_stats"] = sra_stream.finish()
+            job_context["job"].metrics["sra_stream"] = job_context["sra_stream_stats"]
+            logger.info(
+                "Finished streaming SRA file into salmon.",
+                processor_job=job_context["job_id"],
+                **job_context["sra_stream_stats"],
+            )
 
     job_context["time_end"] = timezone.now()
+    job_context["job"].metrics["salmon_exit_code"] = completed_command.returncode
+
+    stream_exit_code = job_context.get("sra_stream_stats", {}).get("fastq_dump_exit_code", 0)
+    if stream_exit_code != 0 and completed_command.returncode == 0:
+        # Salmon will happily quantify whatever reads it got, so
+        # don't let it look like a success if it didn't get them all.
+        failure_reason = "fastq-dump exited with code {} while streaming {}: {}".format(
+            stream_exit_code,
+            job_context["sra_input_file_path"],
+            job_context["sra_stream_stats"].get("fastq_dump_stderr", ""),
+        )
+        logger.error(failure_reason, processor_job=job_context["job_id"])
+        job_context["job"].failure_reason = failure_reason
+        job_context["success"] = False
+        return job_context
 
     if completed_command.returncode == 1:
         stderr = completed_command.stderr.decode().strip()
@@ -927,6 +976,15 @@ def _run_salmon(job_context: Dict) -> Dict:
         kv.is_public = True
         kv.save()
 
+        kv = ComputationalResultAnnotation()
+        kv.data = {
+            "index_was_cached": job_context.get("index_was_cached", None),
+            "index_cold_start_time": job_context.get("index_cold_start_time", None),
+        }
+        kv.result = result
+        kv.is_public = False
+        kv.save()
+
         try:
             with open(
                 os.path.join(job_context["output_directory"], "lib_format_counts.json")
@@ -1078,11 +1136,59 @@ def _run_salmontools(job_context: Dict) -> Dict:
     return job_context
 
 
-def salmon(job_id: int) -> None:
+def _prewarm_index(job_context: Dict, organism_id: int) -> None:
+    """Installs the index the next salmon job queued on this node will probably need.
+
+    The foreman tells us which organism that job is for. Its read
+    length isn't known until it's running, so assume it's the same as
+    ours since that's usually the case for samples queued together.
+    """
+    index_type = "TRANSCRIPTOME_" + job_context["index_length"].upper()
+    index_object = (
+        OrganismIndex.objects.filter(organism_id=organism_id, index_type=index_type)
+        .order_by("-created_at")
+        .first()
+    )
+    if not index_object or index_cache.is_index_installed(
+        index_cache.get_index_directory(index_object.id)
+    ):
+        return
+
+    reservation_id = "prewarm_index_" + str(index_object.id)
+    start_time = time.time()
+    try:
+        disk_space.reserve_space(
+            reservation_id,
+            disk_space.estimate_files_size(
+                index_object.result.computedfile_set.all(), INDEX_DISK_SPACE_MULTIPLIER
+            ),
+        )
+        if index_cache.prewarm_index(index_object):
+            logger.info(
+                "Prewarmed salmon index for the next queued job.",
+                processor_job=job_context["job_id"],
+                organism_index=index_object.id,
+                duration=time.time() - start_time,
+            )
+    except Exception:
+        # This was only ever an optimization, the next job can install it itself.
+        logger.exception(
+            "Failed to prewarm salmon index.",
+            processor_job=job_context["job_id"],
+            organism_index=index_object.id,
+        )
+    finally:
+        disk_space.release_space(reservation_id)
+
+
+def salmon(job_id: int, prewarm_organism_id: int = None) -> None:
     """Main processor function for the Salmon Processor.
 
     Runs salmon quant command line tool, specifying either a long or
     short read length. Also runs Salmontools and Tximport.
+
+    If `prewarm_organism_id` is set, the index for that organism is
+    installed once the job is finished.
     """
     pipeline = Pipeline(name=PipelineEnum.SALMON.value)
     final_context = utils.run_pipeline(
@@ -1100,4 +1206,8 @@ def salmon(job_id: int) -> None:
             utils.end_job,
         ],
     )
+
+    if prewarm_organism_id and final_context and "index_length" in final_context:
+        _prewarm_index(final_context, prewarm_organism_id)
+
     return final_context
@@ -21,6 +21,7 @@ import simplejson as json
 from rpy2.robjects import pandas2ri, r as rlang
 from rpy2.robjects.packages import importr
 
+from data_refinery_common import disk_space
 from data_refinery_common.logging import get_and_configure_logger
 from data_refinery_common.models import ComputedFile, Sample
 from data_refinery_common.utils import get_env_variable
@@ -39,6 +40,9 @@ BODY_ERROR_HTML = (
 )
 BYTES_IN_GB = 1024 * 1024 * 1024
 QN_CHUNK_SIZE = 10000
+# The smasher downloads every input file and then writes out both the
+# smashed matrices and a zip of them.
+SMASHER_DISK_SPACE_MULTIPLIER = 3
 logger = get_and_configure_logger(__name__)
 ### DEBUG ###
 logger.setLevel(logging.getLevelName("DEBUG"))
@@ -103,6 +107,15 @@ def prepare_files(job_context: Dict) -> Dict:
             num_samples=len(job_context["samples"]),
         )
 
+    smashable_files = [
+        computed_file
+        for input_files in job_context["input_files"].values()
+        for computed_file, _ in input_files
+    ]
+    job_context = utils.reserve_disk_space(
+        job_context, disk_space.estimate_files_size(smashable_files, SMASHER_DISK_SPACE_MULTIPLIER),
+    )
+
     dataset_id = str(job_context["dataset"].pk)
     job_context["work_dir"] = "/home/user/data_store/smashed/" + dataset_id + "/"
     # Ensure we have a fresh smash directory
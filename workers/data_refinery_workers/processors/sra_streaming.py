@@ -0,0 +1,263 @@
+"""Streams reads out of .sra files and into salmon through FIFOs.
+
+fastq-dump writes the reads to its stdout and a reader thread hands
+them off to one writer thread per FIFO. Paired reads come out of
+fastq-dump interleaved, so the reader splits them by mate as it goes.
+The queues between the reader and the writers are bounded, so if
+salmon falls behind fastq-dump gets blocked instead of the reads
+piling up in memory, and the time spent waiting on either side tells
+us which one is holding things up.
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from data_refinery_common.logging import get_and_configure_logger
+
+logger = get_and_configure_logger(__name__)
+
+# How much to read from fastq-dump at a time.
+READ_SIZE = 1024 * 1024
+
+# How many chunks can be waiting for each FIFO before the reader has
+# to wait for salmon to catch up.
+QUEUE_DEPTH = 16
+
+# Waiting on either side for longer than this at once counts as a stall.
+STALL_TIME = 30
+
+# How long to give fastq-dump to finish once salmon has exited.
+DUMP_EXIT_TIMEOUT = 60
+
+# How much of fastq-dump's stderr to keep around for failure reasons.
+STDERR_TAIL_SIZE = 2000
+
+
+def _build_dump_command(sra_file_path: str, is_paired: bool) -> List[str]:
+    if is_paired:
+        # --readids appends the mate number to each read's name,
+        # which is how the reader tells the mates apart.
+        return ["fastq-dump", "--stdout", "--split-files", "--readids", sra_file_path]
+    else:
+        return ["fastq-dump", "--stdout", sra_file_path]
+
+
+class _FifoWriter(threading.Thread):
+    """Writes whatever is put on its queue to a FIFO until it gets None."""
+
+    def __init__(self, fifo_path: str):
+        super().__init__(daemon=True)
+        self.fifo_path = fifo_path
+        self.queue = queue.Queue(maxsize=QUEUE_DEPTH)
+        self.opened = threading.Event()
+        self.bytes_written = 0
+        self.error = None
+
+    def run(self):
+        try:
+            # This blocks until salmon opens the other end.
+            with open(self.fifo_path, "wb", buffering=0) as fifo:
+                self.opened.set()
+                chunk = self.queue.get()
+                while chunk is not None:
+                    fifo.write(chunk)
+                    self.bytes_written += len(chunk)
+                    chunk = self.queue.get()
+        except OSError as e:
+            # Most likely salmon exited without reading everything.
+            self.error = e
+        finally:
+            self.opened.set()
+
+        # Keep draining so the reader never gets stuck waiting on us.
+        while self.error and self.queue.get() is not None:
+            pass
+
+    def unblock(self):
+        """Lets the writer past open() if nothing is ever going to read the FIFO."""
+        if self.opened.is_set():
+            return
+
+        try:
+            reader_fd = os.open(self.fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+        except OSError:
+            return
+
+        # Give the writer a chance to open the FIFO before closing
+        # our end, so its first write fails instead of its open.
+        self.opened.wait(timeout=1)
+        os.close(reader_fd)
+
+
+class SraStream:
+    """Dumps the reads in an .sra file into one FIFO per mate.
+
+    Call start() before starting the process reading the FIFOs and
+    finish() after it has exited.
+    """
+
+    def __init__(self, sra_file_path: str, is_paired: bool):
+        self.sra_file_path = sra_file_path
+        self.is_paired = is_paired
+
+        # FIFOs only behave reliably in /tmp in our containers.
+        self.fifo_directory = tempfile.mkdtemp(prefix="sra_stream_", dir="/tmp")
+        num_mates = 2 if is_paired else 1
+        self.fifo_paths = [
+            os.path.join(self.fifo_directory, "mate_" + str(mate + 1)) for mate in range(num_mates)
+        ]
+
+        self.writers = []
+        self.dump_process = None
+        self.stderr_file = None
+        self.reader = None
+
+        self.start_time = None
+        self.bytes_read = 0
+        self.read_wait_time = 0.0
+        self.write_wait_time = 0.0
+        self.num_stalls = 0
+        self.num_unmatched_records = 0
+
+    def start(self) -> None:
+        try:
+            for fifo_path in self.fifo_paths:
+                os.mkfifo(fifo_path)
+                writer = _FifoWriter(fifo_path)
+                writer.start()
+                self.writers.append(writer)
+
+            self.stderr_file = tempfile.TemporaryFile(dir=self.fifo_directory)
+            self.start_time = time.time()
+            self.dump_process = subprocess.Popen(
+                _build_dump_command(self.sra_file_path, self.is_paired),
+                stdout=subprocess.PIPE,
+                stderr=self.stderr_file,
+            )
+        except Exception:
+            for writer in self.writers:
+                writer.queue.put(None)
+                writer.unblock()
+            shutil.rmtree(self.fifo_directory, ignore_errors=True)
+            raise
+
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _record_wait(self, wait_time: float, is_read: bool) -> None:
+        if is_read:
+            self.read_wait_time += wait_time
+        else:
+            self.write_wait_time += wait_time
+
+        if wait_time > STALL_TIME:
+            self.num_stalls += 1
+
+    def _send(self, writer: _FifoWriter, chunk: bytes) -> None:
+        start_time = time.monotonic()
+        writer.queue.put(chunk)
+        self._record_wait(time.monotonic() - start_time, is_read=False)
+
+    def _split_mates(self, pending: bytes) -> bytes:
+        """Sends the complete records in `pending` to their mate's FIFO.
+
+        Returns whatever is left over after the last complete record.
+        """
+        lines = pending.split(b"\n")
+        # The last line is either partial or the empty string after
+        # the final newline, so it's never part of a complete record.
+        num_complete_lines = (len(lines) - 1) // 4 * 4
+
+        mates = ([], [])
+        for record_start in range(0, num_complete_lines, 4):
+            read_name = lines[record_start].split(b" ", 1)[0]
+            if read_name.endswith(b".1"):
+                mates[0].append(b"\n".join(lines[record_start : record_start + 4]))
+            elif read_name.endswith(b".2"):
+                mates[1].append(b"\n".join(lines[record_start : record_start + 4]))
+            else:
+                self.num_unmatched_records += 1
+
+        for writer, records in zip(self.writers, mates):
+            if records:
+                records.append(b"")
+                self._send(writer, b"\n".join(records))
+
+        return b"\n".join(lines[num_complete_lines:])
+
+    def _read(self) -> None:
+        stdout = self.dump_process.stdout
+        pending = b""
+        try:
+            while not any(writer.error for writer in self.writers):
+                start_time = time.monotonic()
+                chunk = stdout.read1(READ_SIZE)
+                self._record_wait(time.monotonic() - start_time, is_read=True)
+                if not chunk:
+                    break
+
+                self.bytes_read += len(chunk)
+                if self.is_paired:
+                    pending = self._split_mates(pending + chunk)
+                else:
+                    self._send(self.writers[0], chunk)
+        finally:
+            for writer in self.writers:
+                writer.queue.put(None)
+
+            # If we stopped early fastq-dump has nowhere to write to.
+            if self.dump_process.poll() is None and any(writer.error for writer in self.writers):
+                self.dump_process.kill()
+
+    def _get_stderr_tail(self) -> str:
+        self.stderr_file.seek(0, os.SEEK_END)
+        self.stderr_file.seek(max(self.stderr_file.tell() - STDERR_TAIL_SIZE, 0))
+        return self.stderr_file.read().decode(errors="replace").strip()
+
+    def finish(self) -> Dict:
+        """Cleans up after the stream and returns its stats.
+
+        The stats include fastq-dump's exit code, so callers can tell
+        whether the reads salmon got were complete.
+        """
+        for writer in self.writers:
+            writer.unblock()
+
+        self.reader.join(timeout=DUMP_EXIT_TIMEOUT)
+        if self.reader.is_alive():
+            logger.error(
+                "fastq-dump didn't finish after its reads stopped being consumed.",
+                sra_file_path=self.sra_file_path,
+            )
+            self.dump_process.kill()
+            self.reader.join()
+
+        dump_exit_code = self.dump_process.wait()
+        for writer in self.writers:
+            writer.join()
+
+        duration = time.time() - self.start_time
+        stats = {
+            "bytes_read": self.bytes_read,
+            "bytes_written": [writer.bytes_written for writer in self.writers],
+            "duration": duration,
+            "bytes_per_second": self.bytes_read / duration if duration else 0.0,
+            "read_wait_time": self.read_wait_time,
+            "write_wait_time": self.write_wait_time,
+            "num_stalls": self.num_stalls,
+            "num_unmatched_records": self.num_unmatched_records,
+            "fastq_dump_exit_code": dump_exit_code,
+        }
+        if dump_exit_code != 0:
+            stats["fastq_dump_stderr"] = self._get_stderr_tail()
+
+        self.stderr_file.close()
+        shutil.rmtree(self.fifo_directory, ignore_errors=True)
+
+        return stats
@@ -102,3 +102,25 @@ class JanitorTestCase(TestCase):
 
         # Deleted all the working directories except for the one that's still running.
         self.assertEqual(len(final_context["deleted_items"]), (JOBS * 2) - 1)
+
+    @tag("janitor")
+    @patch("data_refinery_workers.processors.janitor.batch.describe_jobs")
+    def test_janitor_bulk_lookups(self, mock_describe_jobs):
+        """The janitor should resolve all of its directories with a couple of queries."""
+        prepare_job()
+
+        # Give one of the directories some contents so it has bytes to reclaim.
+        with open(LOCAL_ROOT_DIR + "/processor_job_0/junk.txt", "w") as junk_file:
+            junk_file.write("a" * 1000)
+
+        mock_describe_jobs.return_value = {"jobs": [{"jobId": "running_job", "status": "RUNNING"}]}
+
+        # One query for the samples and one for the processor jobs.
+        with self.assertNumQueries(2):
+            job_context = janitor._find_and_remove_expired_jobs({})
+
+        self.assertEqual(len(job_context["deleted_items"]), (JOBS * 2) - 1)
+        self.assertGreaterEqual(job_context["bytes_reclaimed"], 1000)
+        self.assertIn("percent_used", job_context["disk_usage_before"])
+        self.assertIn("percent_used", job_context["disk_usage_after"])
+        self.assertGreaterEqual(job_context["janitor_duration"], 0)
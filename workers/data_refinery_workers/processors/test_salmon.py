@@ -1046,6 +1046,15 @@ class EarlyTximportTestCase(TestCase):
 
         rds_file = ComputedFile.objects.get(filename="txi_out.RDS")
 
+        # The time spent in each phase should be recorded on the result.
+        timings_annotation = ComputationalResultAnnotation.objects.get(
+            result=rds_file.result, data__has_key="phase_timings"
+        )
+        self.assertEqual(
+            set(timings_annotation.data["phase_timings"].keys()),
+            {"staging", "tximport", "post_processing"},
+        )
+
         for accession_code in complete_accessions:
             # Check to make sure that all the associations were madep
             # correctly. These queries will fail if they weren't.
@@ -0,0 +1,109 @@
+import os
+import shutil
+import threading
+from unittest.mock import patch
+
+from django.test import TestCase, tag
+
+from data_refinery_workers.processors import sra_streaming
+
+TEST_DIR = "/home/user/data_store/sra_streaming_tests"
+
+
+def write_interleaved_fastq(path, num_spots):
+    """Writes what fastq-dump --split-files --readids would for paired reads."""
+    with open(path, "w") as fastq_file:
+        for spot in range(num_spots):
+            for mate in [1, 2]:
+                read_name = "SRR000001.{}.{}".format(spot, mate)
+                fastq_file.write("@{0} {1} length=4\nACGT\n+{0}\n@@@@\n".format(read_name, spot))
+
+
+def read_fifo(path, results, index):
+    with open(path, "rb") as fifo:
+        results[index] = fifo.read()
+
+
+class SraStreamingTestCase(TestCase):
+    def setUp(self):
+        os.makedirs(TEST_DIR, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    @tag("salmon")
+    def test_splits_mates(self):
+        """Each mate should end up in its own FIFO, in order and complete."""
+        fastq_path = os.path.join(TEST_DIR, "interleaved.fastq")
+        # Enough spots that records get split across reads from fastq-dump.
+        num_spots = 50000
+        write_interleaved_fastq(fastq_path, num_spots)
+
+        with patch.object(sra_streaming, "_build_dump_command", return_value=["cat", fastq_path]):
+            stream = sra_streaming.SraStream("SRR000001.sra", is_paired=True)
+            stream.start()
+
+            results = [None, None]
+            readers = [
+                threading.Thread(target=read_fifo, args=(path, results, index))
+                for index, path in enumerate(stream.fifo_paths)
+            ]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join()
+
+            stats = stream.finish()
+
+        for mate, output in enumerate(results):
+            lines = output.decode().splitlines()
+            self.assertEqual(len(lines), num_spots * 4)
+            self.assertEqual(lines[0], "@SRR000001.0.{} 0 length=4".format(mate + 1))
+            self.assertEqual(
+                lines[-4],
+                "@SRR000001.{}.{} {} length=4".format(num_spots - 1, mate + 1, num_spots - 1),
+            )
+
+        self.assertEqual(stats["fastq_dump_exit_code"], 0)
+        self.assertEqual(stats["bytes_read"], os.path.getsize(fastq_path))
+        self.assertEqual(sum(stats["bytes_written"]), stats["bytes_read"])
+        self.assertEqual(stats["num_unmatched_records"], 0)
+        self.assertFalse(os.path.exists(stream.fifo_directory))
+
+    @tag("salmon")
+    def test_consumer_exits_early(self):
+        """If salmon dies without reading its input the stream shouldn't hang."""
+        fastq_path = os.path.join(TEST_DIR, "interleaved.fastq")
+        write_interleaved_fastq(fastq_path, 50000)
+
+        with patch.object(sra_streaming, "_build_dump_command", return_value=["cat", fastq_path]):
+            stream = sra_streaming.SraStream("SRR000001.sra", is_paired=True)
+            stream.start()
+
+            # Only read a little of one FIFO and never open the other.
+            with open(stream.fifo_paths[0], "rb") as fifo:
+                fifo.read(100)
+
+            stats = stream.finish()
+
+        self.assertLess(sum(stats["bytes_written"]), os.path.getsize(fastq_path))
+        self.assertFalse(os.path.exists(stream.fifo_directory))
+
+    @tag("salmon")
+    def test_dump_failure_reported(self):
+        """fastq-dump's exit code and error output should make it into the stats."""
+        with patch.object(
+            sra_streaming,
+            "_build_dump_command",
+            return_value=["sh", "-c", "echo 'item not found' >&2; exit 3"],
+        ):
+            stream = sra_streaming.SraStream("SRR000001.sra", is_paired=False)
+            stream.start()
+
+            results = [None]
+            read_fifo(stream.fifo_paths[0], results, 0)
+            stats = stream.finish()
+
+        self.assertEqual(results[0], b"")
+        self.assertEqual(stats["fastq_dump_exit_code"], 3)
+        self.assertEqual(stats["fastq_dump_stderr"], "item not found")
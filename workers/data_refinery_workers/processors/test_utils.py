@@ -1,14 +1,17 @@
 import copy
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from django.test import TestCase
 from django.utils import timezone
 
+from data_refinery_common import disk_space
 from data_refinery_common.models import (
+    Dataset,
     Organism,
     OriginalFile,
     OriginalFileSampleAssociation,
     ProcessorJob,
+    ProcessorJobDatasetAssociation,
     ProcessorJobOriginalFileAssociation,
     Sample,
     SurveyJob,
@@ -113,3 +116,31 @@ class RunPipelineTestCase(TestCase):
         processor_job.refresh_from_db()
         self.assertFalse(processor_job.success)
         self.assertIsNotNone(processor_job.end_time)
+
+    @patch("data_refinery_workers.processors.utils.disk_space.reserve_space")
+    def test_deferred_smasher_job(self, mock_reserve_space):
+        """A smasher job deferred for disk space shouldn't fail its dataset."""
+        mock_reserve_space.side_effect = disk_space.InsufficientDiskSpaceError(
+            "processor_job_1", 100, 10
+        )
+
+        processor_job = ProcessorJob(pipeline_applied="SMASHER", num_retries=1)
+        processor_job.save()
+        dataset = Dataset(data={}, is_processing=True)
+        dataset.save()
+        ProcessorJobDatasetAssociation.objects.create(processor_job=processor_job, dataset=dataset)
+
+        def reserve(job_context):
+            return utils.reserve_disk_space(job_context, 100)
+
+        utils.run_pipeline({"job_id": processor_job.id}, [reserve])
+
+        processor_job.refresh_from_db()
+        self.assertFalse(processor_job.success)
+        self.assertTrue(processor_job.deferred)
+        self.assertEqual(processor_job.num_retries, 1)
+
+        dataset.refresh_from_db()
+        self.assertTrue(dataset.is_processing)
+        self.assertFalse(dataset.failure_reason)
+        self.assertNotEqual(dataset.success, False)
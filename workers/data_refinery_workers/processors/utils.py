@@ -15,6 +15,7 @@ from django.utils import timezone
 import pandas as pd
 import yaml
 
+from data_refinery_common import disk_space, index_cache
 from data_refinery_common.enums import SMASHER_JOB_TYPES, ProcessorEnum, ProcessorPipeline
 from data_refinery_common.job_management import create_downloader_job
 from data_refinery_common.logging import get_and_configure_logger
@@ -99,6 +100,72 @@ def prepare_original_files(job_context):
     return job_context
 
 
+def reserve_disk_space(job_context: Dict, num_bytes: int) -> Dict:
+    """Reserves `num_bytes` on this node's volume for the job.
+
+    If the space can't be found, even after evicting cached indexes
+    and finished jobs' directories, the job is deferred rather than
+    left to crash partway through writing its files.
+    """
+    try:
+        disk_space.reserve_space(get_disk_space_reservation_id(job_context["job_id"]), num_bytes)
+    except disk_space.InsufficientDiskSpaceError as e:
+        # Running out of room on this node isn't the job's fault, so
+        # the Foreman won't count it against its retries or fail the
+        # job's datasets.
+        job_context["job"].deferred = True
+        raise ProcessorJobError(
+            "Deferring job because there isn't enough disk space: " + str(e),
+            success=False,
+            requested_bytes=e.requested_bytes,
+            available_bytes=e.available_bytes,
+        )
+
+    return job_context
+
+
+def get_disk_space_reservation_id(job_id: int) -> str:
+    """Returns the id a processor job's disk space reservation is tracked under.
+
+    This matches the name of the job's working directory, which keeps
+    that directory from being evicted while the job is using it.
+    """
+    return "processor_job_" + str(job_id)
+
+
+def get_cpu_allocation() -> int:
+    """Returns how many CPUs this container is allowed to use.
+
+    Prefers the container's CPU quota and falls back to the CPUs we're
+    allowed to be scheduled on when there isn't one.
+    """
+    quota_files = [
+        # cgroup v2 keeps the quota and period together.
+        ("/sys/fs/cgroup/cpu.max", None),
+        ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),
+    ]
+    for quota_path, period_path in quota_files:
+        try:
+            with open(quota_path) as quota_file:
+                values = quota_file.read().split()
+            if period_path:
+                with open(period_path) as period_file:
+                    values.append(period_file.read().strip())
+
+            quota, period = values[0], values[1]
+            if quota in ["max", "-1"]:
+                break
+
+            return max(int(int(quota) / int(period)), 1)
+        except (OSError, IndexError, ValueError):
+            continue
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
 def prepare_dataset(job_context):
     """Provision in the Job context for Dataset-driven processors"""
     job = job_context["job"]
@@ -251,8 +318,9 @@ def end_job(job_context: Dict, abort=False):
             if computed_file.id:
                 computed_file.delete()
 
-        # if the processor job fails mark all datasets as failed
-        if ProcessorPipeline[job.pipeline_applied] in SMASHER_JOB_TYPES:
+        # if the processor job fails mark all datasets as failed,
+        # unless it's only being deferred and will be retried.
+        if ProcessorPipeline[job.pipeline_applied] in SMASHER_JOB_TYPES and not job.deferred:
             for dataset in job.datasets.all():
                 dataset.failure_reason = job.failure_reason
                 dataset.is_processing = False
@@ -320,6 +388,20 @@ def end_job(job_context: Dict, abort=False):
     ):
         shutil.rmtree(job_context["work_dir"], ignore_errors=True)
 
+    if "index_cache_reference" in job_context:
+        try:
+            index_cache.release_index(
+                job_context["index_cache_reference"], get_disk_space_reservation_id(job.id)
+            )
+        except Exception:
+            logger.exception("Failed to release cached index.", processor_job=job.id)
+
+    # Whatever this job reserved is either on disk by now or no longer needed.
+    try:
+        disk_space.release_space(get_disk_space_reservation_id(job.id))
+    except Exception:
+        logger.exception("Failed to release disk space reservation.", processor_job=job.id)
+
     job.abort = abort
     job.success = success
     job.end_time = timezone.now()
@@ -443,6 +525,10 @@ class ProcessorJobError(Exception):
             job.abort = self.abort
         job.save()
 
+        # Deferred jobs will be retried, so their datasets aren't failed.
+        if job.deferred:
+            return
+
         # also update the failure reason if this is a dataset's processor job
         for dataset in job.datasets.all():
             dataset.failure_reason = self.failure_reason
@@ -154,6 +154,10 @@ else:
 
 RUNNING_IN_CLOUD = get_env_variable("RUNNING_IN_CLOUD") == "True"
 
+# Files are hashed as they're downloaded rather than read back afterwards.
+# Setting this rereads them anyway and checks the two agree.
+VERIFY_FILE_DIGESTS = get_env_variable_gracefully("VERIFY_FILE_DIGESTS") == "True"
+
 # EngagementBot
 ENGAGEMENTBOT_WEBHOOK = get_env_variable_gracefully("ENGAGEMENTBOT_WEBHOOK")
 